@@ -8,6 +8,7 @@ from flask import Flask, jsonify
 
 from .config import load_config
 from .logging import init_app_logging
+from .tracing import init_tracing
 from .version import NAME as MODEL_NAME, VERSION as MODEL_VERSION
 
 
@@ -59,6 +60,24 @@ def create_app(config_overrides: Optional[dict] = None) -> Flask:
     app.config["FIELD_RESOLVER_URL"] = cfg.FIELD_RESOLVER_URL
     app.config["LOG_LEVEL"] = cfg.LOG_LEVEL
     app.config["LOG_JSON"] = cfg.LOG_JSON
+    app.config["LOG_ASYNC"] = cfg.LOG_ASYNC
+    app.config["LOG_QUEUE_SIZE"] = cfg.LOG_QUEUE_SIZE
+    app.config["LOG_SAMPLE_RATES"] = dict(cfg.LOG_SAMPLE_RATES)
+    app.config["TRACE_ENABLED"] = cfg.TRACE_ENABLED
+    app.config["TRACE_SAMPLE_RATE"] = cfg.TRACE_SAMPLE_RATE
+    app.config["TRACE_BUFFER_SIZE"] = cfg.TRACE_BUFFER_SIZE
+    app.config["TRACE_FILE"] = os.path.join(base_dir, cfg.TRACE_FILE) if cfg.TRACE_FILE else None
+    app.config["PROFILE_TOKEN"] = cfg.PROFILE_TOKEN
+    app.config["PROFILE_DIR"] = os.path.join(base_dir, cfg.PROFILE_DIR)
+    app.config["PROFILE_MAX_SECONDS"] = cfg.PROFILE_MAX_SECONDS
+    app.config["PROFILE_MAX_FILES"] = cfg.PROFILE_MAX_FILES
+    app.config["PROFILE_INTERVAL_MS"] = cfg.PROFILE_INTERVAL_MS
+    app.config["THREAD_BUDGET_ENABLED"] = cfg.THREAD_BUDGET_ENABLED
+    app.config["SERVER_THREADS"] = cfg.SERVER_THREADS
+    app.config["ASGI_CPU_THREADS"] = cfg.ASGI_CPU_THREADS
+    app.config["ASGI_CPU_MAX_PENDING"] = cfg.ASGI_CPU_MAX_PENDING
+    app.config["ASGI_IO_THREADS"] = cfg.ASGI_IO_THREADS
+    app.config["ASGI_CPU_ROUTE_PREFIXES"] = tuple(cfg.ASGI_CPU_ROUTE_PREFIXES)
     app.config["ENABLE_TEST_HOOKS"] = cfg.ENABLE_TEST_HOOKS
     app.config["SERVICE_START_TIME"] = cfg.START_TIME
 
@@ -68,6 +87,41 @@ def create_app(config_overrides: Optional[dict] = None) -> Flask:
     app.config["DISASTER_POST_DAYS"] = getattr(cfg, "DISASTER_POST_DAYS", 7)
     # Parsed dict of thresholds
     app.config["DISASTER_THRESHOLDS"] = getattr(cfg, "DISASTER_THRESHOLDS", {})
+    app.config["RASTER_DATA_DIR"] = os.path.join(base_dir, cfg.RASTER_DATA_DIR)
+    app.config["CHANGE_MASK_CHUNK_ROWS"] = cfg.CHANGE_MASK_CHUNK_ROWS
+
+    # Persistent GEE index cache (shared across gunicorn workers via the SQLite file)
+    app.config["GEE_CACHE_ENABLED"] = cfg.GEE_CACHE_ENABLED
+    app.config["GEE_CACHE_PATH"] = os.path.join(base_dir, cfg.GEE_CACHE_PATH)
+    app.config["GEE_CACHE_TTL_S"] = cfg.GEE_CACHE_TTL_S
+    app.config["GEE_CACHE_NEGATIVE_TTL_S"] = cfg.GEE_CACHE_NEGATIVE_TTL_S
+    if cfg.GEE_CACHE_ENABLED:
+        from .index_cache import IndexCache
+
+        app.extensions["gee_index_cache"] = IndexCache(
+            app.config["GEE_CACHE_PATH"],
+            ttl_s=cfg.GEE_CACHE_TTL_S,
+            negative_ttl_s=cfg.GEE_CACHE_NEGATIVE_TTL_S,
+        )
+
+    # Split one thread budget between ORT and the native libraries' pools
+    from .threads import init_thread_budget
+
+    init_thread_budget(app, cfg)
+
+    # Profile output directory (admin profiling and X-Profile-Token requests)
+    from .profiling import ProfileStore
+
+    app.extensions["profile_store"] = ProfileStore(app.config["PROFILE_DIR"], cfg.PROFILE_MAX_FILES)
+
+    # Bounded fan-out for GEE time series (process-wide pool + rate limiter)
+    from .gee_timeseries import RetryPolicy, TimeSeriesFetcher
+
+    app.extensions["gee_timeseries"] = TimeSeriesFetcher(
+        max_workers=cfg.GEE_TS_MAX_WORKERS,
+        rate_per_s=cfg.GEE_TS_RATE_PER_S,
+        retry=RetryPolicy(max_retries=cfg.GEE_TS_MAX_RETRIES, backoff_s=cfg.GEE_TS_BACKOFF_S),
+    )
 
     # Start background loading of yield prediction model
     from .yield_predict import _predictor, _resolve_model_path
@@ -80,6 +134,7 @@ def create_app(config_overrides: Optional[dict] = None) -> Flask:
 
     # Init logging
     init_app_logging(app)
+    init_tracing(app)
 
     # Register API blueprint
     from .api import api_bp  # local import to avoid circulars
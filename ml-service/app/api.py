@@ -2,19 +2,57 @@ import time
 import uuid
 import hashlib
 import json
+import logging
 import os
+import tempfile
 import numpy as np
 from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, Optional, Tuple, List
 
-from flask import Blueprint, current_app, g, jsonify, request
+from flask import Blueprint, current_app, g, jsonify, request, send_file
 
 from .auth import require_internal_auth
 from .inference import encode_geojson_base64, run_unet_geojson, persist_mask_geojson
 from .monitoring import log_inference_event
+from .logging import get_log_stats
+from .profiling import profile_worker
+from .threads import thread_status
+from .tracing import span
 from .yield_predict import predict_numeric, build_matrix_from_features
-from .disaster_analyze import analyze_indices, build_feature_collection
-from .gee_indices import compute_indices as gee_compute_indices, is_available as gee_is_available
+from .disaster_analyze import (
+    analyze_composites,
+    analyze_indices,
+    analyze_indices_multi,
+    build_feature_collection,
+    thresholds_from_config,
+)
+from .change_mask import (
+    MorphologyConfig as ChangeMaskMorphologyConfig,
+    build_change_mask_chunked,
+    load_stack,
+    mask_to_feature_collection,
+    resolve_local_path,
+)
+from .gee_timeseries import fetch_index_series
+from .negotiation import (
+    JSON as JSON_FORMAT,
+    UnsupportedMediaType,
+    decode_body,
+    encode_body,
+    index_records_from_columns,
+    is_columnar,
+    matrix_from_columns,
+    request_format,
+    response_format,
+)
+from .gee_indices import (
+    DEFAULT_MAX_CLOUD_PCT as GEE_DEFAULT_MAX_CLOUD_PCT,
+    S2_COLLECTION as GEE_S2_COLLECTION,
+    compute_indices as gee_compute_indices,
+    compute_indices_batch as gee_compute_indices_batch,
+    compute_window_composites as gee_compute_window_composites,
+    is_available as gee_is_available,
+)
 from .schemas import (
     ErrorResponse,
     Metrics,
@@ -27,15 +65,80 @@ from .schemas import (
     YieldPredictResponse,
     DisasterAnalyzeRequest,
     DisasterAnalyzeResponse,
+    DisasterScanRequest,
+    ChangeMaskRequest,
+    GeeDisasterAnalyzeRequest,
+    GeeTimeSeriesRequest,
     MetricsBasic,
 )
 from .version import NAME as DEFAULT_MODEL_NAME, VERSION as DEFAULT_MODEL_VERSION
 
 api_bp = Blueprint("api", __name__)
+logger = logging.getLogger(__name__)
 
 
-def _ok(body: Dict[str, Any], status: int = 200):
-    return jsonify(body), status
+def _ok(body: Dict[str, Any], status: int = 200, table_key: Optional[str] = None):
+    """
+    JSON by default; MessagePack (or Arrow, when the body has a primary table under
+    table_key) when the client's Accept header prefers it.
+    """
+    fmt = response_format(request.accept_mimetypes, tabular=table_key is not None)
+    with span("serialize", format=fmt):
+        if fmt == JSON_FORMAT:
+            resp = jsonify(body)
+        else:
+            resp = current_app.response_class(encode_body(body, fmt, table_key), mimetype=fmt)
+    resp.headers["Vary"] = "Accept"
+    return resp, status
+
+
+def _read_body(columnar_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Decode the request body per Content-Type (JSON default, MessagePack, Arrow IPC stream).
+    Arrow tables land under columnar_key as {column: ndarray}.
+    Raises UnsupportedMediaType for formats this endpoint or server can't read.
+    """
+    fmt = request_format(request.content_type)
+    with span("parse", format=fmt):
+        if fmt == JSON_FORMAT:
+            data = request.get_json(force=True, silent=False)
+        else:
+            data = decode_body(request.get_data(cache=False), fmt, columnar_key)
+    if not isinstance(data, dict):
+        raise ValueError("request body must be an object")
+    return data
+
+
+def _unsupported_media_type(exc: Exception):
+    return _error("UNSUPPORTED_MEDIA_TYPE", "Unsupported request body format", {"details": str(exc)}, status=415)
+
+
+def _validate_indices_request(model_cls, data: Dict[str, Any]):
+    """
+    Validate a disaster request whose "indices" are either a list of IndexPoint objects or
+    columnar arrays (vectorized checks). Returns (request_model, index_records).
+    """
+    with span("validate", columnar=is_columnar(data.get("indices"))):
+        return _validate_indices_payload(model_cls, data)
+
+
+def _validate_indices_payload(model_cls, data: Dict[str, Any]):
+    if is_columnar(data.get("indices")):
+        records = index_records_from_columns(data["indices"])
+        req = model_cls.model_validate({**data, "indices": []})
+        return req, records
+    req = model_cls.model_validate(data)
+    records = [
+        {
+            "field_id": r.field_id,
+            "date": r.date,
+            "ndvi": float(r.ndvi),
+            "ndwi": float(r.ndwi),
+            "tdvi": float(r.tdvi),
+        }
+        for r in req.indices
+    ]
+    return req, records
 
 
 def _error(code: str, message: str, details: Optional[Dict[str, Any]] = None, status: int = 400):
@@ -58,7 +161,11 @@ def health():
     uptime_s = time.time() - float(current_app.config.get("SERVICE_START_TIME", time.time()))
     # Version exposed in health matches configured default
     version = str(current_app.config.get("UNET_DEFAULT_VERSION", DEFAULT_MODEL_VERSION))
-    return _ok({"status": "ok", "version": version, "uptime_s": uptime_s})
+    body = {"status": "ok", "version": version, "uptime_s": uptime_s}
+    threads = thread_status(current_app)
+    if threads is not None:
+        body["threads"] = threads
+    return _ok(body)
 
 
 def _resolve_effective_model_version(body_version: Optional[str]) -> Tuple[str, str]:
@@ -153,12 +260,14 @@ def predict():
 
     # Parse and validate request via Pydantic
     try:
-        data = request.get_json(force=True, silent=False)
+        with span("parse"):
+            data = request.get_json(force=True, silent=False)
     except Exception:
         return _error("INVALID_INPUT", "Invalid JSON body", status=400)
 
     try:
-        req = PredictRequest.model_validate(data)
+        with span("validate"):
+            req = PredictRequest.model_validate(data)
     except Exception as exc:
         # Pydantic error formatting
         return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
@@ -201,6 +310,7 @@ def predict():
             tile_size=int(req.tiling.size),
             overlap=int(req.tiling.overlap),
             # threshold/batch/padding/hann taken from env defaults inside pipeline
+            ort_profile_prefix=getattr(g, "ort_profile_prefix", None),
         )
     except Exception as e:
         # Monitoring hook on failure
@@ -233,6 +343,9 @@ def predict():
             pass
         return _error("UPSTREAM_ERROR", "Inference failed", {"details": str(e)}, status=502)
 
+    if meta.get("ort_profile"):
+        g.profile_files = [os.path.basename(meta["ort_profile"])]
+
     # Optional simulated processing delay (within budget)
     if sleep_ms > 0:
         time.sleep(sleep_ms / 1000.0)
@@ -253,6 +366,7 @@ def predict():
         "overlap": int(meta.get("config", {}).get("overlap", req.tiling.overlap)),
         "batch_size": int(meta.get("config", {}).get("batch_size", 4)),
         "threshold": float(meta.get("threshold", 0.5)),
+        "threads": meta.get("threads"),
         "postprocess": {
             "min_area": int(os.getenv("POST_MIN_AREA", "0")),
             "simplify_tolerance": float(os.getenv("POST_SIMPLIFY_TOLERANCE", "0.0")),
@@ -309,15 +423,22 @@ def predict():
 @require_internal_auth
 def yield_predict_endpoint():
     t0 = time.time()
-    # Parse JSON
+    # Parse body (JSON, MessagePack or Arrow IPC; Arrow columns are the feature matrix)
     try:
-        data = request.get_json(force=True, silent=False)
+        data = _read_body(columnar_key="rows")
+    except UnsupportedMediaType as exc:
+        return _unsupported_media_type(exc)
     except Exception:
         return _error("INVALID_INPUT", "Invalid JSON body", status=400)
 
-    # Validate schema
+    # Validate schema; columnar rows ({feature: [values]}) get vectorized checks instead
+    columnar_matrix = None
     try:
-        req = YieldPredictRequest.model_validate(data)
+        with span("validate", columnar=is_columnar(data.get("rows"))):
+            if is_columnar(data.get("rows")):
+                columnar_matrix, names = matrix_from_columns(data["rows"], data.get("feature_names"))
+                data = {**data, "rows": [], "feature_names": names}
+            req = YieldPredictRequest.model_validate(data)
     except Exception as exc:
         return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
 
@@ -335,6 +456,9 @@ def yield_predict_endpoint():
 
     if req.features is not None:
         rows, field_ids, feature_names = build_matrix_from_features(req.features, None)
+    elif columnar_matrix is not None:
+        rows = columnar_matrix
+        feature_names = list(req.feature_names or [])
     else:
         # rows + feature_names path
         rows = [[float(x) for x in r] for r in (req.rows or [])]
@@ -385,22 +509,24 @@ def yield_predict_endpoint():
         }
     except Exception:
         pass
-    return _ok(resp)
+    return _ok(resp, table_key="predictions")
 
 
 @api_bp.post("/v1/disaster/analyze")
 @require_internal_auth
 def disaster_analyze_endpoint():
     t0 = time.time()
-    # Parse JSON
+    # Parse body (JSON, MessagePack or Arrow IPC; Arrow columns are the indices)
     try:
-        data = request.get_json(force=True, silent=False)
+        data = _read_body(columnar_key="indices")
+    except UnsupportedMediaType as exc:
+        return _unsupported_media_type(exc)
     except Exception:
         return _error("INVALID_INPUT", "Invalid JSON body", status=400)
 
     # Validate schema
     try:
-        req = DisasterAnalyzeRequest.model_validate(data)
+        req, records = _validate_indices_request(DisasterAnalyzeRequest, data)
     except Exception as exc:
         return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
 
@@ -411,19 +537,6 @@ def disaster_analyze_endpoint():
         token = str(ve).replace("unknown_version:", "")
         return _error("MODEL_NOT_FOUND", "Model version not available", {"requested": token}, status=404)
 
-    # Prepare indices records (ensure types)
-    records: List[Dict[str, Any]] = []
-    for r in req.indices:
-        records.append(
-            {
-                "field_id": r.field_id,
-                "date": r.date,
-                "ndvi": float(r.ndvi),
-                "ndwi": float(r.ndwi),
-                "tdvi": float(r.tdvi),
-            }
-        )
-
     try:
         analysis, _ = analyze_indices(
             indices_records=records,
@@ -464,6 +577,186 @@ def disaster_analyze_endpoint():
     except Exception:
         pass
 
+    return _ok(body, table_key="analysis")
+
+
+@api_bp.post("/v1/disaster/scan")
+@require_internal_auth
+def disaster_scan_endpoint():
+    """
+    Multi-date "what-if" analysis: classify every field for each candidate event date
+    (explicit list or date range) in a single call. Same classifiers as /v1/disaster/analyze.
+    """
+    t0 = time.time()
+    try:
+        data = _read_body(columnar_key="indices")
+    except UnsupportedMediaType as exc:
+        return _unsupported_media_type(exc)
+    except Exception:
+        return _error("INVALID_INPUT", "Invalid JSON body", status=400)
+
+    try:
+        req, records = _validate_indices_request(DisasterScanRequest, data)
+    except Exception as exc:
+        return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
+
+    try:
+        _, version_only = _resolve_effective_model_version_generic("disaster_analysis", req.model_version, default_version="1.0.0")
+    except ValueError as ve:
+        token = str(ve).replace("unknown_version:", "")
+        return _error("MODEL_NOT_FOUND", "Model version not available", {"requested": token}, status=404)
+
+    event_dates = req.resolved_dates()
+
+    try:
+        scans, _ = analyze_indices_multi(
+            indices_records=records,
+            event=str(req.event),
+            event_dates=event_dates,
+            app_config=current_app.config,
+            pre_days=int(req.pre_days),
+            post_days=int(req.post_days),
+        )
+    except Exception as e:
+        return _error("UPSTREAM_ERROR", "Analysis failed", {"details": str(e)}, status=502)
+
+    request_id = getattr(g, "correlation_id", None) or str(uuid.uuid4())
+    latency_ms = int((time.time() - t0) * 1000)
+    body: Dict[str, Any] = {
+        "request_id": request_id,
+        "scans": scans,
+        "model": ModelInfo(name="disaster_analysis", version=version_only).model_dump(),
+        "metrics": MetricsBasic(latency_ms=latency_ms).model_dump(),
+    }
+
+    try:
+        g.log_extras = {
+            "record_count": len(records),
+            "date_count": len(event_dates),
+            "event": str(req.event),
+            "model": "disaster_analysis",
+            "model_version": version_only,
+        }
+    except Exception:
+        pass
+
+    return _ok(body, table_key="scans")
+
+
+def _change_mask_from_request(req: ChangeMaskRequest, base_dir: str) -> Tuple[np.ndarray, Tuple[int, int]]:
+    pre = {k: load_stack(resolve_local_path(base_dir, p)) for k, p in req.pre.items()}
+    post = {k: load_stack(resolve_local_path(base_dir, p)) for k, p in req.post.items()}
+    cloud = None
+    if req.cloud_mask:
+        cloud = np.load(resolve_local_path(base_dir, req.cloud_mask), mmap_mode="r", allow_pickle=False)
+        if cloud.ndim != 2:
+            raise ValueError("cloud_mask must be a (H,W) array")
+    m = req.morphology
+    mask = build_change_mask_chunked(
+        pre,
+        post,
+        req.event,
+        th=thresholds_from_config(current_app.config),
+        cloud_mask=cloud,
+        morph=ChangeMaskMorphologyConfig(
+            min_area_pixels=int(m.min_area_pixels),
+            open_size=int(m.open_size),
+            close_size=int(m.close_size),
+        ),
+        chunk_rows=int(current_app.config.get("CHANGE_MASK_CHUNK_ROWS", 256)),
+    )
+    return mask, (int(mask.shape[0]), int(mask.shape[1]))
+
+
+@api_bp.post("/v1/disaster/change-mask")
+@require_internal_auth
+def disaster_change_mask_endpoint():
+    """
+    Per-pixel flood/drought/stress change mask from pre/post (T,H,W) index stacks.
+
+    Stacks come either from local storage (JSON body; paths relative to RASTER_DATA_DIR)
+    or as a multipart upload (.npy files named pre_<index>/post_<index>/cloud_mask, plus a
+    "params" form field with the JSON body minus pre/post). Window means are reduced in
+    row blocks from memory-mapped stacks, so full float copies are never materialized.
+    """
+    t0 = time.time()
+    upload_dir: Optional[tempfile.TemporaryDirectory] = None
+    try:
+        if request.files:
+            try:
+                data = json.loads(request.form.get("params") or "{}")
+            except Exception:
+                return _error("INVALID_INPUT", "Invalid JSON in 'params' form field", status=400)
+            if not isinstance(data, dict):
+                return _error("INVALID_INPUT", "'params' must be a JSON object", status=400)
+            upload_dir = tempfile.TemporaryDirectory(prefix="change-mask-")
+            data = dict(data, pre={}, post={})
+            for field, storage in request.files.items():
+                kind, _, key = field.partition("_")
+                if field == "cloud_mask":
+                    name = "cloud_mask.npy"
+                    data["cloud_mask"] = name
+                elif kind in ("pre", "post") and key:
+                    name = f"{field}.npy"
+                    data[kind][key] = name
+                else:
+                    return _error("INVALID_INPUT", f"Unexpected upload field '{field}'", status=400)
+                storage.save(os.path.join(upload_dir.name, name))
+            base_dir = upload_dir.name
+        else:
+            try:
+                data = request.get_json(force=True, silent=False)
+            except Exception:
+                return _error("INVALID_INPUT", "Invalid JSON body", status=400)
+            base_dir = str(current_app.config.get("RASTER_DATA_DIR"))
+
+        try:
+            req = ChangeMaskRequest.model_validate(data)
+        except Exception as exc:
+            return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
+
+        try:
+            _, version_only = _resolve_effective_model_version_generic("disaster_analysis", req.model_version, default_version="1.0.0")
+        except ValueError as ve:
+            token = str(ve).replace("unknown_version:", "")
+            return _error("MODEL_NOT_FOUND", "Model version not available", {"requested": token}, status=404)
+
+        try:
+            mask, (H, W) = _change_mask_from_request(req, base_dir)
+        except FileNotFoundError as e:
+            return _error("NOT_FOUND", "Raster not found", {"details": str(e)}, status=404)
+        except ValueError as e:
+            return _error("INVALID_INPUT", "Invalid raster input", {"details": str(e)}, status=400)
+
+        fc = mask_to_feature_collection(mask, bbox=req.bbox, properties={"event": req.event})
+    finally:
+        if upload_dir is not None:
+            upload_dir.cleanup()
+
+    request_id = getattr(g, "correlation_id", None) or str(uuid.uuid4())
+    latency_ms = int((time.time() - t0) * 1000)
+    body: Dict[str, Any] = {
+        "request_id": request_id,
+        "event": req.event,
+        "mask_geojson": fc,
+        "summary": {
+            "shape": [H, W],
+            "changed_pixels": int(mask.sum()),
+            "changed_fraction": float(mask.mean()) if mask.size else 0.0,
+            "crs": "EPSG:4326" if req.bbox is not None else "pixel",
+        },
+        "model": ModelInfo(name="disaster_analysis", version=version_only).model_dump(),
+        "metrics": MetricsBasic(latency_ms=latency_ms).model_dump(),
+    }
+    try:
+        g.log_extras = {
+            "event": req.event,
+            "model": "disaster_analysis",
+            "model_version": version_only,
+            "feature_count": len(fc["features"]),
+        }
+    except Exception:
+        pass
     return _ok(body)
 
 
@@ -479,6 +772,11 @@ def gee_compute_indices_endpoint():
         "geometry": {...},  // GeoJSON geometry
         "date": "2024-01-15"  // YYYY-MM-DD format
     }
+    or, for many fields in one Earth Engine round trip:
+    {
+        "geometries": [{...}, {...}],
+        "date": "2024-01-15"
+    }
     
     Response:
     {
@@ -486,6 +784,7 @@ def gee_compute_indices_endpoint():
         "ndwi": 0.12,
         "tdvi": 0.58
     }
+    (batched: "indices" is a list in the same order as "geometries")
     """
     t0 = time.time()
     
@@ -502,15 +801,41 @@ def gee_compute_indices_endpoint():
         return _error("INVALID_INPUT", "Request body is required", {}, status=400)
     
     geometry = data.get("geometry")
+    geometries = data.get("geometries")
     date = data.get("date")
     
-    if not geometry:
+    if not geometry and not geometries:
         return _error("INVALID_INPUT", "geometry is required", {}, status=400)
+    if geometries is not None and (not isinstance(geometries, list) or not all(isinstance(x, dict) for x in geometries)):
+        return _error("INVALID_INPUT", "geometries must be a list of GeoJSON geometries", {}, status=400)
     if not date:
         return _error("INVALID_INPUT", "date is required (YYYY-MM-DD format)", {}, status=400)
     
+    cache = current_app.extensions.get("gee_index_cache")
     try:
-        result = gee_compute_indices(geometry, date)
+        if geometries:
+            if cache is not None:
+                result, hits = cache.get_or_compute_many(
+                    geometries,
+                    date,
+                    GEE_S2_COLLECTION,
+                    GEE_DEFAULT_MAX_CLOUD_PCT,
+                    lambda missing: gee_compute_indices_batch(missing, date),
+                )
+            else:
+                result, hits = gee_compute_indices_batch(geometries, date), 0
+            cache_hit = hits == len(geometries)
+        else:
+            if cache is not None:
+                result, cache_hit = cache.get_or_compute(
+                    geometry,
+                    date,
+                    GEE_S2_COLLECTION,
+                    GEE_DEFAULT_MAX_CLOUD_PCT,
+                    lambda: gee_compute_indices(geometry, date),
+                )
+            else:
+                result, cache_hit = gee_compute_indices(geometry, date), False
         
         request_id = getattr(g, "correlation_id", None) or str(uuid.uuid4())
         latency_ms = int((time.time() - t0) * 1000)
@@ -518,8 +843,9 @@ def gee_compute_indices_endpoint():
         body = {
             "request_id": request_id,
             "indices": result,
-            "metrics": {"latency_ms": latency_ms},
+            "metrics": {"latency_ms": latency_ms, "cache_hit": bool(cache_hit)},
         }
+        g.log_extras = {"cache_hit": bool(cache_hit)}
         
         return _ok(body)
         
@@ -530,4 +856,247 @@ def gee_compute_indices_endpoint():
             f"Failed to compute indices: {str(e)}",
             {},
             status=500
-        )
\ No newline at end of file
+        )
+
+
+@api_bp.post("/gee/time-series")
+@require_internal_auth
+def gee_time_series_endpoint():
+    """
+    NDVI/NDWI/TDVI history for one geometry or many fields over a date range (or list of
+    dates). Per-date lookups run concurrently on the bounded GEE pool; the ordered "indices"
+    list can be posted as-is to /v1/disaster/analyze.
+    """
+    t0 = time.time()
+
+    if not gee_is_available():
+        return _error(
+            "SERVICE_UNAVAILABLE",
+            "Google Earth Engine is not available. Install earthengine-api and configure authentication.",
+            {},
+            status=503
+        )
+
+    try:
+        data = request.get_json(force=True, silent=False)
+    except Exception:
+        return _error("INVALID_INPUT", "Invalid JSON body", status=400)
+
+    try:
+        req = GeeTimeSeriesRequest.model_validate(data)
+    except Exception as exc:
+        return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
+
+    fields = req.resolved_fields()
+    dates = req.resolved_dates()
+    series = fetch_index_series(
+        current_app.extensions["gee_timeseries"],
+        fields,
+        dates,
+        cache=current_app.extensions.get("gee_index_cache"),
+        max_cloud_pct=float(req.max_cloud_pct),
+    )
+
+    request_id = getattr(g, "correlation_id", None) or str(uuid.uuid4())
+    latency_ms = int((time.time() - t0) * 1000)
+    body = {
+        "request_id": request_id,
+        "indices": series["indices"],
+        "missing": series["missing"],
+        "failed": series["failed"],
+        "metrics": {"latency_ms": latency_ms, **series["stats"]},
+    }
+    g.log_extras = {
+        "record_count": len(series["indices"]),
+        "date_count": len(dates),
+        "field_count": len(fields),
+        "cache_hit": series["stats"]["cache_hits"] == series["stats"]["calls"],
+    }
+    return _ok(body)
+
+
+@api_bp.post("/gee/disaster-analyze")
+@require_internal_auth
+def gee_disaster_analyze_endpoint():
+    """
+    Disaster check for one geometry with pre/post composites built and reduced in GEE
+    (one round trip). Response mirrors /v1/disaster/analyze plus per-window scene counts.
+    """
+    t0 = time.time()
+
+    if not gee_is_available():
+        return _error(
+            "SERVICE_UNAVAILABLE",
+            "Google Earth Engine is not available. Install earthengine-api and configure authentication.",
+            {},
+            status=503
+        )
+
+    try:
+        data = request.get_json(force=True, silent=False)
+    except Exception:
+        return _error("INVALID_INPUT", "Invalid JSON body", status=400)
+
+    try:
+        req = GeeDisasterAnalyzeRequest.model_validate(data)
+    except Exception as exc:
+        return _error("INVALID_INPUT", "Payload validation failed", {"details": str(exc)}, status=400)
+
+    try:
+        _, version_only = _resolve_effective_model_version_generic("disaster_analysis", req.model_version, default_version="1.0.0")
+    except ValueError as ve:
+        token = str(ve).replace("unknown_version:", "")
+        return _error("MODEL_NOT_FOUND", "Model version not available", {"requested": token}, status=404)
+
+    try:
+        composites = gee_compute_window_composites(
+            req.geometry,
+            req.event_date.isoformat(),
+            int(req.pre_days),
+            int(req.post_days),
+            max_cloud_pct=float(req.max_cloud_pct),
+        )
+    except Exception as e:
+        logger.error(f"Error computing GEE window composites: {e}", exc_info=True)
+        return _error("UPSTREAM_ERROR", "GEE computation failed", {"details": str(e)}, status=502)
+
+    analysis, _ = analyze_composites(
+        field_id=req.field_id,
+        composites=composites,
+        event=str(req.event),
+        app_config=current_app.config,
+        pre_days=int(req.pre_days),
+        post_days=int(req.post_days),
+    )
+
+    request_id = getattr(g, "correlation_id", None) or str(uuid.uuid4())
+    latency_ms = int((time.time() - t0) * 1000)
+    body: Dict[str, Any] = {
+        "request_id": request_id,
+        "analysis": analysis,
+        "composites": {
+            "pre_scene_count": composites["pre_scene_count"],
+            "post_scene_count": composites["post_scene_count"],
+        },
+        "model": ModelInfo(name="disaster_analysis", version=version_only).model_dump(),
+        "metrics": MetricsBasic(latency_ms=latency_ms).model_dump(),
+    }
+    if req.return_ in ("geojson", "both"):
+        body["mask_geojson"] = build_feature_collection(analysis)
+
+    g.log_extras = {
+        "event": str(req.event),
+        "model": "disaster_analysis",
+        "model_version": version_only,
+        "pre_scene_count": composites["pre_scene_count"],
+        "post_scene_count": composites["post_scene_count"],
+    }
+    return _ok(body)
+
+
+@api_bp.get("/admin/traces")
+@require_internal_auth
+def traces_endpoint():
+    """Most recent request traces (newest first); ?limit=N (default 50)."""
+    exporter = current_app.extensions["trace_exporter"]
+    try:
+        limit = int(request.args.get("limit", "50"))
+    except ValueError:
+        return _error("INVALID_INPUT", "limit must be an integer", status=400)
+    return _ok({"traces": exporter.recent(limit)})
+
+
+@api_bp.get("/admin/traces/<trace_id>")
+@require_internal_auth
+def trace_detail_endpoint(trace_id: str):
+    data = current_app.extensions["trace_exporter"].get(trace_id)
+    if data is None:
+        return _error("NOT_FOUND", "Trace not found", {"trace_id": trace_id}, status=404)
+    return _ok(data)
+
+
+@api_bp.get("/admin/logging/stats")
+@require_internal_auth
+def logging_stats_endpoint():
+    """Logging pipeline counters: drops, sampled-out records, queue depth and log-induced latency."""
+    return _ok(get_log_stats())
+
+
+@api_bp.post("/admin/profile")
+@require_internal_auth
+def profile_endpoint():
+    """
+    Sample every thread of this worker for N seconds and store collapsed stacks.
+    Body (optional): {"seconds": 10, "interval_ms": 5}. Blocks for the duration.
+    """
+    data = request.get_json(silent=True) or {}
+    max_s = float(current_app.config.get("PROFILE_MAX_SECONDS", 60))
+    try:
+        seconds = float(data.get("seconds", 10))
+        interval_ms = float(data.get("interval_ms", 5))
+    except (TypeError, ValueError):
+        return _error("INVALID_INPUT", "seconds and interval_ms must be numbers", status=400)
+    if not (0 < seconds <= max_s) or not (0 < interval_ms <= 1000):
+        return _error(
+            "INVALID_INPUT",
+            f"seconds must be in (0, {max_s:g}] and interval_ms in (0, 1000]",
+            {"seconds": seconds, "interval_ms": interval_ms},
+            status=400,
+        )
+    out = profile_worker(current_app.extensions["profile_store"], seconds, interval_ms)
+    out["download_url"] = f"/admin/profiles/{out['file']}"
+    g.log_extras = {"event": "profile", "profile_id": out["profile_id"], "seconds": seconds}
+    return _ok(out)
+
+
+@api_bp.get("/admin/profiles")
+@require_internal_auth
+def profiles_list_endpoint():
+    """Stored profiles (newest first): collapsed stacks (.folded) and ONNX Runtime traces (.ort.json)."""
+    return _ok({"profiles": current_app.extensions["profile_store"].list()})
+
+
+@api_bp.get("/admin/profiles/<name>")
+@require_internal_auth
+def profile_download_endpoint(name: str):
+    store = current_app.extensions["profile_store"]
+    try:
+        path = store.path(name)
+    except ValueError:
+        return _error("INVALID_INPUT", "Invalid profile name", {"name": name}, status=400)
+    if not os.path.isfile(path):
+        return _error("NOT_FOUND", "Profile not found", {"name": name}, status=404)
+    return send_file(path, as_attachment=True, download_name=name, mimetype="text/plain")
+
+
+@api_bp.get("/admin/asgi/stats")
+@require_internal_auth
+def asgi_stats_endpoint():
+    """Executor sizes and CPU queue state when served through asgi.py."""
+    bridge = current_app.extensions.get("asgi_bridge")
+    if bridge is None:
+        return _ok({"enabled": False})
+    return _ok({"enabled": True, **bridge.stats()})
+
+
+@api_bp.get("/admin/gee-cache/stats")
+@require_internal_auth
+def gee_cache_stats_endpoint():
+    cache = current_app.extensions.get("gee_index_cache")
+    if cache is None:
+        return _ok({"enabled": False})
+    return _ok({"enabled": True, **cache.stats()})
+
+
+@api_bp.post("/admin/gee-cache/purge")
+@require_internal_auth
+def gee_cache_purge_endpoint():
+    """
+    Purge the GEE index cache. Body (optional): {"expired_only": true} to drop only expired rows.
+    """
+    cache = current_app.extensions.get("gee_index_cache")
+    if cache is None:
+        return _ok({"enabled": False, "purged": 0})
+    data = request.get_json(silent=True) or {}
+    purged = cache.purge(expired_only=bool(data.get("expired_only", False)))
+    return _ok({"enabled": True, "purged": purged})
@@ -0,0 +1,219 @@
+"""
+ASGI serving mode.
+
+Runs the same Flask app (handlers, auth, correlation-id/logging/tracing hooks) behind an
+asyncio event loop, with two executors instead of one shared thread pool:
+
+- CPU-bound routes (ASGI_CPU_ROUTE_PREFIXES, default "/v1/": segmentation, yield, disaster)
+  run on a small pool sized like the gthread request threads, so the thread budget still
+  holds. At most ASGI_CPU_MAX_PENDING requests wait for it; beyond that the bridge answers
+  503 right away instead of queueing without bound.
+- Everything else (GEE indices/time series, health, admin) runs on a large I/O pool. These
+  handlers mostly wait on Earth Engine, so a slow upstream fills only I/O threads; requests
+  beyond ASGI_IO_THREADS wait on an asyncio semaphore in the loop, not on a thread.
+
+Request bodies are read by the loop before a thread is taken, and each request runs in a
+fresh contextvars.Context so per-request state never leaks between pooled threads.
+"""
+
+import asyncio
+import contextvars
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _latin1(b: bytes) -> str:
+    return b.decode("latin-1")
+
+
+def build_environ(scope: Dict[str, Any], body: bytes, content_length: Optional[int] = None) -> Dict[str, Any]:
+    """PEP 3333 environ for an ASGI HTTP scope (content_length defaults to len(body))."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    path = scope.get("path", "/")
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": _latin1(scope.get("root_path", "").encode("utf-8")),
+        "PATH_INFO": _latin1(path.encode("utf-8")),
+        "QUERY_STRING": _latin1(scope.get("query_string", b"")),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] if server[1] is not None else 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": str(client[0]),
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body) if content_length is None else content_length),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = _latin1(raw_name).upper().replace("-", "_")
+        value = _latin1(raw_value)
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue  # the body has been read already; its received length is set above
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Run a WSGI app to completion (on a worker thread); returns (status, headers, body)."""
+    started: Dict[str, Any] = {}
+
+    def start_response(status: str, headers, exc_info=None):
+        if exc_info and started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], body
+
+
+class AsgiBridge:
+    """ASGI application serving a Flask app with separate CPU and I/O executors."""
+
+    def __init__(self, flask_app) -> None:
+        cfg = flask_app.config
+        budget = flask_app.extensions.get("thread_budget")
+        cpu_threads = int(cfg.get("ASGI_CPU_THREADS", 0) or 0)
+        if cpu_threads <= 0:
+            cpu_threads = budget["budget"].request_threads if budget else int(cfg.get("SERVER_THREADS", 1))
+        self.app = flask_app
+        self.cpu_threads = max(1, cpu_threads)
+        self.io_threads = max(1, int(cfg.get("ASGI_IO_THREADS", 64)))
+        self.cpu_max_pending = max(0, int(cfg.get("ASGI_CPU_MAX_PENDING", 32)))
+        self.cpu_prefixes = tuple(cfg.get("ASGI_CPU_ROUTE_PREFIXES", ("/v1/",)))
+        self.max_body = cfg.get("MAX_CONTENT_LENGTH")
+        self._cpu_pool = ThreadPoolExecutor(self.cpu_threads, thread_name_prefix="asgi-cpu")
+        self._io_pool = ThreadPoolExecutor(self.io_threads, thread_name_prefix="asgi-io")
+        self._cpu_slots: Optional[asyncio.Semaphore] = None
+        self._io_slots: Optional[asyncio.Semaphore] = None
+        self.cpu_waiting = 0
+        self.rejected = 0
+        flask_app.extensions["asgi_bridge"] = self
+
+    def is_cpu_route(self, path: str) -> bool:
+        return path.startswith(self.cpu_prefixes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cpu_threads": self.cpu_threads,
+            "io_threads": self.io_threads,
+            "cpu_max_pending": self.cpu_max_pending,
+            "cpu_waiting": self.cpu_waiting,
+            "rejected": self.rejected,
+        }
+
+    def _slots(self) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        # Created lazily so they bind to the server's running loop
+        if self._cpu_slots is None:
+            self._cpu_slots = asyncio.Semaphore(self.cpu_threads)
+            self._io_slots = asyncio.Semaphore(self.io_threads)
+        return self._cpu_slots, self._io_slots
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise NotImplementedError(f"unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self) -> None:
+        self._cpu_pool.shutdown(wait=False)
+        self._io_pool.shutdown(wait=False)
+
+    async def _read_body(self, receive) -> Optional[Tuple[bytes, int]]:
+        # Past MAX_CONTENT_LENGTH the remainder is dropped; the received length still
+        # reaches Flask, which enforces the limit exactly as under gunicorn. None when the
+        # client disconnected before the body was complete.
+        chunks: List[bytes] = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            if self.max_body is None or size <= self.max_body:
+                chunks.append(chunk)
+            size += len(chunk)
+            more = message.get("more_body", False)
+        return b"".join(chunks), size
+
+    async def _http(self, scope, receive, send) -> None:
+        received = await self._read_body(receive)
+        if received is None:
+            return  # nobody to answer, and a truncated body must not reach the handlers
+        body, size = received
+        environ = build_environ(scope, body, size)
+        cpu_slots, io_slots = self._slots()
+        loop = asyncio.get_running_loop()
+        run = contextvars.Context().run
+
+        if self.is_cpu_route(scope.get("path", "")):
+            if cpu_slots.locked() and self.cpu_waiting >= self.cpu_max_pending:
+                self.rejected += 1
+                await self._send(send, *self._overloaded(environ))
+                return
+            self.cpu_waiting += 1
+            try:
+                await cpu_slots.acquire()
+            finally:
+                self.cpu_waiting -= 1
+            try:
+                result = await loop.run_in_executor(self._cpu_pool, run, call_wsgi, self.app, environ)
+            finally:
+                cpu_slots.release()
+        else:
+            async with io_slots:
+                result = await loop.run_in_executor(self._io_pool, run, call_wsgi, self.app, environ)
+        await self._send(send, *result)
+
+    def _overloaded(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        cid = environ.get("HTTP_X_REQUEST_ID")
+        body = {
+            "error": {
+                "code": "SERVICE_UNAVAILABLE",
+                "message": "Too many CPU-bound requests queued",
+                "details": {"cpu_threads": self.cpu_threads, "cpu_max_pending": self.cpu_max_pending},
+            },
+            "meta": {"correlation_id": cid, "timestamp": datetime.now(timezone.utc).isoformat()},
+        }
+        headers = [(b"content-type", b"application/json"), (b"retry-after", b"1")]
+        if cid:
+            headers.append((b"x-request-id", cid.encode("latin-1")))
+        return 503, headers, json.dumps(body).encode("utf-8")
+
+    @staticmethod
+    async def _send(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -1,8 +1,11 @@
+import hmac
 from functools import wraps
 from typing import Callable, Tuple
 from datetime import datetime, timezone
 
-from flask import current_app, jsonify, request, g
+from flask import current_app, jsonify, make_response, request, g
+
+from .profiling import PROFILE_HEADER, profile_call
 
 
 def _error(code: str, message: str, details=None, status: int = 401):
@@ -25,6 +28,7 @@ def require_internal_auth(fn: Callable):
     Decorator enforcing internal token auth via X-Internal-Token header.
     - 401 AUTH_REQUIRED if header missing
     - 403 UNAUTHORIZED_INTERNAL if token invalid
+    Authenticated requests carrying X-Profile-Token equal to PROFILE_TOKEN are profiled.
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -34,6 +38,27 @@ def require_internal_auth(fn: Callable):
         expected = current_app.config.get("ML_INTERNAL_TOKEN")
         if not expected or header != expected:
             return _error("UNAUTHORIZED_INTERNAL", "Invalid internal token", status=403)
+        profile_token = request.headers.get(PROFILE_HEADER)
+        if profile_token is not None:
+            return _profiled(fn, profile_token, args, kwargs)
         return fn(*args, **kwargs)
 
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def _profiled(fn: Callable, token: str, args, kwargs):
+    expected = str(current_app.config.get("PROFILE_TOKEN") or "")
+    if not expected or not hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+        return _error("UNAUTHORIZED_INTERNAL", "Invalid profile token", status=403)
+
+    def run(profile_id: str):
+        # Segmentation inference picks this up to enable ONNX Runtime profiling
+        g.ort_profile_prefix = current_app.extensions["profile_store"].path(profile_id)
+        return make_response(fn(*args, **kwargs))
+
+    out = profile_call(current_app.extensions["profile_store"], run, float(current_app.config.get("PROFILE_INTERVAL_MS", 1.0)))
+    resp = out["result"]
+    files = [out["file"]] + list(getattr(g, "profile_files", []))
+    resp.headers["X-Profile-Id"] = out["profile_id"]
+    resp.headers["X-Profile-Files"] = ",".join(files)
+    return resp
\ No newline at end of file
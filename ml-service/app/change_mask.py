@@ -0,0 +1,234 @@
+"""
+Pixel-level disaster change masks from (T,H,W) index stacks.
+
+Mirrors ml-training/disaster/algorithms.py::build_change_mask (same thresholds and
+morphology), but computes the pre/post window means with chunked, NaN-aware reductions:
+stacks are memory-mapped and reduced a block of rows at a time, so peak memory is one
+(H,W) boolean mask plus a few (chunk_rows,W) float buffers instead of full float32 copies
+of every stack.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
+
+import numpy as np
+from shapely.affinity import affine_transform
+from shapely.geometry import mapping
+
+from .disaster_analyze import Thresholds
+from .inference import (
+    _polygonize_mask,
+    binary_closing,
+    binary_opening,
+    disk,
+    remove_small_objects,
+)
+
+
+MaskEvent = Literal["flood", "drought", "stress"]
+
+
+@dataclass(frozen=True)
+class MorphologyConfig:
+    min_area_pixels: int = 50
+    open_size: int = 2
+    close_size: int = 2
+
+
+# =========================
+# Stack loading
+# =========================
+
+def load_stack(path: str) -> np.ndarray:
+    """
+    Memory-map a (T,H,W) .npy stack; nothing is read until a block is reduced.
+    """
+    arr = np.load(path, mmap_mode="r", allow_pickle=False)
+    if arr.ndim != 3:
+        raise ValueError(f"Expected stack with shape (T,H,W), got {tuple(arr.shape)} for {os.path.basename(path)}")
+    return arr
+
+
+def resolve_local_path(data_dir: str, rel_path: str) -> str:
+    """
+    Resolve a client-supplied path against the raster data dir, rejecting traversal outside it.
+    """
+    root = os.path.realpath(data_dir)
+    full = os.path.realpath(os.path.join(root, rel_path))
+    if full != root and not full.startswith(root + os.sep):
+        raise ValueError(f"path outside data dir: {rel_path}")
+    if not os.path.isfile(full):
+        raise FileNotFoundError(f"raster not found: {rel_path}")
+    return full
+
+
+# =========================
+# Chunked reductions
+# =========================
+
+def iter_row_chunks(height: int, chunk_rows: int) -> Iterator[Tuple[int, int]]:
+    step = max(1, int(chunk_rows))
+    for r0 in range(0, int(height), step):
+        yield r0, min(int(height), r0 + step)
+
+
+def chunked_nanmean(stack: np.ndarray, r0: int, r1: int) -> np.ndarray:
+    """
+    NaN-aware temporal mean of stack[:, r0:r1, :] -> (r1-r0, W) float32.
+
+    Reads one (rows, W) time slice at a time and accumulates sum/count in float64, so
+    the (T, rows, W) block is never materialized as float. All-NaN pixels yield NaN,
+    matching np.nanmean (without the RuntimeWarning).
+    """
+    rows, width = r1 - r0, stack.shape[2]
+    acc = np.zeros((rows, width), dtype=np.float64)
+    cnt = np.zeros((rows, width), dtype=np.int32)
+    buf = np.empty((rows, width), dtype=np.float64)
+    finite = np.empty((rows, width), dtype=bool)
+    for t in range(stack.shape[0]):
+        np.copyto(buf, stack[t, r0:r1, :], casting="unsafe")
+        np.isfinite(buf, out=finite)
+        np.add(acc, buf, out=acc, where=finite)
+        cnt += finite
+    out = np.full((rows, width), np.nan, dtype=np.float32)
+    np.divide(acc, cnt, out=out, where=cnt > 0, casting="unsafe")
+    return out
+
+
+def _stack_hw(pre: Dict[str, np.ndarray], post: Dict[str, np.ndarray]) -> Tuple[int, int]:
+    shapes = {tuple(v.shape[1:]) for v in list(pre.values()) + list(post.values())}
+    if not shapes:
+        raise ValueError("Could not infer (H,W) from input stacks")
+    if len(shapes) != 1:
+        raise ValueError(f"All stacks must share (H,W); got {sorted(shapes)}")
+    h, w = shapes.pop()
+    return int(h), int(w)
+
+
+def _required_keys(event: str) -> Tuple[str, ...]:
+    if event in ("flood", "drought"):
+        return ("ndwi",)
+    if event == "stress":
+        return ("tdvi",)
+    raise ValueError(f"Unknown event type: {event}")
+
+
+def _event_keys(event: str) -> Tuple[str, ...]:
+    # Indices the event's condition reads; ndvi only tightens drought/stress when present
+    if event == "flood":
+        return ("ndwi",)
+    return _required_keys(event) + ("ndvi",)
+
+
+def _chunk_condition(
+    event: str,
+    means: Dict[str, Tuple[Optional[np.ndarray], Optional[np.ndarray]]],
+    th: Thresholds,
+) -> np.ndarray:
+    # Threshold logic identical to algorithms.build_change_mask, applied per row block
+    ndvi_pre, ndvi_post = means.get("ndvi", (None, None))
+    with np.errstate(invalid="ignore"):
+        if event == "flood":
+            ndwi_pre, ndwi_post = means["ndwi"]
+            ndwi_delta = ndwi_post - ndwi_pre
+            cond_high = (ndwi_delta > th.FLOOD_NDWI_DELTA_MIN) & (ndwi_post > th.FLOOD_NDWI_ABS_MIN)
+            cond_low = (ndwi_delta >= 0.10) & (ndwi_delta < 0.15) & (ndwi_post > 0.08)
+            return cond_high | cond_low
+        if event == "drought":
+            ndwi_pre, ndwi_post = means["ndwi"]
+            cond = (ndwi_pre - ndwi_post) > th.DROUGHT_NDWI_DROP_MIN
+            if ndvi_pre is not None and ndvi_post is not None:
+                cond &= (ndvi_pre - ndvi_post) > th.DROUGHT_NDVI_DROP_MIN
+            return cond
+        tdvi_pre, tdvi_post = means["tdvi"]
+        cond = (tdvi_post - tdvi_pre) > th.STRESS_TDVI_DELTA_MIN
+        if ndvi_pre is not None and ndvi_post is not None:
+            cond &= (ndvi_pre - ndvi_post) > 0.05
+        return cond
+
+
+def build_change_mask_chunked(
+    pre: Dict[str, np.ndarray],
+    post: Dict[str, np.ndarray],
+    event: MaskEvent,
+    th: Optional[Thresholds] = None,
+    cloud_mask: Optional[np.ndarray] = None,
+    morph: Optional[MorphologyConfig] = None,
+    chunk_rows: int = 256,
+) -> np.ndarray:
+    """
+    Bounded-memory equivalent of build_change_mask.
+
+    Args:
+      pre/post: dict with keys among {'ndvi','ndwi','tdvi'} and (T,H,W) arrays (memory-mapped ok)
+      event: 'flood'|'drought'|'stress'
+      cloud_mask: optional (H,W) mask; cloudy pixels are cleared
+      chunk_rows: rows reduced per block
+
+    Returns:
+      (H,W) uint8 array with values {0,1}
+    """
+    th = th or Thresholds()
+    morph = morph or MorphologyConfig()
+    for k in _required_keys(event):
+        if k not in pre or k not in post:
+            raise ValueError(f"{event.capitalize()} mask requires {k} stacks")
+    H, W = _stack_hw(pre, post)
+    if cloud_mask is not None and tuple(cloud_mask.shape) != (H, W):
+        raise ValueError(f"cloud_mask shape {tuple(cloud_mask.shape)} does not match stacks {(H, W)}")
+
+    keys = _event_keys(event)
+    base = np.zeros((H, W), dtype=bool)
+    for r0, r1 in iter_row_chunks(H, chunk_rows):
+        # Only the stacks the event thresholds are reduced
+        means = {
+            k: (
+                chunked_nanmean(pre[k], r0, r1) if k in pre else None,
+                chunked_nanmean(post[k], r0, r1) if k in post else None,
+            )
+            for k in keys
+        }
+        cond = _chunk_condition(event, means, th)
+        if cloud_mask is not None:
+            cond &= ~np.asarray(cloud_mask[r0:r1], dtype=bool)
+        base[r0:r1] = cond
+
+    # Morphological cleaning (same order as algorithms.build_change_mask)
+    if morph.open_size and morph.open_size > 0:
+        base = binary_opening(base, footprint=disk(int(morph.open_size)))
+    if morph.close_size and morph.close_size > 0:
+        base = binary_closing(base, footprint=disk(int(morph.close_size)))
+    if morph.min_area_pixels and morph.min_area_pixels > 0:
+        base = remove_small_objects(base, min_size=int(morph.min_area_pixels))
+
+    return base.astype(np.uint8)
+
+
+# =========================
+# Vectorization
+# =========================
+
+def mask_to_feature_collection(
+    mask01: np.ndarray,
+    bbox: Optional[List[float]] = None,
+    properties: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Polygonize a change mask. Coordinates are pixel (x=col, y=row) unless bbox
+    [minLon,minLat,maxLon,maxLat] is given, in which case the grid is mapped linearly
+    onto it (north-up, row 0 at maxLat).
+    """
+    H, W = mask01.shape
+    polys = _polygonize_mask(mask01)
+    if bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = map(float, bbox)
+        sx = (max_lon - min_lon) / float(W)
+        sy = (max_lat - min_lat) / float(H)
+        polys = [affine_transform(p, [sx, 0.0, 0.0, -sy, min_lon, max_lat]) for p in polys]
+    props = dict(properties or {})
+    features = [
+        {"type": "Feature", "properties": dict(props), "geometry": mapping(p)}
+        for p in polys
+    ]
+    return {"type": "FeatureCollection", "features": features}
@@ -1,7 +1,7 @@
 import os
 import time
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 
 class Config:
@@ -54,6 +54,29 @@ class Config:
                 self.DISASTER_THRESHOLDS = {}
         except Exception:
             self.DISASTER_THRESHOLDS = {}
+        # Per-event log sampling rates, e.g. {"request": 0.1}
+        try:
+            parsed = json.loads(self._LOG_SAMPLE_RATES_JSON_RAW or "{}")
+            self.LOG_SAMPLE_RATES = {str(k): float(v) for k, v in parsed.items()} if isinstance(parsed, dict) else {}
+        except Exception:
+            self.LOG_SAMPLE_RATES = {}
+
+    # Pixel-level change masks: local (T,H,W) .npy stacks and reduction block size
+    RASTER_DATA_DIR: str = os.getenv("RASTER_DATA_DIR", "data/rasters")
+    CHANGE_MASK_CHUNK_ROWS: int = int(os.getenv("CHANGE_MASK_CHUNK_ROWS", "256"))
+
+    # Earth Engine index cache (SQLite file shared by all workers on the host)
+    GEE_CACHE_ENABLED: bool = os.getenv("GEE_CACHE_ENABLED", "1") not in ("0", "false", "False")
+    GEE_CACHE_PATH: str = os.getenv("GEE_CACHE_PATH", "data/gee_index_cache.sqlite")
+    GEE_CACHE_TTL_S: int = int(os.getenv("GEE_CACHE_TTL_S", str(7 * 24 * 3600)))
+    # "No cloud-free scene" results; shorter since late-ingested scenes can appear
+    GEE_CACHE_NEGATIVE_TTL_S: int = int(os.getenv("GEE_CACHE_NEGATIVE_TTL_S", str(6 * 3600)))
+
+    # GEE time series fan-out: pool size, request rate (per process) and retries
+    GEE_TS_MAX_WORKERS: int = int(os.getenv("GEE_TS_MAX_WORKERS", "8"))
+    GEE_TS_RATE_PER_S: float = float(os.getenv("GEE_TS_RATE_PER_S", "10"))
+    GEE_TS_MAX_RETRIES: int = int(os.getenv("GEE_TS_MAX_RETRIES", "3"))
+    GEE_TS_BACKOFF_S: float = float(os.getenv("GEE_TS_BACKOFF_S", "0.5"))
 
     # Timeouts and limits
     REQUEST_TIMEOUT_S: int = int(os.getenv("REQUEST_TIMEOUT_S", "60"))
@@ -70,6 +93,42 @@ class Config:
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_JSON: bool = os.getenv("LOG_JSON", "1") not in ("0", "false", "False")
+    # Background writer: records go through a bounded queue and are dropped (and counted) when it is full
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "1") not in ("0", "false", "False")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Sampling rates per event ("request", "segmentation_inference", ...); warnings/errors are never sampled
+    _LOG_SAMPLE_RATES_JSON_RAW: str = os.getenv("LOG_SAMPLE_RATES_JSON", "{}")
+    LOG_SAMPLE_RATES: Dict[str, float] = {}  # populated in __init__
+
+    # Per-request stage tracing (X-Debug-Trace: 1 always traces its request)
+    TRACE_ENABLED: bool = os.getenv("TRACE_ENABLED", "0") not in ("0", "false", "False")
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+    TRACE_FILE: Optional[str] = os.getenv("TRACE_FILE") or None
+
+    # On-demand profiling: X-Profile-Token must equal PROFILE_TOKEN (empty disables per-request profiles)
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "data/profiles")
+    PROFILE_MAX_SECONDS: int = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "1.0"))
+
+    # Per-process thread budget split between ORT and native (BLAS/OpenMP/OpenCV) pools.
+    # THREAD_BUDGET=0 means available CPUs // SERVER_WORKERS.
+    THREAD_BUDGET_ENABLED: bool = os.getenv("THREAD_BUDGET_ENABLED", "1") not in ("0", "false", "False")
+    THREAD_BUDGET: int = int(os.getenv("THREAD_BUDGET", "0"))
+    THREAD_BUDGET_ORT_SHARE: float = float(os.getenv("THREAD_BUDGET_ORT_SHARE", "0.5"))
+    SERVER_WORKERS: int = int(os.getenv("GUNICORN_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1")
+    SERVER_THREADS: int = int(os.getenv("GUNICORN_THREADS", "1"))
+
+    # ASGI mode (asgi.py): CPU-bound route prefixes run on a pool of ASGI_CPU_THREADS
+    # (0 = the thread budget's request threads); all other routes on ASGI_IO_THREADS
+    ASGI_CPU_THREADS: int = int(os.getenv("ASGI_CPU_THREADS", "0"))
+    ASGI_CPU_MAX_PENDING: int = int(os.getenv("ASGI_CPU_MAX_PENDING", "32"))
+    ASGI_IO_THREADS: int = int(os.getenv("ASGI_IO_THREADS", "64"))
+    ASGI_CPU_ROUTE_PREFIXES: Tuple[str, ...] = tuple(
+        p.strip() for p in os.getenv("ASGI_CPU_ROUTE_PREFIXES", "/v1/").split(",") if p.strip()
+    )
 
     # Testing hooks (intentionally allowed)
     ENABLE_TEST_HOOKS: bool = os.getenv("ENABLE_TEST_HOOKS", "1") not in ("0", "false", "False")
@@ -6,6 +6,8 @@ from typing import Any, Dict, List, Literal, Optional, Tuple
 import numpy as np
 from shapely.geometry import Polygon, mapping
 
+from .tracing import span
+
 
 EventType = Literal["flood", "drought", "stress", "auto"]
 
@@ -55,13 +57,24 @@ def _safe_mean(arr: List[Optional[float]]) -> float:
 
 
 def _compute_stats(pre: List[Dict[str, Any]], post: List[Dict[str, Any]]) -> Dict[str, float]:
-    ndvi_pre = _safe_mean([r.get("ndvi") for r in pre])
-    ndvi_post = _safe_mean([r.get("ndvi") for r in post])
-    ndwi_pre = _safe_mean([r.get("ndwi") for r in pre])
-    ndwi_post = _safe_mean([r.get("ndwi") for r in post])
-    tdvi_pre = _safe_mean([r.get("tdvi") for r in pre])
-    tdvi_post = _safe_mean([r.get("tdvi") for r in post])
-
+    return _stats_from_means(
+        ndvi_pre=_safe_mean([r.get("ndvi") for r in pre]),
+        ndvi_post=_safe_mean([r.get("ndvi") for r in post]),
+        ndwi_pre=_safe_mean([r.get("ndwi") for r in pre]),
+        ndwi_post=_safe_mean([r.get("ndwi") for r in post]),
+        tdvi_pre=_safe_mean([r.get("tdvi") for r in pre]),
+        tdvi_post=_safe_mean([r.get("tdvi") for r in post]),
+    )
+
+
+def _stats_from_means(
+    ndvi_pre: float,
+    ndvi_post: float,
+    ndwi_pre: float,
+    ndwi_post: float,
+    tdvi_pre: float,
+    tdvi_post: float,
+) -> Dict[str, float]:
     ndvi_drop = ndvi_pre - ndvi_post if np.isfinite(ndvi_pre) and np.isfinite(ndvi_post) else float("nan")
     ndwi_delta = ndwi_post - ndwi_pre if np.isfinite(ndwi_pre) and np.isfinite(ndwi_post) else float("nan")
     ndwi_drop = ndwi_pre - ndwi_post if np.isfinite(ndwi_pre) and np.isfinite(ndwi_post) else float("nan")
@@ -177,7 +190,10 @@ def _decide_auto(stats: Dict[str, float], th: Thresholds) -> Dict[str, Any]:
     return best
 
 
-def _thresholds_from_config(app_config) -> Thresholds:
+def thresholds_from_config(app_config) -> Thresholds:
+    """
+    Thresholds from app.config['DISASTER_THRESHOLDS'], falling back to defaults.
+    """
     d = app_config.get("DISASTER_THRESHOLDS", {}) or {}
     try:
         return Thresholds(
@@ -250,43 +266,200 @@ def analyze_indices(
     """
     Compute per-field summaries and return (analysis_list, thresholds_dict_used)
     """
-    th = _thresholds_from_config(app_config)
+    th = thresholds_from_config(app_config)
     pre = int(pre_days if pre_days is not None else int(app_config.get("DISASTER_PRE_DAYS", 14)))
     post = int(post_days if post_days is not None else int(app_config.get("DISASTER_POST_DAYS", 7)))
 
-    grouped = _group_by_field(indices_records)
+    with span("disaster.group", records=len(indices_records)):
+        grouped = _group_by_field(indices_records)
     out: List[Dict[str, Any]] = []
 
-    for fid, arr in grouped.items():
-        pre_arr, post_arr = _window_slices(arr, event_date, pre, post)
-        stats = _compute_stats(pre_arr, post_arr)
-
-        if event == "flood":
-            res = _classify_flood(stats, th)
-        elif event == "drought":
-            res = _classify_drought(stats, th)
-        elif event == "stress":
-            res = _classify_stress(stats, th)
-        elif event == "auto":
-            res = _decide_auto(stats, th)
-        else:
-            raise ValueError("invalid_event")
-
-        out.append(
-            {
-                "field_id": fid,
-                "event": res.get("event"),
-                "severity": res.get("severity"),
-                "metrics": dict(res.get("metrics", {})),
-                "windows": {"pre_days": pre, "post_days": post},
-            }
-        )
+    with span("disaster.classify", fields=len(grouped)):
+        for fid, arr in grouped.items():
+            pre_arr, post_arr = _window_slices(arr, event_date, pre, post)
+            stats = _compute_stats(pre_arr, post_arr)
+            out.append(_analysis_item(fid, _classify(event, stats, th), pre, post))
+
+    return out, _thresholds_dict(th)
+
+
+# =========================
+# Multi-date scans (packed per-field series)
+# =========================
+
+_INDEX_KEYS = ("ndvi", "ndwi", "tdvi")
+
+
+@dataclass(frozen=True)
+class _FieldSeries:
+    """
+    A field's records sorted by day ordinal, with each index's finite values packed in that
+    order and cumulative counts of them: records [lo, hi) hold values[counts[lo]:counts[hi]].
+
+    Window bounds are two binary searches, but each window mean is np.mean over its own slice
+    (O(window) per date) rather than a difference of running sums. That reduces exactly the
+    values _safe_mean sees, in the same order, so scan metrics are bitwise equal to the
+    per-date path in analyze_indices; prefix-sum differences drift by an ulp and can flip a
+    metric sitting on a threshold.
+    """
+
+    ordinals: np.ndarray
+    values: Dict[str, np.ndarray]
+    counts: Dict[str, np.ndarray]
+
+
+def _finite_or_nan(v: Any) -> float:
+    try:
+        f = float(v)
+    except Exception:
+        return float("nan")
+    return f if np.isfinite(f) else float("nan")
+
+
+def _build_field_series(arr: List[Dict[str, Any]]) -> _FieldSeries:
+    # arr is already sorted by date (see _group_by_field)
+    ordinals = np.asarray([r["date"].toordinal() for r in arr], dtype=np.int64)
+    values: Dict[str, np.ndarray] = {}
+    counts: Dict[str, np.ndarray] = {}
+    for k in _INDEX_KEYS:
+        vals = np.asarray([_finite_or_nan(r.get(k)) for r in arr], dtype=np.float64)
+        finite = np.isfinite(vals)
+        values[k] = vals[finite]
+        counts[k] = np.concatenate(([0], np.cumsum(finite, dtype=np.int64)))
+    return _FieldSeries(ordinals=ordinals, values=values, counts=counts)
+
+
+def _window_means(series: _FieldSeries, key: str, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    vals, cnt = series.values[key], series.counts[key]
+    out = np.full(len(lo), np.nan, dtype=np.float64)
+    for i, (a, b) in enumerate(zip(cnt[lo], cnt[hi])):
+        if b > a:
+            out[i] = vals[a:b].mean()
+    return out
+
+
+def _scan_field(
+    series: _FieldSeries, event_ordinals: np.ndarray, pre_days: int, post_days: int
+) -> List[Dict[str, float]]:
+    """
+    Stats dict (same keys as _compute_stats) for every event ordinal, using the same
+    window bounds as _window_slices: pre = [event - pre_days, event), post = (event, event + post_days].
+    """
+    pre_lo = np.searchsorted(series.ordinals, event_ordinals - int(pre_days), side="left")
+    pre_hi = np.searchsorted(series.ordinals, event_ordinals, side="left")
+    post_lo = np.searchsorted(series.ordinals, event_ordinals, side="right")
+    post_hi = np.searchsorted(series.ordinals, event_ordinals + int(post_days), side="right")
+
+    means: Dict[str, np.ndarray] = {}
+    for k in _INDEX_KEYS:
+        means[f"{k}_pre"] = _window_means(series, k, pre_lo, pre_hi)
+        means[f"{k}_post"] = _window_means(series, k, post_lo, post_hi)
+
+    return [
+        _stats_from_means(**{name: float(v[i]) for name, v in means.items()})
+        for i in range(len(event_ordinals))
+    ]
+
+
+def analyze_indices_multi(
+    indices_records: List[Dict[str, Any]],
+    event: EventType,
+    event_dates: List[date],
+    app_config,
+    pre_days: Optional[int] = None,
+    post_days: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Run analyze_indices for many candidate event dates against the same index history.
+
+    Records are grouped, sorted and packed once per field; each window is then located by two
+    binary searches and averaged over its own slice (see _FieldSeries), so the cost is
+    O(records + dates * fields * window) instead of O(records * dates).
+    Returns ([{event_date, analysis}, ...] in the order of event_dates, thresholds_dict_used).
+    """
+    th = thresholds_from_config(app_config)
+    pre = int(pre_days if pre_days is not None else int(app_config.get("DISASTER_PRE_DAYS", 14)))
+    post = int(post_days if post_days is not None else int(app_config.get("DISASTER_POST_DAYS", 7)))
+    if event not in ("flood", "drought", "stress", "auto"):
+        raise ValueError("invalid_event")
+
+    event_ordinals = np.asarray([d.toordinal() for d in event_dates], dtype=np.int64)
+    scans: List[Dict[str, Any]] = [{"event_date": d.isoformat(), "analysis": []} for d in event_dates]
+
+    with span("disaster.group", records=len(indices_records)):
+        grouped = _group_by_field(indices_records)
+    with span("disaster.scan", fields=len(grouped), dates=len(event_dates)):
+        for fid, arr in grouped.items():
+            per_date_stats = _scan_field(_build_field_series(arr), event_ordinals, pre, post)
+            for scan, stats in zip(scans, per_date_stats):
+                scan["analysis"].append(_analysis_item(fid, _classify(event, stats, th), pre, post))
+
+    return scans, _thresholds_dict(th)
 
-    th_dict = {
+
+def _classify(event: str, stats: Dict[str, float], th: Thresholds) -> Dict[str, Any]:
+    if event == "flood":
+        return _classify_flood(stats, th)
+    if event == "drought":
+        return _classify_drought(stats, th)
+    if event == "stress":
+        return _classify_stress(stats, th)
+    if event == "auto":
+        return _decide_auto(stats, th)
+    raise ValueError("invalid_event")
+
+
+def _analysis_item(fid: str, res: Dict[str, Any], pre: int, post: int) -> Dict[str, Any]:
+    return {
+        "field_id": fid,
+        "event": res.get("event"),
+        "severity": res.get("severity"),
+        "metrics": dict(res.get("metrics", {})),
+        "windows": {"pre_days": pre, "post_days": post},
+    }
+
+
+def _thresholds_dict(th: Thresholds) -> Dict[str, float]:
+    return {
         "FLOOD_NDWI_DELTA_MIN": th.FLOOD_NDWI_DELTA_MIN,
         "FLOOD_NDWI_ABS_MIN": th.FLOOD_NDWI_ABS_MIN,
         "DROUGHT_NDWI_DROP_MIN": th.DROUGHT_NDWI_DROP_MIN,
         "DROUGHT_NDVI_DROP_MIN": th.DROUGHT_NDVI_DROP_MIN,
         "STRESS_TDVI_DELTA_MIN": th.STRESS_TDVI_DELTA_MIN,
     }
-    return out, th_dict
\ No newline at end of file
+
+# =========================
+# Server-side window composites (GEE)
+# =========================
+
+
+def stats_from_composites(composites: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Stats dict (same keys as _compute_stats) from gee_indices.compute_window_composites output.
+    Missing windows map to NaN, exactly like an empty window on the client path.
+    """
+    pre = composites.get("pre") or {}
+    post = composites.get("post") or {}
+    return _stats_from_means(
+        **{f"{k}_pre": _finite_or_nan(pre.get(k)) for k in _INDEX_KEYS},
+        **{f"{k}_post": _finite_or_nan(post.get(k)) for k in _INDEX_KEYS},
+    )
+
+
+def analyze_composites(
+    field_id: str,
+    composites: Dict[str, Any],
+    event: EventType,
+    app_config,
+    pre_days: Optional[int] = None,
+    post_days: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Classify one field from pre/post composites; returns the same (analysis_list, thresholds)
+    shape as analyze_indices.
+    """
+    th = thresholds_from_config(app_config)
+    pre = int(pre_days if pre_days is not None else int(app_config.get("DISASTER_PRE_DAYS", 14)))
+    post = int(post_days if post_days is not None else int(app_config.get("DISASTER_POST_DAYS", 7)))
+    stats = stats_from_composites(composites)
+    return [_analysis_item(str(field_id), _classify(event, stats, th), pre, post)], _thresholds_dict(th)
@@ -6,7 +6,7 @@ Provides NDVI, NDWI, and TDVI calculations as alternative to SentinelHub
 import os
 import json
 import logging
-from typing import Dict, Optional, Any
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -20,14 +20,24 @@ except ImportError:
     logger.warning("Google Earth Engine not installed. Install with: pip install earthengine-api")
 
 
+_GEE_INITIALIZED = False
+
+# Sentinel-2 SR collection and default scene filter
+S2_COLLECTION = 'COPERNICUS/S2_SR'
+DEFAULT_MAX_CLOUD_PCT = 30
+INDEX_BANDS = ('NDVI', 'NDWI', 'TDVI')
+_EMPTY_RESULT = {'ndvi': None, 'ndwi': None, 'tdvi': None}
+
+
 def initialize_gee() -> bool:
-    """Initialize Google Earth Engine with authentication"""
+    """Initialize Google Earth Engine with authentication (once per process)"""
+    global _GEE_INITIALIZED
     if not GEE_AVAILABLE:
         return False
     
     try:
         # Check if already initialized
-        if hasattr(ee, '_initialized') and ee._initialized:
+        if _GEE_INITIALIZED or (hasattr(ee, '_initialized') and ee._initialized):
             return True
         
         # Try to initialize
@@ -43,6 +53,7 @@ def initialize_gee() -> bool:
             # User needs to run: earthengine authenticate
             ee.Initialize()
         
+        _GEE_INITIALIZED = True
         logger.info("Google Earth Engine initialized successfully")
         return True
     except Exception as e:
@@ -54,70 +65,92 @@ def initialize_gee() -> bool:
         return False
 
 
-def compute_indices(geometry: Dict[str, Any], date: str) -> Dict[str, Optional[float]]:
+def _ensure_gee() -> None:
+    if not GEE_AVAILABLE:
+        raise RuntimeError("Google Earth Engine is not installed. Install with: pip install earthengine-api")
+    
+    if not initialize_gee():
+        raise RuntimeError("Failed to initialize Google Earth Engine. Check authentication.")
+
+
+def _day_range(date: str):
+    """Return ('YYYY-MM-DD', next day 'YYYY-MM-DD') for a single-day filter"""
+    date_obj = datetime.strptime(date, '%Y-%m-%d')
+    return date_obj.strftime('%Y-%m-%d'), (date_obj + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def _s2_collection(start: str, end: str, region, max_cloud_pct: float = DEFAULT_MAX_CLOUD_PCT):
+    """Sentinel-2 SR scenes in [start, end) intersecting region, below the cloud threshold"""
+    return ee.ImageCollection(S2_COLLECTION) \
+        .filterDate(start, end) \
+        .filterBounds(region) \
+        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', max_cloud_pct))
+
+
+def _index_image(image):
+    """
+    Build one multi-band image with NDVI, NDWI and TDVI so a single reducer call
+    returns all three indices.
+    Sentinel-2 bands: B2=Blue, B3=Green, B4=Red, B8=NIR
+    """
+    nir = image.select('B8')
+    red = image.select('B4')
+    green = image.select('B3')
+    
+    # NDVI = (NIR - RED) / (NIR + RED)
+    ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
+    
+    # NDWI = (GREEN - NIR) / (GREEN + NIR)
+    ndwi = green.subtract(nir).divide(green.add(nir)).rename('NDWI')
+    
+    # TDVI = (NIR - RED) / sqrt(NIR + RED)
+    tdvi = nir.subtract(red).divide(nir.add(red).sqrt()).rename('TDVI')
+    
+    return ndvi.addBands(ndwi).addBands(tdvi)
+
+
+def _indices_from_stats(stats: Optional[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    stats = stats or {}
+    
+    def _f(key: str) -> Optional[float]:
+        v = stats.get(key)
+        return float(v) if v is not None else None
+    
+    return {'ndvi': _f('NDVI'), 'ndwi': _f('NDWI'), 'tdvi': _f('TDVI')}
+
+
+def compute_indices(
+    geometry: Dict[str, Any],
+    date: str,
+    max_cloud_pct: float = DEFAULT_MAX_CLOUD_PCT,
+) -> Dict[str, Optional[float]]:
     """
     Compute NDVI, NDWI, and TDVI indices for a field using Google Earth Engine
     
+    The scene lookup, the empty-collection check and the reduction of all three
+    indices are one server-side expression fetched with a single getInfo.
+    
     Args:
         geometry: GeoJSON geometry object
         date: Date in YYYY-MM-DD format
+        max_cloud_pct: Scene-level CLOUDY_PIXEL_PERCENTAGE upper bound
         
     Returns:
         Dictionary with ndvi, ndwi, tdvi values (or None if computation fails)
     """
-    if not GEE_AVAILABLE:
-        raise RuntimeError("Google Earth Engine is not installed. Install with: pip install earthengine-api")
-    
-    if not initialize_gee():
-        raise RuntimeError("Failed to initialize Google Earth Engine. Check authentication.")
+    _ensure_gee()
     
     try:
-        # Convert date to datetime range
-        date_obj = datetime.strptime(date, '%Y-%m-%d')
-        date_start = date_obj.strftime('%Y-%m-%d')
-        date_end = (date_obj + timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        # Load Sentinel-2 Surface Reflectance collection
-        collection = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterDate(date_start, date_end) \
-            .filterBounds(ee.Geometry(geometry)) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30))  # Filter cloudy images
-        
-        # Get the first (least cloudy) image
-        image = collection.first()
-        
-        # Check if image exists
-        try:
-            image_id = image.get('system:index').getInfo()
-            if not image_id:
-                logger.warning(f"No Sentinel-2 image found for date {date}")
-                return {'ndvi': None, 'ndwi': None, 'tdvi': None}
-        except Exception:
-            logger.warning(f"No Sentinel-2 image found for date {date}")
-            return {'ndvi': None, 'ndwi': None, 'tdvi': None}
-        
-        # Select bands
-        # Sentinel-2 bands: B2=Blue, B3=Green, B4=Red, B8=NIR
-        nir = image.select('B8')
-        red = image.select('B4')
-        green = image.select('B3')
-        
-        # Calculate indices
-        # NDVI = (NIR - RED) / (NIR + RED)
-        ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
-        
-        # NDWI = (GREEN - NIR) / (GREEN + NIR)
-        ndwi = green.subtract(nir).divide(green.add(nir)).rename('NDWI')
-        
-        # TDVI = (NIR - RED) / sqrt(NIR + RED)
-        tdvi = nir.subtract(red).divide(nir.add(red).sqrt()).rename('TDVI')
-        
-        # Convert geometry to EE Geometry
+        date_start, date_end = _day_range(date)
         geometry_ee = ee.Geometry(geometry)
+        collection = _s2_collection(date_start, date_end, geometry_ee, max_cloud_pct)
+        
+        # First scene of the day; only evaluated server-side when the collection is non-empty
+        image = collection.first()
         
         # Calculate mean values over the geometry
         # Use scale=10 meters (Sentinel-2 native resolution)
-        ndvi_stats = ndvi.reduceRegion(
+        stats = _index_image(image).reduceRegion(
             reducer=ee.Reducer.mean(),
             geometry=geometry_ee,
             scale=10,
@@ -125,39 +158,166 @@ def compute_indices(geometry: Dict[str, Any], date: str) -> Dict[str, Optional[f
             bestEffort=True
         )
         
-        ndwi_stats = ndwi.reduceRegion(
-            reducer=ee.Reducer.mean(),
-            geometry=geometry_ee,
-            scale=10,
-            maxPixels=1e9,
-            bestEffort=True
-        )
+        # Single round trip (this triggers the computation)
+        info = ee.Dictionary({
+            'scene_count': collection.size(),
+            'stats': ee.Algorithms.If(collection.size().gt(0), stats, None),
+        }).getInfo() or {}
+        
+        if not info.get('scene_count'):
+            logger.warning(f"No Sentinel-2 image found for date {date}")
+            return dict(_EMPTY_RESULT)
         
-        tdvi_stats = tdvi.reduceRegion(
+        result = _indices_from_stats(info.get('stats'))
+        logger.info(f"Computed indices for date {date}: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error computing indices with Google Earth Engine: {e}", exc_info=True)
+        raise RuntimeError(f"GEE computation failed: {str(e)}")
+
+
+def compute_indices_batch(
+    geometries: List[Dict[str, Any]],
+    date: str,
+    max_cloud_pct: float = DEFAULT_MAX_CLOUD_PCT,
+) -> List[Dict[str, Optional[float]]]:
+    """
+    Compute NDVI, NDWI, and TDVI for many fields on one date with a single
+    reduceRegions call and a single getInfo.
+    
+    Scenes of the day are mosaicked so fields spread across several Sentinel-2
+    tiles are all covered.
+    
+    Args:
+        geometries: List of GeoJSON geometry objects
+        date: Date in YYYY-MM-DD format
+        max_cloud_pct: Scene-level CLOUDY_PIXEL_PERCENTAGE upper bound
+        
+    Returns:
+        List of {ndvi, ndwi, tdvi} dicts in the same order as geometries
+    """
+    if not geometries:
+        return []
+    _ensure_gee()
+    
+    try:
+        date_start, date_end = _day_range(date)
+        fields = ee.FeatureCollection([
+            ee.Feature(ee.Geometry(g), {'idx': i}) for i, g in enumerate(geometries)
+        ])
+        collection = _s2_collection(date_start, date_end, fields.geometry(), max_cloud_pct)
+        
+        reduced = _index_image(collection.mosaic()).reduceRegions(
+            collection=fields,
             reducer=ee.Reducer.mean(),
-            geometry=geometry_ee,
             scale=10,
-            maxPixels=1e9,
-            bestEffort=True
         )
         
-        # Get values (this triggers the computation)
-        ndvi_mean = ndvi_stats.get('NDVI').getInfo()
-        ndwi_mean = ndwi_stats.get('NDWI').getInfo()
-        tdvi_mean = tdvi_stats.get('TDVI').getInfo()
+        info = ee.Dictionary({
+            'scene_count': collection.size(),
+            'features': ee.Algorithms.If(collection.size().gt(0), reduced, None),
+        }).getInfo() or {}
+        
+        results = [dict(_EMPTY_RESULT) for _ in geometries]
+        if not info.get('scene_count'):
+            logger.warning(f"No Sentinel-2 image found for date {date}")
+            return results
+        
+        for feat in (info.get('features') or {}).get('features', []):
+            props = feat.get('properties') or {}
+            idx = props.get('idx')
+            if isinstance(idx, int) and 0 <= idx < len(results):
+                results[idx] = _indices_from_stats(props)
+        
+        logger.info(f"Computed indices for {len(geometries)} fields on date {date}")
+        return results
+        
+    except Exception as e:
+        logger.error(f"Error computing batched indices with Google Earth Engine: {e}", exc_info=True)
+        raise RuntimeError(f"GEE computation failed: {str(e)}")
+
+
+def _window_range(event_date: str, pre_days: int, post_days: int):
+    """
+    filterDate ranges matching the disaster windows used on the client:
+    pre = [event - pre_days, event), post = (event, event + post_days]
+    """
+    event = datetime.strptime(event_date, '%Y-%m-%d')
+    pre = ((event - timedelta(days=int(pre_days))).strftime('%Y-%m-%d'), event.strftime('%Y-%m-%d'))
+    post = ((event + timedelta(days=1)).strftime('%Y-%m-%d'),
+            (event + timedelta(days=int(post_days) + 1)).strftime('%Y-%m-%d'))
+    return pre, post
+
+
+def compute_window_composites(
+    geometry: Dict[str, Any],
+    event_date: str,
+    pre_days: int,
+    post_days: int,
+    max_cloud_pct: float = DEFAULT_MAX_CLOUD_PCT,
+) -> Dict[str, Any]:
+    """
+    Pre/post event NDVI, NDWI and TDVI composites reduced over a field in one getInfo.
+    
+    Each window's cloud-filtered scenes are turned into index images and averaged
+    server-side (per-pixel mean), then both composites are reduced over the geometry
+    in the same expression, so a disaster check is one remote round trip instead of
+    one per day.
+    
+    Args:
+        geometry: GeoJSON geometry object
+        event_date: Event date in YYYY-MM-DD format
+        pre_days: Days before the event in the pre window
+        post_days: Days after the event in the post window
+        max_cloud_pct: Scene-level CLOUDY_PIXEL_PERCENTAGE upper bound
+        
+    Returns:
+        {'pre': {ndvi, ndwi, tdvi}, 'post': {...}, 'pre_scene_count': n, 'post_scene_count': m};
+        index values are None for a window without usable scenes
+    """
+    _ensure_gee()
+    
+    try:
+        (pre_start, pre_end), (post_start, post_end) = _window_range(event_date, pre_days, post_days)
+        geometry_ee = ee.Geometry(geometry)
+        
+        def _window(start: str, end: str):
+            collection = _s2_collection(start, end, geometry_ee, max_cloud_pct)
+            stats = collection.map(_index_image).mean().reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=geometry_ee,
+                scale=10,
+                maxPixels=1e9,
+                bestEffort=True
+            )
+            return collection.size(), ee.Algorithms.If(collection.size().gt(0), stats, None)
+        
+        pre_count, pre_stats = _window(pre_start, pre_end)
+        post_count, post_stats = _window(post_start, post_end)
+        
+        # Single round trip for both windows
+        info = ee.Dictionary({
+            'pre_scene_count': pre_count,
+            'post_scene_count': post_count,
+            'pre': pre_stats,
+            'post': post_stats,
+        }).getInfo() or {}
         
-        # Handle None values
         result = {
-            'ndvi': float(ndvi_mean) if ndvi_mean is not None else None,
-            'ndwi': float(ndwi_mean) if ndwi_mean is not None else None,
-            'tdvi': float(tdvi_mean) if tdvi_mean is not None else None,
+            'pre': _indices_from_stats(info.get('pre')),
+            'post': _indices_from_stats(info.get('post')),
+            'pre_scene_count': int(info.get('pre_scene_count') or 0),
+            'post_scene_count': int(info.get('post_scene_count') or 0),
         }
-        
-        logger.info(f"Computed indices for date {date}: {result}")
+        logger.info(
+            f"Computed window composites for {event_date} (-{pre_days}/+{post_days}d): "
+            f"{result['pre_scene_count']} pre / {result['post_scene_count']} post scenes"
+        )
         return result
         
     except Exception as e:
-        logger.error(f"Error computing indices with Google Earth Engine: {e}", exc_info=True)
+        logger.error(f"Error computing window composites with Google Earth Engine: {e}", exc_info=True)
         raise RuntimeError(f"GEE computation failed: {str(e)}")
 
 
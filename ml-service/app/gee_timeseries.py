@@ -0,0 +1,204 @@
+"""
+Concurrent NDVI/NDWI/TDVI time series from Earth Engine.
+
+Per-date lookups are independent remote calls, so they fan out over a bounded,
+process-wide thread pool. A shared token bucket keeps the request rate under the
+Earth Engine quota across concurrent requests, and transient failures are retried
+with exponential backoff. Results come back ordered and in the IndexPoint shape that
+/v1/disaster/analyze accepts.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .gee_indices import (
+    DEFAULT_MAX_CLOUD_PCT,
+    S2_COLLECTION,
+    compute_indices,
+    compute_indices_batch,
+)
+
+
+logger = logging.getLogger(__name__)
+
+IndexResult = Dict[str, Optional[float]]
+
+# Substrings of Earth Engine / transport errors worth retrying
+_TRANSIENT_MARKERS = (
+    "too many concurrent",
+    "rate limit",
+    "quota",
+    "timed out",
+    "timeout",
+    "temporarily unavailable",
+    "internal error",
+    "connection reset",
+)
+_TRANSIENT_HTTP = re.compile(r"\b(429|500|502|503|504)\b")
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    msg = str(exc).lower()
+    return any(m in msg for m in _TRANSIENT_MARKERS) or bool(_TRANSIENT_HTTP.search(msg))
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate_per_s` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate_per_s: float, burst: Optional[int] = None) -> None:
+        self.rate = float(rate_per_s)
+        self.capacity = float(burst if burst is not None else max(1, int(self.rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns seconds waited. rate <= 0 disables limiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 3
+    backoff_s: float = 0.5
+    max_backoff_s: float = 8.0
+
+    def delay(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        cap = min(self.max_backoff_s, self.backoff_s * (2 ** attempt))
+        return random.uniform(0.5 * cap, cap)
+
+
+class TimeSeriesFetcher:
+    """Process-wide fan-out for per-date index lookups (one instance per app)."""
+
+    def __init__(self, max_workers: int, rate_per_s: float, retry: RetryPolicy) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.limiter = RateLimiter(rate_per_s)
+        self.retry = retry
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gee-ts")
+
+    def _call(self, fn: Callable[[], Any]) -> Tuple[Any, int]:
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                return fn(), attempt
+            except Exception as e:
+                if attempt >= self.retry.max_retries or not is_transient_error(e):
+                    raise
+                delay = self.retry.delay(attempt)
+                logger.warning(f"Transient GEE error (attempt {attempt + 1}), retrying in {delay:.2f}s: {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    def map_ordered(self, calls: List[Callable[[], Any]]) -> List[Dict[str, Any]]:
+        """
+        Run calls concurrently; returns [{ok, value|error, retries}] in input order.
+        Wall time is roughly ceil(len(calls) / max_workers) * slowest call.
+        """
+        futures = [self._executor.submit(self._call, fn) for fn in calls]
+        out: List[Dict[str, Any]] = []
+        for fut in futures:
+            try:
+                value, retries = fut.result()
+                out.append({"ok": True, "value": value, "retries": retries})
+            except Exception as e:
+                out.append({"ok": False, "error": str(e)})
+        return out
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def fetch_index_series(
+    fetcher: TimeSeriesFetcher,
+    fields: List[Dict[str, Any]],
+    dates: List[date],
+    cache=None,
+    max_cloud_pct: float = DEFAULT_MAX_CLOUD_PCT,
+) -> Dict[str, Any]:
+    """
+    Build ordered index series for fields ({field_id, geometry}) over dates.
+
+    One task per date: a single field uses compute_indices, several fields share one
+    batched reduceRegions call per date. Dates without a cloud-free scene are reported in
+    "missing"; tasks that still fail after retries are reported in "failed".
+    """
+    geometries = [f["geometry"] for f in fields]
+    cache_hits = [0] * len(dates)
+
+    def _task(i: int, d: str) -> Callable[[], List[IndexResult]]:
+        def run() -> List[IndexResult]:
+            if len(geometries) == 1:
+                if cache is not None:
+                    res, hit = cache.get_or_compute(
+                        geometries[0], d, S2_COLLECTION, max_cloud_pct,
+                        lambda: compute_indices(geometries[0], d, max_cloud_pct),
+                    )
+                    cache_hits[i] = int(hit)
+                    return [res]
+                return [compute_indices(geometries[0], d, max_cloud_pct)]
+            if cache is not None:
+                res_many, hits = cache.get_or_compute_many(
+                    geometries, d, S2_COLLECTION, max_cloud_pct,
+                    lambda missing: compute_indices_batch(missing, d, max_cloud_pct),
+                )
+                cache_hits[i] = hits
+                return res_many
+            return compute_indices_batch(geometries, d, max_cloud_pct)
+
+        return run
+
+    date_strs = [d.isoformat() for d in dates]
+    results = fetcher.map_ordered([_task(i, d) for i, d in enumerate(date_strs)])
+
+    indices: List[Dict[str, Any]] = []
+    missing: List[Dict[str, str]] = []
+    failed: List[Dict[str, str]] = []
+    retries = 0
+    for f_idx, field in enumerate(fields):
+        fid = str(field["field_id"])
+        for d, res in zip(date_strs, results):
+            if not res["ok"]:
+                failed.append({"field_id": fid, "date": d, "error": res["error"]})
+                continue
+            vals = res["value"][f_idx]
+            if any(vals.get(k) is None for k in ("ndvi", "ndwi", "tdvi")):
+                missing.append({"field_id": fid, "date": d})
+                continue
+            indices.append({"field_id": fid, "date": d, **{k: float(vals[k]) for k in ("ndvi", "ndwi", "tdvi")}})
+    for res in results:
+        retries += int(res.get("retries", 0))
+
+    return {
+        "indices": indices,
+        "missing": missing,
+        "failed": failed,
+        "stats": {
+            "calls": len(dates),
+            "cache_hits": int(sum(cache_hits)),
+            "retries": retries,
+            "failed_calls": sum(1 for r in results if not r["ok"]),
+        },
+    }
@@ -0,0 +1,246 @@
+"""
+Persistent cache for Earth Engine index results.
+
+SQLite file in the service data directory, so all gunicorn workers on a host share it.
+Keys are a canonical geometry hash + date + collection + cloud threshold + scene reduction
+(the single-field path reads the day's first scene, the batch path a mosaic, which differ
+where Sentinel-2 tiles overlap). Both computed indices and "no scene" results are stored, with separate TTLs: a missing cloud-free scene
+may still be ingested later, so negative entries expire sooner.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import shapely
+from shapely.geometry import shape
+
+
+IndexResult = Dict[str, Optional[float]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_cache (
+    key TEXT PRIMARY KEY,
+    geom_hash TEXT NOT NULL,
+    date TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    max_cloud REAL NOT NULL,
+    result TEXT,
+    negative INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_index_cache_expires ON index_cache (expires_at);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_COUNTERS = ("hits", "negative_hits", "misses", "stores", "negative_stores")
+
+
+def geometry_hash(geometry: Dict[str, Any], precision: float = 1e-7) -> str:
+    """
+    Hash of a GeoJSON geometry that ignores ring start/orientation and sub-precision noise,
+    so the same field drawn twice maps to the same key.
+    """
+    geom = shapely.normalize(shapely.set_precision(shape(geometry), precision))
+    return hashlib.sha256(shapely.to_wkb(geom, hex=False)).hexdigest()
+
+
+def is_negative(result: IndexResult) -> bool:
+    return all(result.get(k) is None for k in ("ndvi", "ndwi", "tdvi"))
+
+
+class IndexCache:
+    """
+    Thread-safe, multi-process SQLite cache (WAL mode; one connection per thread).
+    Counters live in the same file so /admin stats reflect all workers; lookups only bump
+    in-memory counters, which are written out every stats_flush_s seconds and on stats().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_s: float,
+        negative_ttl_s: float,
+        timeout_s: float = 5.0,
+        stats_flush_s: float = 5.0,
+    ) -> None:
+        self.path = path
+        self.ttl_s = float(ttl_s)
+        self.negative_ttl_s = float(negative_ttl_s)
+        self._timeout_s = float(timeout_s)
+        self._stats_flush_s = float(stats_flush_s)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = dict.fromkeys(_COUNTERS, 0)
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._timeout_s, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(
+        geom_hash: str, date: str, collection: str, max_cloud: float, reduction: str = "first"
+    ) -> str:
+        raw = f"{geom_hash}|{date}|{collection}|{float(max_cloud):g}|{reduction}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _bump(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._pending[name] += int(n)
+            due = time.monotonic() - self._last_flush >= self._stats_flush_s
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self) -> None:
+        """Add this process's pending counters to the shared cache_stats table."""
+        with self._lock:
+            pending = [(name, n) for name, n in self._pending.items() if n]
+            self._pending = dict.fromkeys(_COUNTERS, 0)
+            self._last_flush = time.monotonic()
+        if pending:
+            self._conn().executemany(
+                "INSERT INTO cache_stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                pending,
+            )
+
+    def get(self, key: str) -> Tuple[bool, Optional[IndexResult]]:
+        """Returns (found, result); result is the all-None dict for cached "no scene" entries."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT result, negative FROM index_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            self._bump("misses")
+            return False, None
+        result, negative = row
+        self._bump("negative_hits" if negative else "hits")
+        if negative:
+            return True, {"ndvi": None, "ndwi": None, "tdvi": None}
+        return True, json.loads(result)
+
+    def put(self, key: str, geom_hash: str, date: str, collection: str, max_cloud: float, result: IndexResult) -> None:
+        negative = is_negative(result)
+        now = time.time()
+        ttl = self.negative_ttl_s if negative else self.ttl_s
+        if ttl <= 0:
+            return
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO index_cache "
+            "(key, geom_hash, date, collection, max_cloud, result, negative, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                geom_hash,
+                date,
+                collection,
+                float(max_cloud),
+                None if negative else json.dumps(result),
+                int(negative),
+                now,
+                now + ttl,
+            ),
+        )
+        self._bump("negative_stores" if negative else "stores")
+
+    def get_or_compute(
+        self,
+        geometry: Dict[str, Any],
+        date: str,
+        collection: str,
+        max_cloud: float,
+        compute: Callable[[], IndexResult],
+        reduction: str = "first",
+    ) -> Tuple[IndexResult, bool]:
+        """Returns (result, cache_hit). reduction names how compute picks the day's image."""
+        gh = geometry_hash(geometry)
+        key = self.make_key(gh, date, collection, max_cloud, reduction)
+        found, cached = self.get(key)
+        if found:
+            return cached, True
+        result = compute()
+        self.put(key, gh, date, collection, max_cloud, result)
+        return result, False
+
+    def get_or_compute_many(
+        self,
+        geometries: List[Dict[str, Any]],
+        date: str,
+        collection: str,
+        max_cloud: float,
+        compute_many: Callable[[List[Dict[str, Any]]], List[IndexResult]],
+        reduction: str = "mosaic",
+    ) -> Tuple[List[Optional[IndexResult]], int]:
+        """
+        Batch variant: only cache misses are passed to compute_many. Returns (results, hit_count)
+        with results[i] belonging to geometries[i]. The default reduction matches
+        compute_indices_batch, which mosaics the day's scenes.
+        """
+        hashes = [geometry_hash(g) for g in geometries]
+        keys = [self.make_key(h, date, collection, max_cloud, reduction) for h in hashes]
+        results: List[Optional[IndexResult]] = [None] * len(geometries)
+        missing: List[int] = []
+        for i, key in enumerate(keys):
+            found, cached = self.get(key)
+            if found:
+                results[i] = cached
+            else:
+                missing.append(i)
+        if missing:
+            computed = compute_many([geometries[i] for i in missing])
+            if len(computed) != len(missing):
+                raise RuntimeError(
+                    f"compute_many returned {len(computed)} results for {len(missing)} geometries"
+                )
+            for i, res in zip(missing, computed):
+                results[i] = res
+                self.put(keys[i], hashes[i], date, collection, max_cloud, res)
+        return results, len(geometries) - len(missing)
+
+    def purge(self, expired_only: bool = False) -> int:
+        conn = self._conn()
+        if expired_only:
+            cur = conn.execute("DELETE FROM index_cache WHERE expires_at <= ?", (time.time(),))
+        else:
+            cur = conn.execute("DELETE FROM index_cache")
+        return int(cur.rowcount or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        self.flush_stats()
+        conn = self._conn()
+        counters = {name: 0 for name in _COUNTERS}
+        for name, value in conn.execute("SELECT name, value FROM cache_stats"):
+            counters[name] = int(value)
+        now = time.time()
+        entries, negative = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(negative), 0) FROM index_cache WHERE expires_at > ?", (now,)
+        ).fetchone()
+        lookups = counters["hits"] + counters["negative_hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": ((counters["hits"] + counters["negative_hits"]) / lookups) if lookups else 0.0,
+            "entries": int(entries),
+            "negative_entries": int(negative),
+            "ttl_s": self.ttl_s,
+            "negative_ttl_s": self.negative_ttl_s,
+            "path": self.path,
+        }
@@ -9,6 +9,9 @@ from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
 from shapely.geometry import Polygon, MultiPolygon, mapping, shape
 from shapely.ops import unary_union
+
+from .profiling import ORT_SUFFIX
+from .tracing import span
 # Optional skimage imports (used for morphology/postprocessing). Provide fallbacks if unavailable.
 try:
     from skimage.morphology import (
@@ -87,6 +90,10 @@ MODEL_UNET_PATH = _env_str(
     os.path.join("ml-training", "models", "unet", MODEL_UNET_VERSION, "model.onnx"),
 )
 ORT_PROVIDERS = _env_list("ORT_PROVIDERS", ["CPUExecutionProvider"])
+ORT_INTRA_OP_THREADS = _env_int("ORT_INTRA_OP_THREADS", 0)  # 0 = ORT default (one per physical core)
+ORT_INTER_OP_THREADS = _env_int("ORT_INTER_OP_THREADS", 0)
+# Spin-waiting intra-op threads burn idle cores; turn off on shared nodes
+ORT_ALLOW_SPINNING = _env_bool("ORT_ALLOW_SPINNING", True)
 
 # Inference behavior
 INFER_TILE_SIZE = _env_int("INFER_TILE_SIZE", 512)
@@ -126,12 +133,42 @@ def _load_ort_session() -> Tuple[Any, str, str, str, List[str]]:
     # Lazy import; onnxruntime is in requirements
     import onnxruntime as ort  # type: ignore
 
-    sess = ort.InferenceSession(MODEL_UNET_PATH, providers=ORT_PROVIDERS)
+    sess = ort.InferenceSession(MODEL_UNET_PATH, sess_options=_session_options(ort), providers=ORT_PROVIDERS)
+    _ORT_SESSION = sess
+    _ORT_INPUT_NAME, _ORT_OUTPUT_NAME, _ORT_INPUT_LAYOUT = _describe_session(sess)
+    return _ORT_SESSION, _ORT_INPUT_NAME, _ORT_OUTPUT_NAME, _ORT_INPUT_LAYOUT, ORT_PROVIDERS
+
+
+def _load_profiling_session(profile_prefix: str) -> Tuple[Any, str, str, str, List[str]]:
+    """
+    Fresh (non-singleton) session with ONNX Runtime profiling enabled; call end_profiling()
+    after use to write the Chrome-trace JSON. Only used for explicitly profiled requests.
+    """
+    import onnxruntime as ort  # type: ignore
+
+    so = _session_options(ort)
+    so.enable_profiling = True
+    so.profile_file_prefix = profile_prefix
+    sess = ort.InferenceSession(MODEL_UNET_PATH, sess_options=so, providers=ORT_PROVIDERS)
+    inp_name, out_name, layout = _describe_session(sess)
+    return sess, inp_name, out_name, layout, ORT_PROVIDERS
+
+
+def _session_options(ort):
+    so = ort.SessionOptions()
+    if ORT_INTRA_OP_THREADS > 0:
+        so.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    if ORT_INTER_OP_THREADS > 0:
+        so.inter_op_num_threads = ORT_INTER_OP_THREADS
+    if not ORT_ALLOW_SPINNING:
+        so.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return so
+
+
+def _describe_session(sess) -> Tuple[str, str, str]:
+    """(input_name, output_name, input_layout) for a session."""
     inp = sess.get_inputs()[0]
     out = sess.get_outputs()[0]
-    _ORT_SESSION = sess
-    _ORT_INPUT_NAME = inp.name
-    _ORT_OUTPUT_NAME = out.name
 
     # Try to infer layout from input shape if static
     # Common: NHWC: (N, H, W, C) or NCHW: (N, C, H, W)
@@ -146,8 +183,7 @@ def _load_ort_session() -> Tuple[Any, str, str, str, List[str]]:
                 lay = "NHWC"
     except Exception:
         lay = "NHWC"
-    _ORT_INPUT_LAYOUT = lay
-    return _ORT_SESSION, _ORT_INPUT_NAME, _ORT_OUTPUT_NAME, _ORT_INPUT_LAYOUT, ORT_PROVIDERS
+    return inp.name, out.name, lay
 
 
 # =========================
@@ -206,6 +242,7 @@ def _infer_tiles(
     use_hann: bool,
     padding: str,
     threshold: float,
+    ort_profile_prefix: Optional[str] = None,
 ) -> Tuple[np.ndarray, Dict[str, Any]]:
     """
     Run sliding window inference using ONNX Runtime session over the given image.
@@ -213,87 +250,104 @@ def _infer_tiles(
     Returns:
       prob_map: (H, W) accumulated probability map (float32 in [0,1])
       meta: { tile_count, providers, timings: {preprocess_ms,infer_ms,postprocess_ms,total_ms}, ... }
+      (plus ort_profile: path of the ORT profile when ort_profile_prefix is given)
     """
     t_start = time.time()
 
     # Load ORT session and determine layout
     t0 = time.time()
-    sess, inp_name, out_name, layout, providers = _load_ort_session()
+    with span("ort.session", profiling=bool(ort_profile_prefix)):
+        if ort_profile_prefix:
+            sess, inp_name, out_name, layout, providers = _load_profiling_session(ort_profile_prefix)
+        else:
+            sess, inp_name, out_name, layout, providers = _load_ort_session()
     t_pre = int((time.time() - t0) * 1000)
 
-    H, W, C = img_rgb.shape
-    assert C == 3, "Expected 3-channel RGB image"
-    # Optionally pad to ensure at least one tile
-    t1 = time.time()
-    img_padded = _pad_image(img_rgb, (tile, tile), padding)
-    Hp, Wp, _ = img_padded.shape
-
-    ys = _sliding_steps(Hp, tile, overlap)
-    xs = _sliding_steps(Wp, tile, overlap)
-
-    weight_map = np.zeros((Hp, Wp), dtype=np.float32)
-    prob_acc = np.zeros((Hp, Wp), dtype=np.float32)
-    window = _hann_window(tile) if use_hann else np.ones((tile, tile), dtype=np.float32)
-
-    batch_imgs: List[np.ndarray] = []
-    batch_coords: List[Tuple[int, int]] = []
-
-    tile_count = 0
-
-    def _flush_batch():
-        nonlocal batch_imgs, batch_coords, prob_acc, weight_map, tile_count
-        if not batch_imgs:
-            return
-        tile_count += len(batch_imgs)
-        x = np.stack(batch_imgs, axis=0)  # (N,tile,tile,3), NHWC normalized
-        x = _normalize_nhwc(x)
-        if layout == "NCHW":
-            x = np.transpose(x, (0, 3, 1, 2))  # (N,3,tile,tile)
-        # ONNX inference
-        out = sess.run([out_name], {inp_name: x})[0]
-        # Accept (N,1,H,W) or (N,H,W,1) or (N,H,W)
-        if out.ndim == 4:
-            if out.shape[1] == 1 and layout == "NCHW":
-                out = out[:, 0, :, :]  # (N,H,W)
-            elif out.shape[-1] == 1:
-                out = out[:, :, :, 0]  # (N,H,W)
-        elif out.ndim == 3:
-            pass
-        else:
-            raise ValueError(f"Unexpected ONNX output shape: {out.shape}")
-
-        out = out.astype(np.float32)
-        # Accumulate with window weighting
-        for (x0, y0), p in zip(batch_coords, out):
-            prob_acc[y0 : y0 + tile, x0 : x0 + tile] += p * window
-            weight_map[y0 : y0 + tile, x0 : x0 + tile] += window
-
-        batch_imgs = []
-        batch_coords = []
-
-    for y0 in ys:
-        for x0 in xs:
-            tile_img = img_padded[y0 : y0 + tile, x0 : x0 + tile, :]
-            if tile_img.shape[0] != tile or tile_img.shape[1] != tile:
-                # Final safety pad (shouldn't happen with _pad_image, but keep robust)
-                tile_img = _pad_image(tile_img, (tile, tile), padding)
-                tile_img = tile_img[:tile, :tile, :]
-            batch_imgs.append(tile_img)
-            batch_coords.append((x0, y0))
-            if len(batch_imgs) >= max(1, int(batch_size)):
-                _flush_batch()
-    _flush_batch()
-
-    # Normalize accumulated probs
-    weight_map = np.maximum(weight_map, 1e-6)
-    prob = prob_acc / weight_map
-    # Trim to original size
-    prob = prob[:H, :W]
-
-    t_infer = int((time.time() - t1) * 1000)
+    ort_profile = None
+    try:
+        H, W, C = img_rgb.shape
+        assert C == 3, "Expected 3-channel RGB image"
+        # Optionally pad to ensure at least one tile
+        t1 = time.time()
+        img_padded = _pad_image(img_rgb, (tile, tile), padding)
+        Hp, Wp, _ = img_padded.shape
+
+        ys = _sliding_steps(Hp, tile, overlap)
+        xs = _sliding_steps(Wp, tile, overlap)
+
+        weight_map = np.zeros((Hp, Wp), dtype=np.float32)
+        prob_acc = np.zeros((Hp, Wp), dtype=np.float32)
+        window = _hann_window(tile) if use_hann else np.ones((tile, tile), dtype=np.float32)
+
+        batch_imgs: List[np.ndarray] = []
+        batch_coords: List[Tuple[int, int]] = []
+
+        tile_count = 0
+
+        def _flush_batch():
+            nonlocal batch_imgs, batch_coords, prob_acc, weight_map, tile_count
+            if not batch_imgs:
+                return
+            tile_count += len(batch_imgs)
+            with span("tiles.batch", n=len(batch_imgs)):
+                x = np.stack(batch_imgs, axis=0)  # (N,tile,tile,3), NHWC normalized
+                x = _normalize_nhwc(x)
+                if layout == "NCHW":
+                    x = np.transpose(x, (0, 3, 1, 2))  # (N,3,tile,tile)
+            # ONNX inference
+            with span("ort.run", n=int(x.shape[0])):
+                out = sess.run([out_name], {inp_name: x})[0]
+            # Accept (N,1,H,W) or (N,H,W,1) or (N,H,W)
+            if out.ndim == 4:
+                if out.shape[1] == 1 and layout == "NCHW":
+                    out = out[:, 0, :, :]  # (N,H,W)
+                elif out.shape[-1] == 1:
+                    out = out[:, :, :, 0]  # (N,H,W)
+            elif out.ndim == 3:
+                pass
+            else:
+                raise ValueError(f"Unexpected ONNX output shape: {out.shape}")
+
+            out = out.astype(np.float32)
+            # Accumulate with window weighting
+            with span("tiles.stitch", n=len(batch_coords)):
+                for (x0, y0), p in zip(batch_coords, out):
+                    prob_acc[y0 : y0 + tile, x0 : x0 + tile] += p * window
+                    weight_map[y0 : y0 + tile, x0 : x0 + tile] += window
+
+            batch_imgs = []
+            batch_coords = []
+
+        for y0 in ys:
+            for x0 in xs:
+                tile_img = img_padded[y0 : y0 + tile, x0 : x0 + tile, :]
+                if tile_img.shape[0] != tile or tile_img.shape[1] != tile:
+                    # Final safety pad (shouldn't happen with _pad_image, but keep robust)
+                    tile_img = _pad_image(tile_img, (tile, tile), padding)
+                    tile_img = tile_img[:tile, :tile, :]
+                batch_imgs.append(tile_img)
+                batch_coords.append((x0, y0))
+                if len(batch_imgs) >= max(1, int(batch_size)):
+                    _flush_batch()
+        _flush_batch()
+
+        # Normalize accumulated probs
+        weight_map = np.maximum(weight_map, 1e-6)
+        prob = prob_acc / weight_map
+        # Trim to original size
+        prob = prob[:H, :W]
+
+        t_infer = int((time.time() - t1) * 1000)
+    finally:
+        if ort_profile_prefix:
+            # ORT names the file <prefix>_<timestamp>.json; keep it next to the request's folded
+            # stacks. Ended on failures too, so the session never keeps profiling.
+            ort_profile = ort_profile_prefix + ORT_SUFFIX
+            os.replace(sess.end_profiling(), ort_profile)
     meta = {
         "tile_count": int(tile_count),
         "providers": providers,
+        "threads": {"intra_op": ORT_INTRA_OP_THREADS, "inter_op": ORT_INTER_OP_THREADS},
         "timings": {
             "preprocess_ms": int(t_pre),
             "infer_ms": int(t_infer),
@@ -310,6 +364,8 @@ def _infer_tiles(
             "padding": str(padding),
         },
     }
+    if ort_profile:
+        meta["ort_profile"] = ort_profile
     return prob.astype(np.float32), meta
 
 
@@ -433,8 +489,11 @@ def mask_to_geojson(
     """
     Convert a binary mask to a GeoJSON FeatureCollection (pixel coordinate reference).
     """
-    m = _apply_morphology(mask01)
-    polys = _polygonize_mask(m)
+    with span("morphology"):
+        m = _apply_morphology(mask01)
+    with span("polygonize") as sp:
+        polys = _polygonize_mask(m)
+        sp.set(polygons=len(polys))
     features: List[Dict[str, Any]] = []
     props = dict(properties or {})
     for p in polys:
@@ -461,12 +520,14 @@ def run_unet_geojson(
     batch_size: Optional[int] = None,
     hann_weighting: Optional[bool] = None,
     padding: Optional[str] = None,
+    ort_profile_prefix: Optional[str] = None,
 ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     """
     Full inference pipeline:
       - tile+stitch probabilities via ONNX Runtime U-Net
       - threshold to binary mask
       - postprocess to polygons
+    ort_profile_prefix enables ONNX Runtime profiling on a one-off session (see meta["ort_profile"]).
     Returns: (geojson_feature_collection, meta)
     """
     th = float(INFER_THRESHOLD if threshold is None else threshold)
@@ -484,17 +545,20 @@ def run_unet_geojson(
         raise ValueError(f"Image dimensions {H}x{W} exceed maximum allowed 4096x4096")
 
     # Inference over tiles
-    prob, meta = _infer_tiles(
-        image_rgb,
-        tile=ts,
-        overlap=ov,
-        batch_size=bs,
-        use_hann=hw,
-        padding=pad,
-        threshold=th,
-    )
+    with span("unet.tiles", tile_size=ts, overlap=ov, batch_size=bs):
+        prob, meta = _infer_tiles(
+            image_rgb,
+            tile=ts,
+            overlap=ov,
+            batch_size=bs,
+            use_hann=hw,
+            padding=pad,
+            threshold=th,
+            ort_profile_prefix=ort_profile_prefix,
+        )
     t2 = time.time()
-    mask01 = (prob >= th).astype(np.uint8)
+    with span("threshold"):
+        mask01 = (prob >= th).astype(np.uint8)
     # Vectorize
     fc = mask_to_geojson(
         mask01,
@@ -1,8 +1,14 @@
+import atexit
+import hashlib
 import logging
+import queue
+import random
 import sys
+import threading
 import time
 import uuid
-from typing import Optional
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
 
 from flask import request, g
 from pythonjsonlogger import jsonlogger
@@ -21,15 +27,206 @@ def _build_json_formatter() -> logging.Formatter:
     return fmt
 
 
+class LogStats:
+    """
+    Counters for the logging pipeline. "emit" is time spent on the calling (request) thread,
+    "write" is time the background writer spends formatting and writing a record.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.emitted = 0
+            self.dropped = 0
+            self.sampled_out = 0
+            self.written = 0
+            self.emit_ns_total = 0
+            self.emit_ns_max = 0
+            self.write_lag_ms_total = 0.0
+            self.write_lag_ms_max = 0.0
+
+    def on_emit(self, ns: int, dropped: bool) -> None:
+        self._local.pending_ns = getattr(self._local, "pending_ns", 0) + ns
+        with self._lock:
+            self.emitted += 1
+            self.dropped += int(dropped)
+            self.emit_ns_total += ns
+            self.emit_ns_max = max(self.emit_ns_max, ns)
+
+    def on_sampled_out(self) -> None:
+        with self._lock:
+            self.sampled_out += 1
+
+    def on_written(self, lag_ms: float) -> None:
+        with self._lock:
+            self.written += 1
+            self.write_lag_ms_total += lag_ms
+            self.write_lag_ms_max = max(self.write_lag_ms_max, lag_ms)
+
+    def take_thread_ns(self) -> int:
+        """Emit time accumulated on this thread since the last call (per-request overhead)."""
+        ns = getattr(self._local, "pending_ns", 0)
+        self._local.pending_ns = 0
+        return ns
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "emitted": self.emitted,
+                "dropped": self.dropped,
+                "sampled_out": self.sampled_out,
+                "written": self.written,
+                "emit_us_avg": (self.emit_ns_total / self.emitted / 1000.0) if self.emitted else 0.0,
+                "emit_us_max": self.emit_ns_max / 1000.0,
+                "write_lag_ms_avg": (self.write_lag_ms_total / self.written) if self.written else 0.0,
+                "write_lag_ms_max": self.write_lag_ms_max,
+            }
+
+
+_STATS = LogStats()
+_LISTENER: Optional[QueueListener] = None
+_QUEUE: Optional["queue.Queue[logging.LogRecord]"] = None
+
+
+def _event_key(record: logging.LogRecord) -> str:
+    # Monitoring events carry their type in "event"; request logs are keyed by message
+    if record.msg == "inference_event":
+        return str(getattr(record, "event", record.msg))
+    return str(record.msg)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of records per event type. Sampling is by correlation/request id when
+    present, so all sampled events of one request are kept together. Warnings, errors and
+    4xx/5xx request logs are always kept.
+    """
+
+    def __init__(self, rates: Dict[str, float], stats: LogStats) -> None:
+        super().__init__()
+        self.rates = {k: min(1.0, max(0.0, float(v))) for k, v in (rates or {}).items()}
+        self.stats = stats
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(_event_key(record))
+        if rate is None or rate >= 1.0:
+            return True
+        if record.levelno >= logging.WARNING or int(getattr(record, "status", 0) or 0) >= 400:
+            return True
+        cid = getattr(record, "correlation_id", None) or getattr(record, "request_id", None)
+        if cid:
+            u = int(hashlib.blake2b(str(cid).encode("utf-8"), digest_size=8).hexdigest(), 16) / 2.0**64
+        else:
+            u = random.random()
+        if u < rate:
+            return True
+        self.stats.on_sampled_out()
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: when the queue is full the record is dropped and counted."""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]", stats: LogStats) -> None:
+        super().__init__(q)
+        self.stats = stats
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge args and render tracebacks here; JSON formatting happens on the writer thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        t0 = time.perf_counter_ns()
+        dropped = False
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            dropped = True
+        except Exception:
+            self.handleError(record)
+        self.stats.on_emit(time.perf_counter_ns() - t0, dropped)
+
+
+class _WriterHandler(logging.StreamHandler):
+    """Stream handler that records enqueue-to-write lag (async) or emit time (sync)."""
+
+    def __init__(self, stream, stats: LogStats, on_caller_thread: bool) -> None:
+        super().__init__(stream)
+        self.stats = stats
+        self.on_caller_thread = on_caller_thread
+
+    def emit(self, record: logging.LogRecord) -> None:
+        t0 = time.perf_counter_ns()
+        super().emit(record)
+        if self.on_caller_thread:
+            self.stats.on_emit(time.perf_counter_ns() - t0, False)
+        self.stats.on_written((time.time() - record.created) * 1000.0)
+
+
+def stop_logging_pipeline() -> None:
+    """Flush and stop the background writer (no-op in synchronous mode)."""
+    global _LISTENER, _QUEUE
+    if _LISTENER is not None:
+        # stop() enqueues a sentinel with put_nowait; retry briefly if the queue is full
+        for _ in range(100):
+            try:
+                _LISTENER.stop()
+                break
+            except queue.Full:
+                time.sleep(0.01)
+            except Exception:
+                break
+    _LISTENER = None
+    _QUEUE = None
+
+
+def get_log_stats() -> Dict[str, Any]:
+    stats = _STATS.snapshot()
+    stats["async"] = _LISTENER is not None
+    stats["queue_depth"] = _QUEUE.qsize() if _QUEUE is not None else 0
+    stats["queue_size"] = _QUEUE.maxsize if _QUEUE is not None else 0
+    return stats
+
+
+atexit.register(stop_logging_pipeline)
+
+
 def init_app_logging(app) -> None:
     """
     Initialize structured JSON logging with correlation_id.
     Attaches before_request/after_request hooks to capture latency and status.
+
+    With LOG_ASYNC, request threads only enqueue records onto a bounded queue; a background
+    listener formats and writes them. LOG_SAMPLE_RATES thins high-volume event types.
     """
+    global _LISTENER, _QUEUE
     log_level = getattr(logging, str(app.config.get("LOG_LEVEL", "INFO")).upper(), logging.INFO)
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(_build_json_formatter())
+    stop_logging_pipeline()
+    _STATS.reset()
+
+    use_async = bool(app.config.get("LOG_ASYNC", True))
+    writer = _WriterHandler(sys.stdout, _STATS, on_caller_thread=not use_async)
+    writer.setFormatter(_build_json_formatter())
+
+    if use_async:
+        _QUEUE = queue.Queue(maxsize=max(1, int(app.config.get("LOG_QUEUE_SIZE", 10000))))
+        handler: logging.Handler = NonBlockingQueueHandler(_QUEUE, _STATS)
+        _LISTENER = QueueListener(_QUEUE, writer, respect_handler_level=True)
+        _LISTENER.start()
+    else:
+        handler = writer
+    handler.addFilter(SamplingFilter(app.config.get("LOG_SAMPLE_RATES") or {}, _STATS))
 
     root = logging.getLogger()
     for h in list(root.handlers):
@@ -44,6 +241,7 @@ def init_app_logging(app) -> None:
     @app.before_request
     def _start_timer():
         g._start_time = time.time()
+        _STATS.take_thread_ns()
         # correlation id from header or new
         cid = request.headers.get("X-Request-Id") or str(uuid.uuid4())
         g.correlation_id = cid
@@ -64,6 +262,8 @@ def init_app_logging(app) -> None:
             "correlation_id": getattr(g, "correlation_id", None),
             "cache_hit": False,  # stub path always false in Sprint 2
             "model_version": model_version,
+            # time this request spent handing earlier log records to the pipeline
+            "log_overhead_us": round(_STATS.take_thread_ns() / 1000.0, 1),
         }
         # Allow handlers to inject extra structured fields (e.g., record_count, event)
         try:
@@ -88,4 +288,4 @@ def get_correlation_id() -> Optional[str]:
     try:
         return getattr(g, "correlation_id", None)
     except Exception:
-        return None
\ No newline at end of file
+        return None
@@ -18,6 +18,7 @@ def log_inference_event(payload: Dict[str, Any]) -> None:
       - overlap: int
       - batch_size: int
       - threshold: float
+      - threads: { intra_op, inter_op } ORT pool sizes of the session used
       - postprocess: dict or str summary
       - timings: { preprocess_ms, infer_ms, postprocess_ms, total_ms }
       - image_shape: [H,W,C]
@@ -36,6 +37,7 @@ def log_inference_event(payload: Dict[str, Any]) -> None:
             "overlap": payload.get("overlap"),
             "batch_size": payload.get("batch_size"),
             "threshold": payload.get("threshold"),
+            "threads": payload.get("threads"),
             "postprocess": payload.get("postprocess"),
             "timings": payload.get("timings"),
             "image_shape": payload.get("image_shape"),
@@ -0,0 +1,242 @@
+"""
+Request/response body codecs: JSON (default), MessagePack and Arrow IPC stream.
+
+Large disaster and yield payloads spend more time in JSON parsing, per-object Pydantic
+validation and serialization than in the model. Clients can instead send
+MessagePack or Arrow and ask for MessagePack/Arrow back via Accept. Columnar payloads
+(Arrow tables, or MessagePack maps of equal-length arrays) are validated with vectorized
+numpy checks rather than one Pydantic object per row.
+
+msgpack and pyarrow are optional; without them the corresponding media type is rejected
+with 415 and JSON keeps working.
+"""
+
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+
+    ARROW_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pa_ipc = None
+    ARROW_AVAILABLE = False
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+_ALIASES = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/vnd.apache.arrow.stream": ARROW,
+    "application/vnd.apache.arrow.file": ARROW,
+}
+
+# Arrow schema metadata key carrying the non-columnar request/response fields as JSON
+ARROW_META_KEY = b"skycrop"
+
+INDEX_COLUMNS = ("field_id", "date", "ndvi", "ndwi", "tdvi")
+INDEX_BOUND = 2.0  # same loose bound as schemas.IndexPoint
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+def available_formats() -> List[str]:
+    out = [JSON]
+    if MSGPACK_AVAILABLE:
+        out.append(MSGPACK)
+    if ARROW_AVAILABLE:
+        out.append(ARROW)
+    return out
+
+
+def request_format(content_type: Optional[str]) -> str:
+    """Canonical format for a Content-Type header; unknown/missing types are treated as JSON."""
+    mime = (content_type or "").split(";", 1)[0].strip().lower()
+    fmt = _ALIASES.get(mime, JSON)
+    if fmt not in available_formats():
+        raise UnsupportedMediaType(f"{mime} is not supported on this server")
+    return fmt
+
+
+def response_format(accept_mimetypes, tabular: bool) -> str:
+    """
+    Best format for the request's Accept header (werkzeug MIMEAccept). JSON wins ties and is
+    the fallback; Arrow is only offered when the body has a primary table.
+    """
+    offers = [JSON] + [f for f in available_formats() if f != JSON and (tabular or f != ARROW)]
+    aliased = [m for m, fmt in _ALIASES.items() if fmt in offers and m not in offers]
+    best = accept_mimetypes.best_match(offers + aliased, default=JSON)
+    return _ALIASES.get(best, JSON)
+
+
+# -------------------------
+# Decoding
+# -------------------------
+
+
+def decode_body(raw: bytes, fmt: str, columnar_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Decode a MessagePack or Arrow IPC body into a dict.
+
+    Arrow tables become {**schema_metadata_fields, columnar_key: {column: ndarray}}, so each
+    endpoint decides which request field the table represents.
+    """
+    if fmt == MSGPACK:
+        data = msgpack.unpackb(raw, raw=False, timestamp=3)
+        if not isinstance(data, dict):
+            raise ValueError("MessagePack body must be a map")
+        return data
+    if fmt == ARROW:
+        if not columnar_key:
+            raise UnsupportedMediaType("this endpoint does not accept Arrow bodies")
+        table = pa_ipc.open_stream(pa.py_buffer(raw)).read_all()
+        meta = (table.schema.metadata or {}).get(ARROW_META_KEY)
+        data = json.loads(meta) if meta else {}
+        if not isinstance(data, dict):
+            raise ValueError("Arrow schema metadata must be a JSON object")
+        data[columnar_key] = {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+        return data
+    raise UnsupportedMediaType(fmt)
+
+
+def is_columnar(value: Any) -> bool:
+    return isinstance(value, dict)
+
+
+def _column(cols: Dict[str, Any], name: str) -> np.ndarray:
+    if name not in cols:
+        raise ValueError(f"missing column '{name}'")
+    return np.asarray(cols[name])
+
+
+def _equal_lengths(cols: Dict[str, np.ndarray]) -> int:
+    lengths = {name: int(arr.shape[0]) if arr.ndim == 1 else -1 for name, arr in cols.items()}
+    if any(n < 0 for n in lengths.values()):
+        raise ValueError("columns must be one-dimensional")
+    if len(set(lengths.values())) > 1:
+        raise ValueError(f"columns must have equal lengths, got {lengths}")
+    return next(iter(lengths.values()), 0)
+
+
+def _float_column(cols: Dict[str, Any], name: str) -> np.ndarray:
+    try:
+        return _column(cols, name).astype(np.float64, copy=False)
+    except (TypeError, ValueError):
+        raise ValueError(f"column '{name}' must be numeric")
+
+
+def _date_column(cols: Dict[str, Any], name: str) -> np.ndarray:
+    arr = _column(cols, name)
+    try:
+        return arr.astype("datetime64[D]")
+    except (TypeError, ValueError):
+        raise ValueError(f"column '{name}' must hold ISO dates (YYYY-MM-DD)")
+
+
+def index_records_from_columns(cols: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Vectorized equivalent of validating List[IndexPoint]: column presence, equal lengths,
+    date parsing and finite index bounds in one pass per column. Returns the record dicts
+    the disaster analysis functions take.
+    """
+    typed = {
+        "field_id": _column(cols, "field_id"),
+        "date": _date_column(cols, "date"),
+        **{k: _float_column(cols, k) for k in ("ndvi", "ndwi", "tdvi")},
+    }
+    n = _equal_lengths(typed)
+    if n == 0:
+        raise ValueError("indices must not be empty")
+
+    for k in ("ndvi", "ndwi", "tdvi"):
+        bad = ~(np.abs(typed[k]) <= INDEX_BOUND)  # also catches NaN/inf
+        if bad.any():
+            i = int(np.flatnonzero(bad)[0])
+            raise ValueError(f"{k}[{i}] must be within [-{INDEX_BOUND:g}, {INDEX_BOUND:g}]")
+    if np.isnat(typed["date"]).any():
+        raise ValueError("date must not be null")
+    if typed["field_id"].dtype == object:
+        # Nulls decode as None; astype(str) would turn them into "None" instead of rejecting
+        missing = np.equal(typed["field_id"], None)
+        if missing.any():
+            raise ValueError(f"field_id[{int(np.flatnonzero(missing)[0])}] must not be null")
+
+    field_ids = typed["field_id"].astype(str).tolist()
+    dates: List[date] = typed["date"].astype(object).tolist()
+    ndvi, ndwi, tdvi = (typed[k].tolist() for k in ("ndvi", "ndwi", "tdvi"))
+    return [
+        {"field_id": f, "date": d, "ndvi": a, "ndwi": b, "tdvi": c}
+        for f, d, a, b, c in zip(field_ids, dates, ndvi, ndwi, tdvi)
+    ]
+
+
+def matrix_from_columns(cols: Dict[str, Any], feature_names: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, List[str]]:
+    """(N, F) float matrix from feature columns in feature_names order (default: column order)."""
+    names = list(feature_names) if feature_names else list(cols.keys())
+    if not names:
+        raise ValueError("at least one feature column is required")
+    typed = {name: _float_column(cols, name) for name in names}
+    _equal_lengths(typed)
+    X = np.column_stack([typed[name] for name in names])
+    if not np.isfinite(X).all():
+        r, c = map(int, np.argwhere(~np.isfinite(X))[0])
+        raise ValueError(f"{names[c]}[{r}] must be a finite number")
+    return X, names
+
+
+# -------------------------
+# Encoding
+# -------------------------
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"cannot serialize {type(obj).__name__}")
+
+
+def encode_body(body: Dict[str, Any], fmt: str, table_key: Optional[str] = None) -> bytes:
+    """
+    Encode a response body. For Arrow, body[table_key] (a list of records) becomes the
+    table and the remaining fields travel as JSON in the schema metadata.
+    """
+    if fmt == MSGPACK:
+        return msgpack.packb(body, use_bin_type=True, default=_msgpack_default)
+    if fmt == ARROW:
+        if not table_key:
+            raise UnsupportedMediaType("response has no table to encode as Arrow")
+        rest = {k: v for k, v in body.items() if k != table_key}
+        table = pa.Table.from_pylist(list(body.get(table_key) or []))
+        table = table.replace_schema_metadata({ARROW_META_KEY: json.dumps(rest, default=_msgpack_default).encode("utf-8")})
+        sink = pa.BufferOutputStream()
+        with pa_ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise UnsupportedMediaType(fmt)
@@ -0,0 +1,144 @@
+"""
+On-demand profiling.
+
+A pure-Python sampling profiler (sys._current_frames on a background thread) writes
+collapsed stacks ("frame;frame;frame count" lines), which flamegraph.pl, speedscope and
+inferno load directly. Two entry points, both behind require_internal_auth:
+
+- POST /admin/profile samples every thread of this worker for N seconds.
+- Any internal endpoint, when X-Profile-Token matches PROFILE_TOKEN, samples only the
+  request thread for that request. Segmentation requests also turn on ONNX Runtime's
+  own profiler (SessionOptions.enable_profiling), which writes a Chrome trace JSON.
+
+Nothing runs unless triggered; the only steady-state cost is one header lookup.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+PROFILE_HEADER = "X-Profile-Token"
+FOLDED_SUFFIX = ".folded"
+ORT_SUFFIX = ".ort.json"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> str:
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class StackSampler:
+    """
+    Samples Python stacks every interval_s on a daemon thread. thread_ids limits sampling to
+    those threads (per-request profiles); None samples every thread except the sampler.
+    """
+
+    def __init__(self, interval_s: float = 0.005, thread_ids: Optional[Iterable[int]] = None) -> None:
+        self.interval_s = max(0.0005, float(interval_s))
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.is_set():
+            for tid, frame in sys._current_frames().items():
+                if tid == me or (self.thread_ids is not None and tid not in self.thread_ids):
+                    continue
+                prefix = f"thread:{names.get(tid, tid)};" if self.thread_ids is None else ""
+                self.stacks[prefix + _fold(frame)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval_s)
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+
+class ProfileStore:
+    """Profile files under one directory, oldest pruned beyond max_files."""
+
+    def __init__(self, directory: str, max_files: int = 50) -> None:
+        self.directory = directory
+        self.max_files = max(1, int(max_files))
+        os.makedirs(directory, exist_ok=True)
+
+    def new_id(self, kind: str) -> str:
+        return f"{time.strftime('%Y%m%dT%H%M%S')}-{kind}-{uuid.uuid4().hex[:8]}"
+
+    def path(self, name: str) -> str:
+        """Absolute path for a stored file name; rejects anything that is not a bare file name."""
+        if not name or os.path.basename(name) != name or name.startswith("."):
+            raise ValueError("invalid profile name")
+        return os.path.join(self.directory, name)
+
+    def write_folded(self, profile_id: str, stacks: Counter) -> str:
+        name = profile_id + FOLDED_SUFFIX
+        with open(self.path(name), "w", encoding="utf-8") as fh:
+            for stack, count in stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        self.prune()
+        return name
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and (entry.name.endswith(FOLDED_SUFFIX) or entry.name.endswith(ORT_SUFFIX)):
+                st = entry.stat()
+                out.append({"name": entry.name, "size_bytes": st.st_size, "created": st.st_mtime})
+        return sorted(out, key=lambda d: d["created"], reverse=True)
+
+    def prune(self) -> None:
+        for item in self.list()[self.max_files:]:
+            try:
+                os.remove(self.path(item["name"]))
+            except OSError:
+                pass
+
+
+def profile_worker(store: ProfileStore, seconds: float, interval_ms: float) -> Dict[str, Any]:
+    """Sample every thread of this process for `seconds`; blocks the calling request."""
+    profile_id = store.new_id("worker")
+    sampler = StackSampler(interval_ms / 1000.0).start()
+    time.sleep(max(0.0, float(seconds)))
+    stacks = sampler.stop()
+    name = store.write_folded(profile_id, stacks)
+    return {"profile_id": profile_id, "file": name, "samples": sampler.samples, "stacks": len(stacks)}
+
+
+def profile_call(store: ProfileStore, fn, interval_ms: float = 1.0) -> Dict[str, Any]:
+    """
+    Run fn() while sampling only the current thread. Returns {"result", "profile_id", "file"};
+    the profile is written even when fn raises.
+    """
+    profile_id = store.new_id("request")
+    sampler = StackSampler(interval_ms / 1000.0, thread_ids=[threading.get_ident()]).start()
+    try:
+        result = fn(profile_id)
+    finally:
+        stacks = sampler.stop()
+        name = store.write_folded(profile_id, stacks)
+    return {"result": result, "profile_id": profile_id, "file": name}
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
 import base64
-from datetime import date
+from datetime import date, timedelta
 from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
 
 
+def _check_bbox(v: List[float]) -> List[float]:
+    if not isinstance(v, list) or len(v) != 4:
+        raise ValueError("bbox must be an array of 4 numbers [minLon,minLat,maxLon,maxLat]")
+    try:
+        min_lon, min_lat, max_lon, max_lat = map(float, v)
+    except Exception:
+        raise ValueError("bbox values must be numeric")
+    if not (-180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
+        raise ValueError("lon must be within [-180,180]")
+    if not (-90.0 <= min_lat <= 90.0 and -90.0 <= max_lat <= 90.0):
+        raise ValueError("lat must be within [-90,90]")
+    if not (min_lon < max_lon and min_lat < max_lat):
+        raise ValueError("bbox min must be less than max for lon and lat")
+    return [min_lon, min_lat, max_lon, max_lat]
+
+
 class TilingConfig(BaseModel):
     size: int = Field(default=512, ge=1, le=4096)
     overlap: int = Field(default=64, ge=0, le=1024)
@@ -32,19 +48,7 @@ class PredictRequest(BaseModel):
     @field_validator("bbox")
     @classmethod
     def validate_bbox(cls, v: List[float]) -> List[float]:
-        if not isinstance(v, list) or len(v) != 4:
-            raise ValueError("bbox must be an array of 4 numbers [minLon,minLat,maxLon,maxLat]")
-        try:
-            min_lon, min_lat, max_lon, max_lat = map(float, v)
-        except Exception:
-            raise ValueError("bbox values must be numeric")
-        if not (-180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
-            raise ValueError("lon must be within [-180,180]")
-        if not (-90.0 <= min_lat <= 90.0 and -90.0 <= max_lat <= 90.0):
-            raise ValueError("lat must be within [-90,90]")
-        if not (min_lon < max_lon and min_lat < max_lat):
-            raise ValueError("bbox min must be less than max for lon and lat")
-        return [min_lon, min_lat, max_lon, max_lat]
+        return _check_bbox(v)
 
 
 class ModelInfo(BaseModel):
@@ -101,6 +105,7 @@ class ErrorBody(BaseModel):
         "UNAUTHORIZED_INTERNAL",
         "NOT_IMPLEMENTED",
         "NOT_FOUND",
+        "UNSUPPORTED_MEDIA_TYPE",
     ]
     message: str
     details: Dict[str, Any] = Field(default_factory=dict)
@@ -197,6 +202,23 @@ class DisasterAnalyzeRequest(BaseModel):
     }
 
 
+class GeeDisasterAnalyzeRequest(BaseModel):
+    geometry: Dict[str, Any]
+    field_id: str = "field"
+    event: Literal["flood", "drought", "stress", "auto"]
+    event_date: date
+    pre_days: int = Field(default=14, ge=1, le=90)
+    post_days: int = Field(default=7, ge=1, le=90)
+    max_cloud_pct: float = Field(default=30, gt=0, le=100)
+    return_: Literal["summary", "geojson", "both"] = Field(default="summary", alias="return")
+    model_version: Optional[str] = None
+
+    model_config = {
+        "populate_by_name": True,
+        "extra": "forbid",
+    }
+
+
 class DisasterAnalysisItem(BaseModel):
     field_id: str
     event: Literal["flood", "drought", "stress"]
@@ -212,3 +234,161 @@ class DisasterAnalyzeResponse(BaseModel):
     metrics: MetricsBasic
     # When return is "geojson" or "both", include inline FeatureCollection
     mask_geojson: Optional[Dict[str, Any]] = None
+
+
+class DateRange(BaseModel):
+    start: date
+    end: date
+    step_days: int = Field(default=1, ge=1, le=90)
+
+    model_config = {"extra": "forbid"}
+
+    @model_validator(mode="after")
+    def validate_order(self) -> "DateRange":
+        if self.start > self.end:
+            raise ValueError("date_range.start must not be after date_range.end")
+        return self
+
+    def count(self) -> int:
+        return (self.end - self.start).days // int(self.step_days) + 1
+
+    def dates(self) -> List[date]:
+        out: List[date] = []
+        cur = self.start
+        while cur <= self.end:
+            out.append(cur)
+            cur = cur + timedelta(days=int(self.step_days))
+        return out
+
+
+MAX_SCAN_DATES = 366
+
+
+class DisasterScanRequest(BaseModel):
+    # Exactly one of event_dates or date_range
+    indices: List[IndexPoint]
+    event: Literal["flood", "drought", "stress", "auto"]
+    event_dates: Optional[List[date]] = None
+    date_range: Optional[DateRange] = None
+    pre_days: int = Field(default=14, ge=1, le=90)
+    post_days: int = Field(default=7, ge=1, le=90)
+    model_version: Optional[str] = None
+
+    model_config = {
+        "populate_by_name": True,
+        "extra": "forbid",
+    }
+
+    @model_validator(mode="after")
+    def validate_dates(self) -> "DisasterScanRequest":
+        if (self.event_dates is None) == (self.date_range is None):
+            raise ValueError("Provide exactly one of 'event_dates' or 'date_range'")
+        n = len(self.event_dates) if self.event_dates is not None else self.date_range.count()
+        if n == 0:
+            raise ValueError("at least one event date is required")
+        if n > MAX_SCAN_DATES:
+            raise ValueError(f"at most {MAX_SCAN_DATES} event dates per scan")
+        return self
+
+    def resolved_dates(self) -> List[date]:
+        if self.event_dates is not None:
+            return list(self.event_dates)
+        assert self.date_range is not None
+        return self.date_range.dates()
+
+
+class DisasterScanItem(BaseModel):
+    event_date: date
+    analysis: List[DisasterAnalysisItem]
+
+
+class DisasterScanResponse(BaseModel):
+    request_id: str
+    scans: List[DisasterScanItem]
+    model: ModelInfo
+    metrics: MetricsBasic
+
+
+class ChangeMaskMorphology(BaseModel):
+    min_area_pixels: int = Field(default=50, ge=0)
+    open_size: int = Field(default=2, ge=0, le=32)
+    close_size: int = Field(default=2, ge=0, le=32)
+
+    model_config = {"extra": "forbid"}
+
+
+class ChangeMaskRequest(BaseModel):
+    # pre/post map index name -> (T,H,W) .npy path, relative to RASTER_DATA_DIR
+    # (or the multipart field name when stacks are uploaded)
+    event: Literal["flood", "drought", "stress"]
+    pre: Dict[str, str] = Field(default_factory=dict)
+    post: Dict[str, str] = Field(default_factory=dict)
+    cloud_mask: Optional[str] = None
+    bbox: Optional[List[float]] = None
+    morphology: ChangeMaskMorphology = Field(default_factory=ChangeMaskMorphology)
+    model_version: Optional[str] = None
+
+    model_config = {
+        "populate_by_name": True,
+        "extra": "forbid",
+    }
+
+    @field_validator("pre", "post")
+    @classmethod
+    def validate_index_keys(cls, v: Dict[str, str]) -> Dict[str, str]:
+        unknown = sorted(set(v) - {"ndvi", "ndwi", "tdvi"})
+        if unknown:
+            raise ValueError(f"unknown index keys: {unknown}; expected ndvi|ndwi|tdvi")
+        return v
+
+    @field_validator("bbox")
+    @classmethod
+    def validate_bbox(cls, v: Optional[List[float]]) -> Optional[List[float]]:
+        return None if v is None else _check_bbox(v)
+
+
+class GeeField(BaseModel):
+    field_id: str
+    geometry: Dict[str, Any]
+
+
+class GeeTimeSeriesRequest(BaseModel):
+    # Either a single geometry (+ optional field_id) or a list of fields;
+    # either explicit dates or a date range
+    geometry: Optional[Dict[str, Any]] = None
+    field_id: Optional[str] = None
+    fields: Optional[List[GeeField]] = None
+    dates: Optional[List[date]] = None
+    date_range: Optional[DateRange] = None
+    max_cloud_pct: float = Field(default=30, gt=0, le=100)
+
+    model_config = {
+        "populate_by_name": True,
+        "extra": "forbid",
+    }
+
+    @model_validator(mode="after")
+    def validate_forms(self) -> "GeeTimeSeriesRequest":
+        if (self.geometry is None) == (self.fields is None):
+            raise ValueError("Provide exactly one of 'geometry' or 'fields'")
+        if self.fields is not None and len(self.fields) == 0:
+            raise ValueError("'fields' must not be empty")
+        if (self.dates is None) == (self.date_range is None):
+            raise ValueError("Provide exactly one of 'dates' or 'date_range'")
+        n = len(self.dates) if self.dates is not None else self.date_range.count()
+        if n == 0:
+            raise ValueError("at least one date is required")
+        if n > MAX_SCAN_DATES:
+            raise ValueError(f"at most {MAX_SCAN_DATES} dates per series")
+        return self
+
+    def resolved_fields(self) -> List[Dict[str, Any]]:
+        if self.fields is not None:
+            return [{"field_id": f.field_id, "geometry": f.geometry} for f in self.fields]
+        return [{"field_id": self.field_id or "field", "geometry": self.geometry}]
+
+    def resolved_dates(self) -> List[date]:
+        if self.dates is not None:
+            return sorted(set(self.dates))
+        assert self.date_range is not None
+        return self.date_range.dates()
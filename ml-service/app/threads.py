@@ -0,0 +1,175 @@
+"""
+Per-process thread budget.
+
+ONNX Runtime, BLAS-backed NumPy, OpenMP code (scikit-image/scikit-learn/SciPy extensions)
+and OpenCV each size their own pools to the machine, on top of gunicorn's request threads.
+At startup one budget (THREAD_BUDGET, or available CPUs / gunicorn workers) is split:
+
+- ORT gets THREAD_BUDGET_ORT_SHARE of it as intra-op threads (inter-op 1), unless
+  ORT_INTRA_OP_THREADS / ORT_INTER_OP_THREADS are set explicitly (e.g. from
+  `python -m loadtest autotune`), which are used as given. The share-derived intra-op size is
+  capped at budget - 1 so the native pool keeps a thread.
+- The rest is the native pool. BLAS/OpenMP run on the calling request thread, so each of the
+  GUNICORN_THREADS request threads gets native // threads; OpenCV's single global pool gets
+  the whole native share.
+
+Limits are applied with threadpoolctl for libraries already loaded, through the standard
+*_NUM_THREADS variables (set only when unset) for libraries loaded later, and with
+cv2.setNumThreads when OpenCV is installed. These are process-wide, so the budget is applied
+once per process; apps created later in the same process report the budget in effect.
+"""
+
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+NATIVE_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class ThreadBudget:
+    cpus: int
+    workers: int
+    request_threads: int
+    total: int
+    ort_intra_op: int
+    ort_inter_op: int
+    native: int
+    native_per_request: int
+    opencv: int
+    source: str  # "auto" (cpus // workers) | "config" (THREAD_BUDGET)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def plan_budget(
+    cpus: int,
+    workers: int = 1,
+    request_threads: int = 1,
+    total: int = 0,
+    ort_share: float = 0.5,
+    ort_intra_override: int = 0,
+    ort_inter_override: int = 0,
+) -> ThreadBudget:
+    workers = max(1, int(workers))
+    request_threads = max(1, int(request_threads))
+    source = "config" if total and total > 0 else "auto"
+    total = int(total) if total and total > 0 else max(1, int(cpus) // workers)
+
+    if ort_intra_override and ort_intra_override > 0:
+        # Explicit (e.g. autotuned) sizes are used as given
+        ort = int(ort_intra_override)
+    else:
+        # The share leaves the native pool at least one thread of the budget
+        ort = int(round(total * min(1.0, max(0.0, float(ort_share)))))
+        ort = max(1, min(ort, total - 1))
+    native = max(1, total - ort)
+    return ThreadBudget(
+        cpus=int(cpus),
+        workers=workers,
+        request_threads=request_threads,
+        total=total,
+        ort_intra_op=ort,
+        ort_inter_op=int(ort_inter_override) if ort_inter_override and ort_inter_override > 0 else 1,
+        native=native,
+        native_per_request=max(1, native // request_threads),
+        opencv=native,
+        source=source,
+    )
+
+
+def _native_pools() -> List[Dict[str, Any]]:
+    try:
+        from threadpoolctl import threadpool_info
+    except ImportError:
+        return []
+    return [
+        {"api": p.get("user_api"), "library": p.get("internal_api"), "num_threads": p.get("num_threads")}
+        for p in threadpool_info()
+    ]
+
+
+def apply_budget(budget: ThreadBudget) -> Dict[str, Any]:
+    """Apply the budget to this process; returns what was applied (for /health)."""
+    applied: Dict[str, Any] = {"env": {}, "threadpoolctl": False, "opencv": None, "ort": False}
+
+    for name in NATIVE_ENV_VARS:
+        if name not in os.environ:
+            os.environ[name] = str(budget.native_per_request)
+            applied["env"][name] = budget.native_per_request
+
+    try:
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(limits=budget.native_per_request)
+        applied["threadpoolctl"] = True
+    except ImportError:
+        pass
+
+    try:
+        import cv2  # type: ignore
+
+        cv2.setNumThreads(budget.opencv)
+        applied["opencv"] = int(cv2.getNumThreads())
+    except ImportError:
+        pass
+
+    from . import inference
+
+    inference.ORT_INTRA_OP_THREADS = budget.ort_intra_op
+    inference.ORT_INTER_OP_THREADS = budget.ort_inter_op
+    applied["ort"] = True
+    return applied
+
+
+# (budget, applied) for this process, set by the first init_thread_budget call
+_PROCESS_BUDGET: Optional[Dict[str, Any]] = None
+
+
+def thread_status(app) -> Optional[Dict[str, Any]]:
+    """Budget, what was applied and the pools' current sizes; None when budgeting is disabled."""
+    state = app.extensions.get("thread_budget")
+    if state is None:
+        return None
+    return {**state["budget"].to_dict(), "applied": state["applied"], "native_pools": _native_pools()}
+
+
+def init_thread_budget(app, cfg) -> Optional[ThreadBudget]:
+    global _PROCESS_BUDGET
+    if not cfg.THREAD_BUDGET_ENABLED:
+        return None
+    if _PROCESS_BUDGET is not None:
+        app.extensions["thread_budget"] = dict(_PROCESS_BUDGET)
+        return _PROCESS_BUDGET["budget"]
+    from . import inference
+
+    budget = plan_budget(
+        available_cpus(),
+        workers=cfg.SERVER_WORKERS,
+        request_threads=cfg.SERVER_THREADS,
+        total=cfg.THREAD_BUDGET,
+        ort_share=cfg.THREAD_BUDGET_ORT_SHARE,
+        ort_intra_override=int(os.getenv("ORT_INTRA_OP_THREADS", "0") or 0),
+        ort_inter_override=int(os.getenv("ORT_INTER_OP_THREADS", "0") or 0),
+    )
+    # Sessions created before this point keep their old pool sizes
+    inference._ORT_SESSION = None
+    applied = apply_budget(budget)
+    _PROCESS_BUDGET = {"budget": budget, "applied": applied}
+    app.extensions["thread_budget"] = dict(_PROCESS_BUDGET)
+    return budget
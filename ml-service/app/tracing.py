@@ -0,0 +1,229 @@
+"""
+Lightweight per-request stage tracing.
+
+A trace is a tree of timed spans keyed by the request's correlation_id. Code marks stages
+with `with span("ort.run", batch=4):`; when no trace is active (tracing disabled and no
+debug header) span() returns a shared no-op context manager, so instrumented hot paths
+pay one ContextVar lookup.
+
+Finished traces go to an in-memory ring buffer (GET /admin/traces) and optionally to a
+JSON-lines file. With `X-Debug-Trace: 1` the breakdown is also returned with the response
+(Server-Timing header, plus a "trace" field on JSON bodies).
+"""
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from flask import g, request
+
+DEBUG_HEADER = "X-Debug-Trace"
+
+_CURRENT: ContextVar[Optional["Trace"]] = ContextVar("skycrop_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start_ns", "end_ns", "children")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.children: List["_Span"] = []
+
+    def to_dict(self, origin_ns: int) -> Dict[str, Any]:
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        out: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start_ns - origin_ns) / 1e6, 3),
+            "duration_ms": round((end - self.start_ns) / 1e6, 3),
+        }
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(origin_ns) for c in self.children]
+        return out
+
+
+class Trace:
+    """Span tree for one request. Spans opened on other threads are not attached."""
+
+    def __init__(self, trace_id: str, name: str, attrs: Optional[Dict[str, Any]] = None) -> None:
+        self.trace_id = trace_id
+        self.root = _Span(name, dict(attrs or {}))
+        self._stack: List[_Span] = [self.root]
+
+    def open(self, name: str, attrs: Dict[str, Any]) -> _Span:
+        s = _Span(name, attrs)
+        self._stack[-1].children.append(s)
+        self._stack.append(s)
+        return s
+
+    def close(self, s: _Span) -> None:
+        s.end_ns = time.perf_counter_ns()
+        # tolerate out-of-order exits (exceptions unwinding several spans)
+        while self._stack and self._stack[-1] is not self.root:
+            top = self._stack.pop()
+            if top is s:
+                break
+
+    def finish(self) -> None:
+        if self.root.end_ns is None:
+            self.root.end_ns = time.perf_counter_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"trace_id": self.trace_id, "ts": time.time(), "root": self.root.to_dict(self.root.start_ns)}
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Total ms per direct child stage of the root (repeated names are summed)."""
+        totals: Dict[str, float] = {}
+        for c in self.root.children:
+            end = c.end_ns if c.end_ns is not None else time.perf_counter_ns()
+            totals[c.name] = totals.get(c.name, 0.0) + (end - c.start_ns) / 1e6
+        return totals
+
+
+class _ActiveSpan:
+    __slots__ = ("_trace", "_name", "_attrs", "_span")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]) -> None:
+        self._trace = trace
+        self._name = name
+        self._attrs = attrs
+        self._span: Optional[_Span] = None
+
+    def __enter__(self) -> "_ActiveSpan":
+        self._span = self._trace.open(self._name, self._attrs)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._span.attrs["error"] = exc_type.__name__
+        self._trace.close(self._span)
+
+    def set(self, **attrs: Any) -> None:
+        self._span.attrs.update(attrs)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs: Any):
+    """Time a stage under the current request's trace; no-op when nothing is being traced."""
+    trace = _CURRENT.get()
+    if trace is None:
+        return _NOOP
+    return _ActiveSpan(trace, name, attrs)
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+class TraceExporter:
+    """Ring buffer of recent traces plus optional JSON-lines file."""
+
+    def __init__(self, capacity: int, file_path: Optional[str] = None) -> None:
+        self._buf: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(capacity)))
+        self._lock = threading.Lock()
+        self.file_path = file_path or None
+
+    def export(self, trace: Trace) -> Dict[str, Any]:
+        data = trace.to_dict()
+        with self._lock:
+            self._buf.append(data)
+            if self.file_path:
+                with open(self.file_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(data, separators=(",", ":")) + "\n")
+        return data
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._buf)
+        return items[-max(0, int(limit)):][::-1]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for item in reversed(self._buf):
+                if item["trace_id"] == trace_id:
+                    return item
+        return None
+
+
+def _server_timing(totals: Dict[str, float], total_ms: float) -> str:
+    parts = [f"{name.replace(' ', '_')};dur={ms:.2f}" for name, ms in totals.items()]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+def init_tracing(app) -> None:
+    """
+    Register request hooks. Must run after init_app_logging so g.correlation_id is set.
+    TRACE_ENABLED traces a TRACE_SAMPLE_RATE fraction of requests; the debug header
+    always traces its request.
+    """
+    exporter = TraceExporter(int(app.config.get("TRACE_BUFFER_SIZE", 200)), app.config.get("TRACE_FILE"))
+    app.extensions["trace_exporter"] = exporter
+
+    @app.before_request
+    def _start_trace():
+        debug = request.headers.get(DEBUG_HEADER, "").lower() in ("1", "true", "yes")
+        enabled = bool(app.config.get("TRACE_ENABLED", False)) and (
+            random.random() < float(app.config.get("TRACE_SAMPLE_RATE", 1.0))
+        )
+        if not (debug or enabled):
+            return
+        cid = getattr(g, "correlation_id", None) or ""
+        trace = Trace(cid, f"{request.method} {request.path}")
+        g._trace = trace
+        g._trace_debug = debug
+        g._trace_token = _CURRENT.set(trace)
+
+    @app.after_request
+    def _finish_trace(resp):
+        trace: Optional[Trace] = getattr(g, "_trace", None)
+        if trace is None:
+            return resp
+        trace.root.attrs["status"] = resp.status_code
+        if request.url_rule is not None:
+            trace.root.attrs["route"] = request.url_rule.rule
+        trace.finish()
+        data = exporter.export(trace)
+        if getattr(g, "_trace_debug", False):
+            total_ms = data["root"]["duration_ms"]
+            resp.headers["Server-Timing"] = _server_timing(trace.stage_totals(), total_ms)
+            resp.headers["X-Trace-Id"] = trace.trace_id
+            if resp.is_json and not resp.direct_passthrough:
+                body = resp.get_json(silent=True)
+                if isinstance(body, dict):
+                    body["trace"] = data
+                    resp.set_data(json.dumps(body))
+        return resp
+
+    @app.teardown_request
+    def _reset_trace(exc):
+        token = getattr(g, "_trace_token", None)
+        if token is not None:
+            try:
+                _CURRENT.reset(token)
+            except ValueError:
+                _CURRENT.set(None)
+            g._trace_token = None
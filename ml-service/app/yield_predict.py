@@ -4,6 +4,8 @@ from typing import List, Optional, Tuple
 
 import numpy as np
 
+from .tracing import span
+
 
 class ModelLoadError(Exception):
     pass
@@ -159,12 +161,14 @@ def predict_numeric(rows: List[List[float]], app_config, model_path_override: Op
     """
     path = _resolve_model_path(app_config, model_path_override)
     try:
-        _predictor.ensure_loaded(path)
+        with span("yield.load_model"):
+            _predictor.ensure_loaded(path)
     except ModelLoadError as e:
         # propagate for API layer to map to 404
         raise
 
-    return _predictor.predict(rows)
+    with span("yield.predict", rows=len(rows)):
+        return _predictor.predict(rows)
 
 
 def build_matrix_from_features(
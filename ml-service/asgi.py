@@ -0,0 +1,6 @@
+from app import create_app
+from app.asgi_bridge import AsgiBridge
+
+# ASGI entrypoint (optional): WEB_CONCURRENCY=2 GUNICORN_THREADS=4 uvicorn asgi:app
+# (the thread budget reads the worker count from WEB_CONCURRENCY, not from --workers)
+app = AsgiBridge(create_app())
@@ -0,0 +1 @@
+"""Offline CPU micro-benchmarks for ml-service hot paths (see benchmarks/run.py)."""
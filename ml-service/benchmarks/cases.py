@@ -0,0 +1,165 @@
+"""
+Benchmark cases for ml-service hot paths.
+
+Each case builds its synthetic inputs once in setup() and returns a zero-argument callable
+plus the number of items one call processes (tiles, regions, records, rows), so results
+report both latency and throughput. Inputs are seeded, so runs are comparable.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+Setup = Callable[[], Tuple[Callable[[], Any], int]]
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    unit: str
+    setup: Setup
+    quick: bool = False  # included in --quick runs
+
+
+# ---------------------------------------------------------------------------
+# _infer_tiles (tiny generated ONNX U-Net)
+# ---------------------------------------------------------------------------
+
+def _use_tiny_unet(model_dir: str) -> None:
+    """Point the inference singleton at the generated model (CPU only)."""
+    import app.inference as inference
+
+    from .tiny_unet import build_tiny_unet
+
+    path = os.path.join(model_dir, "tiny_unet.onnx")
+    if not os.path.isfile(path):
+        build_tiny_unet(path)
+    inference.MODEL_UNET_PATH = path
+    inference.ORT_PROVIDERS = ["CPUExecutionProvider"]
+    inference._ORT_SESSION = None
+
+
+def _infer_tiles_case(size: int, tile: int = 256, overlap: int = 32, batch: int = 4) -> Setup:
+    def setup():
+        import app.inference as inference
+
+        _use_tiny_unet(os.environ.get("BENCH_MODEL_DIR", os.path.join("data", "bench")))
+        rng = np.random.RandomState(1)
+        img = rng.randint(0, 256, size=(size, size, 3), dtype=np.uint8)
+        steps = len(inference._sliding_steps(max(size, tile), tile, overlap))
+
+        def run():
+            return inference._infer_tiles(
+                img, tile=tile, overlap=overlap, batch_size=batch, use_hann=True, padding="reflect", threshold=0.5
+            )
+
+        return run, steps * steps
+
+    return setup
+
+
+# ---------------------------------------------------------------------------
+# _polygonize_mask
+# ---------------------------------------------------------------------------
+
+def synthetic_mask(size: int, regions: int, seed: int = 2) -> np.ndarray:
+    """Binary mask with `regions` non-overlapping discs/ellipses, like a field segmentation."""
+    rng = np.random.RandomState(seed)
+    mask = np.zeros((size, size), dtype=np.uint8)
+    yy, xx = np.mgrid[0:size, 0:size]
+    cells = int(np.ceil(np.sqrt(regions)))
+    cell = size // cells
+    placed = 0
+    for cy in range(cells):
+        for cx in range(cells):
+            if placed >= regions:
+                break
+            ry = rng.uniform(0.2, 0.45) * cell
+            rx = rng.uniform(0.2, 0.45) * cell
+            oy = cy * cell + cell / 2
+            ox = cx * cell + cell / 2
+            mask[((yy - oy) / ry) ** 2 + ((xx - ox) / rx) ** 2 <= 1.0] = 1
+            placed += 1
+    return mask
+
+
+def _polygonize_case(size: int, regions: int) -> Setup:
+    def setup():
+        from app.inference import _polygonize_mask
+
+        mask = synthetic_mask(size, regions)
+        return (lambda: _polygonize_mask(mask)), regions
+
+    return setup
+
+
+# ---------------------------------------------------------------------------
+# analyze_indices
+# ---------------------------------------------------------------------------
+
+def synthetic_indices(fields: int, days: int, seed: int = 3) -> List[Dict[str, Any]]:
+    """Daily index records per field around 2025-01-15, with a drop after the event."""
+    rng = np.random.RandomState(seed)
+    start = date(2025, 1, 15) - timedelta(days=days // 2)
+    out: List[Dict[str, Any]] = []
+    for f in range(fields):
+        for d in range(days):
+            day = start + timedelta(days=d)
+            after = day > date(2025, 1, 15)
+            out.append(
+                {
+                    "field_id": f"f{f:05d}",
+                    "date": day,
+                    "ndvi": float(rng.uniform(0.5, 0.8) - (0.1 if after else 0.0)),
+                    "ndwi": float(rng.uniform(-0.1, 0.2) + (0.2 if after and f % 3 == 0 else 0.0)),
+                    "tdvi": float(rng.uniform(0.3, 0.6)),
+                }
+            )
+    return out
+
+
+def _analyze_case(fields: int, days: int = 30) -> Setup:
+    def setup():
+        from app.disaster_analyze import analyze_indices
+
+        records = synthetic_indices(fields, days)
+        cfg: Dict[str, Any] = {"DISASTER_PRE_DAYS": 14, "DISASTER_POST_DAYS": 7}
+        return (lambda: analyze_indices(records, "auto", date(2025, 1, 15), cfg)), len(records)
+
+    return setup
+
+
+# ---------------------------------------------------------------------------
+# build_matrix_from_features
+# ---------------------------------------------------------------------------
+
+def synthetic_features(rows: int, features: int = 8, seed: int = 4) -> List[Dict[str, Any]]:
+    rng = np.random.RandomState(seed)
+    vals = rng.uniform(0, 100, size=(rows, features))
+    names = [f"feat_{i}" for i in range(features)]
+    return [{"field_id": f"f{r}", **dict(zip(names, map(float, vals[r])))} for r in range(rows)]
+
+
+def _features_case(rows: int) -> Setup:
+    def setup():
+        from app.yield_predict import build_matrix_from_features
+
+        feats = synthetic_features(rows)
+        return (lambda: build_matrix_from_features(feats)), rows
+
+    return setup
+
+
+CASES: List[Case] = [
+    Case("infer_tiles[512px]", "tiles/s", _infer_tiles_case(512), quick=True),
+    Case("infer_tiles[1024px]", "tiles/s", _infer_tiles_case(1024)),
+    Case("polygonize_mask[512px,25]", "regions/s", _polygonize_case(512, 25), quick=True),
+    Case("polygonize_mask[1024px,100]", "regions/s", _polygonize_case(1024, 100)),
+    Case("analyze_indices[100x30]", "records/s", _analyze_case(100), quick=True),
+    Case("analyze_indices[1000x30]", "records/s", _analyze_case(1000)),
+    Case("build_matrix[1k]", "rows/s", _features_case(1_000), quick=True),
+    Case("build_matrix[10k]", "rows/s", _features_case(10_000)),
+]
@@ -0,0 +1,152 @@
+"""
+Micro-benchmark runner with a JSON baseline and regression gate.
+
+    python -m benchmarks.run                    # run all cases, compare to baseline.json
+    python -m benchmarks.run --quick            # smallest size of each hot path
+    python -m benchmarks.run -k infer_tiles     # substring filter
+    python -m benchmarks.run --update-baseline  # record current numbers as the baseline
+
+Each case is warmed up, then timed for --repeat calls; the gate compares the median
+against the baseline median and exits 1 when any case is slower by more than
+--threshold (default 0.25, i.e. 25%, or BENCH_THRESHOLD). Cases missing from the baseline
+are reported but never fail. Baselines are machine-specific: regenerate them on the
+machine that runs the gate.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .cases import CASES, Case
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def measure(fn, items: int, warmup: int, repeat: int) -> Dict[str, Any]:
+    for _ in range(max(0, warmup)):
+        fn()
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    arr = np.asarray(times) * 1000.0
+    median = float(np.median(arr))
+    return {
+        "items": int(items),
+        "repeat": len(times),
+        "median_ms": round(median, 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "min_ms": round(float(arr.min()), 4),
+        "mean_ms": round(float(arr.mean()), 4),
+        "throughput": round(items / (median / 1000.0), 2) if median > 0 else None,
+    }
+
+
+def run_case(case: Case, warmup: int, repeat: int) -> Dict[str, Any]:
+    fn, items = case.setup()
+    return {"unit": case.unit, **measure(fn, items, warmup, repeat)}
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float
+) -> List[Dict[str, Any]]:
+    """One row per result: ratio = current/baseline median; status ok|regression|new."""
+    rows = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("median_ms"):
+            rows.append({"name": name, "status": "new", "ratio": None, **cur})
+            continue
+        ratio = cur["median_ms"] / float(base["median_ms"])
+        status = "regression" if ratio > 1.0 + threshold else "ok"
+        rows.append({"name": name, "status": status, "ratio": round(ratio, 3), "baseline_ms": base["median_ms"], **cur})
+    return rows
+
+
+def machine_info() -> Dict[str, Any]:
+    import onnxruntime as ort
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "onnxruntime": ort.__version__,
+    }
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.isfile(path):
+        return {"cases": {}}
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, Any]], merge_into: Optional[Dict[str, Any]] = None) -> None:
+    cases = dict((merge_into or {}).get("cases", {}))
+    cases.update(results)
+    data = {"machine": machine_info(), "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "cases": cases}
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def _print_rows(rows: List[Dict[str, Any]], threshold: float) -> None:
+    print(f"{'case':32} {'median_ms':>11} {'p95_ms':>10} {'throughput':>20} {'vs base':>8}  status")
+    for r in rows:
+        ratio = f"{r['ratio']:.2f}x" if r.get("ratio") is not None else "-"
+        tput = f"{r['throughput']:.1f} {r['unit']}" if r.get("throughput") is not None else "-"
+        print(f"{r['name']:32} {r['median_ms']:11.3f} {r['p95_ms']:10.3f} {tput:>20} {ratio:>8}  {r['status']}")
+    print(f"(regression threshold: +{threshold:.0%} median latency)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="ml-service micro-benchmarks")
+    p.add_argument("-k", "--filter", default="", help="run cases whose name contains this substring")
+    p.add_argument("--quick", action="store_true", help="only the smallest size of each hot path")
+    p.add_argument("--warmup", type=int, default=2)
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")))
+    p.add_argument("--baseline", default=DEFAULT_BASELINE)
+    p.add_argument("--update-baseline", action="store_true")
+    p.add_argument("--output", default=None, help="write results JSON here")
+    args = p.parse_args(argv)
+
+    cases = [c for c in CASES if args.filter in c.name and (c.quick or not args.quick)]
+    if not cases:
+        print("no benchmark cases selected", file=sys.stderr)
+        return 2
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for case in cases:
+        results[case.name] = run_case(case, args.warmup, args.repeat)
+
+    baseline = load_baseline(args.baseline)
+    rows = compare(results, baseline.get("cases", {}), args.threshold)
+    _print_rows(rows, args.threshold)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"machine": machine_info(), "threshold": args.threshold, "results": rows}, fh, indent=2)
+    if args.update_baseline:
+        save_baseline(args.baseline, results, merge_into=baseline)
+        print(f"baseline updated: {args.baseline}")
+        return 0
+
+    regressions = [r["name"] for r in rows if r["status"] == "regression"]
+    if regressions:
+        print(f"REGRESSION: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
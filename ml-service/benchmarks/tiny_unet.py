@@ -0,0 +1,63 @@
+"""
+Tiny U-Net exported as ONNX for benchmarks.
+
+Two-level encoder/decoder (conv-relu, maxpool, conv-relu, nearest upsample, skip concat,
+conv-relu, 1x1 conv, sigmoid) with seeded random weights. Dynamic N/H/W, NCHW input of
+3 channels, so inference._describe_session picks NCHW exactly as for exported models.
+Built with onnx.helper; no training framework or network access needed.
+"""
+
+import os
+from typing import List
+
+import numpy as np
+
+
+def build_tiny_unet(path: str, base: int = 8, seed: int = 0) -> str:
+    """Write the model to path (parent dirs created) and return path."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.RandomState(seed)
+    inits: List[onnx.TensorProto] = []
+    nodes: List[onnx.NodeProto] = []
+
+    def conv(name: str, x: str, cin: int, cout: int, k: int, relu: bool = True) -> str:
+        w = (rng.randn(cout, cin, k, k) * np.sqrt(2.0 / (cin * k * k))).astype(np.float32)
+        b = np.zeros(cout, dtype=np.float32)
+        inits.append(numpy_helper.from_array(w, f"{name}.w"))
+        inits.append(numpy_helper.from_array(b, f"{name}.b"))
+        pad = k // 2
+        nodes.append(
+            helper.make_node(
+                "Conv", [x, f"{name}.w", f"{name}.b"], [f"{name}.conv"], kernel_shape=[k, k], pads=[pad] * 4
+            )
+        )
+        if not relu:
+            return f"{name}.conv"
+        nodes.append(helper.make_node("Relu", [f"{name}.conv"], [f"{name}.out"]))
+        return f"{name}.out"
+
+    e1 = conv("enc1", "input", 3, base, 3)
+    nodes.append(helper.make_node("MaxPool", [e1], ["pool1"], kernel_shape=[2, 2], strides=[2, 2]))
+    e2 = conv("enc2", "pool1", base, base * 2, 3)
+    inits.append(numpy_helper.from_array(np.array([1, 1, 2, 2], dtype=np.float32), "up.scales"))
+    nodes.append(helper.make_node("Resize", [e2, "", "up.scales"], ["up1"], mode="nearest"))
+    nodes.append(helper.make_node("Concat", ["up1", e1], ["cat1"], axis=1))
+    d1 = conv("dec1", "cat1", base * 3, base, 3)
+    logits = conv("head", d1, base, 1, 1, relu=False)
+    nodes.append(helper.make_node("Sigmoid", [logits], ["output"]))
+
+    graph = helper.make_graph(
+        nodes,
+        "tiny_unet",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N", 3, "H", "W"])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, ["N", 1, "H", "W"])],
+        initializer=inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], producer_name="skycrop-bench")
+    model.ir_version = 8  # readable by onnxruntime>=1.16
+    onnx.checker.check_model(model)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    onnx.save(model, path)
+    return path
@@ -0,0 +1 @@
+"""Load-testing harness for the ml-service HTTP API (see loadtest/runner.py)."""
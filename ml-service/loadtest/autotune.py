@@ -0,0 +1,284 @@
+"""
+Serving-configuration autotuner.
+
+Searches gunicorn workers x gthread threads x ORT intra-op threads x INFER_BATCH_SIZE for
+this host and prints the best combination as env variables.
+
+1. In-process: for every (intra_op_threads, threads-per-worker) pair the matrix needs, run
+   inference._infer_tiles from `threads` concurrent callers on one shared session at each
+   batch size, and keep the fastest batch size (tiles/s, ties broken by p95).
+2. HTTP (unless --skip-http): launch gunicorn with each (workers, threads, intra, batch)
+   candidate and drive the segmentation mix with loadtest.run_load (closed loop).
+
+By default intra-op threads are derived as cpu_count // (workers * threads), so no
+candidate oversubscribes the host; --intra adds explicit values. Without the HTTP phase
+the recommendation is extrapolated from the in-process numbers (per-process tiles/s x workers).
+"""
+
+import argparse
+import os
+import threading
+import time
+from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _dedup(values: Sequence[int]) -> List[int]:
+    return sorted({int(v) for v in values if int(v) >= 1})
+
+
+def build_candidates(
+    cpus: int, workers: Sequence[int], threads: Sequence[int], intra: Optional[Sequence[int]] = None
+) -> List[Dict[str, int]]:
+    """(workers, threads, intra) combinations; derived intra keeps workers * intra <= cpus."""
+    out = []
+    for w, t in product(_dedup(workers), _dedup(threads)):
+        if w > cpus:
+            continue
+        options = {max(1, cpus // (w * t))} | set(_dedup(intra or []))
+        out.extend({"workers": w, "threads": t, "intra": i} for i in sorted(options))
+    return out
+
+
+class _InferenceState:
+    """Swap the inference module's session settings and restore them afterwards."""
+
+    _ATTRS = ("MODEL_UNET_PATH", "ORT_PROVIDERS", "ORT_INTRA_OP_THREADS", "_ORT_SESSION",
+              "_ORT_INPUT_NAME", "_ORT_OUTPUT_NAME", "_ORT_INPUT_LAYOUT")
+
+    def __init__(self) -> None:
+        import app.inference as inference
+
+        self.mod = inference
+        self.saved = {a: getattr(inference, a) for a in self._ATTRS}
+
+    def configure(self, model_path: str, intra: int) -> None:
+        self.mod.MODEL_UNET_PATH = model_path
+        self.mod.ORT_PROVIDERS = ["CPUExecutionProvider"]
+        self.mod.ORT_INTRA_OP_THREADS = int(intra)
+        self.mod._ORT_SESSION = None
+        self.mod._load_ort_session()
+
+    def restore(self) -> None:
+        for a, v in self.saved.items():
+            setattr(self.mod, a, v)
+
+
+def measure_inprocess(
+    infer, img: np.ndarray, tile: int, overlap: int, batch: int, concurrency: int, requests: int
+) -> Dict[str, Any]:
+    """`requests` calls of infer() spread over `concurrency` threads sharing one session."""
+    latencies: List[float] = []
+    tiles = [0]
+    lock = threading.Lock()
+    remaining = [max(requests, concurrency)]
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            t0 = time.perf_counter()
+            _, meta = infer(img, tile=tile, overlap=overlap, batch_size=batch, use_hann=True, padding="reflect", threshold=0.5)
+            dt = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                latencies.append(dt)
+                tiles[0] += int(meta["tile_count"])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - start
+    arr = np.asarray(latencies)
+    return {
+        "tiles_per_s": round(tiles[0] / wall, 2),
+        "requests_per_s": round(len(latencies) / wall, 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+    }
+
+
+def tune_inprocess(
+    model_path: str,
+    pairs: Sequence[Tuple[int, int]],
+    batches: Sequence[int],
+    requests: int = 8,
+    image_size: int = 1024,
+    tile: int = 512,
+    overlap: int = 64,
+) -> List[Dict[str, Any]]:
+    """One row per (intra, threads, batch) with in-process throughput and latency."""
+    state = _InferenceState()
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, size=(image_size, image_size, 3), dtype=np.uint8)
+    rows = []
+    try:
+        for intra in sorted({i for i, _ in pairs}):
+            state.configure(model_path, intra)
+            state.mod._infer_tiles(img, tile=tile, overlap=overlap, batch_size=1, use_hann=True, padding="reflect", threshold=0.5)
+            for conc in sorted({t for i, t in pairs if i == intra}):
+                for batch in _dedup(batches):
+                    res = measure_inprocess(state.mod._infer_tiles, img, tile, overlap, batch, conc, requests)
+                    rows.append({"intra": intra, "threads": conc, "batch": batch, **res})
+    finally:
+        state.restore()
+    return rows
+
+
+def best_batch(rows: List[Dict[str, Any]], intra: int, threads: int) -> Dict[str, Any]:
+    cands = [r for r in rows if r["intra"] == intra and r["threads"] == threads]
+    return max(cands, key=lambda r: (r["tiles_per_s"], -r["p95_ms"]))
+
+
+def tune_http(
+    candidates: List[Dict[str, int]],
+    model_path: str,
+    token: str,
+    duration_s: float,
+    warmup_s: float,
+    mix: str,
+) -> List[Dict[str, Any]]:
+    from .runner import launched_server, run_load
+    from .scenarios import parse_mix, weighted_scenarios
+
+    scenarios = weighted_scenarios(parse_mix(mix))
+    rows = []
+    for c in candidates:
+        env = {
+            "ML_INTERNAL_TOKEN": token,
+            "MODEL_UNET_PATH": os.path.abspath(model_path),
+            "ORT_INTRA_OP_THREADS": str(c["intra"]),
+            "INFER_BATCH_SIZE": str(c["batch"]),
+            "LOG_LEVEL": "WARNING",
+        }
+        with launched_server(c["workers"], c["threads"], env=env) as url:
+            report = run_load(
+                url, token, scenarios,
+                concurrency=2 * c["workers"] * c["threads"], rate=0.0,
+                duration_s=duration_s, warmup_s=warmup_s, trace_fraction=0.0,
+            )
+        total = report["total"]
+        rows.append({
+            **c,
+            "requests_per_s": total["throughput_rps"],
+            "p95_ms": total["latency_ms"]["p95"],
+            "p99_ms": total["latency_ms"]["p99"],
+            "error_rate": total["error_rate"],
+        })
+    return rows
+
+
+def recommend(rows: List[Dict[str, Any]], max_p95_ms: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Highest requests/s without errors (and under max_p95_ms when given); ties prefer lower p95."""
+    ok = [r for r in rows if not r.get("error_rate") and r.get("p95_ms") is not None]
+    if max_p95_ms is not None:
+        ok = [r for r in ok if r["p95_ms"] <= max_p95_ms]
+    if not ok:
+        return None
+    return max(ok, key=lambda r: (r["requests_per_s"], -r["p95_ms"]))
+
+
+def env_lines(cfg: Dict[str, Any]) -> List[str]:
+    return [
+        f"GUNICORN_WORKERS={cfg['workers']}",
+        f"GUNICORN_THREADS={cfg['threads']}",
+        f"ORT_INTRA_OP_THREADS={cfg['intra']}",
+        f"INFER_BATCH_SIZE={cfg['batch']}",
+    ]
+
+
+def _default_model() -> str:
+    import app.inference as inference
+
+    if os.path.isfile(inference.MODEL_UNET_PATH):
+        return inference.MODEL_UNET_PATH
+    from benchmarks.tiny_unet import build_tiny_unet
+
+    path = os.path.join("data", "bench", "tiny_unet.onnx")
+    print(f"[autotune] {inference.MODEL_UNET_PATH} not found; tuning on a generated tiny U-Net ({path})")
+    return path if os.path.isfile(path) else build_tiny_unet(path)
+
+
+def _ints(spec: str) -> List[int]:
+    return [int(x) for x in spec.split(",") if x.strip()]
+
+
+def add_arguments(p: argparse.ArgumentParser) -> None:
+    cpus = cpu_count()
+    p.add_argument("--model", default=None, help="U-Net ONNX to tune with (default: MODEL_UNET_PATH or a tiny generated one)")
+    p.add_argument("--workers", default=",".join(map(str, _dedup([1, 2, cpus // 2, cpus]))))
+    p.add_argument("--threads", default="1,2,4", help="gthread threads per worker")
+    p.add_argument("--intra", default="", help="extra ORT intra-op thread counts to try")
+    p.add_argument("--batch", default="1,2,4,8", help="INFER_BATCH_SIZE values")
+    p.add_argument("--requests", type=int, default=8, help="in-process calls per measurement")
+    p.add_argument("--skip-http", action="store_true", help="in-process phase only")
+    p.add_argument("--http-duration", type=float, default=10.0)
+    p.add_argument("--http-warmup", type=float, default=2.0)
+    p.add_argument("--mix", default="segmentation", help="load-test mix for the HTTP phase")
+    p.add_argument("--token", default=os.getenv("ML_INTERNAL_TOKEN", "change-me"))
+    p.add_argument("--max-p95-ms", type=float, default=None, help="latency cap for the recommendation")
+    p.add_argument("--output", default=None, help="write all measurements as JSON")
+    p.add_argument("--env-out", default=None, help="write the recommended env lines here")
+
+
+def run(args: argparse.Namespace) -> int:
+    import json
+
+    cpus = cpu_count()
+    model = args.model or _default_model()
+    candidates = build_candidates(cpus, _ints(args.workers), _ints(args.threads), _ints(args.intra))
+    pairs = sorted({(c["intra"], c["threads"]) for c in candidates})
+    print(f"[autotune] {cpus} CPUs, {len(candidates)} candidates, in-process pairs (intra, threads): {pairs}")
+
+    inproc = tune_inprocess(model, pairs, _ints(args.batch), requests=args.requests)
+    print(f"{'intra':>5} {'threads':>7} {'batch':>5} {'tiles/s':>9} {'p50_ms':>9} {'p95_ms':>9}")
+    for r in inproc:
+        print(f"{r['intra']:5d} {r['threads']:7d} {r['batch']:5d} {r['tiles_per_s']:9.1f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f}")
+    for c in candidates:
+        b = best_batch(inproc, c["intra"], c["threads"])
+        c["batch"] = b["batch"]
+        # per-process estimate scaled by workers; only used when the HTTP phase is skipped
+        c["requests_per_s"] = round(b["requests_per_s"] * c["workers"], 3)
+        c["p95_ms"] = b["p95_ms"]
+
+    if args.skip_http:
+        final, source = candidates, "in-process estimate"
+    else:
+        final = tune_http(candidates, model, args.token, args.http_duration, args.http_warmup, args.mix)
+        source = "http"
+        print(f"{'workers':>7} {'threads':>7} {'intra':>5} {'batch':>5} {'req/s':>8} {'p95_ms':>9} {'p99_ms':>9} {'err%':>6}")
+        for r in final:
+            fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'-':>9}"  # noqa: E731
+            print(
+                f"{r['workers']:7d} {r['threads']:7d} {r['intra']:5d} {r['batch']:5d} {r['requests_per_s']:8.2f}"
+                f" {fmt(r['p95_ms'])} {fmt(r['p99_ms'])} {100 * r['error_rate']:6.1f}"
+            )
+
+    best = recommend(final, args.max_p95_ms)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"cpus": cpus, "model": model, "source": source, "inprocess": inproc,
+                       "candidates": final, "recommended": best}, fh, indent=2)
+    if best is None:
+        print("[autotune] no configuration met the constraints")
+        return 1
+    lines = env_lines(best)
+    print(f"\n# Recommended for this host ({cpus} CPUs, {source}):")
+    print("\n".join(lines))
+    if args.env_out:
+        with open(args.env_out, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+    return 0
@@ -0,0 +1,136 @@
+"""Summaries and side-by-side comparison for load-test runs."""
+
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """'parse;dur=1.20, ort.run;dur=40.5, total;dur=45' -> {stage: ms}."""
+    out: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for p in params.split(";"):
+            key, _, val = p.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    out[name] = float(val)
+                except ValueError:
+                    pass
+    return out
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    arr = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(arr.max()), 2),
+        "mean": round(float(arr.mean()), 2),
+    }
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed_s: float) -> Dict[str, Any]:
+    """
+    samples: [{status, latency_ms, service_ms, stages?}] for one scenario (or all).
+    latency_ms is measured from the scheduled send time, so queueing in the generator under
+    an open-loop rate is included (no coordinated omission); service_ms is send-to-receive.
+    """
+    n = len(samples)
+    ok = [s for s in samples if 200 <= int(s["status"]) < 400]
+    status_counts: Dict[str, int] = {}
+    for s in samples:
+        status_counts[str(s["status"])] = status_counts.get(str(s["status"]), 0) + 1
+    stage_vals: Dict[str, List[float]] = {}
+    traced = 0
+    for s in samples:
+        if s.get("stages"):
+            traced += 1
+            for k, v in s["stages"].items():
+                stage_vals.setdefault(k, []).append(v)
+    return {
+        "count": n,
+        "ok": len(ok),
+        "errors": n - len(ok),
+        "error_rate": round((n - len(ok)) / n, 4) if n else 0.0,
+        "status_counts": status_counts,
+        "throughput_rps": round(n / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "latency_ms": _percentiles([s["latency_ms"] for s in ok]),
+        "service_ms": _percentiles([s["service_ms"] for s in ok]),
+        "traced": traced,
+        "stages_ms": {k: round(float(np.mean(v)), 2) for k, v in sorted(stage_vals.items())},
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    meta = report["meta"]
+    print(
+        f"{meta['url']}  concurrency={meta['concurrency']} rate={meta['rate'] or 'closed-loop'} "
+        f"duration={meta['elapsed_s']:.1f}s"
+    )
+    print(f"{'scenario':26} {'count':>6} {'rps':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    rows = list(report["scenarios"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        lat = s["latency_ms"]
+        fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'-':>9}"  # noqa: E731
+        print(
+            f"{name:26} {s['count']:6d} {s['throughput_rps']:8.2f} {100 * s['error_rate']:6.1f}"
+            f" {fmt(lat['p50'])} {fmt(lat['p95'])} {fmt(lat['p99'])}"
+        )
+    for name, s in report["scenarios"].items():
+        if s["stages_ms"]:
+            stages = ", ".join(f"{k}={v:.1f}" for k, v in s["stages_ms"].items())
+            print(f"  {name} stages (mean ms over {s['traced']} traced): {stages}")
+
+
+def _delta(a: Optional[float], b: Optional[float]) -> str:
+    if a is None or b is None:
+        return "-"
+    if a == 0:
+        return "n/a"
+    return f"{100.0 * (b - a) / a:+.1f}%"
+
+
+def compare_reports(a: Dict[str, Any], b: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-scenario rows (plus TOTAL) of A vs B for throughput, error rate and latency percentiles."""
+    names = list(dict.fromkeys(list(a["scenarios"]) + list(b["scenarios"]))) + ["TOTAL"]
+    rows = []
+    for name in names:
+        sa = a["total"] if name == "TOTAL" else a["scenarios"].get(name)
+        sb = b["total"] if name == "TOTAL" else b["scenarios"].get(name)
+        row: Dict[str, Any] = {"scenario": name}
+        for key in ("throughput_rps", "error_rate"):
+            row[key] = (sa or {}).get(key), (sb or {}).get(key)
+        for p in ("p50", "p95", "p99"):
+            row[p] = ((sa or {}).get("latency_ms", {}).get(p), (sb or {}).get("latency_ms", {}).get(p))
+        rows.append(row)
+    return rows
+
+
+def print_comparison(a: Dict[str, Any], b: Dict[str, Any], label_a: str = "A", label_b: str = "B") -> None:
+    print(f"A = {label_a}\nB = {label_b}")
+    print(f"{'scenario':26} {'rps A→B':>20} {'err% A→B':>14} {'p50 A→B':>24} {'p95 A→B':>24} {'p99 A→B':>24}")
+
+    def cell(pair, scale=1.0, width=24):
+        x, y = pair
+        fx = f"{x * scale:.1f}" if x is not None else "-"
+        fy = f"{y * scale:.1f}" if y is not None else "-"
+        return f"{fx}→{fy} ({_delta(x, y)})".rjust(width)
+
+    for r in compare_reports(a, b):
+        err = r["error_rate"]
+        err_cell = f"{(err[0] or 0) * 100:.1f}→{(err[1] or 0) * 100:.1f}".rjust(14)
+        print(
+            f"{r['scenario']:26} {cell(r['throughput_rps'], width=20)} {err_cell}"
+            f" {cell(r['p50'])} {cell(r['p95'])} {cell(r['p99'])}"
+        )
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
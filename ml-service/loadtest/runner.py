@@ -0,0 +1,246 @@
+"""
+Load generator for the ml-service HTTP API.
+
+    python -m loadtest run --launch --duration 30 --concurrency 8 --rate 20 \\
+        --mix segmentation=2,yield=1,disaster=1 --output runs/base.json
+    python -m loadtest run --url http://127.0.0.1:8001 --rate 0 --concurrency 16
+    python -m loadtest compare runs/base.json runs/new.json
+    python -m loadtest autotune                 # see loadtest/autotune.py
+
+--rate > 0 is open-loop: request i is scheduled at start + i/rate and its latency is
+measured from that time, so a slow server shows up as latency instead of silently lowering
+the offered load. --rate 0 is closed-loop (each worker sends back-to-back).
+--launch starts gunicorn with the Dockerfile's gthread settings on a local port.
+A --trace-fraction of requests send X-Debug-Trace: 1 so the service's own stage timings
+(Server-Timing) are reported per scenario.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from . import autotune
+from .report import load_report, parse_server_timing, print_comparison, print_report, summarize
+from .scenarios import Scenario, parse_mix, weighted_scenarios
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_load(
+    url: str,
+    token: str,
+    scenarios: List[Tuple[Scenario, float]],
+    concurrency: int = 4,
+    rate: float = 0.0,
+    duration_s: float = 10.0,
+    warmup_s: float = 0.0,
+    max_requests: Optional[int] = None,
+    trace_fraction: float = 0.1,
+    timeout_s: float = 60.0,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Drive the mix against url and return {"meta", "scenarios", "total"} (see report.summarize)."""
+    url = url.rstrip("/")
+    picks = random.Random(seed)
+    population = [s for s, _ in scenarios]
+    weights = [w for _, w in scenarios]
+    lock = threading.Lock()
+    counter = [0]
+    samples: List[Dict[str, Any]] = []
+    t0 = time.perf_counter() + 0.05
+    deadline = t0 + warmup_s + duration_s
+
+    def next_request() -> Optional[Tuple[int, Scenario, float]]:
+        with lock:
+            i = counter[0]
+            if max_requests is not None and i >= max_requests:
+                return None
+            scheduled = t0 + i / rate if rate > 0 else max(t0, time.perf_counter())
+            if scheduled >= deadline:
+                return None
+            counter[0] += 1
+            return i, picks.choices(population, weights)[0], scheduled
+
+    def worker() -> None:
+        session = requests.Session()
+        while True:
+            item = next_request()
+            if item is None:
+                return
+            i, scenario, scheduled = item
+            rng = random.Random(seed * 1_000_003 + i)
+            body = json.dumps(scenario.build(rng))
+            headers = {"X-Internal-Token": token, "Content-Type": "application/json", "X-Request-Id": f"lt-{seed}-{i}"}
+            traced = rng.random() < trace_fraction
+            if traced:
+                headers["X-Debug-Trace"] = "1"
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            sent = time.perf_counter()
+            sample: Dict[str, Any] = {"scenario": scenario.name, "scheduled": scheduled}
+            try:
+                resp = session.request(scenario.method, url + scenario.path, data=body, headers=headers, timeout=timeout_s)
+                sample["status"] = resp.status_code
+                if traced:
+                    sample["stages"] = parse_server_timing(resp.headers.get("Server-Timing"))
+            except requests.RequestException as e:
+                sample["status"] = 0
+                sample["error"] = type(e).__name__
+            done = time.perf_counter()
+            sample["latency_ms"] = (done - scheduled) * 1000.0
+            sample["service_ms"] = (done - sent) * 1000.0
+            with lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=worker, name=f"loadtest-{n}", daemon=True) for n in range(max(1, concurrency))]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    finished = time.perf_counter()
+
+    measured = [s for s in samples if s["scheduled"] >= t0 + warmup_s]
+    elapsed = max(1e-9, finished - (t0 + warmup_s))
+    by_name: Dict[str, List[Dict[str, Any]]] = {}
+    for s in measured:
+        by_name.setdefault(s["scenario"], []).append(s)
+    return {
+        "meta": {
+            "url": url,
+            "concurrency": concurrency,
+            "rate": rate,
+            "duration_s": duration_s,
+            "warmup_s": warmup_s,
+            "elapsed_s": round(elapsed, 3),
+            "trace_fraction": trace_fraction,
+            "seed": seed,
+            "mix": {s.name: round(w, 4) for s, w in scenarios},
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenarios": {name: summarize(by_name[name], elapsed) for name in sorted(by_name)},
+        "total": summarize(measured, elapsed),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+@contextlib.contextmanager
+def launched_server(
+    workers: int = 2, threads: int = 1, port: Optional[int] = None, env: Optional[Dict[str, str]] = None
+) -> Iterator[str]:
+    """gunicorn wsgi:app with the Dockerfile's gthread worker on 127.0.0.1; yields the base URL."""
+    port = port or _free_port()
+    cmd = [
+        sys.executable, "-m", "gunicorn", "wsgi:app",
+        "-w", str(workers), "-k", "gthread", "--threads", str(threads), "-t", "60", "-b", f"127.0.0.1:{port}",
+    ]
+    # The thread budget reads the server layout from these, as under the Dockerfile CMD
+    layout = {"GUNICORN_WORKERS": str(workers), "GUNICORN_THREADS": str(threads)}
+    proc = subprocess.Popen(cmd, cwd=SERVICE_DIR, env={**os.environ, **(env or {}), **layout})
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+            try:
+                if requests.get(url + "/health", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+        else:
+            raise RuntimeError("server did not become healthy within 60s")
+        yield url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    scenarios = weighted_scenarios(parse_mix(args.mix))
+    kwargs = dict(
+        token=args.token,
+        scenarios=scenarios,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        duration_s=args.duration,
+        warmup_s=args.warmup,
+        max_requests=args.requests,
+        trace_fraction=args.trace_fraction,
+        timeout_s=args.timeout,
+        seed=args.seed,
+    )
+    if args.launch:
+        with launched_server(args.workers, args.threads, env={"ML_INTERNAL_TOKEN": args.token}) as url:
+            report = run_load(url, **kwargs)
+        report["meta"]["server"] = {"workers": args.workers, "threads": args.threads, "worker_class": "gthread"}
+    else:
+        report = run_load(args.url, **kwargs)
+    if args.label:
+        report["meta"]["label"] = args.label
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    return 0
+
+
+def _cmd_compare(args: argparse.Namespace) -> int:
+    a, b = load_report(args.a), load_report(args.b)
+    print_comparison(a, b, a["meta"].get("label") or args.a, b["meta"].get("label") or args.b)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(prog="python -m loadtest", description="ml-service load generator")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="drive a synthetic workload and report latency percentiles")
+    r.add_argument("--url", default=os.getenv("LOADTEST_URL", "http://127.0.0.1:80"))
+    r.add_argument("--launch", action="store_true", help="start a local gunicorn (gthread) and test it")
+    r.add_argument("--workers", type=int, default=2, help="gunicorn workers with --launch")
+    r.add_argument("--threads", type=int, default=1, help="gthread threads per worker with --launch")
+    r.add_argument("--token", default=os.getenv("ML_INTERNAL_TOKEN", "change-me"))
+    r.add_argument("--mix", default="segmentation=2,yield=1,disaster=1", help="group or scenario weights")
+    r.add_argument("--concurrency", type=int, default=4)
+    r.add_argument("--rate", type=float, default=0.0, help="total requests/s (0 = closed-loop)")
+    r.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    r.add_argument("--warmup", type=float, default=5.0, help="seconds excluded from the report")
+    r.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    r.add_argument("--trace-fraction", type=float, default=0.1)
+    r.add_argument("--timeout", type=float, default=60.0)
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--label", default=None, help="name shown by compare")
+    r.add_argument("--output", default=None, help="write the JSON report here")
+    r.set_defaults(func=_cmd_run)
+
+    c = sub.add_parser("compare", help="side-by-side comparison of two JSON reports")
+    c.add_argument("a")
+    c.add_argument("b")
+    c.set_defaults(func=_cmd_compare)
+
+    t = sub.add_parser("autotune", help="search workers/threads/ORT threads/batch size for this host")
+    autotune.add_arguments(t)
+    t.set_defaults(func=autotune.run)
+
+    args = p.parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,128 @@
+"""
+Synthetic request scenarios for the load generator.
+
+A scenario is one (route, payload shape) pair; scenarios are grouped (segmentation, yield,
+disaster) so --mix can weight groups while every tiling config or batch size is still
+reported separately. Payload builders take a seeded Random so runs are repeatable.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+Builder = Callable[[random.Random], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    group: str
+    path: str
+    build: Builder
+    method: str = "POST"
+
+
+def _bbox(rng: random.Random) -> List[float]:
+    # ~2 km boxes around Sri Lankan paddy areas
+    lon = rng.uniform(79.9, 81.8)
+    lat = rng.uniform(6.0, 9.5)
+    return [round(lon, 5), round(lat, 5), round(lon + 0.02, 5), round(lat + 0.02, 5)]
+
+
+def _segmentation(size: int, overlap: int) -> Builder:
+    def build(rng: random.Random) -> Dict[str, Any]:
+        return {
+            "bbox": _bbox(rng),
+            "date": (date(2025, 1, 1) + timedelta(days=rng.randrange(300))).isoformat(),
+            "return": "inline",
+            "tiling": {"size": size, "overlap": overlap},
+        }
+
+    return build
+
+
+def _yield(rows: int) -> Builder:
+    def build(rng: random.Random) -> Dict[str, Any]:
+        return {
+            "features": [
+                {
+                    "field_id": f"f{i}",
+                    "ndvi_mean": rng.uniform(0.3, 0.8),
+                    "ndwi_mean": rng.uniform(-0.1, 0.3),
+                    "rainfall_mm": rng.uniform(50, 400),
+                    "temp_mean": rng.uniform(24, 32),
+                    "area_ha": rng.uniform(0.2, 5.0),
+                }
+                for i in range(rows)
+            ]
+        }
+
+    return build
+
+
+def _disaster(fields: int, days: int = 30) -> Builder:
+    event = date(2025, 1, 15)
+
+    def build(rng: random.Random) -> Dict[str, Any]:
+        start = event - timedelta(days=days // 2)
+        indices = []
+        for f in range(fields):
+            for d in range(0, days, 3):
+                day = start + timedelta(days=d)
+                post = day > event
+                indices.append(
+                    {
+                        "field_id": f"f{f}",
+                        "date": day.isoformat(),
+                        "ndvi": round(rng.uniform(0.4, 0.8) - (0.1 if post else 0.0), 4),
+                        "ndwi": round(rng.uniform(-0.1, 0.2) + (0.2 if post and f % 3 == 0 else 0.0), 4),
+                        "tdvi": round(rng.uniform(0.3, 0.6), 4),
+                    }
+                )
+        return {"indices": indices, "event": "auto", "event_date": event.isoformat()}
+
+    return build
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("segmentation[256/32]", "segmentation", "/v1/segmentation/predict", _segmentation(256, 32)),
+    Scenario("segmentation[512/64]", "segmentation", "/v1/segmentation/predict", _segmentation(512, 64)),
+    Scenario("segmentation[1024/128]", "segmentation", "/v1/segmentation/predict", _segmentation(1024, 128)),
+    Scenario("yield[10]", "yield", "/v1/yield/predict", _yield(10)),
+    Scenario("yield[200]", "yield", "/v1/yield/predict", _yield(200)),
+    Scenario("disaster[5]", "disaster", "/v1/disaster/analyze", _disaster(5)),
+    Scenario("disaster[100]", "disaster", "/v1/disaster/analyze", _disaster(100)),
+]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'segmentation=2,yield=1' -> {group: weight}; names may also be exact scenario names."""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        out[name.strip()] = float(weight) if weight else 1.0
+    return out
+
+
+def weighted_scenarios(mix: Dict[str, float]) -> List[tuple]:
+    """
+    [(scenario, weight)] for a mix. A group weight is split evenly over its scenarios;
+    a scenario named explicitly gets its own weight.
+    """
+    known = {s.name for s in SCENARIOS} | {s.group for s in SCENARIOS}
+    unknown = sorted(set(mix) - known)
+    if unknown:
+        raise ValueError(f"unknown scenario(s) in mix: {', '.join(unknown)}")
+    out = []
+    for key, weight in mix.items():
+        if weight <= 0:
+            continue
+        members = [s for s in SCENARIOS if s.name == key] or [s for s in SCENARIOS if s.group == key]
+        out.extend((s, weight / len(members)) for s in members)
+    if not out:
+        raise ValueError("mix selects no scenarios")
+    return out
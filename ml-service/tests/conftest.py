@@ -32,6 +32,8 @@ def app_instance(tmp_path, internal_token):
         "MODEL_NAME": "unet",
         "ENABLE_TEST_HOOKS": True,
         "LOG_LEVEL": "ERROR",
+        "GEE_CACHE_PATH": str(tmp_path / "gee_index_cache.sqlite"),
+        "PROFILE_DIR": str(tmp_path / "profiles"),
     }
     app = create_app(overrides)
     yield app
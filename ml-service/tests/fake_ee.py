@@ -0,0 +1,296 @@
+"""
+Local stand-in for the `ee` (Earth Engine) module used by app.gee_indices tests.
+
+Objects are lazy like the real client library: nothing is computed until getInfo(),
+and every getInfo() counts as one remote round trip (`fake.round_trips`). Concurrent
+scene band reads are tracked too (`fake.peak_in_flight`).
+
+Images are modelled as region -> {band: mean value}, which is enough to check the
+reduction wiring. Scenes are plain dicts:
+    {"id": "S2A_...", "date": "2024-01-15", "cloud": 12.0, "bands": {"B3": .., "B4": .., "B8": ..}}
+where "bands" may also be a callable(geojson_geometry) -> {band: value}.
+"""
+
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class EEException(Exception):
+    pass
+
+
+def _resolve(v: Any) -> Any:
+    if isinstance(v, _Lazy):
+        return v._eval()
+    if isinstance(v, dict):
+        return {k: _resolve(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_resolve(x) for x in v]
+    return v
+
+
+class _Lazy:
+    def __init__(self, fake: "FakeEE", fn: Callable[[], Any]):
+        self._fake = fake
+        self._fn = fn
+
+    def _eval(self) -> Any:
+        return self._fn()
+
+    def getInfo(self) -> Any:
+        self._fake.round_trips += 1
+        if self._fake.fail_next:
+            self._fake.fail_next -= 1
+            raise EEException("transient: Too many concurrent aggregations")
+        return _resolve(self._eval())
+
+
+class _Number(_Lazy):
+    def gt(self, other: Any) -> "_Number":
+        return _Number(self._fake, lambda: _resolve(self) > _resolve(other))
+
+
+class _Value(_Lazy):
+    pass
+
+
+class _Dictionary(_Lazy):
+    def get(self, key: str) -> _Value:
+        return _Value(self._fake, lambda: (_resolve(self) or {}).get(key))
+
+
+class FakeGeometry:
+    def __init__(self, geojson: Dict[str, Any]):
+        self.geojson = geojson
+
+
+class FakeFeature:
+    def __init__(self, geometry: FakeGeometry, props: Optional[Dict[str, Any]] = None):
+        self.geometry = geometry
+        self.props = dict(props or {})
+
+
+class FakeImage(_Lazy):
+    """fn(region_geojson) -> {band: value}; None fn models the null image of an empty collection."""
+
+    def __init__(self, fake: "FakeEE", fn: Optional[Callable[[Any], Dict[str, float]]], props=None):
+        super().__init__(fake, lambda: props)
+        self._bands_fn = fn
+        self._props = dict(props or {})
+
+    def _bands(self, region: Any) -> Dict[str, float]:
+        if self._bands_fn is None:
+            raise EEException("Image.select: Parameter 'input' is required (null image)")
+        return self._bands_fn(region)
+
+    def _derive(self, fn: Callable[[Dict[str, float]], Dict[str, float]]) -> "FakeImage":
+        return FakeImage(self._fake, lambda r: fn(self._bands(r)), self._props)
+
+    def _binary(self, other: Any, op: Callable[[float, float], float]) -> "FakeImage":
+        def fn(r):
+            a = self._bands(r)
+            name, av = next(iter(a.items()))
+            bv = next(iter(other._bands(r).values())) if isinstance(other, FakeImage) else float(other)
+            return {name: op(av, bv)}
+
+        return FakeImage(self._fake, fn, self._props)
+
+    def select(self, *names: str) -> "FakeImage":
+        return self._derive(lambda b: {n: b[n] for n in names})
+
+    def rename(self, name: str) -> "FakeImage":
+        return self._derive(lambda b: {name: next(iter(b.values()))})
+
+    def subtract(self, other):
+        return self._binary(other, lambda a, b: a - b)
+
+    def add(self, other):
+        return self._binary(other, lambda a, b: a + b)
+
+    def divide(self, other):
+        return self._binary(other, lambda a, b: a / b)
+
+    def sqrt(self):
+        return self._derive(lambda b: {k: math.sqrt(v) for k, v in b.items()})
+
+    def addBands(self, other: "FakeImage") -> "FakeImage":
+        return FakeImage(self._fake, lambda r: {**self._bands(r), **other._bands(r)}, self._props)
+
+    def get(self, prop: str) -> _Value:
+        def fn():
+            if self._bands_fn is None:
+                raise EEException("Element.get: Parameter 'object' is required")
+            return self._props.get(prop)
+
+        return _Value(self._fake, fn)
+
+    def reduceRegion(self, reducer=None, geometry=None, scale=None, maxPixels=None, bestEffort=None):
+        self._fake.reduce_region_calls += 1
+        return _Dictionary(self._fake, lambda: self._bands(geometry.geojson if geometry else None))
+
+    def reduceRegions(self, collection=None, reducer=None, scale=None):
+        self._fake.reduce_regions_calls += 1
+
+        def fn():
+            out = []
+            for f in collection.features:
+                out.append(
+                    {
+                        "type": "Feature",
+                        "geometry": f.geometry.geojson,
+                        "properties": {**f.props, **self._bands(f.geometry.geojson)},
+                    }
+                )
+            return {"type": "FeatureCollection", "features": out}
+
+        return _Lazy(self._fake, fn)
+
+
+class FakeFeatureCollection(_Lazy):
+    def __init__(self, fake: "FakeEE", features: List[FakeFeature]):
+        super().__init__(fake, lambda: {"type": "FeatureCollection", "features": []})
+        self.features = list(features)
+
+    def geometry(self) -> FakeGeometry:
+        return FakeGeometry({"type": "GeometryCollection", "geometries": [f.geometry.geojson for f in self.features]})
+
+
+class FakeImageCollection(_Lazy):
+    def __init__(self, fake: "FakeEE", scenes: List[Dict[str, Any]], mappers=()):
+        super().__init__(fake, lambda: [s["id"] for s in scenes])
+        self._scenes = list(scenes)
+        self._mappers = tuple(mappers)
+
+    def _with(self, scenes: List[Dict[str, Any]]) -> "FakeImageCollection":
+        return FakeImageCollection(self._fake, scenes, self._mappers)
+
+    def _image(self, scene: Optional[Dict[str, Any]]) -> FakeImage:
+        if scene is None:
+            return FakeImage(self._fake, None)
+        bands = scene["bands"]
+        raw = bands if callable(bands) else (lambda r, b=bands: dict(b))
+
+        def fn(r):
+            return self._fake._read_bands(raw, r)
+
+        image = FakeImage(self._fake, fn, {"system:index": scene["id"], "CLOUDY_PIXEL_PERCENTAGE": scene.get("cloud", 0)})
+        for mapper in self._mappers:
+            image = mapper(image)
+        return image
+
+    def map(self, fn: Callable[[FakeImage], FakeImage]) -> "FakeImageCollection":
+        return FakeImageCollection(self._fake, self._scenes, self._mappers + (fn,))
+
+    def filterDate(self, start: str, end: str) -> "FakeImageCollection":
+        return self._with([s for s in self._scenes if start <= s["date"] < end])
+
+    def filterBounds(self, region) -> "FakeImageCollection":
+        return self._with(self._scenes)
+
+    def filter(self, pred: Callable[[Dict[str, Any]], bool]) -> "FakeImageCollection":
+        return self._with([s for s in self._scenes if pred(s)])
+
+    def sort(self, prop: str, ascending: bool = True) -> "FakeImageCollection":
+        key = {"CLOUDY_PIXEL_PERCENTAGE": "cloud", "system:time_start": "date"}.get(prop, prop)
+        return self._with(sorted(self._scenes, key=lambda s: s.get(key), reverse=not ascending))
+
+    def size(self) -> _Number:
+        return _Number(self._fake, lambda: len(self._scenes))
+
+    def first(self) -> FakeImage:
+        return self._image(self._scenes[0] if self._scenes else None)
+
+    def mosaic(self) -> FakeImage:
+        # Last scene on top, like ee.ImageCollection.mosaic
+        return self._image(self._scenes[-1] if self._scenes else None)
+
+    def mean(self) -> FakeImage:
+        if not self._scenes:
+            return FakeImage(self._fake, lambda r: {})
+        images = [self._image(s) for s in self._scenes]
+
+        def fn(r):
+            vals = [im._bands(r) for im in images]
+            return {k: sum(v[k] for v in vals) / len(vals) for k in vals[0]}
+
+        return FakeImage(self._fake, fn)
+
+
+class _Filter:
+    @staticmethod
+    def lt(prop: str, value: float):
+        key = "cloud" if prop == "CLOUDY_PIXEL_PERCENTAGE" else prop
+        return lambda s: float(s.get(key, 0)) < float(value)
+
+
+class _Reducer:
+    @staticmethod
+    def mean():
+        return "mean"
+
+
+class FakeEE:
+    """Drop-in for the `ee` module: monkeypatch app.gee_indices.ee with an instance."""
+
+    EEException = EEException
+    Filter = _Filter
+    Reducer = _Reducer
+
+    def __init__(self, scenes: Optional[List[Dict[str, Any]]] = None):
+        self.scenes = list(scenes or [])
+        self.round_trips = 0
+        self.reduce_region_calls = 0
+        self.reduce_regions_calls = 0
+        self.fail_next = 0  # number of upcoming getInfo calls that raise a transient error
+        self.in_flight = 0
+        self.peak_in_flight = 0  # most scene band reads running at the same time
+        self._lock = threading.Lock()
+        self._initialized = True
+        fake = self
+
+        class _Algorithms:
+            @staticmethod
+            def If(cond, a, b):
+                return _Lazy(fake, lambda: _resolve(a) if _resolve(cond) else _resolve(b))
+
+        self.Algorithms = _Algorithms
+
+    def _read_bands(self, fn: Callable[[Any], Dict[str, float]], region: Any) -> Dict[str, float]:
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return fn(region)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def Initialize(self, *args, **kwargs) -> None:
+        self._initialized = True
+
+    def Geometry(self, geojson: Dict[str, Any]) -> FakeGeometry:
+        return FakeGeometry(geojson)
+
+    def Feature(self, geometry: FakeGeometry, props: Optional[Dict[str, Any]] = None) -> FakeFeature:
+        return FakeFeature(geometry, props)
+
+    def FeatureCollection(self, features: List[FakeFeature]) -> FakeFeatureCollection:
+        return FakeFeatureCollection(self, features)
+
+    def ImageCollection(self, name: str) -> FakeImageCollection:
+        return FakeImageCollection(self, self.scenes)
+
+    def Dictionary(self, d: Dict[str, Any]) -> _Dictionary:
+        return _Dictionary(self, lambda: _resolve(d))
+
+
+def install(monkeypatch, scenes: Optional[List[Dict[str, Any]]] = None) -> FakeEE:
+    """Patch app.gee_indices to use a fresh FakeEE and return it."""
+    import app.gee_indices as gee
+
+    fake = FakeEE(scenes)
+    monkeypatch.setattr(gee, "ee", fake, raising=False)
+    monkeypatch.setattr(gee, "GEE_AVAILABLE", True)
+    monkeypatch.setattr(gee, "_GEE_INITIALIZED", True)
+    return fake
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import threading
+import time
+
+from app.asgi_bridge import AsgiBridge
+from test_disaster_analyze import _mk_indices_for_fields
+
+
+async def _request(bridge, method, path, body=b"", headers=None, chunk=None):
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"", "headers": raw_headers,
+             "server": ("testserver", 80), "client": ("127.0.0.1", 5000), "http_version": "1.1", "scheme": "http"}
+    parts = [body[i:i + chunk] for i in range(0, len(body), chunk)] if chunk else [body]
+    messages = [{"type": "http.request", "body": p, "more_body": i < len(parts) - 1} for i, p in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await bridge(scope, receive, send)
+    start = sent[0]
+    headers_out = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], headers_out, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def _analyze_body():
+    return json.dumps({"indices": _mk_indices_for_fields(), "event": "auto", "event_date": "2025-01-15"}).encode()
+
+
+def test_asgi_serves_flask_routes_with_auth_and_correlation(app_instance, auth_headers):
+    bridge = AsgiBridge(app_instance)
+
+    async def scenario():
+        health = await _request(bridge, "GET", "/health", headers={"X-Request-Id": "asgi-1"})
+        unauth = await _request(bridge, "POST", "/v1/disaster/analyze", _analyze_body(), {"Content-Type": "application/json"})
+        ok = await _request(bridge, "POST", "/v1/disaster/analyze", _analyze_body(), auth_headers)
+        return health, unauth, ok
+
+    health, unauth, ok = asyncio.run(scenario())
+    assert health[0] == 200 and health[1]["x-request-id"] == "asgi-1"
+    assert json.loads(health[2])["status"] == "ok"
+    assert unauth[0] == 401
+    assert ok[0] == 200
+    wsgi = app_instance.test_client().post("/v1/disaster/analyze", data=_analyze_body(), headers=auth_headers)
+    assert json.loads(ok[2])["analysis"] == wsgi.get_json()["analysis"]
+    bridge.close()
+
+
+def test_slow_upstream_does_not_block_cpu_routes(app_instance, auth_headers):
+    seen = {}
+
+    def slow_upstream():
+        seen.setdefault("io", set()).add(threading.current_thread().name)
+        time.sleep(0.4)
+        return {"ok": True}
+
+    app_instance.add_url_rule("/gee/_slow", "slow_upstream", slow_upstream, methods=["POST"])
+    app_instance.config["ASGI_CPU_THREADS"] = 1
+    app_instance.config["ASGI_IO_THREADS"] = 16
+    bridge = AsgiBridge(app_instance)
+
+    async def timed(coro):
+        t0 = time.perf_counter()
+        res = await coro
+        return res, time.perf_counter() - t0
+
+    async def scenario():
+        slow = [asyncio.create_task(timed(_request(bridge, "POST", "/gee/_slow", b"{}", auth_headers))) for _ in range(8)]
+        await asyncio.sleep(0.05)
+        fast = await timed(_request(bridge, "POST", "/v1/disaster/analyze", _analyze_body(), auth_headers))
+        return fast, await asyncio.gather(*slow)
+
+    (fast_res, fast_s), slow = asyncio.run(scenario())
+    assert fast_res[0] == 200
+    assert fast_s < 0.3
+    assert all(r[0] == 200 for r, _ in slow)
+    assert all(name.startswith("asgi-io") for name in seen["io"])
+    bridge.close()
+
+
+def test_cpu_queue_overflow_returns_503(app_instance, auth_headers):
+    def busy():
+        time.sleep(0.3)
+        return {"ok": True}
+
+    app_instance.add_url_rule("/v1/_busy", "busy", busy, methods=["POST"])
+    app_instance.config["ASGI_CPU_THREADS"] = 1
+    app_instance.config["ASGI_CPU_MAX_PENDING"] = 1
+    bridge = AsgiBridge(app_instance)
+
+    async def scenario():
+        tasks = []
+        for i in range(3):
+            tasks.append(asyncio.create_task(
+                _request(bridge, "POST", "/v1/_busy", b"{}", {**auth_headers, "X-Request-Id": f"busy-{i}"})
+            ))
+            await asyncio.sleep(0.02)
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(scenario())
+    statuses = sorted(r[0] for r in results)
+    assert statuses == [200, 200, 503]
+    rejected = next(r for r in results if r[0] == 503)
+    assert rejected[1]["retry-after"] == "1"
+    assert json.loads(rejected[2])["error"]["code"] == "SERVICE_UNAVAILABLE"
+    assert bridge.stats()["rejected"] == 1
+    bridge.close()
+
+
+def test_oversized_body_is_not_buffered_and_matches_wsgi(app_instance, auth_headers):
+    app_instance.config["MAX_CONTENT_LENGTH"] = 1000
+    bridge = AsgiBridge(app_instance)
+    messages = [{"type": "http.request", "body": b"x" * 512, "more_body": i < 9} for i in range(10)]
+
+    async def receive():
+        return messages.pop(0)
+
+    body, size = asyncio.run(bridge._read_body(receive))
+    assert size == 5120
+    assert len(body) <= 1000 + 512
+
+    status, _, out = asyncio.run(
+        _request(bridge, "POST", "/v1/disaster/analyze", b"x" * 5000, auth_headers, chunk=512)
+    )
+    wsgi = app_instance.test_client().post("/v1/disaster/analyze", data=b"x" * 5000, headers=auth_headers)
+    assert status == wsgi.status_code
+    assert json.loads(out)["error"]["code"] == wsgi.get_json()["error"]["code"]
+    bridge.close()
+
+
+def test_disconnect_mid_body_skips_the_app(app_instance, auth_headers, monkeypatch):
+    import app.asgi_bridge as asgi_bridge
+
+    bridge = AsgiBridge(app_instance)
+    calls = []
+    monkeypatch.setattr(asgi_bridge, "call_wsgi", lambda *args: calls.append(args))
+    body = _analyze_body()
+    messages = [
+        {"type": "http.request", "body": body[:100], "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(k.lower().encode(), v.encode()) for k, v in auth_headers.items()]
+    scope = {"type": "http", "method": "POST", "path": "/v1/disaster/analyze", "headers": headers}
+    asyncio.run(bridge(scope, receive, send))
+    assert calls == [] and sent == []
+    bridge.close()
+
+
+def test_lifespan_and_stats_endpoint(app_instance, auth_headers):
+    bridge = AsgiBridge(app_instance)
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    stats = app_instance.test_client().get("/admin/asgi/stats", headers=auth_headers).get_json()
+    assert stats["enabled"] is True and stats["cpu_threads"] >= 1
+    asyncio.run(bridge({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks import run as bench
+from benchmarks.cases import CASES, synthetic_mask
+
+
+def test_compare_flags_only_slowdowns_beyond_threshold():
+    results = {
+        "a": {"median_ms": 12.0, "p95_ms": 13.0, "unit": "x/s", "throughput": 1.0},
+        "b": {"median_ms": 13.0, "p95_ms": 14.0, "unit": "x/s", "throughput": 1.0},
+        "c": {"median_ms": 5.0, "p95_ms": 6.0, "unit": "x/s", "throughput": 1.0},
+    }
+    baseline = {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}}
+    rows = {r["name"]: r for r in bench.compare(results, baseline, threshold=0.25)}
+    assert rows["a"]["status"] == "ok" and rows["a"]["ratio"] == 1.2
+    assert rows["b"]["status"] == "regression"
+    assert rows["c"]["status"] == "new"
+
+
+def test_main_gates_on_baseline(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, "CASES", [c for c in CASES if c.name == "build_matrix[1k]"])
+    baseline = tmp_path / "baseline.json"
+
+    assert bench.main(["--baseline", str(baseline), "--update-baseline", "--repeat", "3", "--warmup", "0"]) == 0
+    saved = json.loads(baseline.read_text())
+    assert saved["cases"]["build_matrix[1k]"]["items"] == 1000
+    assert "cpu_count" in saved["machine"]
+
+    # Shrink the baseline so the current run looks like a 1000x slowdown
+    saved["cases"]["build_matrix[1k]"]["median_ms"] /= 1000.0
+    baseline.write_text(json.dumps(saved))
+    out = tmp_path / "results.json"
+    assert bench.main(["--baseline", str(baseline), "--repeat", "3", "--warmup", "0", "--output", str(out)]) == 1
+    assert json.loads(out.read_text())["results"][0]["status"] == "regression"
+
+
+def test_synthetic_mask_has_requested_regions():
+    from skimage.measure import label
+
+    mask = synthetic_mask(256, 16)
+    assert mask.dtype == np.uint8
+    assert label(mask, connectivity=1).max() == 16
+
+
+def test_tiny_unet_runs_through_infer_tiles(tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    import app.inference as inference
+
+    # _use_tiny_unet swaps the module-level session; restore it for other tests
+    for attr in ("MODEL_UNET_PATH", "ORT_PROVIDERS", "_ORT_SESSION", "_ORT_INPUT_NAME", "_ORT_OUTPUT_NAME", "_ORT_INPUT_LAYOUT"):
+        monkeypatch.setattr(inference, attr, getattr(inference, attr))
+    monkeypatch.setenv("BENCH_MODEL_DIR", str(tmp_path))
+
+    case = next(c for c in CASES if c.name == "infer_tiles[512px]")
+    fn, items = case.setup()
+    prob, meta = fn()
+    assert items == meta["tile_count"] == 9
+    assert prob.shape == (512, 512)
+    assert 0.0 <= float(prob.min()) <= float(prob.max()) <= 1.0
+    assert inference._ORT_INPUT_LAYOUT == "NCHW"
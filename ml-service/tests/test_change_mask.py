@@ -0,0 +1,139 @@
+import io
+import json
+from typing import Dict
+
+import numpy as np
+import pytest
+
+
+def _flood_stacks(H: int = 64, W: int = 48, T: int = 4) -> Dict[str, Dict[str, np.ndarray]]:
+    rng = np.random.default_rng(7)
+    pre = rng.uniform(0.0, 0.05, size=(T, H, W)).astype(np.float32)
+    post = rng.uniform(0.0, 0.05, size=(T, H, W)).astype(np.float32)
+    # Flooded block: NDWI rises well above thresholds after the event
+    post[:, 10:40, 8:30] += 0.4
+    # Sprinkle NaNs (clouds / nodata) including a fully-NaN pixel column in time
+    pre[1, 5, 5] = np.nan
+    post[:, 20, 20] = np.nan
+    return {"pre": {"ndwi": pre}, "post": {"ndwi": post}}
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 64, 1000])
+def test_chunked_nanmean_matches_numpy(chunk_rows):
+    from app.change_mask import chunked_nanmean, iter_row_chunks
+
+    stack = _flood_stacks()["post"]["ndwi"]
+    parts = [chunked_nanmean(stack, r0, r1) for r0, r1 in iter_row_chunks(stack.shape[1], chunk_rows)]
+    got = np.concatenate(parts, axis=0)
+    with np.errstate(invalid="ignore"), pytest.warns(RuntimeWarning):
+        want = np.nanmean(stack.astype(np.float32), axis=0)
+    np.testing.assert_allclose(got, want, rtol=1e-6, atol=1e-7, equal_nan=True)
+
+
+def test_build_change_mask_chunked_flood_block():
+    from app.change_mask import MorphologyConfig, build_change_mask_chunked
+
+    s = _flood_stacks()
+    no_morph = MorphologyConfig(min_area_pixels=0, open_size=0, close_size=0)
+    raw = build_change_mask_chunked(s["pre"], s["post"], "flood", morph=no_morph, chunk_rows=5)
+    assert raw.dtype == np.uint8
+    assert raw[10:40, 8:30].sum() == 30 * 22 - 1  # all-NaN pixel never flags
+    assert raw.sum() == raw[10:40, 8:30].sum()
+
+    cloud = np.zeros(raw.shape, dtype=bool)
+    cloud[10:20, :] = True
+    cleaned = build_change_mask_chunked(s["pre"], s["post"], "flood", cloud_mask=cloud, chunk_rows=16)
+    assert cleaned[10:20].sum() == 0
+    assert cleaned[25, 15] == 1
+
+
+def test_build_change_mask_chunked_reduces_only_event_indices(monkeypatch):
+    import app.change_mask as cm
+
+    s = _flood_stacks()
+    shape = s["pre"]["ndwi"].shape
+    pre = {**s["pre"], "ndvi": np.zeros(shape, np.float32), "tdvi": np.zeros(shape, np.float32)}
+    post = {**s["post"], "ndvi": np.zeros(shape, np.float32), "tdvi": np.zeros(shape, np.float32)}
+    names = {id(v): k for d in (pre, post) for k, v in d.items()}
+    seen = set()
+    real = cm.chunked_nanmean
+
+    def spy(stack, r0, r1):
+        seen.add(names[id(stack)])
+        return real(stack, r0, r1)
+
+    monkeypatch.setattr(cm, "chunked_nanmean", spy)
+    want = cm.build_change_mask_chunked(s["pre"], s["post"], "flood", chunk_rows=16)
+    got = cm.build_change_mask_chunked(pre, post, "flood", chunk_rows=16)
+    assert seen == {"ndwi"}
+    np.testing.assert_array_equal(got, want)
+
+    cm.build_change_mask_chunked(pre, post, "drought", chunk_rows=16)
+    assert seen == {"ndwi", "ndvi"}
+
+
+def test_build_change_mask_chunked_requires_event_stacks():
+    from app.change_mask import build_change_mask_chunked
+
+    s = _flood_stacks()
+    with pytest.raises(ValueError):
+        build_change_mask_chunked(s["pre"], s["post"], "stress")
+
+
+def test_change_mask_endpoint_local_storage(client, auth_headers, app_instance, tmp_path):
+    s = _flood_stacks()
+    data_dir = tmp_path / "rasters"
+    data_dir.mkdir()
+    np.save(data_dir / "pre_ndwi.npy", s["pre"]["ndwi"])
+    np.save(data_dir / "post_ndwi.npy", s["post"]["ndwi"])
+    app_instance.config["RASTER_DATA_DIR"] = str(data_dir)
+    app_instance.config["CHANGE_MASK_CHUNK_ROWS"] = 8
+
+    body = {
+        "event": "flood",
+        "pre": {"ndwi": "pre_ndwi.npy"},
+        "post": {"ndwi": "post_ndwi.npy"},
+        "bbox": [80.0, 7.0, 80.1, 7.1],
+    }
+    resp = client.post("/v1/disaster/change-mask", json=body, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert data["summary"]["shape"] == [64, 48]
+    assert data["summary"]["changed_pixels"] > 0
+    feats = data["mask_geojson"]["features"]
+    assert len(feats) == 1
+    assert feats[0]["properties"]["event"] == "flood"
+    # Georeferenced onto the bbox
+    xs = [pt[0] for pt in feats[0]["geometry"]["coordinates"][0]]
+    assert all(80.0 <= x <= 80.1 for x in xs)
+
+    # Paths may not escape the raster data dir
+    body["pre"] = {"ndwi": "../../etc/passwd"}
+    resp = client.post("/v1/disaster/change-mask", json=body, headers=auth_headers)
+    assert resp.status_code == 400
+
+    body["pre"] = {"ndwi": "missing.npy"}
+    resp = client.post("/v1/disaster/change-mask", json=body, headers=auth_headers)
+    assert resp.status_code == 404
+
+
+def test_change_mask_endpoint_multipart_upload(client, auth_headers):
+    s = _flood_stacks()
+
+    def _npy(arr):
+        buf = io.BytesIO()
+        np.save(buf, arr)
+        buf.seek(0)
+        return buf
+
+    headers = {"X-Internal-Token": auth_headers["X-Internal-Token"]}
+    form = {
+        "params": json.dumps({"event": "flood"}),
+        "pre_ndwi": (_npy(s["pre"]["ndwi"]), "pre.npy"),
+        "post_ndwi": (_npy(s["post"]["ndwi"]), "post.npy"),
+    }
+    resp = client.post("/v1/disaster/change-mask", data=form, headers=headers, content_type="multipart/form-data")
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert data["summary"]["crs"] == "pixel"
+    assert len(data["mask_geojson"]["features"]) == 1
@@ -118,4 +118,104 @@ def test_disaster_analyze_validation_errors(client, auth_headers):
     resp = _post(client, "/v1/disaster/analyze", bad_date_body, auth_headers)
     assert resp.status_code == 400
     data = resp.get_json()
-    assert data["error"]["code"] == "INVALID_INPUT"
\ No newline at end of file
+    assert data["error"]["code"] == "INVALID_INPUT"
+
+def test_analyze_indices_multi_matches_single_date():
+    from datetime import date, timedelta
+
+    from app.disaster_analyze import analyze_indices, analyze_indices_multi
+
+    records = []
+    for r in _mk_indices_for_fields():
+        rec = dict(r)
+        rec["date"] = date.fromisoformat(r["date"])
+        records.append(rec)
+    cfg = {"DISASTER_THRESHOLDS": {}}
+    dates = [date(2025, 1, 5) + timedelta(days=i) for i in range(20)]
+
+    for event in ("flood", "drought", "stress", "auto"):
+        scans, _ = analyze_indices_multi(records, event, dates, cfg, pre_days=5, post_days=3)
+        assert [s["event_date"] for s in scans] == [d.isoformat() for d in dates]
+        for d, scan in zip(dates, scans):
+            single, _ = analyze_indices(records, event, d, cfg, pre_days=5, post_days=3)
+            assert len(scan["analysis"]) == len(single)
+            for got, want in zip(scan["analysis"], single):
+                assert got["field_id"] == want["field_id"]
+                assert got["event"] == want["event"]
+                assert got["severity"] == want["severity"]
+                assert got["windows"] == want["windows"]
+                for k, v in want["metrics"].items():
+                    assert abs(got["metrics"][k] - v) < 1e-9
+
+
+def test_disaster_scan_date_range_ok(client, auth_headers):
+    body = {
+        "indices": _mk_indices_for_fields(),
+        "event": "auto",
+        "date_range": {"start": "2025-01-13", "end": "2025-01-17"},
+        "pre_days": 14,
+        "post_days": 7,
+    }
+    resp = _post(client, "/v1/disaster/scan", body, auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert data["model"]["name"] == "disaster_analysis"
+    assert [s["event_date"] for s in data["scans"]] == [
+        "2025-01-13",
+        "2025-01-14",
+        "2025-01-15",
+        "2025-01-16",
+        "2025-01-17",
+    ]
+    # The 2025-01-15 scan must agree with the single-date endpoint
+    single = _post(
+        client,
+        "/v1/disaster/analyze",
+        {"indices": _mk_indices_for_fields(), "event": "auto", "event_date": "2025-01-15"},
+        auth_headers,
+    ).get_json()
+    scan = data["scans"][2]["analysis"]
+    assert [(r["field_id"], r["event"], r["severity"]) for r in scan] == [
+        (r["field_id"], r["event"], r["severity"]) for r in single["analysis"]
+    ]
+
+
+def test_disaster_scan_requires_exactly_one_date_source(client, auth_headers):
+    base = {"indices": _mk_indices_for_fields(), "event": "flood"}
+    resp = _post(client, "/v1/disaster/scan", base, auth_headers)
+    assert resp.status_code == 400
+    both = dict(base, event_dates=["2025-01-15"], date_range={"start": "2025-01-10", "end": "2025-01-12"})
+    resp = _post(client, "/v1/disaster/scan", both, auth_headers)
+    assert resp.status_code == 400
+    too_many = dict(base, date_range={"start": "2024-01-01", "end": "2025-12-31"})
+    resp = _post(client, "/v1/disaster/scan", too_many, auth_headers)
+    assert resp.status_code == 400
+    assert resp.get_json()["error"]["code"] == "INVALID_INPUT"
+
+
+def test_scan_window_means_equal_per_date_path():
+    from datetime import date, timedelta
+
+    import numpy as np
+
+    from app.disaster_analyze import _build_field_series, _safe_mean, _scan_field, _window_slices
+
+    rng = np.random.RandomState(0)
+    start = date(2024, 1, 1)
+    days = np.sort(rng.choice(365, size=120, replace=False))
+    records = []
+    for d in days:
+        ndvi = float(rng.uniform(-1, 1)) if rng.rand() > 0.1 else None  # some missing values
+        records.append({"date": start + timedelta(days=int(d)), "ndvi": ndvi, "ndwi": float(rng.uniform(-1, 1)), "tdvi": 0.1})
+    series = _build_field_series(records)
+    event_dates = [start + timedelta(days=int(d)) for d in rng.randint(0, 365, size=2000)]
+    pre_days, post_days = 21, 9
+    scans = _scan_field(series, np.asarray([d.toordinal() for d in event_dates]), pre_days, post_days)
+
+    # Bitwise equal to _safe_mean over the per-date windows (NaN for empty windows)
+    for ev, stats in zip(event_dates, scans):
+        pre, post = _window_slices(records, ev, pre_days, post_days)
+        for key in ("ndvi", "ndwi"):
+            for got, rows in ((stats[f"{key}_pre_mean"], pre), (stats[f"{key}_post_mean"], post)):
+                want = _safe_mean([r.get(key) for r in rows])
+                assert got == want or (np.isnan(got) and np.isnan(want))
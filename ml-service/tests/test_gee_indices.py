@@ -0,0 +1,148 @@
+import math
+
+import pytest
+
+from fake_ee import install
+
+
+FIELD = {"type": "Polygon", "coordinates": [[[80.1, 7.2], [80.2, 7.2], [80.2, 7.3], [80.1, 7.3], [80.1, 7.2]]]}
+
+
+def _scene(date: str, green: float, red: float, nir: float, cloud: float = 5.0, sid: str = "S2A"):
+    return {"id": f"{sid}_{date}", "date": date, "cloud": cloud, "bands": {"B3": green, "B4": red, "B8": nir}}
+
+
+def _expected(green: float, red: float, nir: float):
+    return {
+        "ndvi": (nir - red) / (nir + red),
+        "ndwi": (green - nir) / (green + nir),
+        "tdvi": (nir - red) / math.sqrt(nir + red),
+    }
+
+
+def test_compute_indices_single_round_trip(monkeypatch):
+    from app.gee_indices import compute_indices
+
+    fake = install(monkeypatch, [_scene("2024-01-15", 0.08, 0.05, 0.40)])
+    got = compute_indices(FIELD, "2024-01-15")
+    assert fake.round_trips == 1
+    assert fake.reduce_region_calls == 1
+    want = _expected(0.08, 0.05, 0.40)
+    for k in ("ndvi", "ndwi", "tdvi"):
+        assert got[k] == pytest.approx(want[k])
+
+
+def test_compute_indices_empty_collection_is_one_round_trip(monkeypatch):
+    from app.gee_indices import compute_indices
+
+    # Only a cloudy scene on the day, and a clear one on another day
+    fake = install(monkeypatch, [_scene("2024-01-15", 0.1, 0.1, 0.3, cloud=80.0), _scene("2024-01-16", 0.1, 0.1, 0.3)])
+    got = compute_indices(FIELD, "2024-01-15")
+    assert got == {"ndvi": None, "ndwi": None, "tdvi": None}
+    assert fake.round_trips == 1
+
+
+def test_compute_indices_batch_uses_one_reduce_regions(monkeypatch):
+    from app.gee_indices import compute_indices_batch
+
+    def bands(region):
+        # Make values depend on the field so ordering is checked
+        x = region["coordinates"][0][0][0]
+        return {"B3": 0.05, "B4": 0.05, "B8": 0.2 + (x - 80.0)}
+
+    fake = install(monkeypatch, [{"id": "S2B_1", "date": "2024-02-01", "cloud": 1.0, "bands": bands}])
+    fields = []
+    for i in range(5):
+        x0 = 80.0 + 0.1 * i
+        fields.append({"type": "Polygon", "coordinates": [[[x0, 7.0], [x0 + 0.05, 7.0], [x0 + 0.05, 7.05], [x0, 7.0]]]})
+
+    got = compute_indices_batch(fields, "2024-02-01")
+    assert fake.round_trips == 1
+    assert fake.reduce_regions_calls == 1
+    assert fake.reduce_region_calls == 0
+    assert len(got) == 5
+    for i, res in enumerate(got):
+        assert res["ndvi"] == pytest.approx(_expected(0.05, 0.05, 0.2 + 0.1 * i)["ndvi"])
+
+    fake.round_trips = 0
+    assert compute_indices_batch(fields, "2024-03-01") == [{"ndvi": None, "ndwi": None, "tdvi": None}] * 5
+    assert fake.round_trips == 1
+
+
+def test_gee_endpoint_batched_geometries(client, auth_headers, monkeypatch):
+    fake = install(monkeypatch, [_scene("2024-01-15", 0.08, 0.05, 0.40)])
+    body = {"geometries": [FIELD, FIELD], "date": "2024-01-15"}
+    resp = client.post("/gee/compute-indices", json=body, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert isinstance(data["indices"], list) and len(data["indices"]) == 2
+    assert fake.round_trips == 1
+
+
+def _window_scenes():
+    # Dry field before 2024-03-10, waterlogged after; a cloudy scene inside each window is skipped
+    scenes = []
+    for day in range(1, 10):
+        scenes.append(_scene(f"2024-03-{day:02d}", 0.06 + 0.002 * day, 0.05, 0.40, sid="PRE"))
+    for day in range(11, 16):
+        scenes.append(_scene(f"2024-03-{day:02d}", 0.30, 0.08, 0.18 + 0.005 * day, sid="POST"))
+    scenes.append(_scene("2024-03-05", 0.9, 0.9, 0.1, cloud=90.0, sid="CLOUDY"))
+    scenes.append(_scene("2024-03-12", 0.9, 0.9, 0.1, cloud=90.0, sid="CLOUDY"))
+    scenes.append(_scene("2024-03-10", 0.9, 0.9, 0.1, sid="EVENT_DAY"))  # excluded from both windows
+    return scenes
+
+
+def _client_side_records(scenes):
+    from datetime import date
+
+    return [
+        {"field_id": "f1", "date": date.fromisoformat(s["date"]), **_expected(s["bands"]["B3"], s["bands"]["B4"], s["bands"]["B8"])}
+        for s in scenes
+        if s["cloud"] < 30
+    ]
+
+
+def test_window_composites_single_round_trip_matches_client_stats(monkeypatch):
+    from datetime import date
+
+    from app.disaster_analyze import analyze_composites, analyze_indices
+    from app.gee_indices import compute_window_composites
+
+    scenes = _window_scenes()
+    fake = install(monkeypatch, scenes)
+    comp = compute_window_composites(FIELD, "2024-03-10", pre_days=14, post_days=7)
+    assert fake.round_trips == 1
+    assert comp["pre_scene_count"] == 9 and comp["post_scene_count"] == 5
+
+    cfg = {"DISASTER_THRESHOLDS": {}}
+    got, _ = analyze_composites("f1", comp, "flood", cfg, pre_days=14, post_days=7)
+    want, _ = analyze_indices(_client_side_records(scenes), "flood", date(2024, 3, 10), cfg, pre_days=14, post_days=7)
+    assert got[0]["severity"] == want[0]["severity"] == "high"
+    for k, v in want[0]["metrics"].items():
+        assert got[0]["metrics"][k] == pytest.approx(v)
+
+
+def test_window_composites_empty_post_window(monkeypatch):
+    from app.disaster_analyze import stats_from_composites
+    from app.gee_indices import compute_window_composites
+
+    fake = install(monkeypatch, [s for s in _window_scenes() if s["date"] < "2024-03-10"])
+    comp = compute_window_composites(FIELD, "2024-03-10", pre_days=14, post_days=7)
+    assert fake.round_trips == 1
+    assert comp["post_scene_count"] == 0
+    assert comp["post"] == {"ndvi": None, "ndwi": None, "tdvi": None}
+    stats = stats_from_composites(comp)
+    assert math.isnan(stats["ndwi_delta"]) and math.isfinite(stats["ndwi_pre_mean"])
+
+
+def test_gee_disaster_analyze_endpoint(client, auth_headers, monkeypatch):
+    fake = install(monkeypatch, _window_scenes())
+    body = {"geometry": FIELD, "field_id": "f1", "event": "flood", "event_date": "2024-03-10", "return": "both"}
+    resp = client.post("/gee/disaster-analyze", json=body, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert fake.round_trips == 1
+    assert data["analysis"][0]["field_id"] == "f1"
+    assert data["analysis"][0]["severity"] == "high"
+    assert data["composites"] == {"pre_scene_count": 9, "post_scene_count": 5}
+    assert data["mask_geojson"]["type"] == "FeatureCollection"
@@ -0,0 +1,132 @@
+import time
+
+from fake_ee import install
+
+
+FIELD = {"type": "Polygon", "coordinates": [[[80.1, 7.2], [80.2, 7.2], [80.2, 7.3], [80.1, 7.3], [80.1, 7.2]]]}
+DATES = ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05", "2024-01-06"]
+
+
+def _scenes(delay_s: float = 0.0):
+    out = []
+    for i, d in enumerate(DATES):
+        nir = 0.30 + 0.02 * i
+
+        def bands(region, nir=nir):
+            if delay_s:
+                time.sleep(delay_s)
+            return {"B3": 0.08, "B4": 0.05, "B8": nir}
+
+        out.append({"id": f"S2A_{d}", "date": d, "cloud": 5.0, "bands": bands})
+    return out
+
+
+def _fetcher(workers: int = 4, rate: float = 0, retries: int = 3):
+    from app.gee_timeseries import RetryPolicy, TimeSeriesFetcher
+
+    return TimeSeriesFetcher(workers, rate, RetryPolicy(max_retries=retries, backoff_s=0.001, max_backoff_s=0.01))
+
+
+def _dates():
+    from datetime import date
+
+    return [date.fromisoformat(d) for d in DATES]
+
+
+def test_series_is_ordered_and_runs_concurrently(monkeypatch):
+    from app.gee_timeseries import fetch_index_series
+
+    fake = install(monkeypatch, _scenes(delay_s=0.02))
+    fields = [{"field_id": "f1", "geometry": FIELD}]
+
+    def run(workers):
+        fetcher = _fetcher(workers=workers)
+        try:
+            return fetch_index_series(fetcher, fields, _dates())
+        finally:
+            fetcher.shutdown()
+
+    serial = run(1)
+    assert fake.peak_in_flight == 1
+    fake.round_trips = 0
+    out = run(6)
+    assert out == serial
+
+    assert [p["date"] for p in out["indices"]] == DATES
+    ndvi = [p["ndvi"] for p in out["indices"]]
+    assert ndvi == sorted(ndvi)
+    assert fake.round_trips == len(DATES)
+    assert fake.peak_in_flight > 1
+    assert out["stats"]["calls"] == len(DATES) and out["stats"]["failed_calls"] == 0
+
+
+def test_transient_errors_are_retried_and_permanent_reported(monkeypatch):
+    from app.gee_timeseries import fetch_index_series
+
+    fake = install(monkeypatch, _scenes())
+    fake.fail_next = 2
+    fetcher = _fetcher(workers=1)
+    out = fetch_index_series(fetcher, [{"field_id": "f1", "geometry": FIELD}], _dates())
+    assert len(out["indices"]) == len(DATES)
+    assert out["stats"]["retries"] == 2
+    assert out["failed"] == []
+
+    fake.fail_next = 10
+    strict = _fetcher(workers=1, retries=1)
+    out = fetch_index_series(strict, [{"field_id": "f1", "geometry": FIELD}], _dates()[:1])
+    assert out["indices"] == []
+    assert out["failed"][0]["date"] == DATES[0]
+    fetcher.shutdown()
+    strict.shutdown()
+
+
+def test_multi_field_series_uses_batch_and_cache(monkeypatch, tmp_path):
+    from app.gee_timeseries import fetch_index_series
+    from app.index_cache import IndexCache
+
+    fake = install(monkeypatch, _scenes()[:4])  # last two dates have no scene
+    cache = IndexCache(str(tmp_path / "c.sqlite"), ttl_s=3600, negative_ttl_s=60)
+    other = {"type": "Polygon", "coordinates": [[[81.0, 7.0], [81.1, 7.0], [81.1, 7.1], [81.0, 7.0]]]}
+    fields = [{"field_id": "a", "geometry": FIELD}, {"field_id": "b", "geometry": other}]
+    fetcher = _fetcher()
+
+    out = fetch_index_series(fetcher, fields, _dates(), cache=cache)
+    assert fake.reduce_regions_calls == len(DATES)
+    assert [(p["field_id"], p["date"]) for p in out["indices"]] == [("a", d) for d in DATES[:4]] + [
+        ("b", d) for d in DATES[:4]
+    ]
+    assert {(m["field_id"], m["date"]) for m in out["missing"]} == {(f, d) for f in "ab" for d in DATES[4:]}
+
+    fake.round_trips = 0
+    again = fetch_index_series(fetcher, fields, _dates(), cache=cache)
+    assert fake.round_trips == 0
+    assert again["stats"]["cache_hits"] == 2 * len(DATES)
+    assert again["indices"] == out["indices"]
+    fetcher.shutdown()
+
+
+def test_rate_limiter_spaces_acquisitions():
+    from app.gee_timeseries import RateLimiter
+
+    limiter = RateLimiter(rate_per_s=50, burst=1)
+    t0 = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.perf_counter() - t0 >= 5 / 50 * 0.9
+
+
+def test_time_series_endpoint_feeds_disaster_analyze(client, auth_headers, monkeypatch):
+    install(monkeypatch, _scenes())
+    body = {"geometry": FIELD, "field_id": "f1", "date_range": {"start": DATES[0], "end": DATES[-1]}}
+    resp = client.post("/gee/time-series", json=body, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert len(data["indices"]) == len(DATES)
+    assert data["metrics"]["calls"] == len(DATES)
+
+    analyze = {"indices": data["indices"], "event": "stress", "event_date": "2024-01-03"}
+    resp = client.post("/v1/disaster/analyze", json=analyze, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+
+    resp = client.post("/gee/time-series", json={"geometry": FIELD, "dates": []}, headers=auth_headers)
+    assert resp.status_code == 400
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+
+from fake_ee import install
+
+
+FIELD = {"type": "Polygon", "coordinates": [[[80.1, 7.2], [80.2, 7.2], [80.2, 7.3], [80.1, 7.3], [80.1, 7.2]]]}
+# Same polygon, different start vertex, opposite orientation and float noise
+FIELD_REORDERED = {
+    "type": "Polygon",
+    "coordinates": [[[80.2, 7.3], [80.2, 7.2000000001], [80.1, 7.2], [80.1, 7.3], [80.2, 7.3]]],
+}
+SCENE = {"id": "S2A_1", "date": "2024-01-15", "cloud": 3.0, "bands": {"B3": 0.08, "B4": 0.05, "B8": 0.40}}
+
+
+def test_geometry_hash_is_canonical():
+    from app.index_cache import geometry_hash
+
+    assert geometry_hash(FIELD) == geometry_hash(FIELD_REORDERED)
+    moved = {"type": "Polygon", "coordinates": [[[x + 0.01, y] for x, y in FIELD["coordinates"][0]]]}
+    assert geometry_hash(FIELD) != geometry_hash(moved)
+
+
+def test_cache_positive_and_negative_ttls(tmp_path):
+    from app.index_cache import IndexCache
+
+    cache = IndexCache(str(tmp_path / "c.sqlite"), ttl_s=60, negative_ttl_s=0.05)
+    calls = []
+
+    def compute(res):
+        def _fn():
+            calls.append(res)
+            return res
+
+        return _fn
+
+    ok = {"ndvi": 0.5, "ndwi": 0.1, "tdvi": 0.3}
+    empty = {"ndvi": None, "ndwi": None, "tdvi": None}
+    assert cache.get_or_compute(FIELD, "2024-01-15", "S2", 30, compute(ok)) == (ok, False)
+    assert cache.get_or_compute(FIELD_REORDERED, "2024-01-15", "S2", 30, compute(ok)) == (ok, True)
+    # Cloud threshold is part of the key
+    assert cache.get_or_compute(FIELD, "2024-01-15", "S2", 10, compute(ok)) == (ok, False)
+
+    assert cache.get_or_compute(FIELD, "2024-01-16", "S2", 30, compute(empty)) == (empty, False)
+    assert cache.get_or_compute(FIELD, "2024-01-16", "S2", 30, compute(empty)) == (empty, True)
+    time.sleep(0.1)
+    assert cache.get_or_compute(FIELD, "2024-01-16", "S2", 30, compute(empty)) == (empty, False)
+    assert len(calls) == 4
+
+    # A second instance on the same file (another worker) sees entries and flushed counters
+    other = IndexCache(cache.path, ttl_s=60, negative_ttl_s=60)
+    assert other.stats()["misses"] == 0
+    cache.flush_stats()
+    stats = other.stats()
+    assert stats["hits"] == 1 and stats["negative_hits"] == 1 and stats["misses"] == 4
+    assert other.get_or_compute(FIELD, "2024-01-15", "S2", 30, compute(ok)) == (ok, True)
+    assert other.purge() >= 2
+    assert other.stats()["entries"] == 0
+
+
+def test_get_or_compute_many_keeps_results_aligned(tmp_path):
+    from app.index_cache import IndexCache
+
+    cache = IndexCache(str(tmp_path / "c.sqlite"), ttl_s=60, negative_ttl_s=60)
+    other = {"type": "Polygon", "coordinates": [[[81.0, 7.0], [81.1, 7.0], [81.1, 7.1], [81.0, 7.0]]]}
+    ok = {"ndvi": 0.5, "ndwi": 0.1, "tdvi": 0.3}
+    cache.get_or_compute_many([other], "2024-01-15", "S2", 30, lambda missing: [ok])
+
+    seen = []
+
+    def compute_many(missing):
+        seen.append(len(missing))
+        return [{"ndvi": 0.2, "ndwi": None, "tdvi": None} for _ in missing]
+
+    geometries = [FIELD, other, FIELD_REORDERED]
+    results, hits = cache.get_or_compute_many(geometries, "2024-01-15", "S2", 30, compute_many)
+    assert hits == 1 and seen == [2]
+    assert results[1] == ok and results[0] == results[2] == {"ndvi": 0.2, "ndwi": None, "tdvi": None}
+
+    # Single-field (first scene) entries are not reused for batch (mosaic) lookups, and vice versa
+    first = {"ndvi": 0.9, "ndwi": 0.0, "tdvi": 0.6}
+    assert cache.get_or_compute(FIELD, "2024-01-15", "S2", 30, lambda: first) == (first, False)
+    assert cache.get_or_compute(FIELD, "2024-01-15", "S2", 30, lambda: ok) == (first, True)
+    results, hits = cache.get_or_compute_many([FIELD], "2024-01-15", "S2", 30, compute_many)
+    assert hits == 1 and results == [{"ndvi": 0.2, "ndwi": None, "tdvi": None}]
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute_many([FIELD, other], "2024-01-16", "S2", 30, lambda missing: [])
+
+
+def test_gee_endpoint_uses_cache_and_admin_routes(client, auth_headers, monkeypatch):
+    fake = install(monkeypatch, [SCENE])
+    body = {"geometry": FIELD, "date": "2024-01-15"}
+    r1 = client.post("/gee/compute-indices", json=body, headers=auth_headers)
+    r2 = client.post("/gee/compute-indices", json={"geometry": FIELD_REORDERED, "date": "2024-01-15"}, headers=auth_headers)
+    assert r1.status_code == 200 and r2.status_code == 200
+    assert r1.get_json()["metrics"]["cache_hit"] is False
+    assert r2.get_json()["metrics"]["cache_hit"] is True
+    assert r2.get_json()["indices"] == r1.get_json()["indices"]
+    assert fake.round_trips == 1
+
+    # No-scene dates are negatively cached too
+    for _ in range(3):
+        r = client.post("/gee/compute-indices", json={"geometry": FIELD, "date": "2024-02-01"}, headers=auth_headers)
+        assert r.get_json()["indices"] == {"ndvi": None, "ndwi": None, "tdvi": None}
+    assert fake.round_trips == 2
+
+    # Batch (mosaic) results are keyed apart from single-scene ones; a repeat is served from cache
+    other = {"type": "Polygon", "coordinates": [[[81.0, 7.0], [81.1, 7.0], [81.1, 7.1], [81.0, 7.0]]]}
+    rb = client.post("/gee/compute-indices", json={"geometries": [FIELD, other], "date": "2024-01-15"}, headers=auth_headers)
+    assert rb.status_code == 200
+    assert rb.get_json()["metrics"]["cache_hit"] is False
+    assert fake.round_trips == 3 and fake.reduce_regions_calls == 1
+    rb2 = client.post(
+        "/gee/compute-indices", json={"geometries": [FIELD_REORDERED, other], "date": "2024-01-15"}, headers=auth_headers
+    )
+    assert rb2.get_json()["metrics"]["cache_hit"] is True
+    assert rb2.get_json()["indices"] == rb.get_json()["indices"]
+    assert fake.round_trips == 3
+
+    stats = client.get("/admin/gee-cache/stats", headers=auth_headers).get_json()
+    assert stats["enabled"] is True
+    assert stats["hits"] == 3 and stats["negative_hits"] == 2
+    assert client.get("/admin/gee-cache/stats").status_code == 401
+
+    purged = client.post("/admin/gee-cache/purge", json={}, headers=auth_headers).get_json()
+    assert purged["purged"] == 4
@@ -0,0 +1,142 @@
+import json
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from loadtest.report import compare_reports, parse_server_timing, summarize
+from loadtest.runner import main, run_load
+from loadtest.scenarios import parse_mix, weighted_scenarios
+
+
+@pytest.fixture()
+def live_url(app_instance):
+    server = make_server("127.0.0.1", 0, app_instance, threaded=True)
+    th = threading.Thread(target=server.serve_forever, daemon=True)
+    th.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_parse_server_timing():
+    timing = parse_server_timing("parse;dur=1.25, ort.run;dur=40, total;dur=45.5")
+    assert timing == {"parse": 1.25, "ort.run": 40.0, "total": 45.5}
+    assert parse_server_timing(None) == {}
+
+
+def test_summarize_percentiles_and_errors():
+    samples = [{"status": 200, "latency_ms": float(i), "service_ms": float(i)} for i in range(1, 101)]
+    samples.append({"status": 502, "latency_ms": 5.0, "service_ms": 5.0})
+    s = summarize(samples, elapsed_s=10.0)
+    assert s["count"] == 101 and s["errors"] == 1
+    assert s["status_counts"] == {"200": 100, "502": 1}
+    assert s["latency_ms"]["p50"] == pytest.approx(50.5)
+    assert s["latency_ms"]["p99"] == pytest.approx(99.01)
+    assert s["throughput_rps"] == 10.1
+
+
+def test_mix_splits_group_weight_over_scenarios():
+    weighted = dict((s.name, w) for s, w in weighted_scenarios(parse_mix("disaster=1,yield[10]=3")))
+    assert weighted == {"disaster[5]": 0.5, "disaster[100]": 0.5, "yield[10]": 3.0}
+    with pytest.raises(ValueError):
+        weighted_scenarios(parse_mix("nope=1"))
+
+
+def test_run_against_live_app_reports_stage_timings(live_url, internal_token):
+    report = run_load(
+        live_url,
+        internal_token,
+        weighted_scenarios(parse_mix("disaster[5]=1")),
+        concurrency=2,
+        rate=40,
+        duration_s=0.5,
+        trace_fraction=1.0,
+    )
+    s = report["scenarios"]["disaster[5]"]
+    assert s["count"] == report["total"]["count"] >= 15
+    assert s["errors"] == 0
+    assert s["latency_ms"]["p50"] <= s["latency_ms"]["p99"]
+    assert s["traced"] == s["count"]
+    assert "disaster.classify" in s["stages_ms"] and "total" in s["stages_ms"]
+
+
+def test_compare_cli(tmp_path, capsys, live_url, internal_token):
+    paths = []
+    for label in ("a", "b"):
+        out = tmp_path / f"{label}.json"
+        argv = ["run", "--url", live_url, "--token", internal_token, "--mix", "disaster",
+                "--requests", "6", "--warmup", "0", "--concurrency", "2", "--label", label, "--output", str(out)]
+        assert main(argv) == 0
+        paths.append(str(out))
+    rows = compare_reports(*(json.loads(open(p).read()) for p in paths))
+    assert rows[-1]["scenario"] == "TOTAL"
+    assert main(["compare", *paths]) == 0
+    assert "p95 A→B" in capsys.readouterr().out
+
+
+def test_autotune_candidates_do_not_oversubscribe():
+    from loadtest.autotune import build_candidates
+
+    cands = build_candidates(8, workers=[1, 2, 16], threads=[1, 2], intra=[3])
+    assert {(c["workers"], c["threads"]) for c in cands} == {(1, 1), (1, 2), (2, 1), (2, 2)}
+    derived = [c for c in cands if c["intra"] != 3]
+    assert all(c["workers"] * c["threads"] * c["intra"] <= 8 for c in derived)
+    assert {"workers": 2, "threads": 2, "intra": 2} in cands
+
+
+def test_autotune_recommend_respects_errors_and_latency_cap():
+    from loadtest.autotune import env_lines, recommend
+
+    rows = [
+        {"workers": 4, "threads": 1, "intra": 1, "batch": 4, "requests_per_s": 9.0, "p95_ms": 900.0, "error_rate": 0.0},
+        {"workers": 2, "threads": 2, "intra": 2, "batch": 2, "requests_per_s": 8.0, "p95_ms": 300.0, "error_rate": 0.0},
+        {"workers": 8, "threads": 1, "intra": 1, "batch": 8, "requests_per_s": 20.0, "p95_ms": 100.0, "error_rate": 0.2},
+    ]
+    assert recommend(rows)["workers"] == 4
+    best = recommend(rows, max_p95_ms=500)
+    assert env_lines(best) == ["GUNICORN_WORKERS=2", "GUNICORN_THREADS=2", "ORT_INTRA_OP_THREADS=2", "INFER_BATCH_SIZE=2"]
+    assert recommend(rows, max_p95_ms=10) is None
+
+
+def test_autotune_inprocess_restores_inference_state(tmp_path):
+    pytest.importorskip("onnx")
+    import app.inference as inference
+    from benchmarks.tiny_unet import build_tiny_unet
+    from loadtest.autotune import best_batch, tune_inprocess
+
+    before = (inference.MODEL_UNET_PATH, inference.ORT_INTRA_OP_THREADS, inference._ORT_SESSION)
+    model = build_tiny_unet(str(tmp_path / "tiny.onnx"))
+    rows = tune_inprocess(model, [(1, 1), (1, 2)], [1, 2], requests=2, image_size=256, tile=128, overlap=16)
+    assert len(rows) == 4
+    assert all(r["tiles_per_s"] > 0 and r["p50_ms"] <= r["p95_ms"] for r in rows)
+    assert best_batch(rows, 1, 2)["threads"] == 2
+    assert (inference.MODEL_UNET_PATH, inference.ORT_INTRA_OP_THREADS, inference._ORT_SESSION) == before
+
+
+def test_launched_server_passes_worker_layout_to_the_budget(monkeypatch):
+    import loadtest.runner as runner
+
+    seen = {}
+
+    class _ExitedProc:
+        returncode = 3
+
+        def __init__(self, cmd, cwd=None, env=None):
+            seen.update(cmd=cmd, env=env)
+
+        def poll(self):
+            return self.returncode
+
+        def terminate(self):
+            pass
+
+        def wait(self, timeout=None):
+            return self.returncode
+
+    monkeypatch.setattr(runner.subprocess, "Popen", _ExitedProc)
+    monkeypatch.setenv("GUNICORN_WORKERS", "9")
+    with pytest.raises(RuntimeError):
+        with runner.launched_server(workers=4, threads=2, port=1):
+            pass
+    assert seen["env"]["GUNICORN_WORKERS"] == "4" and seen["env"]["GUNICORN_THREADS"] == "2"
+    assert seen["cmd"][seen["cmd"].index("-w") + 1] == "4"
@@ -0,0 +1,54 @@
+import logging
+import queue
+import time
+
+from app.logging import LogStats, NonBlockingQueueHandler, SamplingFilter, get_log_stats
+
+
+def _record(msg="request", level=logging.INFO, **extra):
+    rec = logging.LogRecord("ml-service", level, __file__, 1, msg, None, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    stats = LogStats()
+    q = queue.Queue(maxsize=2)
+    handler = NonBlockingQueueHandler(q, stats)
+    t0 = time.perf_counter()
+    for i in range(10):
+        handler.handle(_record(correlation_id=str(i)))
+    assert time.perf_counter() - t0 < 0.5
+    snap = stats.snapshot()
+    assert q.qsize() == 2
+    assert snap["emitted"] == 10 and snap["dropped"] == 8
+    # Extras survive the hand-off so the writer can format them
+    assert q.get_nowait().correlation_id == "0"
+
+
+def test_sampling_is_per_event_and_keeps_errors():
+    stats = LogStats()
+    f = SamplingFilter({"request": 0.25, "segmentation_inference": 0.0}, stats)
+    kept = sum(f.filter(_record(correlation_id=f"cid-{i}")) for i in range(4000))
+    assert 800 < kept < 1200
+    # Same correlation id -> same decision across events of one request
+    assert len({f.filter(_record(correlation_id="abc")) for _ in range(5)}) == 1
+    assert f.filter(_record(status=500, correlation_id="x"))
+    assert f.filter(_record(level=logging.ERROR))
+    assert not f.filter(_record("inference_event", event="segmentation_inference", request_id="r"))
+    assert f.filter(_record("other"))
+    assert stats.snapshot()["sampled_out"] >= 4000 - 1200
+
+
+def test_logging_stats_endpoint_reports_pipeline(client, auth_headers):
+    client.get("/health")
+    resp = client.get("/admin/logging/stats", headers=auth_headers)
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["async"] is True
+    assert data["queue_size"] == 10000
+    for key in ("dropped", "sampled_out", "emit_us_avg", "emit_us_max", "write_lag_ms_max", "queue_depth"):
+        assert key in data
+    assert client.get("/admin/logging/stats").status_code == 401
+    logging.getLogger("ml-service").error("boom")  # tests run at LOG_LEVEL=ERROR
+    assert get_log_stats()["emitted"] >= 1
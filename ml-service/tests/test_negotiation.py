@@ -0,0 +1,137 @@
+import json
+
+import joblib
+import numpy as np
+import pytest
+
+msgpack = pytest.importorskip("msgpack")
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc as pa_ipc  # noqa: E402
+
+from test_disaster_analyze import _mk_indices_for_fields  # noqa: E402
+
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+
+def _columns(records):
+    return {k: [r[k] for r in records] for k in ("field_id", "date", "ndvi", "ndwi", "tdvi")}
+
+
+def _arrow_bytes(columns, meta):
+    table = pa.table(columns).replace_schema_metadata({b"skycrop": json.dumps(meta).encode("utf-8")})
+    sink = pa.BufferOutputStream()
+    with pa_ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _analyze_body():
+    return {"event": "auto", "event_date": "2025-01-15", "pre_days": 14, "post_days": 7}
+
+
+def _strip(data):
+    # Arrow struct columns carry the union of metric keys (absent ones are null)
+    def metrics(m):
+        return json.dumps({k: v for k, v in m.items() if v is not None}, sort_keys=True)
+
+    return sorted((a["field_id"], a["event"], a["severity"], metrics(a["metrics"])) for a in data["analysis"])
+
+
+def test_msgpack_columnar_matches_json(client, auth_headers):
+    records = _mk_indices_for_fields()
+    ref = client.post("/v1/disaster/analyze", json={**_analyze_body(), "indices": records}, headers=auth_headers)
+    assert ref.status_code == 200
+    assert ref.headers["Content-Type"].startswith("application/json")
+
+    for indices in (records, _columns(records)):
+        payload = msgpack.packb({**_analyze_body(), "indices": indices})
+        headers = {**auth_headers, "Content-Type": MSGPACK, "Accept": MSGPACK}
+        resp = client.post("/v1/disaster/analyze", data=payload, headers=headers)
+        assert resp.status_code == 200, resp.get_data()
+        assert resp.headers["Content-Type"] == MSGPACK
+        assert resp.headers["Vary"] == "Accept"
+        assert _strip(msgpack.unpackb(resp.get_data())) == _strip(ref.get_json())
+
+
+def test_arrow_request_and_response(client, auth_headers):
+    records = _mk_indices_for_fields()
+    ref = client.post("/v1/disaster/analyze", json={**_analyze_body(), "indices": records}, headers=auth_headers).get_json()
+
+    body = _arrow_bytes(_columns(records), _analyze_body())
+    headers = {**auth_headers, "Content-Type": ARROW, "Accept": f"{ARROW}, application/json;q=0.5"}
+    resp = client.post("/v1/disaster/analyze", data=body, headers=headers)
+    assert resp.status_code == 200, resp.get_data()
+    assert resp.headers["Content-Type"] == ARROW
+    table = pa_ipc.open_stream(resp.get_data()).read_all()
+    assert table.num_rows == 2
+    meta = json.loads(table.schema.metadata[b"skycrop"])
+    assert meta["model"]["name"] == "disaster_analysis"
+    assert _strip({"analysis": table.to_pylist()}) == _strip(ref)
+
+
+def test_columnar_validation_is_vectorized_and_strict(client, auth_headers):
+    headers = {**auth_headers, "Content-Type": MSGPACK}
+    cols = _columns(_mk_indices_for_fields())
+
+    bad = dict(cols, ndwi=cols["ndwi"][:-1] + [3.5])
+    resp = client.post("/v1/disaster/analyze", data=msgpack.packb({**_analyze_body(), "indices": bad}), headers=headers)
+    assert resp.status_code == 400
+    assert "ndwi[7]" in resp.get_json()["error"]["details"]["details"]
+
+    short = dict(cols, tdvi=cols["tdvi"][:3])
+    resp = client.post("/v1/disaster/analyze", data=msgpack.packb({**_analyze_body(), "indices": short}), headers=headers)
+    assert resp.status_code == 400
+
+    bad_date = dict(cols, date=["2025-13-01"] * len(cols["date"]))
+    resp = client.post("/v1/disaster/analyze", data=msgpack.packb({**_analyze_body(), "indices": bad_date}), headers=headers)
+    assert resp.status_code == 400
+
+    # Null field ids are rejected, as in the JSON path, not turned into "None"
+    no_id = dict(cols, field_id=cols["field_id"][:-1] + [None])
+    resp = client.post("/v1/disaster/analyze", data=msgpack.packb({**_analyze_body(), "indices": no_id}), headers=headers)
+    assert resp.status_code == 400
+    assert f"field_id[{len(cols['field_id']) - 1}]" in resp.get_json()["error"]["details"]["details"]
+    json_no_id = [dict(r, field_id=None) for r in _mk_indices_for_fields()[:1]]
+    resp = client.post("/v1/disaster/analyze", json={**_analyze_body(), "indices": json_no_id}, headers=auth_headers)
+    assert resp.status_code == 400
+
+
+def test_scan_accepts_columnar_indices(client, auth_headers):
+    records = _mk_indices_for_fields()
+    body = {"event": "flood", "event_dates": ["2025-01-15", "2025-01-18"], "indices": _columns(records)}
+    headers = {**auth_headers, "Content-Type": MSGPACK, "Accept": MSGPACK}
+    resp = client.post("/v1/disaster/scan", data=msgpack.packb(body), headers=headers)
+    assert resp.status_code == 200, resp.get_data()
+    scans = msgpack.unpackb(resp.get_data())["scans"]
+    assert [s["event_date"] for s in scans] == ["2025-01-15", "2025-01-18"]
+
+
+class _SumRegressor:
+    def predict(self, X):
+        return np.asarray(X, dtype=float).sum(axis=1)
+
+
+def test_yield_arrow_columns(client, auth_headers, app_instance, tmp_path):
+    joblib.dump(_SumRegressor(), tmp_path / "model.joblib")
+    app_instance.config["ML_YIELD_MODEL_PATH"] = str(tmp_path / "model.onnx")
+
+    body = _arrow_bytes({"b": [2.0, 0.5, 3.0], "a": [1.0, 0.5, 10.0]}, {"feature_names": ["a", "b"]})
+    headers = {**auth_headers, "Content-Type": ARROW, "Accept": MSGPACK}
+    resp = client.post("/v1/yield/predict", data=body, headers=headers)
+    assert resp.status_code == 200, resp.get_data()
+    preds = msgpack.unpackb(resp.get_data())["predictions"]
+    assert [p["yield_kg_per_ha"] for p in preds] == [3.0, 1.0, 13.0]
+
+    body = _arrow_bytes({"a": [1.0, float("nan")]}, {})
+    resp = client.post("/v1/yield/predict", data=body, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_unknown_accept_falls_back_to_json_and_arrow_only_when_tabular(client, auth_headers):
+    resp = client.get("/health", headers={"Accept": ARROW})
+    assert resp.headers["Content-Type"].startswith("application/json")
+    resp = client.get("/health", headers={"Accept": MSGPACK})
+    assert msgpack.unpackb(resp.get_data())["status"] == "ok"
+    resp = client.get("/health", headers={"Accept": "*/*"})
+    assert resp.get_json()["status"] == "ok"
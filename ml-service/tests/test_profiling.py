@@ -0,0 +1,141 @@
+import os
+
+from test_disaster_analyze import _mk_indices_for_fields
+from test_segmentation_inference import _FakeOrtSession
+
+
+def _analyze_body():
+    return {"indices": _mk_indices_for_fields(), "event": "auto", "event_date": "2025-01-15"}
+
+
+def _read_folded(path):
+    lines = open(path, encoding="utf-8").read().splitlines()
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+    return lines
+
+
+def test_worker_profile_writes_folded_stacks(client, auth_headers, app_instance):
+    resp = client.post("/admin/profile", json={"seconds": 0.2, "interval_ms": 2}, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    data = resp.get_json()
+    assert data["file"].endswith(".folded")
+    assert data["samples"] > 0
+    path = os.path.join(app_instance.config["PROFILE_DIR"], data["file"])
+    lines = _read_folded(path)
+    # the request thread itself was sleeping inside profile_worker
+    assert any("profile_worker" in line for line in lines)
+
+    listed = client.get("/admin/profiles", headers=auth_headers).get_json()["profiles"]
+    assert [p["name"] for p in listed] == [data["file"]]
+
+    dl = client.get(data["download_url"], headers=auth_headers)
+    assert dl.status_code == 200
+    assert dl.get_data(as_text=True) == open(path, encoding="utf-8").read()
+
+
+def test_worker_profile_rejects_long_durations(client, auth_headers):
+    resp = client.post("/admin/profile", json={"seconds": 3600}, headers=auth_headers)
+    assert resp.status_code == 400
+
+
+def test_profile_download_rejects_bad_names(client, auth_headers):
+    assert client.get("/admin/profiles/..%2Fsecrets", headers=auth_headers).status_code in (400, 404)
+    assert client.get("/admin/profiles/.hidden", headers=auth_headers).status_code == 400
+    assert client.get("/admin/profiles/missing.folded", headers=auth_headers).status_code == 404
+
+
+def test_request_profile_requires_matching_token(client, auth_headers, app_instance):
+    app_instance.config["PROFILE_TOKEN"] = "prof-secret"
+
+    plain = client.post("/v1/disaster/analyze", json=_analyze_body(), headers=auth_headers)
+    assert plain.status_code == 200
+    assert "X-Profile-Id" not in plain.headers
+
+    wrong = client.post(
+        "/v1/disaster/analyze", json=_analyze_body(), headers={**auth_headers, "X-Profile-Token": "nope"}
+    )
+    assert wrong.status_code == 403
+
+    resp = client.post(
+        "/v1/disaster/analyze", json=_analyze_body(), headers={**auth_headers, "X-Profile-Token": "prof-secret"}
+    )
+    assert resp.status_code == 200
+    assert resp.get_json()["analysis"]
+    files = resp.headers["X-Profile-Files"].split(",")
+    assert files[0] == resp.headers["X-Profile-Id"] + ".folded"
+    assert os.path.isfile(os.path.join(app_instance.config["PROFILE_DIR"], files[0]))
+
+
+def test_request_profile_disabled_without_configured_token(client, auth_headers):
+    resp = client.post(
+        "/v1/disaster/analyze", json=_analyze_body(), headers={**auth_headers, "X-Profile-Token": ""}
+    )
+    assert resp.status_code == 403
+
+
+def test_segmentation_profile_includes_ort_trace(client, auth_headers, app_instance, monkeypatch):
+    import app.inference as inference
+
+    class _ProfilingSession(_FakeOrtSession):
+        def __init__(self, prefix):
+            super().__init__()
+            self.prefix = prefix
+
+        def end_profiling(self):
+            path = f"{self.prefix}_2025-01-01_00-00-00.json"
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write('[{"cat": "Session", "name": "model_run"}]')
+            return path
+
+    sessions = []
+
+    def _loader(prefix):
+        sessions.append(_ProfilingSession(prefix))
+        return sessions[-1], "input", "output", "NHWC", ["CPUExecutionProvider"]
+
+    monkeypatch.setattr(inference, "_load_profiling_session", _loader)
+    app_instance.config["PROFILE_TOKEN"] = "prof-secret"
+
+    body = {"bbox": [80.10, 7.20, 80.12, 7.22], "date": "2025-10-15", "return": "inline", "tiling": {"size": 128, "overlap": 16}}
+    resp = client.post(
+        "/v1/segmentation/predict", json=body, headers={**auth_headers, "X-Profile-Token": "prof-secret"}
+    )
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    assert sessions and sessions[0].calls > 0
+
+    profile_id = resp.headers["X-Profile-Id"]
+    assert resp.headers["X-Profile-Files"].split(",") == [profile_id + ".folded", profile_id + ".ort.json"]
+    names = {p["name"] for p in client.get("/admin/profiles", headers=auth_headers).get_json()["profiles"]}
+    assert {profile_id + ".folded", profile_id + ".ort.json"} <= names
+
+
+def test_ort_profiling_ends_when_inference_fails(tmp_path, monkeypatch):
+    import numpy as np
+    import pytest
+
+    import app.inference as inference
+
+    ended = []
+
+    class _FailingSession(_FakeOrtSession):
+        def run(self, outputs, feeds):
+            raise RuntimeError("ort run failed")
+
+        def end_profiling(self):
+            path = str(tmp_path / "req_2025-01-01_00-00-00.json")
+            open(path, "w", encoding="utf-8").write("[]")
+            ended.append(path)
+            return path
+
+    monkeypatch.setattr(
+        inference,
+        "_load_profiling_session",
+        lambda prefix: (_FailingSession(), "input", "output", "NHWC", ["CPUExecutionProvider"]),
+    )
+    img = np.zeros((64, 64, 3), dtype=np.uint8)
+    with pytest.raises(RuntimeError, match="ort run failed"):
+        inference._infer_tiles(img, 32, 0, 2, False, "reflect", 0.5, ort_profile_prefix=str(tmp_path / "req"))
+    assert len(ended) == 1
+    assert os.path.isfile(str(tmp_path / "req") + inference.ORT_SUFFIX)
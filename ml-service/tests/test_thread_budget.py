@@ -0,0 +1,87 @@
+from app.threads import plan_budget
+
+
+def test_plan_auto_splits_cpus_per_worker():
+    b = plan_budget(cpus=16, workers=2, request_threads=2, ort_share=0.5)
+    assert b.source == "auto"
+    assert b.total == 8
+    assert (b.ort_intra_op, b.ort_inter_op) == (4, 1)
+    assert b.native == 4 and b.native_per_request == 2 and b.opencv == 4
+
+
+def test_plan_explicit_budget_and_ort_override():
+    b = plan_budget(cpus=64, workers=4, request_threads=3, total=6, ort_share=0.25, ort_intra_override=5)
+    assert b.source == "config" and b.total == 6
+    assert b.ort_intra_op == 5
+    assert b.native == 1 and b.native_per_request == 1
+
+
+def test_plan_never_goes_below_one_thread():
+    b = plan_budget(cpus=1, workers=4, request_threads=8, ort_share=1.0)
+    assert b.total == 1
+    assert b.ort_intra_op == 1 and b.native == 1 and b.native_per_request == 1
+
+
+def test_plan_keeps_a_native_thread_and_honors_inter_op():
+    b = plan_budget(cpus=4, workers=1, request_threads=1, ort_share=1.0)
+    assert (b.ort_intra_op, b.native) == (3, 1)
+    b = plan_budget(cpus=8, workers=2, request_threads=1, ort_share=0.5, ort_inter_override=2)
+    assert (b.total, b.ort_intra_op, b.ort_inter_op, b.native) == (4, 2, 2, 2)
+
+
+def test_plan_uses_autotuned_intra_op_as_given():
+    from loadtest.autotune import build_candidates
+
+    # The tuner derives intra = cpus // (workers * threads); the service must run exactly that
+    for c in build_candidates(4, [1, 2, 4], [1, 2]):
+        b = plan_budget(cpus=4, workers=c["workers"], request_threads=c["threads"], ort_intra_override=c["intra"])
+        assert b.ort_intra_op == c["intra"]
+
+
+def test_health_reports_effective_allocation(client, app_instance):
+    import app.inference as inference
+
+    data = client.get("/health").get_json()
+    threads = data["threads"]
+    budget = app_instance.extensions["thread_budget"]["budget"]
+    assert threads["total"] == budget.total
+    assert threads["ort_intra_op"] == inference.ORT_INTRA_OP_THREADS == budget.ort_intra_op
+    assert threads["ort_inter_op"] == inference.ORT_INTER_OP_THREADS == 1
+    assert threads["applied"]["ort"] is True
+    assert isinstance(threads["native_pools"], list)
+
+
+def test_budget_disabled_omits_health_section(tmp_path, internal_token):
+    from app import create_app
+
+    app = create_app(
+        {
+            "ML_INTERNAL_TOKEN": internal_token,
+            "STATIC_FOLDER": str(tmp_path / "static"),
+            "LOG_LEVEL": "ERROR",
+            "GEE_CACHE_PATH": str(tmp_path / "cache.sqlite"),
+            "PROFILE_DIR": str(tmp_path / "profiles"),
+            "THREAD_BUDGET_ENABLED": False,
+        }
+    )
+    assert "threads" not in app.test_client().get("/health").get_json()
+
+
+def test_budget_is_applied_once_per_process(tmp_path, internal_token, app_instance, monkeypatch):
+    import app.threads as threads
+    from app import create_app
+
+    calls = []
+    monkeypatch.setattr(threads, "apply_budget", lambda budget: calls.append(budget))
+    monkeypatch.setenv("ORT_INTER_OP_THREADS", "3")
+    other = create_app(
+        {
+            "ML_INTERNAL_TOKEN": internal_token,
+            "STATIC_FOLDER": str(tmp_path / "static"),
+            "LOG_LEVEL": "ERROR",
+            "GEE_CACHE_PATH": str(tmp_path / "cache.sqlite"),
+            "PROFILE_DIR": str(tmp_path / "profiles"),
+        }
+    )
+    assert calls == []
+    assert other.extensions["thread_budget"] == app_instance.extensions["thread_budget"]
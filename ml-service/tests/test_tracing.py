@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+
+from test_disaster_analyze import _mk_indices_for_fields
+
+
+def _analyze_body():
+    return {"indices": _mk_indices_for_fields(), "event": "auto", "event_date": "2025-01-15"}
+
+
+def _names(node):
+    out = [node["name"]]
+    for c in node.get("children", []):
+        out.extend(_names(c))
+    return out
+
+
+def test_span_is_noop_without_active_trace():
+    from app.tracing import _NOOP, span
+
+    with span("anything", x=1) as sp:
+        sp.set(y=2)
+    assert span("x") is _NOOP
+
+
+def test_debug_header_returns_breakdown(client, auth_headers):
+    headers = {**auth_headers, "X-Debug-Trace": "1", "X-Request-Id": "trace-me-1"}
+    resp = client.post("/v1/disaster/analyze", json=_analyze_body(), headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["X-Trace-Id"] == "trace-me-1"
+    timing = resp.headers["Server-Timing"]
+    for stage in ("parse", "validate", "disaster.group", "disaster.classify", "serialize", "total"):
+        assert f"{stage};dur=" in timing
+
+    data = resp.get_json()
+    root = data["trace"]["root"]
+    assert root["attrs"]["route"] == "/v1/disaster/analyze"
+    assert root["attrs"]["status"] == 200
+    names = _names(root)
+    assert names.index("parse") < names.index("validate") < names.index("disaster.classify")
+    assert all(c["duration_ms"] >= 0 for c in root["children"])
+
+    stored = client.get("/admin/traces/trace-me-1", headers=auth_headers)
+    assert stored.status_code == 200
+    assert stored.get_json()["root"]["name"] == "POST /v1/disaster/analyze"
+
+
+def test_no_trace_when_disabled(client, auth_headers, app_instance):
+    resp = client.post("/v1/disaster/analyze", json=_analyze_body(), headers=auth_headers)
+    assert "Server-Timing" not in resp.headers
+    assert "trace" not in resp.get_json()
+    assert app_instance.extensions["trace_exporter"].recent() == []
+
+
+def test_enabled_tracing_exports_to_file(auth_headers, tmp_path):
+    from app import create_app
+
+    trace_file = tmp_path / "traces.jsonl"
+    app = create_app(
+        {
+            "ML_INTERNAL_TOKEN": auth_headers["X-Internal-Token"],
+            "LOG_LEVEL": "ERROR",
+            "GEE_CACHE_PATH": str(tmp_path / "c.sqlite"),
+            "TRACE_ENABLED": True,
+            "TRACE_FILE": str(trace_file),
+        }
+    )
+    with app.test_client() as c:
+        resp = c.post("/v1/disaster/analyze", json=_analyze_body(), headers=auth_headers)
+        assert resp.status_code == 200
+        assert "trace" not in resp.get_json()  # breakdown only returned with the debug header
+        recent = c.get("/admin/traces?limit=5", headers=auth_headers).get_json()["traces"]
+    assert recent[0]["root"]["attrs"]["route"] == "/v1/disaster/analyze"
+    lines = trace_file.read_text().strip().splitlines()
+    assert json.loads(lines[0])["trace_id"] == resp.headers["X-Request-Id"]
+
+
+def test_inference_stages_are_traced(monkeypatch):
+    import app.inference as inf
+    from app.tracing import Trace, _CURRENT
+
+    class _Sess:
+        def run(self, outputs, feeds):
+            x = next(iter(feeds.values()))
+            return [np.full(x.shape[:3], 0.9, dtype=np.float32)]
+
+    monkeypatch.setattr(inf, "_load_ort_session", lambda: (_Sess(), "in", "out", "NHWC", ["CPUExecutionProvider"]))
+    trace = Trace("t", "test")
+    token = _CURRENT.set(trace)
+    try:
+        img = np.zeros((96, 96, 3), dtype=np.uint8)
+        inf.run_unet_geojson(img, tile_size=64, overlap=32, batch_size=2)
+    finally:
+        _CURRENT.reset(token)
+    trace.finish()
+    names = _names(trace.to_dict()["root"])
+    for stage in ("unet.tiles", "ort.session", "tiles.batch", "ort.run", "tiles.stitch", "threshold", "morphology", "polygonize"):
+        assert stage in names
+    assert names.count("ort.run") == 2  # 4 tiles in batches of 2
@@ -70,4 +70,34 @@ def load_and_resolve_config(config_path: str) -> Dict[str, Any]:
         cfg.setdefault("registry", {})
         cfg["registry"]["model_version"] = model_version_env
 
-    return cfg
\ No newline at end of file
+    return cfg
+
+def onednn_env_from_config(cfg: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Environment variables requested by train.performance.onednn:
+    enabled -> TF_ENABLE_ONEDNN_OPTS, fpmath_mode -> ONEDNN_DEFAULT_FPMATH_MODE.
+    """
+    perf = (cfg.get("train", {}) or {}).get("performance", {}) or {}
+    onednn = perf.get("onednn", {}) or {}
+    env: Dict[str, str] = {}
+    if onednn.get("enabled") is not None:
+        env["TF_ENABLE_ONEDNN_OPTS"] = "1" if bool(onednn["enabled"]) else "0"
+    if onednn.get("fpmath_mode"):
+        env["ONEDNN_DEFAULT_FPMATH_MODE"] = str(onednn["fpmath_mode"]).upper()
+    return env
+
+
+def apply_onednn_env(config_path: str) -> Dict[str, str]:
+    """
+    Export the oneDNN variables of a config. TF_ENABLE_ONEDNN_OPTS is only read when TensorFlow
+    is imported, so call this before importing it. Variables already set in the environment win.
+    Returns the variables that were set.
+    """
+    if not config_path or not os.path.exists(config_path):
+        return {}
+    applied: Dict[str, str] = {}
+    for name, value in onednn_env_from_config(load_yaml_config(config_path)).items():
+        if name not in os.environ:
+            os.environ[name] = value
+            applied[name] = value
+    return applied
@@ -7,11 +7,16 @@ import math
 import yaml
 import glob
 import time
+import queue
 import random
 import hashlib
 import argparse
+import itertools
+import threading
+import collections
 import numpy as np
 from typing import List, Tuple, Optional, Dict
+from concurrent.futures import ProcessPoolExecutor
 
 # Third-party
 import albumentations as A
@@ -216,6 +221,24 @@ def write_mask_png(path: str, mask01: np.ndarray) -> None:
     cv2.imwrite(path, (mask01 * 255).astype(np.uint8))
 
 
+def encode_png(rgb: np.ndarray) -> bytes:
+    """PNG bytes identical to what write_png writes (RGB/RGBA -> BGR/BGRA)."""
+    if rgb.ndim != 3 or rgb.shape[-1] not in (3, 4):
+        raise ValueError(f"encode_png expects HxWx3 or HxWx4, got shape {rgb.shape}")
+    code = cv2.COLOR_RGB2BGR if rgb.shape[-1] == 3 else cv2.COLOR_RGBA2BGRA
+    ok, buf = cv2.imencode(".png", cv2.cvtColor(np.ascontiguousarray(rgb), code))
+    if not ok:
+        raise RuntimeError("PNG encoding failed")
+    return buf.tobytes()
+
+
+def encode_mask_png(mask01: np.ndarray) -> bytes:
+    ok, buf = cv2.imencode(".png", (mask01 * 255).astype(np.uint8))
+    if not ok:
+        raise RuntimeError("PNG encoding failed")
+    return buf.tobytes()
+
+
 def matching_mask_path(images_dir: str, masks_dir: str, image_path: str) -> Optional[str]:
     base = os.path.splitext(os.path.basename(image_path))[0]
     # Try common mask extensions
@@ -498,6 +521,157 @@ def build_augmentations(
     return build_augmentations_from_cfg(aug_cfg=aug_cfg, image_channels=3, seed=seed)
 
 
+# ----------------------------
+# Batch augmentations
+# ----------------------------
+#
+# The cheap, common transforms of train.augment (hflip, vflip, rotate90, brightness_contrast)
+# handled for a whole stacked uint8 batch: every random decision and parameter is drawn as a
+# per-sample array in one call, brightness/contrast becomes one lookup table per sample, and each
+# sample gets a single fused flip/rotate kernel written straight into the output batch, instead
+# of one albumentations pipeline call per sample. Everything else in the config
+# (shift_scale_rotate, elastic, noise, blur, ...) still runs per sample through albumentations.
+# Selected with train.augment.engine: batch (default per_sample).
+
+AUG_ENGINES = ("per_sample", "batch")
+_BATCH_SPATIAL = (("hflip", "flip_horizontal"), ("vflip", "flip_vertical"), ("rotate90", "random_rotate_90"))
+# np.rot90 (counter-clockwise) k -> cv2.rotate code
+_ROT90_CODES = {1: cv2.ROTATE_90_COUNTERCLOCKWISE, 2: cv2.ROTATE_180, 3: cv2.ROTATE_90_CLOCKWISE}
+
+
+def _aug_prob(cfg: Dict, legacy_key: str, new_key: str) -> float:
+    """Effective probability of a toggle, resolved like build_augmentations_from_cfg does."""
+    p, enabled = 0.0, False
+    if isinstance(cfg.get(new_key), dict):
+        enabled = bool(cfg[new_key].get("enabled", False))
+        p = float(cfg[new_key].get("p", 0.0))
+    if legacy_key in cfg and not isinstance(cfg.get(legacy_key), dict):
+        p = float(cfg.get(legacy_key, p))
+        enabled = enabled or p > 0.0
+    return p if enabled else 0.0
+
+
+class BatchAugmenter:
+    """
+    Vectorized hflip / vflip / rotate90 / brightness_contrast over (N,H,W,C) uint8 images and
+    (N,H,W) {0,1} masks, with the remaining configured transforms applied per sample.
+
+    Order matches the albumentations pipeline: flips and rotations, the other spatial transforms
+    (shift_scale_rotate, elastic, cutout), brightness/contrast, then the other photometric ones.
+    Random draws come from a RandomState seeded with `seed` (and the residual pipelines are
+    seeded too), so a fixed seed and call sequence reproduce the same batches.
+    rotate90 on non-square tiles is limited to 180 degrees so the batch shape is kept.
+    """
+
+    def __init__(self, aug_cfg: Optional[Dict], image_channels: int, seed: int = 1337) -> None:
+        cfg = dict(aug_cfg or {})
+        self.channels = int(image_channels)
+        self.rng = np.random.RandomState(seed)
+        self.p_hflip, self.p_vflip, self.p_rot90 = (_aug_prob(cfg, lk, nk) for lk, nk in _BATCH_SPATIAL)
+
+        allow_photo_multi = bool(cfg.get("allow_photometric_on_multichannel", False))
+        photometric = self.channels == 3 or (self.channels == 4 and allow_photo_multi)
+        bc = cfg.get("brightness_contrast")
+        self.bc_limits = (0.2, 0.2)
+        self.p_bc = 0.0
+        if photometric and isinstance(bc, dict):
+            if bool(bc.get("enabled", False)):
+                self.p_bc = float(bc.get("p", 0.0))
+            self.bc_limits = (float(bc.get("brightness_limit", 0.2)), float(bc.get("contrast_limit", 0.2)))
+        elif photometric and bc is not None:
+            self.p_bc = float(bc)
+
+        # Everything not covered above falls back to per-sample albumentations pipelines, split
+        # around brightness/contrast: spatial transforms before it, photometric ones after
+        residual = dict(cfg)
+        for lk, nk in _BATCH_SPATIAL:
+            residual[lk] = 0.0
+            if isinstance(residual.get(nk), dict):
+                residual[nk] = {**residual[nk], "enabled": False}
+        residual["brightness_contrast"] = 0.0
+        rest = build_augmentations_from_cfg(aug_cfg=residual, image_channels=self.channels, seed=seed).transforms
+        # Photometric transforms are image-only (or the RGB-only Lambda wrapper for 4 channels)
+        photo = [isinstance(t, (A.ImageOnlyTransform, A.Lambda)) for t in rest]
+        self.residual_spatial = self._residual([t for t, ph in zip(rest, photo) if not ph], seed)
+        self.residual_photometric = self._residual([t for t, ph in zip(rest, photo) if ph], seed + 1)
+
+    @staticmethod
+    def _residual(transforms: List, seed: int) -> Optional[A.Compose]:
+        if not transforms:
+            return None
+        comp = A.Compose(transforms, p=1.0)
+        if hasattr(comp, "set_random_seed"):
+            comp.set_random_seed(seed)
+        return comp
+
+    def _draw(self, n: int, p: float) -> np.ndarray:
+        return self.rng.random_sample(n) < p if p > 0 else np.zeros(n, dtype=bool)
+
+    def __call__(self, images: np.ndarray, masks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x = np.asarray(images, dtype=np.uint8)
+        y = np.asarray(masks, dtype=np.uint8)
+        n, h, w = x.shape[:3]
+
+        # All random parameters for the batch in a handful of vectorized draws
+        hflip = self._draw(n, self.p_hflip)
+        vflip = self._draw(n, self.p_vflip)
+        rot = self._draw(n, self.p_rot90)
+        ks = np.where(rot, self.rng.randint(0, 4, size=n) if h == w else 2 * self.rng.randint(0, 2, size=n), 0)
+        bc = self._draw(n, self.p_bc)
+        b_lim, c_lim = self.bc_limits
+        alpha = 1.0 + self.rng.uniform(-c_lim, c_lim, size=n)
+        beta = 255.0 * self.rng.uniform(-b_lim, b_lim, size=n)
+        # One uint8 lookup table per sample: clip(v * alpha + beta)
+        luts = np.clip(np.arange(256)[None, :] * alpha[:, None] + beta[:, None], 0, 255).astype(np.uint8)
+
+        out_x = np.empty_like(x)
+        out_y = np.empty_like(y)
+        for i in range(n):
+            xi, yi = x[i], y[i]
+            # hflip, vflip then rot90, folded into at most two cv2 calls (SIMD, unlike strided numpy copies)
+            code = {(True, False): 1, (False, True): 0, (True, True): -1}.get((bool(hflip[i]), bool(vflip[i])))
+            if code is not None:
+                xi, yi = cv2.flip(xi, code), cv2.flip(yi, code)
+            if ks[i]:
+                rc = _ROT90_CODES[int(ks[i])]
+                xi, yi = cv2.rotate(xi, rc), cv2.rotate(yi, rc)
+            if self.residual_spatial is not None:
+                res = self.residual_spatial(image=xi, mask=yi)
+                xi, yi = res["image"], (res["mask"] > 0)
+            if bc[i]:
+                if xi.shape[-1] == 3:
+                    xi = cv2.LUT(xi, luts[i])
+                else:
+                    xi = xi.copy()
+                    xi[..., :3] = luts[i][xi[..., :3]]
+            if self.residual_photometric is not None:
+                xi = self.residual_photometric(image=xi)["image"]
+            out_x[i] = xi.reshape(out_x.shape[1:])
+            out_y[i] = yi
+        return out_x, out_y
+
+
+def aug_engine_from_cfg(aug_cfg: Optional[Dict]) -> str:
+    engine = str((aug_cfg or {}).get("engine", "per_sample")).lower()
+    if engine not in AUG_ENGINES:
+        raise ValueError(f"Unknown augmentation engine: {engine} (expected one of {AUG_ENGINES})")
+    return engine
+
+
+def _stack_batch(
+    imgs, msks, normalize: bool, batch_aug: Optional[BatchAugmenter] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """uint8 samples (lists or stacked arrays) -> (x float32 NHWC, y float32 NHW1), batch augmenter applied first if given."""
+    x = imgs if isinstance(imgs, np.ndarray) else np.stack(imgs, axis=0)
+    y = msks if isinstance(msks, np.ndarray) else np.stack(msks, axis=0)
+    if batch_aug is not None:
+        x, y = batch_aug(x, y)
+    x = x.astype(np.float32)
+    if normalize:
+        x /= 255.0
+    return x, y.astype(np.float32)[..., None]
+
+
 # ----------------------------
 # Dataset Sequences for Keras
 # ----------------------------
@@ -528,9 +702,14 @@ class TileDataset(tf.keras.utils.Sequence if tf is not None else object):  # typ
         self.rng = np.random.RandomState(seed)
         if aug_cfg is None:
             aug_cfg = {}
+        self.aug_cfg = aug_cfg
         # Deterministic pipelines for 3- and 4-channel inputs
         self.aug3 = build_augmentations_from_cfg(aug_cfg=aug_cfg, image_channels=3, seed=seed)
         self.aug4 = build_augmentations_from_cfg(aug_cfg=aug_cfg, image_channels=4, seed=seed)
+        self.aug_engine = aug_engine_from_cfg(aug_cfg)
+        self.batch_augs: Dict[int, BatchAugmenter] = {}
+        if augment and self.aug_engine == "batch":
+            self.batch_augs = {c: BatchAugmenter(aug_cfg, image_channels=c, seed=seed) for c in (3, 4)}
 
         self.indexes = np.arange(len(self.image_paths))
         if self.shuffle:
@@ -543,6 +722,15 @@ class TileDataset(tf.keras.utils.Sequence if tf is not None else object):  # typ
         if self.shuffle:
             self.rng.shuffle(self.indexes)
 
+    def load_sample(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Decoded uint8 image and {0,1} mask of sample i, before augmentation."""
+        # Read image (supports PNG/JPEG/TIFF and .nc if provided)
+        img = read_image_any(self.image_paths[i])
+        msk = read_mask_any(self.mask_paths[i])
+        if msk is None or img is None:
+            raise FileNotFoundError(f"Missing file for pair: {self.image_paths[i]} / {self.mask_paths[i]}")
+        return img, (msk > 127).astype(np.uint8)
+
     def __getitem__(self, idx: int) -> Tuple[np.ndarray, np.ndarray]:
         start = idx * self.batch_size
         end = min((idx + 1) * self.batch_size, len(self.image_paths))
@@ -550,15 +738,10 @@ class TileDataset(tf.keras.utils.Sequence if tf is not None else object):  # typ
         imgs: List[np.ndarray] = []
         msks: List[np.ndarray] = []
         for i in batch_idx:
-            # Read image (supports PNG/JPEG/TIFF and .nc if provided)
-            img = read_image_any(self.image_paths[i])
-            msk = read_mask_any(self.mask_paths[i])
-            if msk is None or img is None:
-                raise FileNotFoundError(f"Missing file for pair: {self.image_paths[i]} / {self.mask_paths[i]}")
-            msk = (msk > 127).astype(np.uint8)
+            img, msk = self.load_sample(i)
 
             # Augmentations: spatial for 3/4ch; photometric for 3ch (and optionally 4ch via config)
-            if self.augment and img.ndim == 3 and img.shape[-1] in (3, 4):
+            if self.augment and self.aug_engine == "per_sample" and img.ndim == 3 and img.shape[-1] in (3, 4):
                 aug = self.aug3 if img.shape[-1] == 3 else self.aug4
                 if aug is not None:
                     augmented = aug(image=img, mask=msk)
@@ -566,16 +749,10 @@ class TileDataset(tf.keras.utils.Sequence if tf is not None else object):  # typ
                     msk = augmented["mask"]
                     # Ensure binary mask after spatial transforms
                     msk = (msk > 0).astype(np.uint8)
-
-            img = img.astype(np.float32)
-            if self.normalize:
-                img /= 255.0
-            msk = msk.astype(np.float32)[..., None]  # H W 1
             imgs.append(img)
             msks.append(msk)
-        x = np.stack(imgs, axis=0)
-        y = np.stack(msks, axis=0)
-        return x, y
+        batch_aug = self.batch_augs.get(imgs[0].shape[-1]) if imgs[0].ndim == 3 else None
+        return _stack_batch(imgs, msks, self.normalize, batch_aug)
 
 class Sentinel2Dataset(tf.keras.utils.Sequence if tf is not None else object):  # type: ignore
     def __init__(
@@ -617,7 +794,10 @@ class Sentinel2Dataset(tf.keras.utils.Sequence if tf is not None else object):
         self.rng = np.random.RandomState(seed)
         if aug_cfg is None:
             aug_cfg = {}
+        self.aug_cfg = aug_cfg
         self.aug = build_augmentations_from_cfg(aug_cfg=aug_cfg, image_channels=3, seed=seed)
+        self.aug_engine = aug_engine_from_cfg(aug_cfg)
+        self.batch_aug = BatchAugmenter(aug_cfg, image_channels=3, seed=seed) if augment and self.aug_engine == "batch" else None
         self.indexes = np.arange(len(self.image_paths))
         if self.shuffle:
             self.rng.shuffle(self.indexes)
@@ -629,6 +809,18 @@ class Sentinel2Dataset(tf.keras.utils.Sequence if tf is not None else object):
         if self.shuffle:
             self.rng.shuffle(self.indexes)
 
+    def load_sample(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Decoded uint8 image and {0,1} mask of sample i, resized to 512x512, before augmentation."""
+        img = read_image_any(self.image_paths[i])
+        msk = read_mask_any(self.mask_paths[i])
+        if msk is None or img is None:
+            raise FileNotFoundError(f"Missing file for pair: {self.image_paths[i]} / {self.mask_paths[i]}")
+        msk = (msk > 127).astype(np.uint8)
+        # Resize to 512x512
+        img = cv2.resize(img, (512, 512), interpolation=cv2.INTER_LINEAR)
+        msk = cv2.resize(msk, (512, 512), interpolation=cv2.INTER_NEAREST)
+        return img, msk
+
     def __getitem__(self, idx: int) -> Tuple[np.ndarray, np.ndarray]:
         start = idx * self.batch_size
         end = min((idx + 1) * self.batch_size, len(self.image_paths))
@@ -636,28 +828,16 @@ class Sentinel2Dataset(tf.keras.utils.Sequence if tf is not None else object):
         imgs: List[np.ndarray] = []
         msks: List[np.ndarray] = []
         for i in batch_idx:
-            img = read_image_any(self.image_paths[i])
-            msk = read_mask_any(self.mask_paths[i])
-            if msk is None or img is None:
-                raise FileNotFoundError(f"Missing file for pair: {self.image_paths[i]} / {self.mask_paths[i]}")
-            msk = (msk > 127).astype(np.uint8)
-            # Resize to 512x512
-            img = cv2.resize(img, (512, 512), interpolation=cv2.INTER_LINEAR)
-            msk = cv2.resize(msk, (512, 512), interpolation=cv2.INTER_NEAREST)
-            if self.augment and img.ndim == 3 and img.shape[-1] == 3:
+            img, msk = self.load_sample(i)
+            if self.augment and self.aug_engine == "per_sample" and img.ndim == 3 and img.shape[-1] == 3:
                 augmented = self.aug(image=img, mask=msk)
                 img = augmented["image"]
                 msk = augmented["mask"]
                 msk = (msk > 0).astype(np.uint8)
-            img = img.astype(np.float32)
-            if self.normalize:
-                img /= 255.0
-            msk = msk.astype(np.float32)[..., None]  # H W 1
             imgs.append(img)
             msks.append(msk)
-        x = np.stack(imgs, axis=0)
-        y = np.stack(msks, axis=0)
-        return x, y
+        batch_aug = self.batch_aug if imgs[0].ndim == 3 and imgs[0].shape[-1] == 3 else None
+        return _stack_batch(imgs, msks, self.normalize, batch_aug)
 
 
 def build_sequences_from_tiles(
@@ -703,45 +883,6 @@ def build_sequences_from_tiles(
     return train_seq, val_seq
 
 
-# ----------------------------
-# Tiling CLI and Logic
-# ----------------------------
-
-def split_by_image(files: List[str], val_ratio: float, seed: int) -> Tuple[List[str], List[str]]:
-    rng = np.random.RandomState(seed)
-    files_sorted = sorted(files)
-    rng.shuffle(files_sorted)
-    n_val = max(1, int(round(len(files_sorted) * float(val_ratio)))) if len(files_sorted) > 1 else 1 if len(files_sorted) == 1 and val_ratio > 0 else 0
-    val_set = set(files_sorted[:n_val])
-    train_list = [f for f in files_sorted if f not in val_set]
-    val_list = [f for f in files_sorted if f in val_set]
-    return train_list, val_list
-
-
-def perform_tiling(
-    data_dir: str,
-    tile_size: int = 512,
-    overlap: int = 64,
-    min_mask_coverage: float = 0.005,
-    val_ratio: float = 0.2,
-    seed: int = 1337,
-) -> Dict[str, int]:
-    raw_images_dir = os.path.join(data_dir, "raw", "images")
-    raw_masks_dir = os.path.join(data_dir, "raw", "masks")
-    if not os.path.isdir(raw_images_dir) or not os.path.isdir(raw_masks_dir):
-        raise FileNotFoundError(f"Expected raw images/masks at {raw_images_dir} and {raw_masks_dir}")
-
-    tiles_base = os.path.join(data_dir, "tiles")
-    train_img_out = os.path.join(tiles_base, "train", "images")
-    train_msk_out = os.path.join(tiles_base, "train", "masks")
-    val_img_out = os.path.join(tiles_base, "val", "images")
-    val_msk_out = os.path.join(tiles_base, "val", "masks")
-    for d in [train_img_out, train_msk_out, val_img_out, val_msk_out]:
-        ensure_dir(d)
-
-    image_files = list_files(raw_images_dir)
-    if len(image_files) == 0:
-        raise FileNotFoundError(f"No images found under {raw_images_dir}")
 def build_sequences_from_sentinel2(
     sentinel2_base_dir: str,
     batch_size: int = 4,
@@ -783,6 +924,540 @@ def build_sequences_from_sentinel2(
     )
     return train_seq, val_seq, test_seq
 
+
+# ----------------------------
+# Packed (memory-mapped) shards
+# ----------------------------
+#
+# Layout written by `dataset.py pack` under <out_dir>/<split>/:
+#   index.json                      {"version", "tile_shape", "count", "shards": [...], "names": [...]}
+#   images-00000.npy, ...           uint8 N x H x W x C (already decoded/resized)
+#   masks-00000.npy, ...            uint8 N x H x W with values {0,1}
+# Shards are plain .npy files so they can be opened with np.load(mmap_mode="r"):
+# a batch is a slice of the page cache instead of a PNG decode per tile.
+
+PACKED_INDEX = "index.json"
+PACKED_VERSION = 1
+
+
+def _load_pair_uint8(image_path: str, mask_path: str, resize: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode one pair exactly as the PNG loaders do: uint8 image and {0,1} mask, optionally resized."""
+    img = read_image_any(image_path)
+    msk = (read_mask_any(mask_path) > 127).astype(np.uint8)
+    if resize:
+        img = cv2.resize(img, (int(resize), int(resize)), interpolation=cv2.INTER_LINEAR)
+        msk = cv2.resize(msk, (int(resize), int(resize)), interpolation=cv2.INTER_NEAREST)
+    return img.astype(np.uint8, copy=False), msk
+
+
+def pack_tile_shards(
+    image_paths: List[str],
+    mask_paths: List[str],
+    out_dir: str,
+    shard_size: int = 1024,
+    resize: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Decode image/mask pairs once and write them into contiguous .npy shards plus index.json.
+    All samples must share one shape (use resize for variable-size sources).
+    """
+    assert len(image_paths) == len(mask_paths), "Image/mask count mismatch"
+    if len(image_paths) == 0:
+        raise FileNotFoundError(f"No image/mask pairs to pack into {out_dir}")
+    ensure_dir(out_dir)
+    for stale in glob.glob(os.path.join(out_dir, "images-*.npy")) + glob.glob(os.path.join(out_dir, "masks-*.npy")):
+        os.remove(stale)
+
+    shard_size = max(1, int(shard_size))
+    first_img, first_msk = _load_pair_uint8(image_paths[0], mask_paths[0], resize)
+    img_shape = first_img.shape if first_img.ndim == 3 else first_img.shape + (1,)
+    shards: List[Dict] = []
+    n = len(image_paths)
+
+    with tqdm(total=n, desc=f"Packing {os.path.basename(os.path.normpath(out_dir))}", unit="tile") as bar:
+        for s, start in enumerate(range(0, n, shard_size)):
+            count = min(shard_size, n - start)
+            img_name, msk_name = f"images-{s:05d}.npy", f"masks-{s:05d}.npy"
+            imgs = np.lib.format.open_memmap(os.path.join(out_dir, img_name), mode="w+", dtype=np.uint8, shape=(count,) + img_shape)
+            msks = np.lib.format.open_memmap(os.path.join(out_dir, msk_name), mode="w+", dtype=np.uint8, shape=(count,) + img_shape[:2])
+            for j in range(count):
+                i = start + j
+                img, msk = (first_img, first_msk) if i == 0 else _load_pair_uint8(image_paths[i], mask_paths[i], resize)
+                if img.ndim == 2:
+                    img = img[..., None]
+                if img.shape != img_shape or msk.shape != img_shape[:2]:
+                    raise ValueError(
+                        f"Sample {image_paths[i]} has shape {img.shape}/{msk.shape}, expected {img_shape}; "
+                        "pass --resize to pack variable-size images"
+                    )
+                imgs[j] = img
+                msks[j] = msk
+                bar.update(1)
+            imgs.flush()
+            msks.flush()
+            del imgs, msks
+            shards.append({"images": img_name, "masks": msk_name, "count": count})
+
+    index = {
+        "version": PACKED_VERSION,
+        "tile_shape": list(img_shape),
+        "count": n,
+        "resize": int(resize) if resize else None,
+        "shards": shards,
+        "names": [os.path.basename(p) for p in image_paths],
+    }
+    with open(os.path.join(out_dir, PACKED_INDEX), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    return {"tiles": n, "shards": len(shards)}
+
+
+def _split_pairs(images_dir: str, masks_dir: str) -> Tuple[List[str], List[str]]:
+    imgs = list_files(images_dir)
+    pairs = [(i, matching_mask_path(images_dir, masks_dir, i)) for i in imgs]
+    pairs = [(i, m) for i, m in pairs if m is not None]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
+
+
+def pack_dataset(
+    data_dir: str,
+    out_dir: Optional[str] = None,
+    source: str = "tiles",
+    sentinel2_dir: Optional[str] = None,
+    shard_size: int = 1024,
+    resize: Optional[int] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Pack every split of a tiles/ tree (train, val) or a Sentinel-2 tree (train, val, test) into shards.
+    Sentinel-2 samples are resized to 512 unless resize is given, matching Sentinel2Dataset.
+    """
+    out_dir = out_dir or os.path.join(data_dir, "packed")
+    if source == "tiles":
+        base = os.path.join(data_dir, "tiles")
+        splits = {s: (os.path.join(base, s, "images"), os.path.join(base, s, "masks")) for s in ("train", "val")}
+    elif source == "sentinel2":
+        base = sentinel2_dir or os.path.join(data_dir, "sentinel2_datasets")
+        splits = {
+            s: (os.path.join(base, s, f"{s}_images"), os.path.join(base, s, f"{s}_masks")) for s in ("train", "val", "test")
+        }
+        resize = resize or 512
+    else:
+        raise ValueError(f"Unknown pack source: {source} (expected tiles|sentinel2)")
+
+    stats: Dict[str, Dict[str, int]] = {}
+    for split, (images_dir, masks_dir) in splits.items():
+        images, masks = _split_pairs(images_dir, masks_dir)
+        if len(images) == 0:
+            continue
+        stats[split] = pack_tile_shards(images, masks, os.path.join(out_dir, split), shard_size=shard_size, resize=resize)
+    if not stats:
+        raise FileNotFoundError(f"No image/mask pairs found under {base}")
+    return stats
+
+
+class PackedTileDataset(tf.keras.utils.Sequence if tf is not None else object):  # type: ignore
+    """
+    Keras Sequence over shards written by pack_tile_shards. Same batches and augmentations as
+    TileDataset, but samples are read from memory-mapped uint8 arrays with no image decoding.
+    """
+
+    def __init__(
+        self,
+        packed_dir: str,
+        batch_size: int = 4,
+        shuffle: bool = True,
+        augment: bool = False,
+        aug_cfg: Optional[Dict] = None,
+        seed: int = 1337,
+        normalize: bool = True,
+    ) -> None:
+        index_path = os.path.join(packed_dir, PACKED_INDEX)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"Packed index not found: {index_path} (run `dataset.py pack` first)")
+        with open(index_path, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        if int(self.index.get("version", 0)) != PACKED_VERSION:
+            raise ValueError(f"Unsupported packed format version in {index_path}: {self.index.get('version')}")
+        self.packed_dir = packed_dir
+        self.images = [np.load(os.path.join(packed_dir, s["images"]), mmap_mode="r") for s in self.index["shards"]]
+        self.masks = [np.load(os.path.join(packed_dir, s["masks"]), mmap_mode="r") for s in self.index["shards"]]
+        counts = np.array([s["count"] for s in self.index["shards"]], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.count = int(self.offsets[-1])
+        self.batch_size = max(1, int(batch_size))
+        self.shuffle = shuffle
+        self.augment = augment
+        self.normalize = normalize
+        self.seed = seed
+        self.rng = np.random.RandomState(seed)
+        if aug_cfg is None:
+            aug_cfg = {}
+        self.aug_cfg = aug_cfg
+        self.channels = int(self.index["tile_shape"][-1])
+        self.aug = build_augmentations_from_cfg(aug_cfg=aug_cfg, image_channels=self.channels, seed=seed)
+        self.aug_engine = aug_engine_from_cfg(aug_cfg)
+        self.batch_aug = None
+        if augment and self.aug_engine == "batch" and self.channels in (3, 4):
+            self.batch_aug = BatchAugmenter(aug_cfg, image_channels=self.channels, seed=seed)
+
+        self.indexes = np.arange(self.count)
+        if self.shuffle:
+            self.rng.shuffle(self.indexes)
+
+    def __len__(self) -> int:
+        return int(math.ceil(self.count / self.batch_size))
+
+    def on_epoch_end(self) -> None:
+        if self.shuffle:
+            self.rng.shuffle(self.indexes)
+
+    def read_raw(self, batch_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """uint8 images (N,H,W,C) and {0,1} masks (N,H,W) for global sample indices, in the given order."""
+        batch_idx = np.asarray(batch_idx, dtype=np.int64)
+        shard_of = np.searchsorted(self.offsets, batch_idx, side="right") - 1
+        h, w, c = self.index["tile_shape"]
+        x = np.empty((len(batch_idx), h, w, c), dtype=np.uint8)
+        y = np.empty((len(batch_idx), h, w), dtype=np.uint8)
+        # One fancy-index read per shard, in file order, instead of one read per sample
+        for s in np.unique(shard_of):
+            pos = np.nonzero(shard_of == s)[0]
+            local = batch_idx[pos] - self.offsets[s]
+            order = np.argsort(local, kind="stable")
+            x[pos[order]] = self.images[s][local[order]]
+            y[pos[order]] = self.masks[s][local[order]]
+        return x, y
+
+    def load_sample(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """uint8 image (H,W,C) and {0,1} mask (H,W) of sample i, before augmentation."""
+        x, y = self.read_raw(np.array([i]))
+        return x[0], y[0]
+
+    def __getitem__(self, idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        start = idx * self.batch_size
+        end = min((idx + 1) * self.batch_size, self.count)
+        x_u8, y_u8 = self.read_raw(self.indexes[start:end])
+        if self.batch_aug is not None:
+            # Already one contiguous uint8 batch: augment it as a whole
+            return _stack_batch(x_u8, y_u8, self.normalize, self.batch_aug)
+        imgs: List[np.ndarray] = []
+        msks: List[np.ndarray] = []
+        for img, msk in zip(x_u8, y_u8):
+            if self.augment and self.channels in (3, 4):
+                augmented = self.aug(image=img, mask=msk)
+                img = augmented["image"]
+                msk = (augmented["mask"] > 0).astype(np.uint8)
+            imgs.append(img)
+            msks.append(msk)
+        x = np.stack(imgs, axis=0).astype(np.float32)
+        if self.normalize:
+            x /= 255.0
+        y = np.stack(msks, axis=0).astype(np.float32)[..., None]
+        return x, y
+
+
+def build_sequences_from_packed(
+    packed_dir: str,
+    batch_size: int = 4,
+    augment_cfg: Optional[Dict] = None,
+    seed: int = 1337,
+    splits: Tuple[str, str] = ("train", "val"),
+) -> Tuple[PackedTileDataset, PackedTileDataset]:
+    train_seq = PackedTileDataset(
+        os.path.join(packed_dir, splits[0]),
+        batch_size=batch_size,
+        shuffle=True,
+        augment=True,
+        aug_cfg=augment_cfg,
+        seed=seed,
+    )
+    val_seq = PackedTileDataset(
+        os.path.join(packed_dir, splits[1]),
+        batch_size=batch_size,
+        shuffle=False,
+        augment=False,
+        aug_cfg=augment_cfg,
+        seed=seed,
+    )
+    return train_seq, val_seq
+
+
+# ----------------------------
+# tf.data input pipeline
+# ----------------------------
+#
+# Alternative to feeding model.fit with the Sequences above: sample decoding (and augmentation)
+# runs in tf.data's parallel map, batches are normalized with one vectorized op and prefetched,
+# so input preparation overlaps with the training step. The validation split is decoded once and
+# cached as uint8. Any of TileDataset, Sentinel2Dataset or PackedTileDataset can be the source;
+# its load_sample() and augmentation config are reused, so batches match the Sequence path.
+
+PIPELINE_TYPES = ("sequence", "tf_data")
+
+
+def num_samples(seq) -> int:
+    return len(seq.image_paths) if hasattr(seq, "image_paths") else int(seq.count)
+
+
+def _cache_fingerprint(seq, *shapes) -> str:
+    """
+    Digest of what cached samples depend on: the sequence type, sample shapes and the path,
+    size and mtime of every source file (packed shards and index included).
+    """
+    if hasattr(seq, "image_paths"):
+        files = list(seq.image_paths) + list(seq.mask_paths)
+    else:
+        shards = [os.path.join(seq.packed_dir, sh[k]) for sh in seq.index["shards"] for k in ("images", "masks")]
+        files = [os.path.join(seq.packed_dir, PACKED_INDEX)] + shards
+    h = hashlib.sha256(json.dumps([type(seq).__name__, [list(s) for s in shapes]]).encode("utf-8"))
+    for path in files:
+        st = os.stat(path)
+        h.update(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _fingerprinted_cache_path(prefix: str, fingerprint: str) -> str:
+    """<prefix>-<fingerprint>; cache files left by other fingerprints of the prefix are removed."""
+    path = f"{prefix}-{fingerprint}"
+    hexdigits = set("0123456789abcdef")
+    for old in glob.glob(glob.escape(prefix) + "-*"):
+        tag = os.path.basename(old)[len(os.path.basename(prefix)) + 1 :]
+        if len(tag) >= 16 and set(tag[:16]) <= hexdigits and tag[:16] != fingerprint:
+            os.remove(old)
+    return path
+
+
+def _augment_sample(img: np.ndarray, msk: np.ndarray, aug) -> Tuple[np.ndarray, np.ndarray]:
+    augmented = aug(image=img, mask=msk)
+    return augmented["image"], (augmented["mask"] > 0).astype(np.uint8)
+
+
+def build_tf_dataset(
+    seq,
+    training: bool,
+    num_parallel_calls: int = -1,
+    prefetch: int = -1,
+    cache: bool = False,
+    cache_dir: str = "",
+    deterministic: bool = True,
+):
+    """
+    tf.data.Dataset of (x float32 NHWC, y float32 NHW1) batches over a Sequence's samples.
+
+    training=True shuffles the sample order every epoch (seeded with seq.seed) and applies the
+    sequence's albumentations config when seq.augment is set; training=False keeps file order and,
+    with cache=True, decodes each sample once (in memory, or under cache_dir when given). On-disk
+    caches are named after a fingerprint of the tile files and sample shapes, so a changed tile
+    set is decoded again instead of being served from a stale cache.
+    num_parallel_calls / prefetch of -1 mean tf.data.AUTOTUNE.
+
+    Per-sample augmentations draw from the same global RNG as the Sequence path; with more than
+    one parallel call the assignment of draws to samples depends on thread scheduling, so use
+    num_parallel_calls: 1 (or train.augment.engine: batch) when augmented batches must be
+    bit-reproducible.
+    """
+    if tf is None:
+        raise RuntimeError("TensorFlow is required for the tf.data input pipeline")
+    n = num_samples(seq)
+    if n == 0:
+        raise FileNotFoundError("No samples for the tf.data pipeline")
+    autotune = tf.data.AUTOTUNE
+    calls = autotune if int(num_parallel_calls) < 0 else max(1, int(num_parallel_calls))
+    img0, msk0 = seq.load_sample(0)
+    img_shape, msk_shape = img0.shape, msk0.shape
+    channels = img_shape[-1] if img0.ndim == 3 else 1
+    augment = bool(training and seq.augment and img0.ndim == 3 and channels in (3, 4))
+    # engine: batch runs the vectorized transforms once per batch instead of in the sample map
+    batch_aug = None
+    if augment and aug_engine_from_cfg(seq.aug_cfg) == "batch":
+        batch_aug = BatchAugmenter(seq.aug_cfg, image_channels=channels, seed=seq.seed)
+        augment = False
+    # Albumentations pipelines keep per-call state, so each map thread builds its own
+    local = threading.local()
+
+    def _load(i):
+        img, msk = seq.load_sample(int(i))
+        if augment:
+            aug = getattr(local, "aug", None)
+            if aug is None:
+                aug = local.aug = build_augmentations_from_cfg(aug_cfg=seq.aug_cfg, image_channels=channels, seed=seq.seed)
+            img, msk = _augment_sample(img, msk, aug)
+        # Flips/rot90 return strided views; tensors need contiguous buffers
+        return np.ascontiguousarray(img, dtype=np.uint8), np.ascontiguousarray(msk, dtype=np.uint8)
+
+    def _tf_load(i):
+        img, msk = tf.numpy_function(_load, [i], (tf.uint8, tf.uint8))
+        img.set_shape(img_shape)
+        msk.set_shape(msk_shape)
+        return img, msk
+
+    def _to_float(x, y):
+        x = tf.cast(x, tf.float32)
+        if seq.normalize:
+            x = x / 255.0
+        return x, tf.cast(y, tf.float32)[..., None]
+
+    ds = tf.data.Dataset.range(n)
+    if training and seq.shuffle:
+        ds = ds.shuffle(n, seed=seq.seed, reshuffle_each_iteration=True)
+    ds = ds.map(_tf_load, num_parallel_calls=calls, deterministic=deterministic)
+    if cache and not augment:
+        if cache_dir:
+            cache_dir = _fingerprinted_cache_path(cache_dir, _cache_fingerprint(seq, img_shape, msk_shape))
+        ds = ds.cache(cache_dir)
+    ds = ds.batch(seq.batch_size)
+    if batch_aug is not None:
+        def _tf_batch_aug(x, y):
+            xa, ya = tf.numpy_function(batch_aug, [x, y], (tf.uint8, tf.uint8))
+            xa.set_shape(x.shape)
+            ya.set_shape(y.shape)
+            return xa, ya
+
+        # Sequential map: one RNG stream in batch order, so a fixed seed reproduces the epoch
+        ds = ds.map(_tf_batch_aug)
+    ds = ds.map(_to_float, num_parallel_calls=calls, deterministic=deterministic)
+    return ds.prefetch(autotune if int(prefetch) < 0 else int(prefetch))
+
+
+def build_input_pipeline(train_seq, val_seq, pipeline_cfg: Optional[Dict] = None):
+    """
+    (train, val) inputs for model.fit as selected by data.pipeline in config.yaml:
+    the Sequences themselves for type "sequence", tf.data datasets for "tf_data".
+    """
+    cfg = pipeline_cfg or {}
+    kind = str(cfg.get("type", "sequence")).lower()
+    if kind not in PIPELINE_TYPES:
+        raise ValueError(f"Unknown input pipeline type: {kind} (expected one of {PIPELINE_TYPES})")
+    if kind == "sequence":
+        return train_seq, val_seq
+    opts = dict(
+        num_parallel_calls=int(cfg.get("num_parallel_calls", -1)),
+        prefetch=int(cfg.get("prefetch", -1)),
+        deterministic=bool(cfg.get("deterministic", True)),
+    )
+    cache_dir = str(cfg.get("cache_dir") or "")
+    if cache_dir:
+        ensure_dir(cache_dir)
+        cache_dir = os.path.join(cache_dir, "val")
+    train_ds = build_tf_dataset(train_seq, training=True, **opts)
+    val_ds = build_tf_dataset(val_seq, training=False, cache=bool(cfg.get("cache_val", True)), cache_dir=cache_dir, **opts)
+    return train_ds, val_ds
+
+
+def measure_input_throughput(source, num_batches: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """
+    Samples/sec of producing batches from a Sequence or tf.data.Dataset alone (no model),
+    after `warmup` batches that are not timed. Wraps around the source if it is shorter.
+    """
+    if tf is not None and isinstance(source, tf.data.Dataset):
+        # One long-lived iterator: steady-state rate without per-epoch pipeline start-up
+        def _batches():
+            yield from source.repeat()
+    else:
+        def _batches():
+            while True:
+                for i in range(len(source)):
+                    yield source[i]
+
+    it = _batches()
+    for _ in range(max(0, int(warmup))):
+        next(it)
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(max(1, int(num_batches))):
+        x, _y = next(it)
+        samples += int(x.shape[0])
+    seconds = time.perf_counter() - start
+    return {
+        "batches": int(max(1, int(num_batches))),
+        "samples": samples,
+        "seconds": round(seconds, 4),
+        "samples_per_sec": round(samples / seconds, 2) if seconds > 0 else float("inf"),
+    }
+
+
+# ----------------------------
+# Tiling CLI and Logic
+# ----------------------------
+
+def split_by_image(files: List[str], val_ratio: float, seed: int) -> Tuple[List[str], List[str]]:
+    rng = np.random.RandomState(seed)
+    files_sorted = sorted(files)
+    rng.shuffle(files_sorted)
+    n_val = max(1, int(round(len(files_sorted) * float(val_ratio)))) if len(files_sorted) > 1 else 1 if len(files_sorted) == 1 and val_ratio > 0 else 0
+    val_set = set(files_sorted[:n_val])
+    train_list = [f for f in files_sorted if f not in val_set]
+    val_list = [f for f in files_sorted if f in val_set]
+    return train_list, val_list
+
+
+def _tile_pair_encoded(
+    img_path: str,
+    msk_path: str,
+    tile_size: int,
+    overlap: int,
+    min_mask_coverage: float,
+) -> Tuple[str, List[Tuple[str, bytes, bytes]]]:
+    """
+    Read, tile and PNG-encode one raw pair (runs in a worker process).
+    Returns ("ok", tiles), ("skipped", []) when no tile passes the coverage filter, or ("error: ...", []).
+    """
+    try:
+        img = read_image_any(img_path)
+        msk = read_mask_any(msk_path)
+        msk01 = binarize_mask(msk)
+    except Exception as e:
+        return f"error: {e}", []
+    tiles = tile_image_and_mask(img, msk01, tile_size=tile_size, overlap=overlap, min_mask_coverage=min_mask_coverage)
+    if len(tiles) == 0:
+        return "skipped", []
+    base = os.path.splitext(os.path.basename(img_path))[0]
+    return "ok", [
+        (f"{base}_x{x}_y{y}.png", encode_png(img_tile), encode_mask_png(msk_tile))
+        for (img_tile, msk_tile, (x, y)) in tiles
+    ]
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def perform_tiling(
+    data_dir: str,
+    tile_size: int = 512,
+    overlap: int = 64,
+    min_mask_coverage: float = 0.005,
+    val_ratio: float = 0.2,
+    seed: int = 1337,
+    workers: int = 1,
+    max_pending: int = 0,
+    writer_threads: int = 2,
+    write_queue_size: int = 256,
+) -> Dict[str, int]:
+    """
+    Tile raw/{images,masks} into tiles/{train,val}/{images,masks}.
+
+    workers > 1 reads/tiles/encodes one raw image per task in a process pool (0 = all CPUs).
+    At most max_pending images (default 2 x workers) are in flight, and encoded tiles reach the
+    writer threads through a queue of write_queue_size files, so memory stays bounded. Results are
+    consumed in input order: files, split and counts are identical to workers=1.
+    """
+    raw_images_dir = os.path.join(data_dir, "raw", "images")
+    raw_masks_dir = os.path.join(data_dir, "raw", "masks")
+    if not os.path.isdir(raw_images_dir) or not os.path.isdir(raw_masks_dir):
+        raise FileNotFoundError(f"Expected raw images/masks at {raw_images_dir} and {raw_masks_dir}")
+
+    tiles_base = os.path.join(data_dir, "tiles")
+    train_img_out = os.path.join(tiles_base, "train", "images")
+    train_msk_out = os.path.join(tiles_base, "train", "masks")
+    val_img_out = os.path.join(tiles_base, "val", "images")
+    val_msk_out = os.path.join(tiles_base, "val", "masks")
+    for d in [train_img_out, train_msk_out, val_img_out, val_msk_out]:
+        ensure_dir(d)
+
+    image_files = list_files(raw_images_dir)
+    if len(image_files) == 0:
+        raise FileNotFoundError(f"No images found under {raw_images_dir}")
+
     # Filter to those with matching masks
     pairs: List[Tuple[str, str]] = []
     for img_path in image_files:
@@ -795,40 +1470,68 @@ def build_sequences_from_sentinel2(
     # Split by image to reduce leakage
     img_paths = [p[0] for p in pairs]
     train_imgs, val_imgs = split_by_image(img_paths, val_ratio=val_ratio, seed=seed)
-    train_set = set(train_imgs)
     val_set = set(val_imgs)
 
     counts = {"train_tiles": 0, "val_tiles": 0, "skipped": 0}
-
-    for img_path, msk_path in tqdm(pairs, desc="Tiling", unit="img"):
-        try:
-            img = read_image_any(img_path)
-            msk = read_mask_any(msk_path)
-            msk01 = binarize_mask(msk)
-        except Exception as e:
-            print(f"Warning: skipping pair due to read error: {img_path} / {msk_path} ({e})")
-            continue
-
-        tiles = tile_image_and_mask(
-            img, msk01, tile_size=tile_size, overlap=overlap, min_mask_coverage=min_mask_coverage
-        )
-        if len(tiles) == 0:
+    workers = (os.cpu_count() or 1) if int(workers) <= 0 else int(workers)
+    args = (int(tile_size), int(overlap), float(min_mask_coverage))
+
+    write_q: "queue.Queue[Optional[Tuple[str, bytes]]]" = queue.Queue(maxsize=max(1, int(write_queue_size)))
+    write_errors: List[BaseException] = []
+
+    def _writer() -> None:
+        while True:
+            item = write_q.get()
+            if item is None:
+                return
+            try:
+                _write_bytes(*item)
+            except BaseException as e:  # surfaced after the queue drains
+                write_errors.append(e)
+
+    writers = [threading.Thread(target=_writer, name=f"tile-writer-{i}", daemon=True) for i in range(max(1, int(writer_threads)))]
+    for t in writers:
+        t.start()
+
+    def _consume(img_path: str, msk_path: str, status: str, tiles: List[Tuple[str, bytes, bytes]]) -> None:
+        if status.startswith("error"):
+            print(f"Warning: skipping pair due to read error: {img_path} / {msk_path} ({status[len('error: '):]})")
+            return
+        if status == "skipped":
             counts["skipped"] += 1
-            continue
-
-        base = os.path.splitext(os.path.basename(img_path))[0]
+            return
         is_val = img_path in val_set
-
-        for (img_tile, msk_tile, (x, y)) in tiles:
-            tile_name = f"{base}_x{x}_y{y}.png"
-            if is_val:
-                write_png(os.path.join(val_img_out, tile_name), img_tile)
-                write_mask_png(os.path.join(val_msk_out, tile_name), msk_tile)
-                counts["val_tiles"] += 1
-            else:
-                write_png(os.path.join(train_img_out, tile_name), img_tile)
-                write_mask_png(os.path.join(train_msk_out, tile_name), msk_tile)
-                counts["train_tiles"] += 1
+        img_out, msk_out = (val_img_out, val_msk_out) if is_val else (train_img_out, train_msk_out)
+        for tile_name, img_png, msk_png in tiles:
+            write_q.put((os.path.join(img_out, tile_name), img_png))
+            write_q.put((os.path.join(msk_out, tile_name), msk_png))
+            counts["val_tiles" if is_val else "train_tiles"] += 1
+
+    try:
+        if workers <= 1:
+            for img_path, msk_path in tqdm(pairs, desc="Tiling", unit="img"):
+                _consume(img_path, msk_path, *_tile_pair_encoded(img_path, msk_path, *args))
+        else:
+            window = int(max_pending) if int(max_pending) > 0 else 2 * workers
+            with ProcessPoolExecutor(max_workers=workers) as pool, tqdm(total=len(pairs), desc="Tiling", unit="img") as bar:
+                pending: "collections.deque" = collections.deque()
+                it = iter(pairs)
+                for pair in itertools.islice(it, window):
+                    pending.append((pair, pool.submit(_tile_pair_encoded, *pair, *args)))
+                while pending:
+                    (img_path, msk_path), fut = pending.popleft()
+                    _consume(img_path, msk_path, *fut.result())
+                    bar.update(1)
+                    nxt = next(it, None)
+                    if nxt is not None:
+                        pending.append((nxt, pool.submit(_tile_pair_encoded, *nxt, *args)))
+    finally:
+        for _ in writers:
+            write_q.put(None)
+        for t in writers:
+            t.join()
+    if write_errors:
+        raise write_errors[0]
 
     return counts
 
@@ -863,6 +1566,9 @@ def build_arg_parser() -> argparse.ArgumentParser:
     pt.add_argument("--min-mask-coverage", type=float, default=0.005, help="Minimum mask coverage (0..1) to keep a tile")
     pt.add_argument("--val-ratio", type=float, default=0.2)
     pt.add_argument("--seed", type=int, default=1337)
+    pt.add_argument("--workers", type=int, default=0, help="Tiling processes, one raw image per task (0 = all CPUs, 1 = serial)")
+    pt.add_argument("--max-pending", type=int, default=0, help="Raw images in flight (default 2 x workers)")
+    pt.add_argument("--writer-threads", type=int, default=2, help="Threads writing encoded tiles to disk")
 
     # index subcommand
     pi = sub.add_parser("index", help="Show counts of tiles for train/val")
@@ -874,6 +1580,15 @@ def build_arg_parser() -> argparse.ArgumentParser:
     pb.add_argument("--batch-size", type=int, default=4)
     pb.add_argument("--seed", type=int, default=1337)
 
+    # pack subcommand (memory-mapped shards for training without per-tile decoding)
+    pp = sub.add_parser("pack", help="Decode tiles once into memory-mapped .npy shards with an index")
+    pp.add_argument("--data-dir", type=str, default=os.getenv("DATA_DIR", "./data"))
+    pp.add_argument("--out-dir", type=str, default=None, help="Default: <data-dir>/packed")
+    pp.add_argument("--source", type=str, default="tiles", choices=["tiles", "sentinel2"])
+    pp.add_argument("--sentinel2-dir", type=str, default=None, help="Default: <data-dir>/sentinel2_datasets")
+    pp.add_argument("--shard-size", type=int, default=1024, help="Tiles per shard file")
+    pp.add_argument("--resize", type=int, default=0, help="Resize to NxN while packing (sentinel2 defaults to 512)")
+
     return p
 
 
@@ -889,6 +1604,9 @@ def main(argv: Optional[List[str]] = None) -> int:
             min_mask_coverage=float(args.min_mask_coverage),
             val_ratio=float(args.val_ratio),
             seed=int(args.seed),
+            workers=int(args.workers),
+            max_pending=int(args.max_pending),
+            writer_threads=int(args.writer_threads),
         )
         elapsed = time.time() - start
         print(json.dumps({"status": "ok", "stats": stats, "seconds": round(elapsed, 2)}, indent=2))
@@ -899,6 +1617,20 @@ def main(argv: Optional[List[str]] = None) -> int:
         print(json.dumps({"status": "ok", "stats": stats}, indent=2))
         return 0
 
+    if args.cmd == "pack":
+        start = time.time()
+        stats = pack_dataset(
+            data_dir=args.data_dir,
+            out_dir=args.out_dir,
+            source=args.source,
+            sentinel2_dir=args.sentinel2_dir,
+            shard_size=int(args.shard_size),
+            resize=int(args.resize) or None,
+        )
+        elapsed = time.time() - start
+        print(json.dumps({"status": "ok", "stats": stats, "seconds": round(elapsed, 2)}, indent=2))
+        return 0
+
     if args.cmd == "check":
         tiles_dir = os.path.join(args.data_dir, "tiles")
         train_seq, val_seq = build_sequences_from_tiles(
@@ -96,6 +96,19 @@ def build_model_from_config(cfg: Dict[str, Any]) -> "tf.keras.Model":
     return model
 
 
+def as_float32_model(model: "tf.keras.Model", cfg: Dict[str, Any]) -> "tf.keras.Model":
+    """
+    Checkpoints trained under mixed_bfloat16 (train.performance.precision) carry the mixed policy
+    in their layers; rebuild them in float32 for export. Mixed precision keeps float32 variables,
+    so the weights transfer unchanged.
+    """
+    if all(getattr(layer, "dtype_policy", None) is None or layer.dtype_policy.name == "float32" for layer in model.layers):
+        return model
+    f32 = build_model_from_config(cfg)
+    f32.set_weights(model.get_weights())
+    return f32
+
+
 def export_savedmodel(model: "tf.keras.Model", out_dir: str) -> None:
     # Export TF SavedModel for serving
     model.export(out_dir)
@@ -179,6 +192,7 @@ def main(argv=None) -> int:
         except Exception as e:
             print("Failed to load weights from checkpoint:", e)
             return 2
+    model = as_float32_model(model, cfg)
 
     # Export SavedModel
     export_savedmodel(model, savedmodel_dir)
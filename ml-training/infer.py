@@ -1,9 +1,14 @@
 import os
 import sys
+import glob
 import json
+import hashlib
 import math
+import time
 import argparse
-from typing import Tuple, Optional, Dict, Any
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Optional, Dict, Any, List
 
 import numpy as np
 import cv2
@@ -48,11 +53,19 @@ def _normalize_image(img: np.ndarray) -> np.ndarray:
 
 
 def _accumulate_probs(
-    img: np.ndarray, H: int, W: int, tile_size: int, overlap: int, predict_fn, pad_to_tile: bool = False
+    img: np.ndarray,
+    H: int,
+    W: int,
+    tile_size: int,
+    overlap: int,
+    predict_fn,
+    pad_to_tile: bool = False,
+    batch_size: int = 4,
 ) -> np.ndarray:
     """
     Sliding window inference with overlap; accumulate probabilities and average on overlaps.
     predict_fn expects input batch (N, tile, tile, 3) in [0,1] and returns (N, tile, tile, 1) probs.
+    Tiles are sent to predict_fn batch_size at a time.
     """
     stride = max(1, tile_size - overlap)
 
@@ -82,7 +95,7 @@ def _accumulate_probs(
     # Process in mini-batches for efficiency
     batch_imgs: list[np.ndarray] = []
     batch_coords: list[Tuple[int, int]] = []
-    max_batch = 4
+    max_batch = max(1, int(batch_size))
 
     def _flush_batch():
         nonlocal batch_imgs, batch_coords
@@ -126,14 +139,18 @@ def _accumulate_probs(
     return prob
 
 
-def _predictor_from_model(model_path: str, tile_size: int) -> Any:
+def _predictor_from_model(model_path: str, tile_size: int, threads: int = 0) -> Any:
     """
-    Returns a predict_fn that maps (N, tile, tile, 3) -> (N, tile, tile, 1) probabilities
+    Returns a predict_fn that maps (N, tile, tile, 3) -> (N, tile, tile, 1) probabilities.
+    threads > 0 caps the runtime's intra-op threads (used by batch workers sharing the CPUs).
     """
     ext = os.path.splitext(model_path)[1].lower()
     if ext == ".onnx":
         assert ort is not None, "onnxruntime is not installed"
-        sess = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        sess_opts = ort.SessionOptions()
+        if threads > 0:
+            sess_opts.intra_op_num_threads = int(threads)
+        sess = ort.InferenceSession(model_path, sess_options=sess_opts, providers=["CPUExecutionProvider"])
         inp_name = sess.get_inputs()[0].name
         out_name = sess.get_outputs()[0].name
 
@@ -150,6 +167,11 @@ def _predictor_from_model(model_path: str, tile_size: int) -> Any:
         return predict_fn
     else:
         assert tf is not None, "TensorFlow is required to load SavedModel"
+        if threads > 0:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(int(threads))
+            except RuntimeError:  # runtime already initialized in this process
+                pass
         # Allow passing either SavedModel dir or a .keras model file
         if os.path.isdir(model_path):
             model = tf.keras.models.load_model(model_path, compile=False)
@@ -166,6 +188,31 @@ def _predictor_from_model(model_path: str, tile_size: int) -> Any:
         return predict_fn
 
 
+def _read_raster(image_path: str) -> Tuple[np.ndarray, Any, Any]:
+    """Read an RGB raster: (H, W, 3) array plus (transform, crs) for GeoTIFFs, (None, None) otherwise."""
+    if is_tiff(image_path):
+        if rasterio is None:
+            raise RuntimeError("rasterio not installed; required for GeoTIFF")
+        with rasterio.open(image_path) as src:
+            # Read RGB or replicate single band
+            if src.count >= 3:
+                arr = src.read(indexes=(1, 2, 3))
+                arr = np.transpose(arr, (1, 2, 0))
+            else:
+                band = src.read(1)
+                arr = np.stack([band, band, band], axis=-1)
+            transform = src.transform
+            crs = src.crs
+    else:
+        bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise FileNotFoundError(f"Failed to read image: {image_path}")
+        arr = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        transform = None
+        crs = None
+    return arr, transform, crs
+
+
 def run_inference(
     image_path: str,
     out_geojson: str,
@@ -176,6 +223,9 @@ def run_inference(
     min_area_pixels: int = 64,
     buffer_pixels: int = 0,
     postprocess: Optional[Dict[str, Any]] = None,
+    batch_size: int = 4,
+    predict_fn: Any = None,
+    extra_members: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Perform offline inference and write GeoJSON polygons.
@@ -186,6 +236,11 @@ def run_inference(
         model_path: ONNX or SavedModel path
         tile_size, overlap, threshold: inference tiling and probability threshold
         min_area_pixels, buffer_pixels: legacy polygonization controls (kept for backward compatibility)
+        batch_size: tiles per predictor call
+        predict_fn: an already loaded predictor (from _predictor_from_model) to reuse across images;
+          loaded from model_path when None
+        extra_members: top-level members added to the FeatureCollection (batch mode stamps the
+          hash of its parameters here)
         postprocess: optional dict mirroring ML-Service options:
           {
             "min_area": int,
@@ -198,35 +253,15 @@ def run_inference(
     Returns:
         Small summary dict with metadata.
     """
-    # Read image
-    if is_tiff(image_path):
-        if rasterio is None:
-            raise RuntimeError("rasterio not installed; required for GeoTIFF")
-        with rasterio.open(image_path) as src:
-            # Read RGB or replicate single band
-            if src.count >= 3:
-                arr = src.read(indexes=(1, 2, 3))
-                arr = np.transpose(arr, (1, 2, 0))
-            else:
-                band = src.read(1)
-                arr = np.stack([band, band, band], axis=-1)
-            transform = src.transform
-            crs = src.crs
-    else:
-        arr = cv2.cvtColor(cv2.imread(image_path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
-        transform = None
-        crs = None
-
-    if arr is None:
-        raise FileNotFoundError(f"Failed to read image: {image_path}")
-
+    arr, transform, crs = _read_raster(image_path)
     H, W, _ = arr.shape
 
     # Predictor
-    predict_fn = _predictor_from_model(model_path, tile_size=tile_size)
+    if predict_fn is None:
+        predict_fn = _predictor_from_model(model_path, tile_size=tile_size)
 
     # Accumulate probabilities
-    prob = _accumulate_probs(arr, H, W, tile_size, overlap, predict_fn, pad_to_tile=True)
+    prob = _accumulate_probs(arr, H, W, tile_size, overlap, predict_fn, pad_to_tile=True, batch_size=batch_size)
 
     # Threshold to binary
     mask01 = (prob >= float(threshold)).astype(np.uint8)
@@ -254,9 +289,12 @@ def run_inference(
             },
         ),
     )
-    # Save
+    fc.update(extra_members or {})
+    # Save (write then rename, so an interrupted run never leaves a truncated GeoJSON behind)
     os.makedirs(os.path.dirname(out_geojson) or ".", exist_ok=True)
-    save_geojson(fc, out_geojson)
+    tmp_path = out_geojson + ".tmp"
+    save_geojson(fc, tmp_path)
+    os.replace(tmp_path, out_geojson)
 
     return {
         "status": "ok",
@@ -270,10 +308,230 @@ def run_inference(
     }
 
 
+# ----------------------------
+# Batch inference (directory / glob)
+# ----------------------------
+
+IMAGE_EXTS = (".tif", ".tiff", ".png", ".jpg", ".jpeg")
+SUMMARY_NAME = "inference_summary.json"
+# FeatureCollection member holding the hash of the parameters a batch output was made with
+PARAMS_MEMBER = "inference_params_sha256"
+
+# Per-process predictor for batch workers (loaded once by _init_batch_worker)
+_WORKER: Dict[str, Any] = {}
+
+
+def list_inference_inputs(source: str) -> List[str]:
+    """Images in a directory (non-recursive) or matching a glob pattern (** allowed), sorted."""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, f) for f in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and os.path.splitext(p)[1].lower() in IMAGE_EXTS)
+
+
+def _output_paths(images: List[str], out_dir: str) -> List[str]:
+    outs = [os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + ".geojson") for p in images]
+    seen: Dict[str, str] = {}
+    for img, out in zip(images, outs):
+        if out in seen:
+            raise ValueError(f"{seen[out]} and {img} would both write {out}; use separate runs or rename")
+        seen[out] = img
+    return outs
+
+
+def _mtime(path: str) -> float:
+    """Modification time of a file, or the newest file under a directory (SavedModel)."""
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    newest = os.path.getmtime(path)
+    for dirpath, _, files in os.walk(path):
+        for f in files:
+            newest = max(newest, os.path.getmtime(os.path.join(dirpath, f)))
+    return newest
+
+
+def _params_hash(params: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _is_up_to_date(image_path: str, out_path: str, model_mtime: float, params_hash: str) -> bool:
+    """Output exists, is newer than both its image and the model, and was made with these parameters."""
+    if not os.path.exists(out_path):
+        return False
+    out_mtime = os.path.getmtime(out_path)
+    if out_mtime < os.path.getmtime(image_path) or out_mtime < model_mtime:
+        return False
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            fc = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return isinstance(fc, dict) and fc.get(PARAMS_MEMBER) == params_hash
+
+
+def _write_json(path: str, obj: Dict[str, Any]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _init_batch_worker(model_path: str, tile_size: int, threads: int) -> None:
+    _WORKER["predict_fn"] = _predictor_from_model(model_path, tile_size=tile_size, threads=threads)
+
+
+def _infer_one(image_path: str, out_path: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one image with the worker's predictor. Errors are reported back instead of raised,
+    so one unreadable image does not stop the run.
+    """
+    t0 = time.perf_counter()
+    try:
+        res = run_inference(image_path, out_path, predict_fn=_WORKER["predict_fn"], **opts)
+    except Exception as e:
+        res = {"status": "error", "image": image_path, "out": out_path, "error": f"{type(e).__name__}: {e}"}
+    res["seconds"] = round(time.perf_counter() - t0, 3)
+    return res
+
+
+def run_batch_inference(
+    source: str,
+    out_dir: str,
+    model_path: str,
+    tile_size: int = 512,
+    overlap: int = 64,
+    threshold: float = 0.5,
+    min_area_pixels: int = 64,
+    buffer_pixels: int = 0,
+    postprocess: Optional[Dict[str, Any]] = None,
+    batch_size: int = 4,
+    workers: int = 1,
+    force: bool = False,
+    summary_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run inference over a directory or glob of images, writing out_dir/<image stem>.geojson per
+    image and a run summary (default out_dir/inference_summary.json).
+
+    - The model is loaded once per worker: in-process for workers == 1, otherwise once per process
+      of a pool (0 = all CPUs). Each worker's runtime gets an equal share of the CPUs as intra-op
+      threads, so the pool does not oversubscribe the machine.
+    - Images whose GeoJSON is newer than both the image and the model and carries the hash of the
+      current inference parameters (PARAMS_MEMBER) are skipped, so an interrupted run resumes
+      where it stopped, also after a parameter change. Outputs are written atomically;
+      force=True redoes everything.
+    - A failing image is recorded as an error in the summary and retried on the next run.
+
+    Returns the run summary.
+    """
+    images = list_inference_inputs(source)
+    if not images:
+        raise FileNotFoundError(f"No images ({', '.join(IMAGE_EXTS)}) found for {source}")
+    os.makedirs(out_dir, exist_ok=True)
+    outs = _output_paths(images, out_dir)
+    summary_path = summary_path or os.path.join(out_dir, SUMMARY_NAME)
+
+    opts = {
+        "model_path": model_path,
+        "tile_size": int(tile_size),
+        "overlap": int(overlap),
+        "threshold": float(threshold),
+        "min_area_pixels": int(min_area_pixels),
+        "buffer_pixels": int(buffer_pixels),
+        "postprocess": postprocess,
+        "batch_size": int(batch_size),
+    }
+    # Everything that changes the GeoJSON (batch size and workers do not)
+    params = {k: v for k, v in opts.items() if k != "batch_size"}
+    params["model_path"] = os.path.abspath(model_path)
+    params_hash = _params_hash(params)
+    opts["extra_members"] = {PARAMS_MEMBER: params_hash}
+
+    model_mtime = _mtime(model_path)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+    todo: List[int] = []
+    for i, (img, out) in enumerate(zip(images, outs)):
+        if not force and _is_up_to_date(img, out, model_mtime, params_hash):
+            results[i] = {"status": "up_to_date", "image": img, "out": out}
+        else:
+            todo.append(i)
+
+    cpus = os.cpu_count() or 1
+    workers = cpus if int(workers) <= 0 else int(workers)
+    workers = max(1, min(workers, len(todo)))
+    threads = max(1, cpus // workers) if workers > 1 else 0
+    # Params are only recorded once the run is over; each output carries its own params hash
+    summary: Dict[str, Any] = {"status": "running", "images": len(images), "pending": len(todo)}
+    _write_json(summary_path, summary)
+
+    def report(k: int, res: Dict[str, Any]) -> None:
+        name = os.path.basename(res["image"])
+        if res["status"] == "ok":
+            print(f"[infer] {k}/{len(todo)} {name}: {res['num_features']} features in {res['seconds']}s")
+        else:
+            print(f"[infer] {k}/{len(todo)} {name}: {res['error']}")
+
+    start = time.perf_counter()
+    if todo and workers <= 1:
+        _init_batch_worker(model_path, int(tile_size), 0)
+        for k, i in enumerate(todo, 1):
+            results[i] = _infer_one(images[i], outs[i], opts)
+            report(k, results[i])
+    elif todo:
+        # spawn: forking a process that has TensorFlow/ONNX Runtime thread pools is unsafe
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_batch_worker,
+            initargs=(model_path, int(tile_size), threads),
+        ) as pool:
+            futures = [(i, pool.submit(_infer_one, images[i], outs[i], opts)) for i in todo]
+            for k, (i, fut) in enumerate(futures, 1):
+                try:
+                    results[i] = fut.result()
+                except Exception as e:  # worker crashed or could not load the model
+                    results[i] = {
+                        "status": "error",
+                        "image": images[i],
+                        "out": outs[i],
+                        "error": f"worker failed ({type(e).__name__}: {e})",
+                    }
+                report(k, results[i])
+    elapsed = time.perf_counter() - start
+
+    done = [r for r in results if r is not None]
+    processed = sum(1 for r in done if r["status"] == "ok")
+    failed = sum(1 for r in done if r["status"] == "error")
+    summary = {
+        "status": "ok" if failed == 0 else "partial",
+        "params": params,
+        "images": len(images),
+        "processed": processed,
+        "up_to_date": sum(1 for r in done if r["status"] == "up_to_date"),
+        "failed": failed,
+        "workers": workers,
+        "batch_size": int(batch_size),
+        "elapsed_sec": round(elapsed, 2),
+        "images_per_sec": round(processed / elapsed, 3) if processed and elapsed > 0 else None,
+        "results": done,
+    }
+    _write_json(summary_path, summary)
+    return summary
+
+
 def parse_args(argv=None):
     p = argparse.ArgumentParser("Offline inference: tile+stitch to GeoJSON polygons")
-    p.add_argument("--image", type=str, required=True, help="Path to input image (GeoTIFF or PNG/JPEG)")
-    p.add_argument("--out", type=str, required=True, help="Output GeoJSON path")
+    p.add_argument("--image", type=str, default=None, help="Path to input image (GeoTIFF or PNG/JPEG)")
+    p.add_argument("--out", type=str, default=None, help="Output GeoJSON path")
+    p.add_argument(
+        "--input",
+        type=str,
+        default=None,
+        help="Batch mode: directory or glob of images (e.g. 'scenes/**/*.tif'); writes one GeoJSON per image to --out-dir",
+    )
+    p.add_argument("--out-dir", type=str, default=None, help="Batch mode: output directory (GeoJSON + inference_summary.json)")
     p.add_argument(
         "--model",
         type=str,
@@ -285,11 +543,38 @@ def parse_args(argv=None):
     p.add_argument("--threshold", type=float, default=0.5)
     p.add_argument("--min-area-pixels", type=int, default=64)
     p.add_argument("--buffer-pixels", type=int, default=0)
-    return p.parse_args(argv)
+    p.add_argument("--batch-size", type=int, default=4, help="Tiles per model call")
+    p.add_argument("--workers", type=int, default=1, help="Batch mode: worker processes, each loads the model once (0 = all CPUs)")
+    p.add_argument("--force", action="store_true", help="Batch mode: redo images whose GeoJSON is already up to date")
+    p.add_argument("--summary", type=str, default=None, help="Batch mode: run summary path (default <out-dir>/inference_summary.json)")
+    args = p.parse_args(argv)
+    if args.input is not None:
+        if not args.out_dir:
+            p.error("--input requires --out-dir")
+    elif not (args.image and args.out):
+        p.error("either --image and --out, or --input and --out-dir are required")
+    return args
 
 
 def main(argv=None) -> int:
     args = parse_args(argv)
+    if args.input is not None:
+        summary = run_batch_inference(
+            source=args.input,
+            out_dir=args.out_dir,
+            model_path=args.model,
+            tile_size=int(args.tile_size),
+            overlap=int(args.overlap),
+            threshold=float(args.threshold),
+            min_area_pixels=int(args.min_area_pixels),
+            buffer_pixels=int(args.buffer_pixels),
+            batch_size=int(args.batch_size),
+            workers=int(args.workers),
+            force=bool(args.force),
+            summary_path=args.summary,
+        )
+        print(json.dumps({k: v for k, v in summary.items() if k != "results"}, indent=2))
+        return 0 if summary["failed"] == 0 else 1
     res = run_inference(
         image_path=args.image,
         out_geojson=args.out,
@@ -299,6 +584,7 @@ def main(argv=None) -> int:
         threshold=float(args.threshold),
         min_area_pixels=int(args.min_area_pixels),
         buffer_pixels=int(args.buffer_pixels),
+        batch_size=int(args.batch_size),
     )
     print(json.dumps(res, indent=2))
     return 0
@@ -99,13 +99,14 @@ def build_unet(
     # Decoder
     for d in reversed(range(depth - 1)):
         filters //= 2
-        x = layers.UpSampling2D((2, 2), interpolation="bilinear", name=f"dec{d}_up")(x)
+        # float32 resize: XLA rejects the bf16 ResizeBilinear gradient under mixed_bfloat16
+        x = layers.UpSampling2D((2, 2), interpolation="bilinear", name=f"dec{d}_up", dtype="float32")(x)
         x = layers.Concatenate(name=f"dec{d}_concat")([x, skips[d]])
         x = conv_block(x, filters, dropout=dropout, name=f"dec{d}", kernel_regularizer=kernel_regularizer)
 
-    # Output
+    # Output (float32 even under a mixed precision policy, so probabilities/loss stay full precision)
     activation = "sigmoid" if output_channels == 1 else "softmax"
-    outputs = layers.Conv2D(output_channels, (1, 1), activation=activation, name="logits")(x)
+    outputs = layers.Conv2D(output_channels, (1, 1), activation=activation, name="logits", dtype="float32")(x)
 
     model = models.Model(inputs=inputs, outputs=outputs, name="unet")
     return model
@@ -120,6 +121,7 @@ def compile_unet(
     metric_threshold: float = 0.5,
     optimizer: str = "adam",
     weight_decay: float = 0.0,
+    jit_compile: bool = False,
 ) -> "tf.keras.Model":
     """
     Compile U-Net with BCE+Dice loss and IoU/Dice metrics.
@@ -133,6 +135,7 @@ def compile_unet(
         metric_threshold: probability threshold for IoU/Dice metrics
         optimizer: 'adam' or 'sgd'
         weight_decay: optional weight decay (decoupled) if supported
+        jit_compile: XLA-compile the train/eval step
 
     Returns:
         compiled model
@@ -151,7 +154,7 @@ def compile_unet(
     iou_fn = iou_metric(threshold=metric_threshold, smooth=1e-6, name="iou")
     dice_fn = dice_metric(threshold=metric_threshold, smooth=1e-6, name="dice")
 
-    model.compile(optimizer=opt, loss=loss_fn, metrics=[iou_fn, dice_fn])
+    model.compile(optimizer=opt, loss=loss_fn, metrics=[iou_fn, dice_fn], jit_compile=jit_compile)
     return model
 
 
@@ -162,6 +165,8 @@ def build_and_compile_from_config(cfg: Dict) -> "tf.keras.Model":
     - Decoupled weight decay via tensorflow-addons (preferred). If unavailable and weight_decay > 0,
       falls back to L2 kernel regularization on Conv layers (bias/BN excluded).
     - Losses: bce, dice, bce_dice (default/back-compat), focal, tversky
+    - XLA-compiled train step via train.performance.jit_compile (build under the mixed precision
+      policy set by train_perf.apply_performance)
     """
     assert tf is not None, "TensorFlow is required"
 
@@ -325,5 +330,8 @@ def build_and_compile_from_config(cfg: Dict) -> "tf.keras.Model":
     iou_fn = iou_metric(threshold=metric_threshold, smooth=1e-6, name="iou")
     dice_fn = dice_metric(threshold=metric_threshold, smooth=1e-6, name="dice")
 
-    model.compile(optimizer=opt, loss=loss_fn, metrics=[iou_fn, dice_fn])
+    # --- XLA (train.performance.jit_compile) ---
+    jit_compile = bool((train_cfg.get("performance", {}) or {}).get("jit_compile", False))
+
+    model.compile(optimizer=opt, loss=loss_fn, metrics=[iou_fn, dice_fn], jit_compile=jit_compile)
     return model
\ No newline at end of file
@@ -5,6 +5,7 @@ import glob
 import math
 import argparse
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
@@ -122,8 +123,12 @@ def _h5_recursive_find(node, names: Sequence[str]):
     return None
 
 
-def _load_var_array(var) -> np.ndarray:
+def _load_var_array(var, window: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
     # Handle netCDF4.Variable or h5py.Dataset -> np.ndarray (2D)
+    if window is not None:
+        # Only the requested hyperslab is read from disk
+        rows, cols = _window_slices(window, _var_shape2d(var))
+        return _slice_var(var, rows, cols)
     arr = np.array(var[:])
     # Accept 2D or 3D; if 3D take the first slice along the smallest leading dimension
     if arr.ndim == 3:
@@ -141,38 +146,122 @@ def _load_var_array(var) -> np.ndarray:
     return arr.astype(np.float32)
 
 
-def _read_band(ds, band_name: str) -> Optional[np.ndarray]:
-    aliases = BAND_ALIASES.get(band_name, (band_name,))
+def _band_axes(shape: Tuple[int, ...]) -> Tuple[Optional[int], int, int]:
+    """
+    (band_axis, y_axis, x_axis) of the 2D plane _load_var_array would pick from a variable of this
+    shape, so slices can be read without loading the whole variable. band_axis is None for 2D.
+    """
+    if len(shape) == 2:
+        return None, 0, 1
+    if len(shape) == 3:
+        if shape[0] <= 4 and shape[1] >= 8 and shape[2] >= 8:
+            return 0, 1, 2
+        if shape[-1] <= 4 and shape[0] >= 8 and shape[1] >= 8:
+            return 2, 0, 1
+        return 0, 1, 2
+    raise ValueError(f"Expected 2D band array, got shape {tuple(shape)}")
+
+
+def _var_shape2d(var) -> Tuple[int, int]:
+    _, ya, xa = _band_axes(tuple(var.shape))
+    return int(var.shape[ya]), int(var.shape[xa])
+
+
+def _slice_var(var, rows: slice, cols: slice) -> np.ndarray:
+    """Read only var[rows, cols] of the band plane (h5py/netCDF4 hyperslab) as float32."""
+    band_axis, ya, xa = _band_axes(tuple(var.shape))
+    index: List = [slice(None)] * len(var.shape)
+    index[ya], index[xa] = rows, cols
+    if band_axis is not None:
+        index[band_axis] = 0
+    return np.array(var[tuple(index)]).astype(np.float32)
+
+
+def _find_var(ds, names: Sequence[str]):
     if netCDF4 is not None and isinstance(ds, netCDF4.Dataset):
-        var = _try_get_nc4_var(ds, aliases)
+        var = _try_get_nc4_var(ds, names)
         if var is not None:
-            try:
-                return _load_var_array(var)
-            except Exception:
-                pass
+            return var
     if h5py is not None and isinstance(ds, h5py.File):
-        var = _h5_recursive_find(ds, aliases)
-        if var is not None:
-            try:
-                return _load_var_array(var)
-            except Exception:
-                pass
+        return _h5_recursive_find(ds, names)
     return None
 
 
-def _read_optional_var(ds, names: Sequence[str]) -> Optional[np.ndarray]:
+def _window_slices(window: Tuple[int, int, int, int], shape: Tuple[int, int]) -> Tuple[slice, slice]:
+    """Row/column slices of a (row_off, col_off, height, width) pixel window, clipped to shape (H, W)."""
+    row_off, col_off, height, width = (int(v) for v in window)
+    if height <= 0 or width <= 0 or row_off < 0 or col_off < 0:
+        raise ValueError(f"Invalid window {tuple(window)}: expected (row_off, col_off, height, width) with non-negative offsets")
+    H, W = shape
+    if row_off >= H or col_off >= W:
+        raise ValueError(f"Window {tuple(window)} lies outside the {H}x{W} scene")
+    return slice(row_off, min(H, row_off + height)), slice(col_off, min(W, col_off + width))
+
+
+X_COORD_ALIASES = ("x", "lon", "longitude", "easting")
+Y_COORD_ALIASES = ("y", "lat", "latitude", "northing")
+
+
+def _find_coord(ds, names: Sequence[str]) -> Optional[np.ndarray]:
+    # Coordinate variables are matched by exact (case-insensitive) name only; substring
+    # matching as for bands would pick up e.g. "B04_x"
+    keys = ds.variables.keys() if netCDF4 is not None and isinstance(ds, netCDF4.Dataset) else ds.keys()
+    kmap = {_norm_key(k): k for k in keys}
+    for nm in names:
+        k = kmap.get(_norm_key(nm))
+        if k is None:
+            continue
+        var = ds.variables[k] if netCDF4 is not None and isinstance(ds, netCDF4.Dataset) else ds[k]
+        if len(var.shape) == 1:
+            return np.asarray(var[:], dtype=np.float64)
+    return None
+
+
+def _coord_range(coord: np.ndarray, lo: float, hi: float, name: str) -> Tuple[int, int]:
+    """[start, stop) indices of coord values inside [lo, hi]; coord may be ascending or descending."""
+    idx = np.flatnonzero((coord >= min(lo, hi)) & (coord <= max(lo, hi)))
+    if idx.size == 0:
+        raise ValueError(f"bbox does not overlap the scene along {name}")
+    return int(idx[0]), int(idx[-1]) + 1
+
+
+def _bbox_to_window(ds, bbox: Sequence[float], shape: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """
+    Pixel window covering bbox = (min_x, min_y, max_x, max_y) in the units of the scene's 1D
+    x/y (or lon/lat) coordinate variables. Pixels whose centre coordinate falls inside are kept.
+    """
+    if len(bbox) != 4:
+        raise ValueError(f"bbox must be (min_x, min_y, max_x, max_y), got {bbox}")
+    xs = _find_coord(ds, X_COORD_ALIASES)
+    ys = _find_coord(ds, Y_COORD_ALIASES)
+    if xs is None or ys is None:
+        raise ValueError("bbox needs 1D x/y (or lon/lat) coordinate variables; pass a pixel window instead")
+    H, W = shape
+    c0, c1 = _coord_range(xs[:W], float(bbox[0]), float(bbox[2]), "x")
+    r0, r1 = _coord_range(ys[:H], float(bbox[1]), float(bbox[3]), "y")
+    return r0, c0, r1 - r0, c1 - c0
+
+
+def _read_band(ds, band_name: str, window: Optional[Tuple[int, int, int, int]] = None) -> Optional[np.ndarray]:
+    aliases = BAND_ALIASES.get(band_name, (band_name,))
+    return _read_optional_var(ds, aliases, window=window)
+
+
+def _read_optional_var(
+    ds, names: Sequence[str], window: Optional[Tuple[int, int, int, int]] = None
+) -> Optional[np.ndarray]:
     if netCDF4 is not None and isinstance(ds, netCDF4.Dataset):
         var = _try_get_nc4_var(ds, names)
         if var is not None:
             try:
-                return _load_var_array(var)
+                return _load_var_array(var, window)
             except Exception:
                 pass
     if h5py is not None and isinstance(ds, h5py.File):
         var = _h5_recursive_find(ds, names)
         if var is not None:
             try:
-                return _load_var_array(var)
+                return _load_var_array(var, window)
             except Exception:
                 pass
     return None
@@ -199,43 +288,194 @@ def _open_netcdf(path: str):
 # Normalization
 # ----------------------------
 
+PERCENTILE_MODES = ("exact", "histogram", "sampled")
+_HIST_MAX_VALUE = 65535  # integer reflectance (uint16 DN) range covered by the bincount
+_HIST_BLOCK_ROWS = 256  # rows per bincount pass; bounds the temporaries to one block
+
+
+class _IntHistogram:
+    """
+    Streaming bincount of a band's finite values. Only valid while every value is a non-negative
+    integer <= _HIST_MAX_VALUE (Sentinel-2 DN); callers fall back to np.nanpercentile otherwise.
+    """
+
+    def __init__(self) -> None:
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.valid = True
+        self.dtype = np.dtype(np.float64)
+
+    def add(self, block: np.ndarray) -> None:
+        if not self.valid:
+            return
+        self.dtype = block.dtype
+        b = block[np.isfinite(block)]
+        if b.size == 0:
+            return
+        if b.min() < 0 or b.max() > _HIST_MAX_VALUE or np.any(b != np.floor(b)):
+            self.valid = False
+            return
+        c = np.bincount(b.astype(np.int64))
+        if c.size > self.counts.size:
+            self.counts = np.pad(self.counts, (0, c.size - self.counts.size))
+        self.counts[: c.size] += c
+
+    def percentiles(self, ps: Sequence[float]) -> Optional[List[float]]:
+        """
+        Same values as np.nanpercentile(..., method="linear") over the counted samples, bit for bit
+        (the interpolation runs in the band's dtype, like numpy's).
+        """
+        if not self.valid or self.counts.sum() == 0:
+            return None
+        cum = np.cumsum(self.counts)
+        n = int(cum[-1])
+        out = []
+        for p in ps:
+            pos = (n - 1) * (float(p) / 100.0)
+            k = int(math.floor(pos))
+            t = pos - k
+            a = np.searchsorted(cum, k, side="right")
+            b = np.searchsorted(cum, min(k + 1, n - 1), side="right")
+            # Interpolate the two order statistics with numpy itself, in the band's dtype: with
+            # [a, b] the virtual index is t exactly, so the result equals the full percentile
+            out.append(float(np.quantile(np.array([a, b], dtype=self.dtype), t)))
+        return out
+
+
+def _sampled(v: np.ndarray, stride: int, row0: int = 0) -> np.ndarray:
+    """Every stride-th row/column of v on the global pixel grid (v starts at global row row0)."""
+    s = max(1, int(stride))
+    return v[(-row0) % s :: s, ::s] if s > 1 else v
+
+
+def _band_bounds(
+    v: np.ndarray,
+    method: str = "percentile",
+    percentiles: Tuple[float, float] = (2.0, 98.0),
+    percentile_mode: str = "exact",
+    sample_stride: int = 4,
+) -> Optional[Tuple[float, float]]:
+    """
+    (lo, hi) scaling bounds of one band for per_band/percentile; None when the band is degenerate.
+
+    percentile_mode:
+      - exact: np.nanpercentile (two sort-based passes over the band)
+      - histogram: one bincount pass; identical to exact for integer-valued bands, falls back to
+        exact for anything else
+      - sampled: histogram over every sample_stride-th row and column (approximate)
+    """
+    if method == "per_band":
+        lo = float(np.nanmin(v))
+        hi = float(np.nanmax(v))
+    elif method == "percentile":
+        bounds = None
+        if percentile_mode in ("histogram", "sampled"):
+            src = _sampled(v, sample_stride) if percentile_mode == "sampled" else v
+            hist = _IntHistogram()
+            for y0 in range(0, src.shape[0], _HIST_BLOCK_ROWS):
+                hist.add(src[y0 : y0 + _HIST_BLOCK_ROWS])
+            bounds = hist.percentiles(percentiles)
+        elif percentile_mode != "exact":
+            raise ValueError(f"Unknown percentile mode: {percentile_mode} (expected one of {PERCENTILE_MODES})")
+        if bounds is None:
+            bounds = [float(np.nanpercentile(v, percentiles[0])), float(np.nanpercentile(v, percentiles[1]))]
+        lo, hi = bounds
+    else:
+        raise ValueError(f"Unknown normalization method: {method}")
+    if not math.isfinite(lo) or not math.isfinite(hi) or hi <= lo:
+        return None
+    return lo, hi
+
+
+def _scale_to_uint8(
+    stack: np.ndarray,
+    method: str,
+    bounds: Sequence[Optional[Tuple[float, float]]] = (),
+    inplace: bool = False,
+) -> np.ndarray:
+    """
+    Scale an H W C float32 stack (or a row chunk of it) to uint8 with precomputed per-band bounds.
+    Works one band at a time; with inplace=True the stack itself is used as scratch, so the only
+    new full-size allocation is the uint8 result.
+    """
+    if method not in ("none", "per_band", "percentile"):
+        raise ValueError(f"Unknown normalization method: {method}")
+    out8 = np.zeros(stack.shape, dtype=np.uint8)
+    for c in range(stack.shape[-1]):
+        if method == "none":
+            # Assume reflectance scaled (0..10000) -> map linearly to [0,255]
+            scale = 255.0 / 10000.0
+            v = stack[..., c] if inplace else stack[..., c].copy()
+            v *= scale
+        else:
+            b = bounds[c] if c < len(bounds) else None
+            if b is None:
+                continue
+            lo, hi = b
+            v = stack[..., c] if inplace else stack[..., c].copy()
+            if method == "percentile":
+                np.clip(v, lo, hi, out=v)
+            v -= lo
+            v /= hi - lo
+            v *= 255.0
+        np.clip(v, 0.0, 255.0, out=v)
+        out8[..., c] = v
+    return out8
+
+
 def _normalize_stack_to_uint8(
     stack: np.ndarray,
     method: str = "percentile",
     percentiles: Tuple[float, float] = (2.0, 98.0),
+    percentile_mode: str = "exact",
+    sample_stride: int = 4,
+    inplace: bool = False,
 ) -> np.ndarray:
-    # stack: H W C float32
-    out = np.zeros_like(stack, dtype=np.float32)
-    C = stack.shape[-1]
+    # stack: H W C float32 (overwritten when inplace=True)
     if method == "none":
-        # Assume reflectance scaled (0..10000) -> map linearly to [0,255]
-        scale = 255.0 / 10000.0
-        out = np.clip(stack * scale, 0.0, 255.0)
-    elif method == "per_band":
-        for c in range(C):
-            v = stack[..., c]
-            vmin = float(np.nanmin(v))
-            vmax = float(np.nanmax(v))
-            if not math.isfinite(vmin) or not math.isfinite(vmax) or vmax <= vmin:
-                out[..., c] = 0.0
-            else:
-                out[..., c] = (v - vmin) / (vmax - vmin) * 255.0
-        out = np.clip(out, 0.0, 255.0)
-    elif method == "percentile":
-        p_lo, p_hi = percentiles
-        for c in range(C):
-            v = stack[..., c]
-            lo = float(np.nanpercentile(v, p_lo))
-            hi = float(np.nanpercentile(v, p_hi))
-            if not math.isfinite(lo) or not math.isfinite(hi) or hi <= lo:
-                out[..., c] = 0.0
-            else:
-                vv = np.clip(v, lo, hi)
-                out[..., c] = (vv - lo) / (hi - lo) * 255.0
-        out = np.clip(out, 0.0, 255.0)
-    else:
-        raise ValueError(f"Unknown normalization method: {method}")
-    return out.astype(np.uint8)
+        return _scale_to_uint8(stack, method, inplace=inplace)
+    bounds = [
+        _band_bounds(stack[..., c], method, percentiles, percentile_mode, sample_stride) for c in range(stack.shape[-1])
+    ]
+    return _scale_to_uint8(stack, method, bounds, inplace=inplace)
+
+
+def compare_percentile_modes(
+    stack: np.ndarray,
+    percentiles: Tuple[float, float] = (2.0, 98.0),
+    sample_stride: int = 4,
+    repeat: int = 3,
+) -> Dict[str, Dict]:
+    """
+    Time _normalize_stack_to_uint8 for every percentile mode on one stack and report each mode's
+    deviation from exact: max |bound - exact bound| and max |pixel - exact pixel| (uint8 levels).
+    """
+    import time
+
+    report: Dict[str, Dict] = {}
+    exact_bounds = [_band_bounds(stack[..., c], "percentile", percentiles, "exact") for c in range(stack.shape[-1])]
+    exact_px: Optional[np.ndarray] = None
+    for mode in PERCENTILE_MODES:
+        best = float("inf")
+        for _ in range(max(1, int(repeat))):
+            t0 = time.perf_counter()
+            out = _normalize_stack_to_uint8(stack, "percentile", percentiles, mode, sample_stride)
+            best = min(best, time.perf_counter() - t0)
+        if exact_px is None:
+            exact_px = out
+        bounds = [_band_bounds(stack[..., c], "percentile", percentiles, mode, sample_stride) for c in range(stack.shape[-1])]
+        dev = [
+            max(abs(a[0] - b[0]), abs(a[1] - b[1])) if a is not None and b is not None else (0.0 if a == b else float("inf"))
+            for a, b in zip(bounds, exact_bounds)
+        ]
+        report[mode] = {
+            "seconds": round(best, 4),
+            "max_bound_dev": float(max(dev)) if dev else 0.0,
+            "max_pixel_dev": int(np.max(np.abs(out.astype(np.int16) - exact_px.astype(np.int16)))),
+            "bounds": [list(b) if b is not None else None for b in bounds],
+        }
+    for mode in PERCENTILE_MODES:
+        report[mode]["speedup"] = round(report["exact"]["seconds"] / max(report[mode]["seconds"], 1e-9), 2)
+    return report
 
 
 # ----------------------------
@@ -307,6 +547,253 @@ def _write_tiff(path: str, arr: np.ndarray) -> None:
 # Core preprocessing
 # ----------------------------
 
+def _stack_chunked(
+    ds,
+    path: str,
+    bands: Sequence[str],
+    include_nir: bool,
+    method: str,
+    percentiles: Tuple[float, float],
+    chunk_rows: int,
+    percentile_mode: str = "exact",
+    sample_stride: int = 4,
+) -> np.ndarray:
+    """
+    Same result as stacking the full bands and calling _normalize_stack_to_uint8, but reads
+    chunk_rows rows at a time so only the uint8 output and one chunk of float32 bands are resident.
+    Histogram/sampled percentiles are accumulated chunk by chunk; the exact method (and the
+    histogram fallback for non-integer bands) holds one full band while computing its bounds.
+    """
+    band_vars = []
+    for b in bands:
+        var = _find_var(ds, BAND_ALIASES.get(b, (b,)))
+        if var is None:
+            raise ValueError(f"Missing band '{b}' in {path}")
+        band_vars.append(var)
+    if include_nir:
+        var = _find_var(ds, BAND_ALIASES["B08"])
+        if var is None:
+            raise ValueError("Requested include_nir=True but NIR (B08) not found")
+        band_vars.append(var)
+
+    shapes = [_var_shape2d(v) for v in band_vars]
+    # Crop to the common extent, as the whole-scene path does
+    H = min(sh[0] for sh in shapes)
+    W = min(sh[1] for sh in shapes)
+    step = max(1, int(chunk_rows))
+    cols = slice(0, W)
+
+    bounds: List[Optional[Tuple[float, float]]] = []
+    if method == "per_band":
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for var in band_vars:
+                lo, hi = np.inf, -np.inf
+                for y0 in range(0, H, step):
+                    v = _slice_var(var, slice(y0, min(H, y0 + step)), cols)
+                    lo = np.fmin(lo, np.nanmin(v))
+                    hi = np.fmax(hi, np.nanmax(v))
+                lo, hi = float(lo), float(hi)
+                bounds.append((lo, hi) if math.isfinite(lo) and math.isfinite(hi) and hi > lo else None)
+    elif method == "percentile":
+        for var in band_vars:
+            b = None
+            need_exact = percentile_mode not in ("histogram", "sampled")
+            if not need_exact:
+                hist = _IntHistogram()
+                stride = sample_stride if percentile_mode == "sampled" else 1
+                for y0 in range(0, H, step):
+                    hist.add(_sampled(_slice_var(var, slice(y0, min(H, y0 + step)), cols), stride, row0=y0))
+                    if not hist.valid:
+                        break
+                pcts = hist.percentiles(percentiles)
+                if pcts is None:
+                    need_exact = True
+                else:
+                    lo, hi = pcts
+                    b = (lo, hi) if math.isfinite(lo) and math.isfinite(hi) and hi > lo else None
+            if need_exact:
+                band = np.empty((H, W), dtype=np.float32)
+                for y0 in range(0, H, step):
+                    band[y0:y0 + step] = _slice_var(var, slice(y0, min(H, y0 + step)), cols)
+                b = _band_bounds(band, method, percentiles)
+                del band
+            bounds.append(b)
+    elif method != "none":
+        raise ValueError(f"Unknown normalization method: {method}")
+
+    out8 = np.empty((H, W, len(band_vars)), dtype=np.uint8)
+    for y0 in range(0, H, step):
+        rows = slice(y0, min(H, y0 + step))
+        chunk = np.stack([_slice_var(var, rows, cols) for var in band_vars], axis=-1)
+        out8[rows] = _scale_to_uint8(chunk, method, bounds, inplace=True)
+    return out8
+
+
+def _mask_chunked(var, source: str, threshold: float, H: int, W: int, chunk_rows: int) -> np.ndarray:
+    """Cloud mask from an SCL or cloud-probability variable, read chunk_rows rows at a time, padded/cropped to H x W."""
+    mH, mW = _var_shape2d(var)
+    h, w = min(H, mH), min(W, mW)
+    step = max(1, int(chunk_rows))
+    scale = 1.0
+    if source != "scl":
+        # Like _cloudprob_to_mask: 0..100 inputs are detected from the scene maximum
+        peak = -np.inf
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for y0 in range(0, mH, step):
+                peak = np.fmax(peak, np.nanmax(_slice_var(var, slice(y0, min(mH, y0 + step)), slice(0, mW))))
+        scale = 100.0 if peak > 1.0 else 1.0
+    mask01 = np.zeros((H, W), dtype=np.uint8)
+    for y0 in range(0, h, step):
+        rows = slice(y0, min(h, y0 + step))
+        v = _slice_var(var, rows, slice(0, w))
+        if source == "scl":
+            mask01[rows, :w] = _scl_to_cloud_mask(v)
+        else:
+            mask01[rows, :w] = (v / scale >= float(threshold)).astype(np.uint8)
+    return mask01
+
+
+def _process_scene(path: str, opts: Dict) -> Dict:
+    """
+    Convert one .nc file and write its outputs. Runs in a worker process when workers > 1, so
+    every error is captured here and reported back instead of raised.
+
+    Returns {"counts": per-file count increments, "record": (image, mask) or None, "messages": [...]}.
+    """
+    base = os.path.splitext(os.path.basename(path))[0]
+    counts = {"processed": 0, "images": 0, "masks": 0, "skipped": 0, "warnings": 0}
+    messages: List[str] = []
+    result = {"counts": counts, "record": None, "messages": messages}
+
+    def warn(msg: str) -> None:
+        messages.append(f"Warning: {msg}")
+        counts["warnings"] += 1
+
+    try:
+        ds = _open_netcdf(path)
+    except Exception as e:
+        warn(f"cannot open {path}: {e}")
+        counts["skipped"] += 1
+        return result
+
+    bands = opts["bands"]
+    include_nir = opts["include_nir"]
+    method, percentiles = opts["method"], opts["percentiles"]
+    percentile_mode, sample_stride = opts.get("percentile_mode", "exact"), int(opts.get("sample_stride", 4))
+    mask_source, mask_threshold = opts["mask_source"], opts["mask_threshold"]
+    chunk_rows = int(opts.get("chunk_rows") or 0)
+    try:
+        if chunk_rows > 0:
+            out8 = _stack_chunked(
+                ds, path, bands, include_nir, method, percentiles, chunk_rows, percentile_mode, sample_stride
+            )
+            H, W = out8.shape[:2]
+        else:
+            # Bands order as requested
+            band_arrays: List[np.ndarray] = []
+            for b in bands:
+                arr = _read_band(ds, b)
+                if arr is None:
+                    raise ValueError(f"Missing band '{b}' in {path}")
+                band_arrays.append(arr.astype(np.float32))
+
+            if include_nir:
+                nir = _read_band(ds, "B08")
+                if nir is None:
+                    raise ValueError("Requested include_nir=True but NIR (B08) not found")
+                band_arrays.append(nir.astype(np.float32))
+
+            # Align shapes
+            shapes = [a.shape for a in band_arrays]
+            H, W = shapes[0]
+            if not all(sh == (H, W) for sh in shapes):
+                # Try to crop to min shape
+                minH = min(sh[0] for sh in shapes)
+                minW = min(sh[1] for sh in shapes)
+                band_arrays = [a[:minH, :minW] for a in band_arrays]
+                H, W = minH, minW
+
+            stack = np.stack(band_arrays, axis=-1)  # H W C
+            del band_arrays
+
+            # Normalize to uint8 [0,255]
+            out8 = _normalize_stack_to_uint8(
+                stack,
+                method=method,
+                percentiles=percentiles,
+                percentile_mode=percentile_mode,
+                sample_stride=sample_stride,
+                inplace=True,
+            )
+            del stack
+
+        # Cloud mask (optional)
+        mask01: Optional[np.ndarray] = None
+        if opts["mask_enabled"]:
+            marr: Optional[np.ndarray] = None
+            if mask_source in ("scl", "cloud_probability", "cloudprob", "probability"):
+                is_scl = mask_source == "scl"
+                names = SCL_ALIASES if is_scl else CLOUD_PROB_ALIASES
+                found = False
+                if chunk_rows > 0:
+                    var = _find_var(ds, names)
+                    if var is not None:
+                        found = True
+                        mask01 = _mask_chunked(var, "scl" if is_scl else "probability", mask_threshold, H, W, chunk_rows)
+                else:
+                    raw = _read_optional_var(ds, names)
+                    if raw is not None:
+                        found = True
+                        marr = _scl_to_cloud_mask(raw) if is_scl else _cloudprob_to_mask(raw, threshold=mask_threshold)
+                if not found:
+                    warn(f"{'SCL' if is_scl else 'cloud probability'} not found for {base}; proceeding without mask")
+            elif mask_source == "heuristic":
+                marr = _heuristic_cloud_mask(out8)
+            else:
+                warn(f"unknown cloud mask source '{mask_source}', skipping mask")
+
+            if marr is not None:
+                if marr.shape != (H, W):
+                    mH, mW = marr.shape
+                    mH2 = min(H, mH)
+                    mW2 = min(W, mW)
+                    mask01 = np.zeros((H, W), dtype=np.uint8)
+                    mask01[:mH2, :mW2] = marr[:mH2, :mW2]
+                else:
+                    mask01 = marr.astype(np.uint8)
+
+        # Write outputs
+        ext = ".png" if opts["use_png"] else ".tif"
+        img_out = os.path.join(opts["img_dir"], base + ext)
+        if opts["use_png"]:
+            _write_png(img_out, out8)
+        else:
+            _write_tiff(img_out, out8)
+        counts["images"] += 1
+
+        mask_out_path: Optional[str] = None
+        if mask01 is not None:
+            ensure_dir(opts["msk_dir"])
+            mask_out_path = os.path.join(opts["msk_dir"], base + ".png")
+            _write_mask_png(mask_out_path, mask01)
+            counts["masks"] += 1
+
+        result["record"] = (img_out, mask_out_path)
+        counts["processed"] += 1
+
+    except Exception as e:
+        warn(f"skipping {base} due to error: {e}")
+        counts["skipped"] += 1
+    finally:
+        try:
+            ds.close()  # type: ignore
+        except Exception:
+            pass
+    return result
+
+
 def preprocess_sentinel2_dataset(
     input_dir: str,
     output_dir: str,
@@ -317,6 +804,8 @@ def preprocess_sentinel2_dataset(
     output_format: str = "png",
     structure: str = "folders",  # "folders" | "manifest"
     seed: int = 1337,
+    workers: int = 1,
+    chunk_rows: int = 0,
 ) -> Dict[str, int]:
     """
     Convert Sentinel-2 .nc files into RGB (optionally +NIR) images, with optional cloud masks.
@@ -330,6 +819,13 @@ def preprocess_sentinel2_dataset(
           output_dir/masks/... (if any)
           output_dir/manifests/{train,val,test}.csv with (image_path,mask_path)
 
+    Performance:
+      - workers > 1 converts files in a process pool (0 = all CPUs). A failing file only counts as
+        skipped; results are merged in file order, so counts and the seeded manifest split are the
+        same as with workers=1.
+      - chunk_rows > 0 reads and normalizes each scene in blocks of that many rows to bound peak
+        memory per worker; the output is identical to whole-scene processing.
+
     Returns stats dict with counts and warnings.
     """
     rng = np.random.RandomState(seed)
@@ -343,6 +839,10 @@ def preprocess_sentinel2_dataset(
     if isinstance(percentiles, list):
         percentiles = (float(percentiles[0]), float(percentiles[1]))
     percentiles = tuple(map(float, percentiles))  # type: ignore
+    percentile_mode = str(normalize_cfg.get("percentile_mode", "exact")).lower()
+    sample_stride = int(normalize_cfg.get("sample_stride", 4))
+    if percentile_mode not in PERCENTILE_MODES:
+        raise ValueError(f"normalize.percentile_mode must be one of {PERCENTILE_MODES}")
 
     mask_enabled = bool(cloud_mask_cfg.get("enabled", False))
     mask_source = str(cloud_mask_cfg.get("source", "scl")).lower()
@@ -370,109 +870,44 @@ def preprocess_sentinel2_dataset(
 
     records: List[Tuple[str, Optional[str]]] = []
     counts = {"processed": 0, "images": 0, "masks": 0, "skipped": 0, "manifest": 0, "warnings": 0}
+    opts = {
+        "img_dir": img_dir,
+        "msk_dir": msk_dir,
+        "bands": tuple(bands),
+        "include_nir": bool(include_nir),
+        "method": method,
+        "percentiles": percentiles,
+        "percentile_mode": percentile_mode,
+        "sample_stride": sample_stride,
+        "mask_enabled": mask_enabled,
+        "mask_source": mask_source,
+        "mask_threshold": mask_threshold,
+        "use_png": use_png,
+        "chunk_rows": int(chunk_rows),
+    }
 
-    for path in files:
-        base = os.path.splitext(os.path.basename(path))[0]
-        try:
-            ds = _open_netcdf(path)
-        except Exception as e:
-            print(f"Warning: cannot open {path}: {e}")
-            counts["skipped"] += 1
-            counts["warnings"] += 1
-            continue
-
-        try:
-            # Bands order as requested
-            band_arrays: List[np.ndarray] = []
-            for b in bands:
-                arr = _read_band(ds, b)
-                if arr is None:
-                    raise ValueError(f"Missing band '{b}' in {path}")
-                band_arrays.append(arr.astype(np.float32))
-
-            if include_nir:
-                nir = _read_band(ds, "B08")
-                if nir is None:
-                    raise ValueError("Requested include_nir=True but NIR (B08) not found")
-                band_arrays.append(nir.astype(np.float32))
-
-            # Align shapes
-            shapes = [a.shape for a in band_arrays]
-            H, W = shapes[0]
-            if not all(s == (H, W) for s in shapes):
-                # Try to crop to min shape
-                minH = min(s[0] for s in shapes)
-                minW = min(s[1] for s in shapes)
-                band_arrays = [a[:minH, :minW] for a in band_arrays]
-                H, W = minH, minW
-
-            stack = np.stack(band_arrays, axis=-1)  # H W C
-
-            # Normalize to uint8 [0,255]
-            out8 = _normalize_stack_to_uint8(stack, method=method, percentiles=percentiles)
-
-            # Cloud mask (optional)
-            mask01: Optional[np.ndarray] = None
-            if mask_enabled:
-                marr: Optional[np.ndarray] = None
-                if mask_source == "scl":
-                    scl = _read_optional_var(ds, SCL_ALIASES)
-                    if scl is not None:
-                        marr = _scl_to_cloud_mask(scl)
-                    else:
-                        print(f"Warning: SCL not found for {base}; proceeding without mask")
-                        counts["warnings"] += 1
-                elif mask_source in ("cloud_probability", "cloudprob", "probability"):
-                    cp = _read_optional_var(ds, CLOUD_PROB_ALIASES)
-                    if cp is not None:
-                        marr = _cloudprob_to_mask(cp, threshold=mask_threshold)
-                    else:
-                        print(f"Warning: cloud probability not found for {base}; proceeding without mask")
-                        counts["warnings"] += 1
-                elif mask_source == "heuristic":
-                    marr = _heuristic_cloud_mask(out8)
-                else:
-                    print(f"Warning: unknown cloud mask source '{mask_source}', skipping mask")
+    def merge(result: Dict) -> None:
+        for msg in result["messages"]:
+            print(msg)
+        for k, v in result["counts"].items():
+            counts[k] += v
+        if result["record"] is not None:
+            records.append(result["record"])
+
+    workers = (os.cpu_count() or 1) if int(workers) <= 0 else int(workers)
+    if workers <= 1 or len(files) <= 1:
+        for path in files:
+            merge(_process_scene(path, opts))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            futures = [pool.submit(_process_scene, path, opts) for path in files]
+            for path, fut in zip(files, futures):
+                try:
+                    merge(fut.result())
+                except Exception as e:  # worker crashed (e.g. killed for memory)
+                    counts["skipped"] += 1
                     counts["warnings"] += 1
-
-                if marr is not None:
-                    if marr.shape != (H, W):
-                        mH, mW = marr.shape
-                        mH2 = min(H, mH)
-                        mW2 = min(W, mW)
-                        mask01 = np.zeros((H, W), dtype=np.uint8)
-                        mask01[:mH2, :mW2] = marr[:mH2, :mW2]
-                    else:
-                        mask01 = marr.astype(np.uint8)
-
-            # Write outputs
-            ext = ".png" if use_png else ".tif"
-            img_out = os.path.join(img_dir, base + ext)
-            if use_png:
-                _write_png(img_out, out8)
-            else:
-                _write_tiff(img_out, out8)
-            counts["images"] += 1
-
-            mask_out_path: Optional[str] = None
-            if mask01 is not None:
-                ensure_dir(msk_dir)
-                mask_out_path = os.path.join(msk_dir, base + ".png")
-                _write_mask_png(mask_out_path, mask01)
-                counts["masks"] += 1
-
-            records.append((img_out, mask_out_path))
-            counts["processed"] += 1
-
-        except Exception as e:
-            print(f"Warning: skipping {base} due to error: {e}")
-            counts["skipped"] += 1
-            counts["warnings"] += 1
-        finally:
-            try:
-                ds.close()  # type: ignore
-            except Exception:
-                pass
+                    print(f"Warning: skipping {os.path.basename(path)}: worker failed ({type(e).__name__}: {e})")
 
     # Manifest splitting
     if structure == "manifest" and len(records) > 0:
@@ -501,54 +936,139 @@ def preprocess_sentinel2_dataset(
 
 
 # ----------------------------
-# Minimal dataset helper for .nc (optional integration)
+# Window reading (optional integration)
 # ----------------------------
 
+def _normalize_opts(normalize_cfg: Optional[Dict]) -> Tuple[str, Tuple[float, float], str, int]:
+    if normalize_cfg is None:
+        normalize_cfg = {"method": "percentile", "percentiles": (2.0, 98.0)}
+    method = str(normalize_cfg.get("method", "percentile")).lower()
+    percentiles = normalize_cfg.get("percentiles", (2.0, 98.0))
+    percentiles = (float(percentiles[0]), float(percentiles[1]))
+    percentile_mode = str(normalize_cfg.get("percentile_mode", "exact")).lower()
+    sample_stride = int(normalize_cfg.get("sample_stride", 4))
+    return method, percentiles, percentile_mode, sample_stride
+
+
+class NetCDFScene:
+    """
+    One open .nc file for repeated window reads (tiling, inference). The file handle and the
+    band variable lookups are reused across bands and calls; each read only pulls the requested
+    hyperslab through h5py/netCDF4 slicing, so a small area of a huge scene is never fully loaded.
+
+        with NetCDFScene(path) as scene:
+            H, W = scene.shape()
+            for window in windows:
+                img = read_netcdf_window(scene, window=window)
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.ds = _open_netcdf(path)
+        self._vars: Dict[str, object] = {}
+
+    def band_var(self, band: str):
+        if band not in self._vars:
+            var = _find_var(self.ds, BAND_ALIASES.get(band, (band,)))
+            if var is None:
+                if band == "B08":
+                    raise ValueError("Requested include_nir=True but NIR (B08) not found")
+                raise ValueError(f"Missing band '{band}' in {self.path}")
+            self._vars[band] = var
+        return self._vars[band]
+
+    def shape(self, bands: Sequence[str] = ("B04", "B03", "B02")) -> Tuple[int, int]:
+        """Common (H, W) of bands; mismatched bands are cropped to it, as in whole-scene reads."""
+        shapes = [_var_shape2d(self.band_var(b)) for b in bands]
+        return min(sh[0] for sh in shapes), min(sh[1] for sh in shapes)
+
+    def window_for_bbox(self, bbox: Sequence[float], bands: Sequence[str] = ("B04", "B03", "B02")) -> Tuple[int, int, int, int]:
+        return _bbox_to_window(self.ds, bbox, self.shape(bands))
+
+    def read_bands(
+        self,
+        bands: Sequence[str] = ("B04", "B03", "B02"),
+        window: Optional[Tuple[int, int, int, int]] = None,
+        bbox: Optional[Sequence[float]] = None,
+    ) -> np.ndarray:
+        """Raw float32 h x w x C stack of bands over window (or bbox); the whole scene when neither is given."""
+        if window is not None and bbox is not None:
+            raise ValueError("Pass either window or bbox, not both")
+        shape = self.shape(bands)
+        if bbox is not None:
+            window = _bbox_to_window(self.ds, bbox, shape)
+        rows, cols = _window_slices(window, shape) if window is not None else (slice(0, shape[0]), slice(0, shape[1]))
+        return np.stack([_slice_var(self.band_var(b), rows, cols) for b in bands], axis=-1)
+
+    def close(self) -> None:
+        try:
+            self.ds.close()  # type: ignore
+        except Exception:
+            pass
+
+    def __enter__(self) -> "NetCDFScene":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_netcdf_window(
+    source,
+    window: Optional[Tuple[int, int, int, int]] = None,
+    bbox: Optional[Sequence[float]] = None,
+    bands: Sequence[str] = ("B04", "B03", "B02"),
+    include_nir: bool = False,
+    normalize_cfg: Optional[Dict] = None,
+    bounds: Optional[Sequence[Optional[Tuple[float, float]]]] = None,
+) -> np.ndarray:
+    """
+    Read a region of a .nc scene as a uint8 RGB (+optional NIR) image.
+
+    Args:
+        source: path to the .nc file, or an open NetCDFScene to reuse across many windows
+        window: (row_off, col_off, height, width) in pixels; clipped to the scene
+        bbox: (min_x, min_y, max_x, max_y) in the scene's x/y (or lon/lat) coordinates,
+              as an alternative to window; neither means the whole scene
+        normalize_cfg: as in preprocess_sentinel2_dataset
+        bounds: per-band (lo, hi) to scale with instead of computing them from this window,
+                e.g. scene-wide bounds so adjacent tiles share one contrast stretch
+
+    Returns: np.ndarray h x w x 3 (or 4), dtype=uint8.
+    """
+    method, percentiles, percentile_mode, sample_stride = _normalize_opts(normalize_cfg)
+    names = tuple(bands) + (("B08",) if include_nir else ())
+    scene = source if isinstance(source, NetCDFScene) else NetCDFScene(source)
+    try:
+        stack = scene.read_bands(names, window=window, bbox=bbox)
+    finally:
+        if scene is not source:
+            scene.close()
+    if bounds is not None and method != "none":
+        return _scale_to_uint8(stack, method, list(bounds), inplace=True)
+    return _normalize_stack_to_uint8(
+        stack, method=method, percentiles=percentiles, percentile_mode=percentile_mode,
+        sample_stride=sample_stride, inplace=True,
+    )
+
+
 def read_netcdf_rgb(
     path: str,
     bands: Sequence[str] = ("B04", "B03", "B02"),
     include_nir: bool = False,
     normalize_cfg: Optional[Dict] = None,
+    window: Optional[Tuple[int, int, int, int]] = None,
+    bbox: Optional[Sequence[float]] = None,
 ) -> np.ndarray:
     """
     Convenience helper to read a single .nc as RGB (+optional NIR) uint8 image.
+    window/bbox restrict the read to a region (see read_netcdf_window).
 
     Returns: np.ndarray HxWx3 or HxWx4, dtype=uint8 normalized as requested.
     """
-    if normalize_cfg is None:
-        normalize_cfg = {"method": "percentile", "percentiles": (2.0, 98.0)}
-    method = str(normalize_cfg.get("method", "percentile")).lower()
-    percentiles = normalize_cfg.get("percentiles", (2.0, 98.0))
-    if isinstance(percentiles, list):
-        percentiles = (float(percentiles[0]), float(percentiles[1]))
-    percentiles = tuple(map(float, percentiles))  # type: ignore
-
-    ds = _open_netcdf(path)
-    try:
-        arrs: List[np.ndarray] = []
-        for b in bands:
-            a = _read_band(ds, b)
-            if a is None:
-                raise ValueError(f"Missing band {b} in {path}")
-            arrs.append(a.astype(np.float32))
-        if include_nir:
-            nir = _read_band(ds, "B08")
-            if nir is None:
-                raise ValueError("include_nir=True but NIR (B08) missing")
-            arrs.append(nir.astype(np.float32))
-        shapes = [a.shape for a in arrs]
-        H, W = shapes[0]
-        if not all(s == (H, W) for s in shapes):
-            minH = min(s[0] for s in shapes)
-            minW = min(s[1] for s in shapes)
-            arrs = [a[:minH, :minW] for a in arrs]
-        stack = np.stack(arrs, axis=-1)
-        return _normalize_stack_to_uint8(stack, method=method, percentiles=percentiles)
-    finally:
-        try:
-            ds.close()  # type: ignore
-        except Exception:
-            pass
+    return read_netcdf_window(
+        path, window=window, bbox=bbox, bands=bands, include_nir=include_nir, normalize_cfg=normalize_cfg
+    )
 
 
 # ----------------------------
@@ -558,17 +1078,28 @@ def read_netcdf_rgb(
 def _parse_cli() -> argparse.Namespace:
     p = argparse.ArgumentParser("Sentinel-2 NetCDF preprocessing")
     p.add_argument("--input-dir", type=str, required=True, help="Directory with .nc files")
-    p.add_argument("--output-dir", type=str, required=True, help="Output base directory")
+    p.add_argument("--output-dir", type=str, default=None, help="Output base directory")
     p.add_argument("--bands", type=str, default="B04,B03,B02", help="Comma-separated band names order")
     p.add_argument("--include-nir", action="store_true", help="Append NIR (B08) as 4th channel")
     p.add_argument("--normalize-method", type=str, default="percentile", choices=["percentile", "per_band", "none"])
     p.add_argument("--percentiles", type=str, default="2,98", help="Used when normalize-method=percentile")
+    p.add_argument(
+        "--percentile-mode", type=str, default="histogram", choices=list(PERCENTILE_MODES),
+        help="histogram: one bincount pass, identical to exact for integer bands; sampled: approximate, every Nth row/col",
+    )
+    p.add_argument("--sample-stride", type=int, default=4, help="Row/column step for --percentile-mode sampled")
+    p.add_argument(
+        "--compare-percentile-modes", action="store_true",
+        help="Time every percentile mode on the first input file, print speed and deviation from exact, write nothing",
+    )
     p.add_argument("--cloud-mask-enabled", action="store_true", help="Generate cloud mask if possible")
     p.add_argument("--cloud-mask-source", type=str, default="scl", choices=["scl", "cloud_probability", "heuristic"])
     p.add_argument("--cloud-threshold", type=float, default=0.4, help="Cloud probability threshold (0..1)")
     p.add_argument("--output-format", type=str, default="png", choices=["png", "tif", "tiff"])
     p.add_argument("--structure", type=str, default="folders", choices=["folders", "manifest"])
     p.add_argument("--seed", type=int, default=1337)
+    p.add_argument("--workers", type=int, default=1, help="Worker processes, one file per task (0 = all CPUs)")
+    p.add_argument("--chunk-rows", type=int, default=0, help="Process scenes in blocks of N rows to bound memory (0 = whole scene)")
     return p.parse_args()
 
 
@@ -576,7 +1107,36 @@ def _main(argv: Optional[List[str]] = None) -> int:
     args = _parse_cli()
     bands = tuple([b.strip() for b in str(args.bands).split(",") if b.strip()])
     p_lo, p_hi = [float(x) for x in str(args.percentiles).split(",")]
-    norm_cfg = {"method": args.normalize_method, "percentiles": (p_lo, p_hi)}
+    norm_cfg = {
+        "method": args.normalize_method,
+        "percentiles": (p_lo, p_hi),
+        "percentile_mode": args.percentile_mode,
+        "sample_stride": int(args.sample_stride),
+    }
+    if args.compare_percentile_modes:
+        import json
+
+        files = list_netcdf_files(args.input_dir)
+        if not files:
+            print(f"No .nc files found in {args.input_dir}", file=sys.stderr)
+            return 2
+        ds = _open_netcdf(files[0])
+        try:
+            arrs = [_read_band(ds, b) for b in bands]
+        finally:
+            ds.close()
+        if any(a is None for a in arrs):
+            print(f"Missing bands {bands} in {files[0]}", file=sys.stderr)
+            return 2
+        H = min(a.shape[0] for a in arrs)
+        W = min(a.shape[1] for a in arrs)
+        stack = np.stack([a[:H, :W] for a in arrs], axis=-1)
+        report = compare_percentile_modes(stack, (p_lo, p_hi), sample_stride=int(args.sample_stride))
+        print(json.dumps({"file": files[0], "shape": list(stack.shape), "modes": report}, indent=2))
+        return 0
+    if not args.output_dir:
+        print("--output-dir is required", file=sys.stderr)
+        return 2
     cm_cfg = {
         "enabled": bool(args.cloud_mask_enabled),
         "source": args.cloud_mask_source,
@@ -592,6 +1152,8 @@ def _main(argv: Optional[List[str]] = None) -> int:
         output_format=args.output_format,
         structure=args.structure,
         seed=int(args.seed),
+        workers=int(args.workers),
+        chunk_rows=int(args.chunk_rows),
     )
     print(stats)
     return 0
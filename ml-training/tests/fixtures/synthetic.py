@@ -54,7 +54,7 @@ def make_synthetic_raw_dataset(base_dir: str, n_images: int = 3, size: int = 256
         mask = (cv2.GaussianBlur(mask.astype(np.float32), (5, 5), 0) > 0.2).astype(np.uint8)
 
         # Blend shapes into image channels for simple signal
-        img = cv2.add(img, (mask * 40)[..., None])
+        img = np.clip(img.astype(np.int16) + (mask * 40)[..., None], 0, 255).astype(np.uint8)
 
         base = f"syn_{i:03d}"
         cv2.imwrite(os.path.join(images_dir, base + ".png"), cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
@@ -8,7 +8,7 @@ ML_TRAINING_ROOT = os.path.abspath(os.path.join(HERE, ".."))
 if ML_TRAINING_ROOT not in sys.path:
     sys.path.insert(0, ML_TRAINING_ROOT)
 
-from dataset import build_augmentations_from_cfg, set_global_seeds  # noqa: E402
+from dataset import BatchAugmenter, build_augmentations_from_cfg, set_global_seeds  # noqa: E402
 
 
 def _make_rgb_with_square(h=64, w=64, square=(16, 16, 32, 32), val=255):
@@ -151,4 +151,83 @@ def test_determinism_fixed_seed():
     img2, mask2 = out2["image"], out2["mask"]
 
     assert np.array_equal(img1, img2), "With fixed seed, repeated pipeline builds should yield identical image outputs"
-    assert np.array_equal(mask1, mask2), "With fixed seed, repeated pipeline builds should yield identical mask outputs"
\ No newline at end of file
+    assert np.array_equal(mask1, mask2), "With fixed seed, repeated pipeline builds should yield identical mask outputs"
+
+
+def test_batch_augmenter_vectorized_transforms():
+    rng = np.random.RandomState(0)
+    x = rng.randint(0, 256, size=(64, 16, 16, 3)).astype(np.uint8)
+    y = (rng.rand(64, 16, 16) > 0.5).astype(np.uint8)
+    cfg = {"hflip": 0.5, "vflip": 0.5, "rotate90": 0.5, "brightness_contrast": 0.0}
+
+    xa, ya = BatchAugmenter(cfg, image_channels=3, seed=7)(x, y)
+    assert xa.dtype == np.uint8 and xa.shape == x.shape and ya.shape == y.shape
+    assert np.array_equal(x, x.copy())  # inputs untouched
+    # Every sample is one of the 8 dihedral variants of its input, with the mask moved alongside
+    changed = 0
+    for i in range(len(x)):
+        variants = [(np.rot90(f(x[i]), k), np.rot90(f(y[i]), k)) for f in (lambda a: a, np.fliplr) for k in range(4)]
+        assert any(np.array_equal(xa[i], vx) and np.array_equal(ya[i], vy) for vx, vy in variants)
+        changed += not np.array_equal(xa[i], x[i])
+    assert 0 < changed < len(x)
+
+    # Same seed -> same batch; another seed -> different draws
+    xb, yb = BatchAugmenter(cfg, image_channels=3, seed=7)(x, y)
+    np.testing.assert_array_equal(xa, xb)
+    np.testing.assert_array_equal(ya, yb)
+    assert not np.array_equal(xa, BatchAugmenter(cfg, image_channels=3, seed=8)(x, y)[0])
+
+
+def test_batch_augmenter_photometric_and_fallback():
+    img, mask = _make_rgba_with_square(h=32, w=32, square=(8, 8, 20, 20))
+    x, y = np.stack([img] * 8), np.stack([mask] * 8)
+    bc = {"brightness_contrast": {"enabled": True, "p": 1.0, "brightness_limit": 0.3, "contrast_limit": 0.0}}
+
+    # 4-channel photometric stays off unless allowed, and then only touches RGB
+    xa, ya = BatchAugmenter(bc, image_channels=4, seed=1)(x, y)
+    np.testing.assert_array_equal(xa, x)
+    xa, ya = BatchAugmenter({**bc, "allow_photometric_on_multichannel": True}, image_channels=4, seed=1)(x, y)
+    np.testing.assert_array_equal(xa[..., 3], x[..., 3])
+    np.testing.assert_array_equal(ya, y)
+    assert not np.array_equal(xa[..., :3], x[..., :3])
+    # Contrast-free brightness shifts each sample by one offset (clipped to 0..255)
+    for i in range(len(x)):
+        diff = xa[i, 10, 10, 0].astype(int) - x[i, 10, 10, 0].astype(int)
+        assert abs(diff) <= 0.3 * 255 + 1
+
+    # Transforms without a batch kernel fall back to the per-sample albumentations pipeline
+    ssr = {"hflip": 0.5, "shift_scale_rotate": {"enabled": True, "p": 1.0, "shift_limit": 0.2, "scale_limit": 0.0,
+                                                 "rotate_limit": 0, "border_mode": "constant"}}
+    aug = BatchAugmenter(ssr, image_channels=3, seed=3)
+    assert aug.residual_spatial is not None and aug.residual_photometric is None and aug.p_hflip == 0.5
+    names = [type(t).__name__ for t in aug.residual_spatial.transforms]
+    assert "ShiftScaleRotate" in names and "HorizontalFlip" not in names
+    rgb, m = _make_rgb_with_square(h=32, w=32, square=(8, 8, 20, 20))
+    xs, ys = aug(np.stack([rgb] * 4), np.stack([m] * 4))
+    assert set(np.unique(ys)) <= {0, 1}
+    np.testing.assert_array_equal(xs, BatchAugmenter(ssr, image_channels=3, seed=3)(np.stack([rgb] * 4), np.stack([m] * 4))[0])
+    plain = BatchAugmenter({"hflip": 0.5}, image_channels=3)
+    assert plain.residual_spatial is None and plain.residual_photometric is None
+
+
+def test_batch_augmenter_orders_transforms_like_albumentations():
+    cfg = {
+        "shift_scale_rotate": {"enabled": True, "p": 1.0, "shift_limit": 0.2, "scale_limit": 0.0,
+                               "rotate_limit": 0, "border_mode": "constant"},
+        "brightness_contrast": {"enabled": True, "p": 1.0, "brightness_limit": 0.3, "contrast_limit": 0.0},
+        "blur": {"enabled": True, "p": 1.0, "blur_limit": 3},
+    }
+    aug = BatchAugmenter(cfg, image_channels=3, seed=5)
+    assert [type(t).__name__ for t in aug.residual_photometric.transforms] == ["Blur"]
+    assert [type(t).__name__ for t in build_augmentations_from_cfg(cfg, image_channels=3).transforms] == [
+        "ShiftScaleRotate", "RandomBrightnessContrast", "Blur"
+    ]
+
+    # Shifting first leaves a zero border that brightness/contrast then lifts, as albumentations does
+    x = np.full((16, 32, 32, 3), 200, dtype=np.uint8)
+    y = np.ones((16, 32, 32), dtype=np.uint8)
+    aug.residual_photometric = None  # keep border pixels exact
+    xa, ya = aug(x, y)
+    borders = [xa[i][ya[i] == 0] for i in range(len(x)) if ya[i].min() == 0]
+    assert borders and any(b.min() > 0 for b in borders)
+    assert all(len(np.unique(b)) == 1 for b in borders)
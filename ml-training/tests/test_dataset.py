@@ -12,7 +12,17 @@ ML_TRAINING_ROOT = os.path.abspath(os.path.join(HERE, ".."))
 if ML_TRAINING_ROOT not in sys.path:
     sys.path.insert(0, ML_TRAINING_ROOT)
 
-from dataset import build_sequences_from_tiles  # noqa: E402
+from dataset import (  # noqa: E402
+    PackedTileDataset,
+    TileDataset,
+    build_input_pipeline,
+    build_sequences_from_tiles,
+    measure_input_throughput,
+    pack_dataset,
+    perform_tiling,
+    write_mask_png,
+    write_png,
+)
 from tests.fixtures.synthetic import (  # noqa: E402
     make_synthetic_raw_dataset,
     make_tiled_dataset,
@@ -62,4 +72,150 @@ def test_tiling_and_loader_shapes(tmp_dirs):
     xv, yv = val_seq[0]
     assert xv.shape[-1] == 3 and yv.shape[-1] == 1
     assert xv.shape[1] == xv.shape[2] == 128
-    assert yv.shape[1] == yv.shape[2] == 128
\ No newline at end of file
+    assert yv.shape[1] == yv.shape[2] == 128
+
+
+def _write_tiles(tiles_dir, split, n, size=32, seed=0):
+    rng = np.random.RandomState(seed)
+    img_dir = os.path.join(tiles_dir, split, "images")
+    msk_dir = os.path.join(tiles_dir, split, "masks")
+    os.makedirs(img_dir, exist_ok=True)
+    os.makedirs(msk_dir, exist_ok=True)
+    for i in range(n):
+        name = f"t_{i:03d}.png"
+        write_png(os.path.join(img_dir, name), rng.randint(0, 256, size=(size, size, 3)).astype(np.uint8))
+        write_mask_png(os.path.join(msk_dir, name), (rng.rand(size, size) > 0.5).astype(np.uint8))
+    return sorted(os.path.join(img_dir, f) for f in os.listdir(img_dir)), sorted(os.path.join(msk_dir, f) for f in os.listdir(msk_dir))
+
+
+def test_pack_shards_roundtrip_matches_png_loader(tmp_dirs):
+    data_dir = tmp_dirs["DATA_DIR"]
+    tiles_dir = os.path.join(data_dir, "tiles")
+    train_imgs, train_msks = _write_tiles(tiles_dir, "train", 7, seed=1)
+    _write_tiles(tiles_dir, "val", 3, seed=2)
+
+    stats = pack_dataset(data_dir, shard_size=3)
+    assert stats == {"train": {"tiles": 7, "shards": 3}, "val": {"tiles": 3, "shards": 1}}
+    packed_train = os.path.join(data_dir, "packed", "train")
+    with open(os.path.join(packed_train, "index.json"), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    assert index["tile_shape"] == [32, 32, 3] and index["count"] == 7
+    assert [s["count"] for s in index["shards"]] == [3, 3, 1]
+
+    packed = PackedTileDataset(packed_train, batch_size=4, shuffle=False, augment=False)
+    assert isinstance(packed.images[0], np.memmap)
+    ref = TileDataset(train_imgs, train_msks, batch_size=4, shuffle=False, augment=False)
+    assert len(packed) == len(ref) == 2
+    for b in range(len(ref)):
+        x, y = packed[b]
+        xr, yr = ref[b]
+        np.testing.assert_array_equal(x, xr)
+        np.testing.assert_array_equal(y, yr)
+
+    # Shuffled + augmented batches keep shapes and value ranges
+    aug = {"hflip": 0.5, "vflip": 0.5, "rotate90": 0.5, "brightness_contrast": 0.2}
+    a = PackedTileDataset(packed_train, batch_size=4, shuffle=True, augment=True, aug_cfg=aug, seed=5)
+    xa, ya = a[0]
+    assert xa.shape == (4, 32, 32, 3) and ya.shape == (4, 32, 32, 1)
+    assert np.all((ya == 0.0) | (ya == 1.0))
+    assert 0.0 <= xa.min() and xa.max() <= 1.0
+
+
+def _tree_bytes(root):
+    out = {}
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            p = os.path.join(dirpath, f)
+            with open(p, "rb") as fh:
+                out[os.path.relpath(p, root)] = fh.read()
+    return out
+
+
+@pytest.mark.timeout(120)
+def test_parallel_tiling_matches_serial(tmp_path):
+    serial_dir, parallel_dir = str(tmp_path / "serial"), str(tmp_path / "parallel")
+    for d in (serial_dir, parallel_dir):
+        make_synthetic_raw_dataset(d, n_images=5, size=160)
+
+    kwargs = dict(tile_size=64, overlap=16, min_mask_coverage=0.01, val_ratio=0.4, seed=7)
+    serial = perform_tiling(serial_dir, workers=1, **kwargs)
+    parallel = perform_tiling(parallel_dir, workers=2, max_pending=1, writer_threads=3, write_queue_size=2, **kwargs)
+
+    assert serial == parallel
+    assert serial["train_tiles"] > 0 and serial["val_tiles"] > 0
+    a = _tree_bytes(os.path.join(serial_dir, "tiles"))
+    b = _tree_bytes(os.path.join(parallel_dir, "tiles"))
+    assert sorted(a) == sorted(b)
+    assert all(a[k] == b[k] for k in a)
+    assert len(a) == 2 * (serial["train_tiles"] + serial["val_tiles"])
+
+
+def test_tf_data_pipeline_matches_sequences(tmp_dirs):
+    pytest.importorskip("tensorflow")
+    tiles_dir = os.path.join(tmp_dirs["DATA_DIR"], "tiles")
+    _write_tiles(tiles_dir, "train", 7, seed=3)
+    _write_tiles(tiles_dir, "val", 5, seed=4)
+    aug = {"hflip": 0.5, "vflip": 0.5, "rotate90": 0.5, "brightness_contrast": 0.2}
+    train_seq, val_seq = build_sequences_from_tiles(tiles_dir, batch_size=2, augment_cfg=aug, seed=11)
+
+    cfg = {"type": "tf_data", "num_parallel_calls": 2, "cache_val": True}
+    train_ds, val_ds = build_input_pipeline(train_seq, val_seq, cfg)
+    assert build_input_pipeline(train_seq, val_seq, {"type": "sequence"}) == (train_seq, val_seq)
+    with pytest.raises(ValueError):
+        build_input_pipeline(train_seq, val_seq, {"type": "bogus"})
+
+    # Validation: same batches as the Sequence, also on the second (cached) pass
+    for _ in range(2):
+        batches = [(x.numpy(), y.numpy()) for x, y in val_ds]
+        assert len(batches) == len(val_seq) == 3
+        for b, (x, y) in enumerate(batches):
+            xr, yr = val_seq[b]
+            np.testing.assert_array_equal(x, xr)
+            np.testing.assert_array_equal(y, yr)
+
+    # Training: every sample once per epoch, augmented (mask stays binary), reshuffled each epoch
+    epochs = []
+    for _ in range(2):
+        xs, ys = zip(*[(x.numpy(), y.numpy()) for x, y in train_ds])
+        x, y = np.concatenate(xs), np.concatenate(ys)
+        assert x.shape == (7, 32, 32, 3) and y.shape == (7, 32, 32, 1)
+        assert x.dtype == np.float32 and 0.0 <= x.min() and x.max() <= 1.0
+        assert np.all((y == 0.0) | (y == 1.0))
+        epochs.append(y.reshape(7, -1).sum(axis=1))
+    assert sorted(epochs[0]) == sorted(epochs[1])
+
+    for source in (train_seq, train_ds):
+        stats = measure_input_throughput(source, num_batches=2, warmup=1)
+        assert stats["samples"] == 4 and stats["samples_per_sec"] > 0
+
+
+def test_tf_data_disk_cache_follows_the_tile_set(tmp_dirs, tmp_path):
+    pytest.importorskip("tensorflow")
+    tiles_dir = os.path.join(tmp_dirs["DATA_DIR"], "tiles")
+    _write_tiles(tiles_dir, "train", 2, seed=1)
+    _write_tiles(tiles_dir, "val", 3, seed=2)
+    cache_dir = str(tmp_path / "cache")
+    cfg = {"type": "tf_data", "cache_val": True, "cache_dir": cache_dir}
+
+    def _val_batches():
+        train_seq, val_seq = build_sequences_from_tiles(tiles_dir, batch_size=2, seed=0)
+        _, val_ds = build_input_pipeline(train_seq, val_seq, cfg)
+        for _ in range(2):
+            batches = [x.numpy() for x, _y in val_ds]
+        return val_seq, batches
+
+    _, first = _val_batches()
+    cached = set(os.listdir(cache_dir))
+    assert cached and all(f.startswith("val-") for f in cached)
+    _val_batches()  # unchanged tiles reuse the same cache files
+    assert set(os.listdir(cache_dir)) == cached
+
+    # Re-tiling under the same names must not be served from the old cache
+    img_paths, _ = _write_tiles(tiles_dir, "val", 3, seed=5)
+    later = time.time() + 10
+    for p in img_paths:
+        os.utime(p, (later, later))
+    val_seq, second = _val_batches()
+    np.testing.assert_array_equal(second[0], val_seq[0][0])
+    assert not np.array_equal(first[0], second[0])
+    assert set(os.listdir(cache_dir)).isdisjoint(cached)
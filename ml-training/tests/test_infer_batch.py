@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pytest
+
+# Ensure ml-training modules importable
+HERE = os.path.dirname(__file__)
+ML_TRAINING_ROOT = os.path.abspath(os.path.join(HERE, ".."))
+if ML_TRAINING_ROOT not in sys.path:
+    sys.path.insert(0, ML_TRAINING_ROOT)
+
+tf = pytest.importorskip("tensorflow")
+
+import infer  # noqa: E402
+from dataset import write_png  # noqa: E402
+from model_unet import build_unet  # noqa: E402
+
+
+def _geojson_files(out_dir):
+    out = {}
+    for f in sorted(os.listdir(out_dir)):
+        if f.endswith(".geojson"):
+            with open(os.path.join(out_dir, f), "r", encoding="utf-8") as fh:
+                out[f] = json.load(fh)
+    return out
+
+
+@pytest.mark.timeout(300)
+def test_batch_inference_resumes_and_matches_single_image(tmp_path, monkeypatch):
+    model_path = str(tmp_path / "model.keras")
+    build_unet(input_shape=(32, 32, 3), base_filters=4, depth=2).save(model_path)
+
+    img_dir = tmp_path / "scenes"
+    img_dir.mkdir()
+    rng = np.random.RandomState(0)
+    for i in range(3):
+        write_png(str(img_dir / f"scene_{i}.png"), rng.randint(0, 256, size=(40, 56, 3)).astype(np.uint8))
+    (img_dir / "broken.png").write_bytes(b"not a png")
+    (img_dir / "notes.txt").write_text("ignored", encoding="utf-8")
+    os.utime(model_path, (1, 1))  # model older than every output
+
+    kwargs = dict(model_path=model_path, tile_size=32, overlap=8, threshold=0.5, min_area_pixels=1, batch_size=3)
+    out_dir = str(tmp_path / "out")
+    summary = infer.run_batch_inference(str(img_dir), out_dir, **kwargs)
+    assert (summary["images"], summary["processed"], summary["up_to_date"], summary["failed"]) == (4, 3, 0, 1)
+    assert summary["status"] == "partial"
+    with open(os.path.join(out_dir, infer.SUMMARY_NAME), "r", encoding="utf-8") as f:
+        assert json.load(f)["processed"] == 3
+    outputs = _geojson_files(out_dir)
+    assert sorted(outputs) == [f"scene_{i}.geojson" for i in range(3)]
+
+    # Same result as one-image-per-invocation inference
+    single = str(tmp_path / "single.geojson")
+    infer.run_inference(str(img_dir / "scene_1.png"), single, **kwargs)
+    stamped = dict(outputs["scene_1.geojson"])
+    assert len(stamped.pop(infer.PARAMS_MEMBER)) == 64
+    with open(single, "r", encoding="utf-8") as f:
+        assert json.load(f) == stamped
+
+    # Resume: only the failed image and images newer than their output are redone
+    (img_dir / "broken.png").unlink()
+    newer = os.path.getmtime(os.path.join(out_dir, "scene_2.geojson")) + 10
+    os.utime(img_dir / "scene_2.png", (newer, newer))
+    summary = infer.run_batch_inference(str(img_dir / "*.png"), out_dir, **kwargs)
+    assert (summary["processed"], summary["up_to_date"], summary["failed"]) == (1, 2, 0)
+    assert [r["status"] for r in summary["results"]] == ["up_to_date", "up_to_date", "ok"]
+
+    # A run with new parameters interrupted after one image: the next run redoes only the others
+    real_infer_one = infer._infer_one
+
+    def _interrupt_after_one(*args):
+        if (tmp_path / "interrupted").exists():
+            raise KeyboardInterrupt
+        (tmp_path / "interrupted").touch()
+        return real_infer_one(*args)
+
+    monkeypatch.setattr(infer, "_infer_one", _interrupt_after_one)
+    with pytest.raises(KeyboardInterrupt):
+        infer.run_batch_inference(str(img_dir), out_dir, **{**kwargs, "threshold": 0.45})
+    monkeypatch.undo()
+    with open(os.path.join(out_dir, infer.SUMMARY_NAME), "r", encoding="utf-8") as f:
+        assert "params" not in json.load(f)
+    summary = infer.run_batch_inference(str(img_dir), out_dir, **{**kwargs, "threshold": 0.45})
+    assert [r["status"] for r in summary["results"]] == ["up_to_date", "ok", "ok"]
+    assert summary["params"]["threshold"] == 0.45
+
+    # Changed parameters invalidate previous outputs; a process pool gives the same GeoJSON
+    summary = infer.run_batch_inference(str(img_dir), out_dir, workers=2, **{**kwargs, "threshold": 0.4})
+    assert (summary["processed"], summary["up_to_date"], summary["workers"]) == (3, 0, 2)
+    pooled = _geojson_files(out_dir)
+    serial_dir = str(tmp_path / "serial")
+    infer.run_batch_inference(str(img_dir), serial_dir, **{**kwargs, "threshold": 0.4})
+    assert _geojson_files(serial_dir) == pooled
+
+    with pytest.raises(SystemExit):
+        infer.parse_args(["--input", str(img_dir)])
+    with pytest.raises(FileNotFoundError):
+        infer.run_batch_inference(str(tmp_path / "empty_*.png"), out_dir, **kwargs)
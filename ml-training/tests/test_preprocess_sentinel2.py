@@ -14,7 +14,15 @@ ML_TRAINING_ROOT = os.path.abspath(os.path.join(HERE, ".."))
 if ML_TRAINING_ROOT not in sys.path:
     sys.path.insert(0, ML_TRAINING_ROOT)
 
-from preprocess_sentinel2 import preprocess_sentinel2_dataset  # noqa: E402
+from preprocess_sentinel2 import (  # noqa: E402
+    NetCDFScene,
+    _IntHistogram,
+    _normalize_stack_to_uint8,
+    compare_percentile_modes,
+    preprocess_sentinel2_dataset,
+    read_netcdf_rgb,
+    read_netcdf_window,
+)
 
 
 S2_SAMPLES_DIR = os.path.abspath(os.path.join(ML_TRAINING_ROOT, "..", "sentinel2_datasets", "test", "test_images"))
@@ -231,4 +239,182 @@ def test_dataset_loader_reads_generated_png_channels_nir(tmp_path):
         arr = read_image_any(p)
         assert arr.dtype == np.uint8
         assert arr.ndim == 3
-        assert arr.shape[-1] == 4, "Expected 4 channels when include_nir=True"
\ No newline at end of file
+        assert arr.shape[-1] == 4, "Expected 4 channels when include_nir=True"
+
+
+def _write_h5_scene(path, H=96, W=80, seed=0, scl=True, prob=False):
+    import h5py
+
+    rng = np.random.RandomState(seed)
+    with h5py.File(path, "w") as f:
+        for name in ("B02", "B03", "B08"):
+            f.create_dataset(name, data=rng.randint(0, 6000, size=(H, W)).astype(np.uint16))
+        # (1, H, W) layout exercises the 3D band-plane selection
+        f.create_dataset("B04", data=rng.randint(0, 6000, size=(1, H, W)).astype(np.uint16))
+        if scl:
+            f.create_dataset("SCL", data=rng.randint(0, 12, size=(H, W)).astype(np.uint8))
+        if prob:
+            f.create_dataset("CLDPRB", data=rng.randint(0, 101, size=(H, W)).astype(np.uint8))
+
+
+def _read_tree(root):
+    out = {}
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            with open(os.path.join(dirpath, f), "rb") as fh:
+                out[os.path.relpath(os.path.join(dirpath, f), root)] = fh.read()
+    return out
+
+
+@pytest.mark.parametrize("method", ["percentile", "per_band", "none"])
+def test_chunked_processing_matches_whole_scene(tmp_path, method):
+    pytest.importorskip("h5py")
+    src = tmp_path / "nc"
+    src.mkdir()
+    _write_h5_scene(str(src / "a.nc"), seed=1)
+    _write_h5_scene(str(src / "b.nc"), seed=2, scl=False, prob=True)
+    kwargs = dict(
+        input_dir=str(src),
+        include_nir=True,
+        normalize_cfg={"method": method, "percentiles": (2.0, 98.0)},
+        output_format="png",
+        structure="folders",
+    )
+    whole = preprocess_sentinel2_dataset(output_dir=str(tmp_path / "whole"), **kwargs)
+    chunked = preprocess_sentinel2_dataset(output_dir=str(tmp_path / "chunked"), chunk_rows=7, **kwargs)
+    assert whole == chunked and whole["images"] == 2
+    assert _read_tree(str(tmp_path / "whole")) == _read_tree(str(tmp_path / "chunked"))
+
+    for source in ("scl", "cloud_probability"):
+        cm = {"enabled": True, "source": source, "threshold": 0.4}
+        a = preprocess_sentinel2_dataset(output_dir=str(tmp_path / f"m_whole_{source}"), cloud_mask_cfg=cm, **kwargs)
+        b = preprocess_sentinel2_dataset(output_dir=str(tmp_path / f"m_chunk_{source}"), cloud_mask_cfg=cm, chunk_rows=10, **kwargs)
+        assert a == b and a["masks"] == 1 and a["warnings"] == 1
+        assert _read_tree(str(tmp_path / f"m_whole_{source}")) == _read_tree(str(tmp_path / f"m_chunk_{source}"))
+
+
+@pytest.mark.timeout(120)
+def test_parallel_preprocessing_matches_serial_and_captures_errors(tmp_path, capsys):
+    pytest.importorskip("h5py")
+    src = tmp_path / "nc"
+    src.mkdir()
+    for i in range(5):
+        _write_h5_scene(str(src / f"s{i}.nc"), H=48, W=40, seed=i)
+    (src / "broken.nc").write_bytes(b"not a netcdf file")
+
+    kwargs = dict(input_dir=str(src), structure="manifest", seed=2024)
+    serial = preprocess_sentinel2_dataset(output_dir=str(tmp_path / "serial"), **kwargs)
+    parallel = preprocess_sentinel2_dataset(output_dir=str(tmp_path / "parallel"), workers=3, chunk_rows=16, **kwargs)
+    out = capsys.readouterr().out
+
+    assert serial == parallel
+    assert serial["processed"] == 5 and serial["skipped"] == 1 and serial["manifest"] == 5
+    assert "broken" in out
+    for split in ("train.csv", "val.csv", "test.csv"):
+        a = (tmp_path / "serial" / "manifests" / split).read_text().replace(str(tmp_path / "serial"), "")
+        b = (tmp_path / "parallel" / "manifests" / split).read_text().replace(str(tmp_path / "parallel"), "")
+        assert a == b
+    assert _read_tree(str(tmp_path / "serial" / "images")) == _read_tree(str(tmp_path / "parallel" / "images"))
+
+
+def test_histogram_percentiles_match_exact_for_integer_bands():
+    rng = np.random.RandomState(3)
+    stack = rng.randint(0, 12000, size=(123, 97, 3)).astype(np.float32)
+    stack[10:20, 5:9, 0] = np.nan
+    stack[..., 2] = 42.0  # degenerate band
+    exact = _normalize_stack_to_uint8(stack.copy(), "percentile", (2.0, 98.0), "exact")
+    for pct in [(2.0, 98.0), (0.5, 99.7), (0.0, 100.0)]:
+        a = _normalize_stack_to_uint8(stack.copy(), "percentile", pct, "exact")
+        b = _normalize_stack_to_uint8(stack.copy(), "percentile", pct, "histogram", inplace=True)
+        np.testing.assert_array_equal(a, b)
+    # Non-integer data falls back to the exact computation
+    floats = rng.rand(40, 30, 3).astype(np.float32) * 1000
+    np.testing.assert_array_equal(
+        _normalize_stack_to_uint8(floats.copy(), "percentile", (2.0, 98.0), "exact"),
+        _normalize_stack_to_uint8(floats.copy(), "percentile", (2.0, 98.0), "histogram"),
+    )
+
+    report = compare_percentile_modes(stack, (2.0, 98.0), sample_stride=2, repeat=1)
+    assert set(report) == {"exact", "histogram", "sampled"}
+    assert report["histogram"]["max_bound_dev"] == 0 and report["histogram"]["max_pixel_dev"] == 0
+    assert report["sampled"]["max_pixel_dev"] <= 8
+    np.testing.assert_array_equal(exact[..., 2], 0)
+
+
+def test_histogram_percentiles_equal_np_percentile_on_random_integer_scenes():
+    rng = np.random.RandomState(11)
+    for i in range(600):
+        dtype = (np.float32, np.float64, np.uint16)[i % 3]
+        v = rng.randint(0, rng.randint(1, 12000), size=(rng.randint(1, 20), rng.randint(1, 20))).astype(dtype)
+        ps = (2.0, 98.0, float(rng.uniform(0, 100)))
+        hist = _IntHistogram()
+        hist.add(v)
+        assert hist.percentiles(ps) == [float(np.nanpercentile(v, p)) for p in ps]
+
+
+def test_chunked_histogram_percentiles_match_whole_scene_exact(tmp_path):
+    pytest.importorskip("h5py")
+    src = tmp_path / "nc"
+    src.mkdir()
+    _write_h5_scene(str(src / "a.nc"), H=70, W=64, seed=9)
+    base = dict(input_dir=str(src), structure="folders")
+    preprocess_sentinel2_dataset(
+        output_dir=str(tmp_path / "exact"), normalize_cfg={"method": "percentile", "percentile_mode": "exact"}, **base
+    )
+    preprocess_sentinel2_dataset(
+        output_dir=str(tmp_path / "hist"),
+        normalize_cfg={"method": "percentile", "percentile_mode": "histogram"},
+        chunk_rows=9,
+        **base,
+    )
+    assert _read_tree(str(tmp_path / "exact")) == _read_tree(str(tmp_path / "hist"))
+    with pytest.raises(ValueError):
+        preprocess_sentinel2_dataset(
+            output_dir=str(tmp_path / "bad"), normalize_cfg={"method": "percentile", "percentile_mode": "fast"}, **base
+        )
+
+
+def test_read_netcdf_window_reads_only_the_requested_region(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    path = str(tmp_path / "a.nc")
+    _write_h5_scene(path, H=90, W=70, seed=4)
+    with h5py.File(path, "a") as f:
+        f.create_dataset("x", data=500000.0 + 10.0 * np.arange(70) + 5.0)
+        f.create_dataset("y", data=4000000.0 - 10.0 * np.arange(90) - 5.0)  # north-up: descending
+
+    whole = read_netcdf_rgb(path)
+    with NetCDFScene(path) as scene:
+        assert scene.shape() == (90, 70)
+        raw = scene.read_bands(window=(10, 20, 30, 25))
+        assert raw.shape == (30, 25, 3) and raw.dtype == np.float32
+        # Scene-wide bounds applied to a window reproduce the whole-scene pixels
+        full = scene.read_bands()
+        bounds = [(float(np.nanpercentile(full[..., c], 2.0)), float(np.nanpercentile(full[..., c], 98.0))) for c in range(3)]
+        tile = read_netcdf_window(scene, window=(10, 20, 30, 25), bounds=bounds)
+        np.testing.assert_array_equal(tile, whole[10:40, 20:45])
+        # Windows are clipped at the scene edge
+        assert read_netcdf_window(scene, window=(80, 60, 64, 64)).shape == (10, 10, 3)
+        # bbox in map units -> the same pixels as the matching window
+        bbox = (500200.0, 4000000.0 - 400.0, 500450.0, 4000000.0 - 100.0)
+        assert scene.window_for_bbox(bbox) == (10, 20, 30, 25)
+        np.testing.assert_array_equal(
+            read_netcdf_window(scene, bbox=bbox), read_netcdf_window(scene, window=(10, 20, 30, 25))
+        )
+        with pytest.raises(ValueError):
+            scene.read_bands(window=(95, 0, 8, 8))
+
+    class _Recorder:
+        """Wraps an h5py dataset and records the element count of every read."""
+
+        def __init__(self, ds):
+            self.ds, self.shape, self.reads = ds, ds.shape, []
+
+        def __getitem__(self, idx):
+            out = self.ds[idx]
+            self.reads.append(int(np.asarray(out).size))
+            return out
+
+    with NetCDFScene(path) as scene:
+        scene._vars = {b: _Recorder(scene.band_var(b)) for b in ("B04", "B03", "B02")}
+        read_netcdf_window(scene, window=(0, 0, 16, 16))
+        assert all(v.reads == [256] for v in scene._vars.values())
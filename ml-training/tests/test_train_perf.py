@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Ensure ml-training modules importable
+HERE = os.path.dirname(__file__)
+ML_TRAINING_ROOT = os.path.abspath(os.path.join(HERE, ".."))
+if ML_TRAINING_ROOT not in sys.path:
+    sys.path.insert(0, ML_TRAINING_ROOT)
+
+tf = pytest.importorskip("tensorflow")
+
+import train_perf  # noqa: E402
+from config_utils import apply_onednn_env, onednn_env_from_config  # noqa: E402
+from export import as_float32_model  # noqa: E402
+from model_unet import build_and_compile_from_config  # noqa: E402
+
+
+def _cfg(**performance):
+    return {
+        "data": {"tile": {"size": 16}},
+        "model": {"input_channels": 3, "output_channels": 1, "base_filters": 4, "depth": 2, "dropout": 0.0},
+        "metrics": {"threshold": 0.5},
+        "train": {"learning_rate": 1e-3, "performance": performance},
+    }
+
+
+@pytest.fixture
+def restore_policy():
+    yield
+    tf.keras.mixed_precision.set_global_policy("float32")
+
+
+def test_precision_auto_follows_cpu_bf16(monkeypatch, restore_policy):
+    monkeypatch.setattr(train_perf, "cpu_bf16_flags", lambda: [])
+    eff = train_perf.apply_performance({"precision": "auto"})
+    assert eff["precision"]["policy"] == "float32" and tf.keras.mixed_precision.global_policy().name == "float32"
+
+    monkeypatch.setattr(train_perf, "cpu_bf16_flags", lambda: ["amx_bf16"])
+    eff = train_perf.apply_performance({"precision": "auto", "jit_compile": True})
+    assert eff["precision"] == {"requested": "auto", "policy": "mixed_bfloat16", "cpu_bf16": ["amx_bf16"]}
+    assert eff["jit_compile"] is True
+    assert eff["intra_op_threads"] >= 0 and eff["inter_op_threads"] >= 0
+
+    with pytest.raises(ValueError):
+        train_perf.apply_performance({"precision": "float8"})
+
+    # Defaults leave TensorFlow's behavior untouched
+    eff = train_perf.apply_performance(None)
+    assert eff["precision"]["policy"] == "float32" and eff["jit_compile"] is False
+
+
+def test_onednn_env_from_config(tmp_path, monkeypatch):
+    cfg = _cfg(onednn={"enabled": False, "fpmath_mode": "bf16"})
+    assert onednn_env_from_config(cfg) == {"TF_ENABLE_ONEDNN_OPTS": "0", "ONEDNN_DEFAULT_FPMATH_MODE": "BF16"}
+    assert onednn_env_from_config(_cfg()) == {}
+
+    path = tmp_path / "config.yaml"
+    path.write_text("train:\n  performance:\n    onednn: {enabled: true, fpmath_mode: bf16}\n", encoding="utf-8")
+    monkeypatch.delenv("TF_ENABLE_ONEDNN_OPTS", raising=False)
+    monkeypatch.setenv("ONEDNN_DEFAULT_FPMATH_MODE", "STRICT")
+    # Variables already in the environment win
+    assert apply_onednn_env(str(path)) == {"TF_ENABLE_ONEDNN_OPTS": "1"}
+    assert os.environ["ONEDNN_DEFAULT_FPMATH_MODE"] == "STRICT"
+
+
+@pytest.mark.timeout(180)
+def test_bf16_jit_training_and_float32_export(restore_policy):
+    tf.keras.mixed_precision.set_global_policy("mixed_bfloat16")
+    model = build_and_compile_from_config(_cfg(jit_compile=True))
+    assert model.jit_compile is True
+    assert model.get_layer("logits").compute_dtype == "float32"
+    assert model.get_layer("enc0_conv1").compute_dtype == "bfloat16"
+
+    rng = np.random.RandomState(0)
+    x = rng.rand(4, 16, 16, 3).astype(np.float32)
+    y = (rng.rand(4, 16, 16, 1) > 0.5).astype(np.float32)
+    timer = train_perf.StepTimeCallback()
+    history = model.fit(x, y, batch_size=2, epochs=2, verbose=0, callbacks=[timer])
+    assert np.all(np.isfinite(history.history["loss"]))
+    stats = timer.summary()
+    assert stats["steps"] == 4 and stats["mean_ms"] > 0 and stats["first_step_ms"] > 0
+
+    # Export rebuilds the mixed-precision checkpoint in float32 with the same weights
+    tf.keras.mixed_precision.set_global_policy("float32")
+    f32 = as_float32_model(model, _cfg())
+    assert f32 is not model
+    assert all(layer.dtype_policy.name == "float32" for layer in f32.layers)
+    for a, b in zip(model.get_weights(), f32.get_weights()):
+        np.testing.assert_array_equal(a, b)
+    np.testing.assert_allclose(f32.predict(x, verbose=0), model.predict(x, verbose=0), atol=5e-2)
+    assert as_float32_model(f32, _cfg()) is f32
+
+
+class _SlowSequence(tf.keras.utils.Sequence):
+    def __init__(self, delay, n=4):
+        super().__init__()
+        self.delay, self.n, self.passes = delay, n, 0
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        time.sleep(self.delay)
+        rng = np.random.RandomState(i)
+        return rng.rand(2, 16, 16, 3).astype(np.float32), (rng.rand(2, 16, 16, 1) > 0.5).astype(np.float32)
+
+    def on_epoch_end(self):
+        self.passes += 1
+
+
+@pytest.mark.timeout(180)
+def test_throughput_callback_flags_input_bound_epochs(tmp_path):
+    model = build_and_compile_from_config(_cfg())
+
+    seq = _SlowSequence(delay=0.15)
+    cb = train_perf.ThroughputCallback(log_dir=str(tmp_path), input_bound_threshold=0.5)
+    model.fit(cb.wrap(seq), epochs=2, verbose=0, callbacks=[cb])
+    report = cb.report()
+    assert seq.passes == 2 and len(cb.times) == len(cb.waits) == 8 and cb.samples == [2] * 8
+    assert [e["epoch"] for e in report["epochs"]] == [1, 2] and report["input_bound_epochs"] == [1, 2]
+    for e in report["epochs"]:
+        assert e["data_wait_ms"] >= 100 and e["compute_ms"] >= 0
+        assert e["step_ms"] == pytest.approx(e["data_wait_ms"] + e["compute_ms"], abs=0.05)
+        assert 0 < e["samples_per_sec"] < 2 / 0.1
+    assert report["overall"]["data_wait_fraction"] > 0.5
+    peak = train_perf.peak_rss_mb()
+    assert peak is None or peak > 0
+
+    # Same model fed from an in-memory tf.data pipeline: compute dominates, nothing flagged
+    x, y = seq[0]
+    ds = tf.data.Dataset.from_tensor_slices((np.repeat(x, 4, axis=0), np.repeat(y, 4, axis=0))).batch(2).cache()
+    cb = train_perf.ThroughputCallback(input_bound_threshold=0.5)
+    model.fit(cb.wrap(ds), epochs=2, verbose=0, callbacks=[cb])
+    report = cb.report()
+    assert len(cb.times) == 8 and report["input_bound_epochs"] == []
+    assert report["overall"]["samples_per_sec"] > 0
@@ -0,0 +1,284 @@
+"""
+CPU training performance settings (train.performance in config.yaml).
+
+- threads: TensorFlow intra-op / inter-op pool sizes. "auto" uses the CPUs available to this
+  process for intra-op and 2 inter-op threads (one U-Net step has little op-level parallelism);
+  0 leaves TensorFlow's defaults. Applied before TensorFlow executes its first op.
+- precision: float32 | mixed_bfloat16 | auto. auto selects mixed_bfloat16 only when the CPU has
+  native bf16 (AVX512_BF16 or AMX); elsewhere bf16 is emulated and slower than float32.
+- jit_compile: XLA-compile the train step (passed to model.compile).
+- onednn: TF_ENABLE_ONEDNN_OPTS is read when TensorFlow is imported, so train_unet.py exports it
+  before its own imports (config_utils.apply_onednn_env); fpmath_mode sets
+  ONEDNN_DEFAULT_FPMATH_MODE (e.g. bf16 lets oneDNN use bf16 math inside float32 ops on AMX).
+
+apply_performance() returns the effective settings, which train_unet.py records in
+train_summary.json together with the step time measured by StepTimeCallback.
+
+ThroughputCallback (train.performance.throughput) splits each step into time spent waiting on the
+input and time in the train step, tracks samples/sec and peak RSS, writes them to TensorBoard and
+flags input-bound epochs.
+"""
+
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config_utils import onednn_env_from_config
+
+try:
+    import tensorflow as tf
+except Exception:  # pragma: no cover - CI environments may not install TF
+    tf = None  # type: ignore
+
+PRECISIONS = ("float32", "mixed_bfloat16", "auto")
+_BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_bf16_flags() -> List[str]:
+    """Native bf16 CPU features of this host (Linux /proc/cpuinfo; empty elsewhere)."""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = set(line.split(":", 1)[1].split())
+                    return [fl for fl in _BF16_CPU_FLAGS if fl in flags]
+    except OSError:
+        pass
+    return []
+
+
+def _thread_count(value: Any, auto: int) -> int:
+    if str(value).lower() == "auto":
+        return auto
+    return max(0, int(value or 0))
+
+
+def apply_performance(perf_cfg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply thread pools, mixed precision and oneDNN math mode; call before building the model
+    (and before any TensorFlow op runs). Returns the effective settings.
+    """
+    assert tf is not None, "TensorFlow is required for training performance settings"
+    cfg = perf_cfg or {}
+    effective: Dict[str, Any] = {"cpus": available_cpus()}
+
+    # Thread pools: only settable before the runtime initializes
+    intra = _thread_count(cfg.get("intra_op_threads", 0), effective["cpus"])
+    inter = _thread_count(cfg.get("inter_op_threads", 0), 2)
+    try:
+        if intra:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+        if inter:
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+    except RuntimeError as e:
+        effective["threads_error"] = str(e)
+    effective["intra_op_threads"] = int(tf.config.threading.get_intra_op_parallelism_threads())
+    effective["inter_op_threads"] = int(tf.config.threading.get_inter_op_parallelism_threads())
+
+    # oneDNN: fpmath mode is read when the first primitive is created, so it can still be set here
+    env = onednn_env_from_config({"train": {"performance": cfg}})
+    if "ONEDNN_DEFAULT_FPMATH_MODE" in env:
+        os.environ.setdefault("ONEDNN_DEFAULT_FPMATH_MODE", env["ONEDNN_DEFAULT_FPMATH_MODE"])
+    effective["onednn"] = {
+        "TF_ENABLE_ONEDNN_OPTS": os.environ.get("TF_ENABLE_ONEDNN_OPTS", "default"),
+        "ONEDNN_DEFAULT_FPMATH_MODE": os.environ.get("ONEDNN_DEFAULT_FPMATH_MODE", "default"),
+    }
+
+    # Mixed precision
+    precision = str(cfg.get("precision", "float32")).lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision} (expected one of {PRECISIONS})")
+    bf16_flags = cpu_bf16_flags()
+    policy = precision
+    if precision == "auto":
+        policy = "mixed_bfloat16" if bf16_flags else "float32"
+    tf.keras.mixed_precision.set_global_policy(policy)
+    effective["precision"] = {"requested": precision, "policy": policy, "cpu_bf16": bf16_flags}
+
+    effective["jit_compile"] = bool(cfg.get("jit_compile", False))
+    return effective
+
+
+class StepTimeCallback(tf.keras.callbacks.Callback if tf is not None else object):  # type: ignore
+    """
+    Wall time per training step. The first `skip` steps (tracing / XLA compilation) are kept
+    apart so the summary reflects steady-state speed.
+    """
+
+    def __init__(self, skip: int = 1) -> None:
+        super().__init__()
+        self.skip = max(0, int(skip))
+        self.times: List[float] = []
+        self._t0 = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None) -> None:
+        self._t0 = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None) -> None:
+        self.times.append(time.perf_counter() - self._t0)
+
+    def summary(self) -> Dict[str, Any]:
+        steady = sorted(self.times[self.skip:])
+        if not steady:
+            return {"steps": len(self.times), "first_step_ms": round(1000 * self.times[0], 2) if self.times else None}
+        return {
+            "steps": len(self.times),
+            "first_step_ms": round(1000 * self.times[0], 2),
+            "mean_ms": round(1000 * sum(steady) / len(steady), 2),
+            "median_ms": round(1000 * steady[len(steady) // 2], 2),
+        }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB (None where `resource` is unavailable)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _sequence_dataset(seq) -> "tf.data.Dataset":
+    """A Keras Sequence as tf.data, prefetched like Keras' own adapter; reshuffles after each pass."""
+    x0, y0 = seq[0]
+    spec = tuple(tf.TensorSpec((None,) + tuple(a.shape[1:]), tf.as_dtype(a.dtype)) for a in (x0, y0))
+
+    def gen():
+        for i in range(len(seq)):
+            yield seq[i]
+        seq.on_epoch_end()
+
+    ds = tf.data.Dataset.from_generator(gen, output_signature=spec)
+    return ds.apply(tf.data.experimental.assert_cardinality(len(seq))).prefetch(tf.data.AUTOTUNE)
+
+
+class ThroughputCallback(StepTimeCallback):
+    """
+    Per-step wall time split into data wait and compute, samples/sec and peak RSS.
+
+    Keras fetches the next batch inside the train function, so the wait cannot be seen from
+    callback hooks alone: wrap() returns the training input with each hand-off to the model timed
+    (the input keeps its own parallelism/prefetch). Compute is the rest of the step.
+
+    Per-step times and per-epoch aggregates are written to TensorBoard under `log_dir`/throughput.
+    An epoch is input-bound when the data wait reaches `input_bound_threshold` of its step time.
+    """
+
+    def __init__(self, log_dir: Optional[str] = None, input_bound_threshold: float = 0.3, skip: int = 1) -> None:
+        super().__init__(skip=skip)
+        self.log_dir = log_dir
+        self.input_bound_threshold = float(input_bound_threshold)
+        self.waits: List[float] = []
+        self.samples: List[int] = []
+        self.epochs: List[Dict[str, Any]] = []
+        self._pending: List[Tuple[float, int]] = []
+        self._epoch_start = 0
+        self._writer = None
+
+    def wrap(self, source) -> "tf.data.Dataset":
+        """Training input (Keras Sequence or tf.data.Dataset) with timed batch hand-offs."""
+        inner = source if isinstance(source, tf.data.Dataset) else _sequence_dataset(source)
+        n_batches = int(inner.cardinality())
+
+        def timed():
+            it = iter(inner)
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    batch = next(it)
+                except StopIteration:
+                    return
+                self._pending.append((time.perf_counter() - t0, int(tf.nest.flatten(batch)[0].shape[0])))
+                yield batch
+
+        ds = tf.data.Dataset.from_generator(timed, output_signature=inner.element_spec)
+        if n_batches > 0:
+            ds = ds.apply(tf.data.experimental.assert_cardinality(n_batches))
+        # No prefetch after the timing point, otherwise the hand-off would be hidden again
+        options = tf.data.Options()
+        options.experimental_optimization.inject_prefetch = False
+        return ds.with_options(options)
+
+    def on_epoch_begin(self, epoch, logs=None) -> None:
+        self._epoch_start = len(self.times)
+
+    def on_train_batch_end(self, batch, logs=None) -> None:
+        super().on_train_batch_end(batch, logs)
+        pending, self._pending = self._pending, []
+        self.waits.append(sum(w for w, _ in pending))
+        self.samples.append(sum(n for _, n in pending))
+        step = len(self.times) - 1
+        self._scalars(
+            {"step_ms": 1000 * self.times[step], "data_wait_ms": 1000 * self.waits[step]}, step, prefix="throughput_step"
+        )
+
+    def on_epoch_end(self, epoch, logs=None) -> None:
+        start = self._epoch_start
+        if len(self.times) - max(start, self.skip) > 0:
+            start = max(start, self.skip)  # keep tracing/compilation out of the first epoch
+        stats = {"epoch": epoch + 1, "steps": len(self.times) - self._epoch_start, **self._aggregate(start, len(self.times))}
+        stats["input_bound"] = bool(stats["data_wait_fraction"] >= self.input_bound_threshold)
+        self.epochs.append(stats)
+        self._scalars({k: v for k, v in stats.items() if k not in ("epoch", "steps", "input_bound")}, epoch)
+        if stats["input_bound"]:
+            print(
+                f"[throughput] epoch {epoch + 1} is input-bound: {stats['data_wait_fraction']:.0%} of step time "
+                f"waiting on data (threshold {self.input_bound_threshold:.0%})"
+            )
+
+    def on_train_end(self, logs=None) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _aggregate(self, start: int, end: int) -> Dict[str, Any]:
+        n = max(1, end - start)
+        total, wait, samples = sum(self.times[start:end]), sum(self.waits[start:end]), sum(self.samples[start:end])
+        return {
+            "step_ms": round(1000 * total / n, 2),
+            "data_wait_ms": round(1000 * wait / n, 2),
+            "compute_ms": round(1000 * (total - wait) / n, 2),
+            "data_wait_fraction": round(wait / total, 4) if total > 0 else 0.0,
+            "samples_per_sec": round(samples / total, 2) if samples and total > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def _scalars(self, values: Dict[str, Any], step: int, prefix: str = "throughput") -> None:
+        if not self.log_dir:
+            return
+        if self._writer is None:
+            self._writer = tf.summary.create_file_writer(os.path.join(self.log_dir, "throughput"))
+        try:
+            with self._writer.as_default():
+                for name, value in values.items():
+                    if value is not None:
+                        tf.summary.scalar(f"{prefix}/{name}", float(value), step=step)
+        except Exception as e:  # e.g. tensorboard package missing; keep collecting for the summary
+            print(f"[throughput] TensorBoard scalars disabled: {e}")
+            self.log_dir = None
+
+    def report(self) -> Dict[str, Any]:
+        """Summary for train_summary.json: per-epoch aggregates, overall steady state, flags."""
+        start = self.skip if len(self.times) > self.skip else 0
+        return {
+            "input_bound_threshold": self.input_bound_threshold,
+            "overall": self._aggregate(start, len(self.times)),
+            "epochs": self.epochs,
+            "input_bound_epochs": [e["epoch"] for e in self.epochs if e["input_bound"]],
+        }
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import json
+
+    print(json.dumps({"cpus": available_cpus(), "cpu_bf16": cpu_bf16_flags(), "python": sys.version.split()[0]}, indent=2))
@@ -17,14 +17,27 @@ CURRENT_DIR = os.path.dirname(__file__)
 if CURRENT_DIR not in sys.path:
     sys.path.insert(0, CURRENT_DIR)
 
+if __name__ == "__main__":  # pragma: no cover
+    # train.performance.onednn has to be exported before TensorFlow is imported (via dataset.py)
+    from config_utils import apply_onednn_env
+
+    _pre = argparse.ArgumentParser(add_help=False)
+    _pre.add_argument("--config", type=str, default=None)
+    apply_onednn_env(_pre.parse_known_args()[0].config)
+
 from dataset import (  # noqa: E402
     build_sequences_from_tiles,
     build_sequences_from_sentinel2,
+    build_sequences_from_packed,
+    build_input_pipeline,
+    measure_input_throughput,
+    num_samples,
     set_global_seeds,
     load_yaml_config,
 )
 from model_unet import build_and_compile_from_config  # noqa: E402
 from config_utils import load_and_resolve_config  # noqa: E402
+from train_perf import StepTimeCallback, ThroughputCallback, apply_performance  # noqa: E402
 
 
 def download_sentinel2_dataset(data_dir: str, sentinel2_cfg: Dict) -> None:
@@ -61,6 +74,13 @@ def download_sentinel2_dataset(data_dir: str, sentinel2_cfg: Dict) -> None:
 def parse_args(argv=None):
     p = argparse.ArgumentParser("Train U-Net baseline for boundary detection")
     p.add_argument("--config", type=str, required=True, help="Path to YAML config")
+    p.add_argument(
+        "--benchmark-input",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Time N training batches from the Sequence and tf.data pipelines (no model), print samples/sec and exit",
+    )
     return p.parse_args(argv)
 
 
@@ -88,15 +108,24 @@ def main(argv=None) -> int:
         print("TensorFlow import failed; training cannot proceed.", e)
         return 2
 
+    # CPU performance: thread pools (before the first op), precision policy (before the model)
+    performance = apply_performance(cfg.get("train", {}).get("performance", {}))
+    print(f"[performance] {json.dumps(performance)}")
+
     # Paths
     data_dir = str(cfg.get("data", {}).get("data_dir", "./data"))
     tiles_dir = str(cfg.get("data", {}).get("tiles_dir", os.path.join(data_dir, "tiles")))
     runs_dir = str(cfg.get("paths", {}).get("runs_dir", "./runs"))
     exp_name = str(cfg.get("experiment", {}).get("name", "unet_baseline"))
 
+    # Packed shards (dataset.py pack) take precedence over PNG tiles / Sentinel-2 folders
+    packed_cfg = cfg.get("data", {}).get("packed", {}) or {}
+    use_packed = bool(packed_cfg.get("enabled", False))
+    packed_dir = str(packed_cfg.get("dir") or os.path.join(data_dir, "packed"))
+
     # Sentinel-2 config
     sentinel2_cfg = cfg.get("data", {}).get("sentinel2", {})
-    use_sentinel2 = bool(sentinel2_cfg.get("enabled", False))
+    use_sentinel2 = bool(sentinel2_cfg.get("enabled", False)) and not use_packed
     if use_sentinel2:
         sentinel2_base_dir = os.path.join(data_dir, sentinel2_cfg.get("input_dir", "sentinel2_datasets"))
         download_cfg = sentinel2_cfg.get("download", {})
@@ -119,7 +148,14 @@ def main(argv=None) -> int:
 
     # Datasets
     try:
-        if use_sentinel2:
+        if use_packed:
+            train_seq, val_seq = build_sequences_from_packed(
+                packed_dir=packed_dir,
+                batch_size=batch_size,
+                augment_cfg=augment_cfg,
+                seed=seed,
+            )
+        elif use_sentinel2:
             train_seq, val_seq, _ = build_sequences_from_sentinel2(
                 sentinel2_base_dir=sentinel2_base_dir,
                 batch_size=batch_size,
@@ -135,7 +171,11 @@ def main(argv=None) -> int:
                 seed=seed,
             )
     except FileNotFoundError as e:
-        if use_sentinel2:
+        if use_packed:
+            print(f"Packed dataset missing: {e}")
+            print("Hint: pack tiles first, e.g.:")
+            print(f"  python ml-training/dataset.py pack --data-dir {data_dir} --out-dir {packed_dir}")
+        elif use_sentinel2:
             print(f"Sentinel-2 dataset missing: {e}")
             print("Hint: check download links in config or set data.sentinel2.download.enabled: true")
         else:
@@ -144,6 +184,18 @@ def main(argv=None) -> int:
             print("  python ml-training/dataset.py tile --data-dir ./data --tile-size 512 --overlap 64 --val-ratio 0.2 --seed 1337")
         return 2
 
+    # Input pipeline: Keras Sequences (default) or tf.data with parallel decode + prefetch
+    pipeline_cfg = cfg.get("data", {}).get("pipeline", {}) or {}
+    pipeline_type = str(pipeline_cfg.get("type", "sequence")).lower()
+    if args.benchmark_input > 0:
+        report = {}
+        for kind in ("sequence", "tf_data"):
+            train_in, _ = build_input_pipeline(train_seq, val_seq, {**pipeline_cfg, "type": kind})
+            report[kind] = measure_input_throughput(train_in, num_batches=args.benchmark_input)
+        print(json.dumps({"status": "ok", "batch_size": batch_size, "input_pipeline": report}, indent=2))
+        return 0
+    train_in, val_in = build_input_pipeline(train_seq, val_seq, pipeline_cfg)
+
     # Model
     model = build_and_compile_from_config(cfg)
     model.summary(print_fn=lambda s: print(s))
@@ -155,7 +207,17 @@ def main(argv=None) -> int:
     patience = int(cfg.get("checkpoint", {}).get("early_stopping_patience", 5))
 
     ckpt_path = os.path.join(ckpt_dir, "best.keras")
+    # Throughput instrumentation: data wait vs compute per step, samples/sec, peak RSS
+    throughput_cfg = (train_cfg.get("performance", {}) or {}).get("throughput", {}) or {}
+    throughput = None
+    if bool(throughput_cfg.get("enabled", False)):
+        throughput = ThroughputCallback(
+            log_dir=tb_dir, input_bound_threshold=float(throughput_cfg.get("input_bound_threshold", 0.3))
+        )
+        train_in = throughput.wrap(train_in)
+    step_timer = throughput or StepTimeCallback()
     callbacks = [
+        step_timer,
         tf.keras.callbacks.TensorBoard(log_dir=tb_dir, histogram_freq=0, write_graph=False, write_images=False),
         tf.keras.callbacks.ModelCheckpoint(
             filepath=ckpt_path, monitor=monitor, mode=mode, save_best_only=save_best_only, save_weights_only=False
@@ -166,8 +228,8 @@ def main(argv=None) -> int:
     # Fit
     start = time.time()
     history = model.fit(
-        train_seq,
-        validation_data=val_seq,
+        train_in,
+        validation_data=val_in,
         epochs=epochs,
         callbacks=callbacks,
         verbose=1,
@@ -175,7 +237,7 @@ def main(argv=None) -> int:
     elapsed = time.time() - start
 
     # Evaluate final/best
-    metrics = model.evaluate(val_seq, return_dict=True, verbose=0)
+    metrics = model.evaluate(val_in, return_dict=True, verbose=0)
 
     # Extract simple loss progression info to support smoke tests
     train_losses = history.history.get("loss", []) or []
@@ -195,7 +257,15 @@ def main(argv=None) -> int:
         "train_loss_last": train_loss_last,
         "val_loss_first": val_loss_first,
         "val_loss_last": val_loss_last,
+        # End-to-end training throughput (includes validation passes)
+        "input_pipeline": {
+            "type": pipeline_type,
+            "samples_per_sec": round(num_samples(train_seq) * len(train_losses) / elapsed, 2) if elapsed > 0 else None,
+        },
+        "performance": {**performance, "step_time_ms": step_timer.summary()},
     }
+    if throughput is not None:
+        result["throughput"] = throughput.report()
 
     # Persist training summary
     with open(os.path.join(run_root, "train_summary.json"), "w", encoding="utf-8") as f: